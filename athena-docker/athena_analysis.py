@@ -13,6 +13,24 @@ import os
 import vtk
 from vtk.util import numpy_support
 import os.path
+import itertools
+
+# The repository's float32 readers (utils/ one level up) when run from a checkout
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try:
+    from utils.athena_io import read_table, read_vtk_components
+    ATHENA_IO_AVAILABLE = True
+except ImportError:
+    ATHENA_IO_AVAILABLE = False
+
+# Cells per chunk of the streaming analysis (about 50 MB of float64 buffers)
+CHUNK_CELLS = 1 << 20
+# Joint (density, gamma - 1) histogram resolution, in bins per decade
+HISTOGRAM_BINS_PER_DECADE = 16
+# gamma - 1 below this (e.g. gas at rest) is counted in the lowest row
+GAMMA_MINUS_ONE_FLOOR = 1e-12
+# Upper bound on v^2/c^2, as in analyze_relativistic_effects
+MAX_BETA2 = 0.9999
 
 def read_athena_data(filename):
     """Read data from an Athena HDF5 output file"""
@@ -134,6 +152,15 @@ def read_athena_data_any_format(filename):
     _, ext = os.path.splitext(filename)
     
     # Use appropriate reader based on file extension
+    if ext.lower() == '.vtk' and ATHENA_IO_AVAILABLE and _athena_vtk_layout(filename) is not None:
+        # Athena++ binary VTK: float32 fields, vector components as views of one array
+        try:
+            time, data = read_vtk_components(filename)
+            print(f"Successfully read VTK file: {filename} (time = {time})")
+            return time, data
+        except (OSError, ValueError) as e:
+            print(f"Error reading VTK file {filename}: {e}")
+            return None, None
     if ext.lower() in ['.vtk', '.vtu', '.vtp']:
         return read_athena_vtk(filename)
     elif ext.lower() in ['.h5', '.hdf5', '.athdf']:
@@ -142,12 +169,15 @@ def read_athena_data_any_format(filename):
         # Try to read as text format
         try:
             time, data = None, None
-            # Load data as a NumPy array
-            data_array = np.loadtxt(filename)
+            # Load data as one float32 array (the columns below are views of it)
+            if ATHENA_IO_AVAILABLE:
+                data_array = read_table(filename)
+            else:
+                data_array = np.loadtxt(filename, dtype=np.float32, ndmin=2)
             
             # Organize data into a dictionary
             # Assuming columns are: x, y, z, time, rho, vel1, vel2, vel3, press
-            time = data_array[0, 3]  # Get time from first row
+            time = float(data_array[0, 3])  # Get time from first row
             
             data = {
                 'x': data_array[:, 0],
@@ -171,30 +201,313 @@ def read_athena_data_any_format(filename):
             print(f"Error reading file {filename}: {e}")
             return None, None
 
+def fused_speed_gamma(vel1, vel2=None, vel3=None, speed=None, gamma=None, c=1.0):
+    """
+    |v| and the Lorentz factor of one chunk in a single pass over the
+    components, written into the `speed` and `gamma` buffers (allocated when
+    not given; pass them back in to reuse them across chunks)
+    """
+    n = np.size(vel1)
+    if speed is None or speed.size < n:
+        speed = np.empty(n)
+    if gamma is None or gamma.size < n:
+        gamma = np.empty(n)
+    speed, gamma = speed[:n], gamma[:n]
+    # speed <- |v|^2, one component at a time (gamma is the scratch buffer)
+    np.multiply(vel1, vel1, out=speed.reshape(np.shape(vel1)))
+    for v in (vel2, vel3):
+        if v is not None:
+            np.multiply(v, v, out=gamma.reshape(np.shape(v)))
+            speed += gamma
+    # gamma <- 1 / sqrt(1 - min(v^2/c^2, 0.9999)), then speed <- |v|
+    np.multiply(speed, 1.0 / c**2, out=gamma)
+    np.minimum(gamma, MAX_BETA2, out=gamma)
+    np.subtract(1.0, gamma, out=gamma)
+    np.sqrt(gamma, out=gamma)
+    np.reciprocal(gamma, out=gamma)
+    np.sqrt(speed, out=speed)
+    return speed, gamma
+
 def analyze_relativistic_effects(data):
     """Calculate relativistic effects from simulation data"""
     if 'rho' not in data or 'vel1' not in data:
         print("Required variables not found in data")
         return None
     
-    # Calculate total velocity
-    vel_total = np.sqrt(data['vel1']**2)
-    if 'vel2' in data:
-        vel_total = np.sqrt(vel_total**2 + data['vel2']**2)
-    if 'vel3' in data:
-        vel_total = np.sqrt(vel_total**2 + data['vel3']**2)
-    
-    # Calculate relativistic gamma factor (time dilation)
+    # Total velocity and relativistic gamma factor (time dilation) in one pass
     # Assuming c = 1 in code units, adjust if using different units
-    c = 1.0  
-    gamma = 1.0 / np.sqrt(1.0 - np.minimum(vel_total**2/c**2, 0.9999))
+    vel_total, gamma = fused_speed_gamma(data['vel1'], data.get('vel2'), data.get('vel3'), c=1.0)
+    shape = np.shape(data['vel1'])
     
     return {
-        'velocity': vel_total,
-        'gamma': gamma,
+        'velocity': vel_total.reshape(shape),
+        'gamma': gamma.reshape(shape),
         'density': data['rho']
     }
 
+class JointHistogram:
+    """
+    Histogram of (x, y) pairs on log10 bins of fixed width that grows its
+    range as chunks arrive, so no pass over the data is needed to find it.
+    Non-positive x values are only counted (in `excluded`); y values are
+    floored at `y_floor`.
+    """
+    def __init__(self, bins_per_decade=HISTOGRAM_BINS_PER_DECADE, y_floor=GAMMA_MINUS_ONE_FLOOR):
+        self.bins_per_decade = bins_per_decade
+        self.y_floor = y_floor
+        self.counts = np.zeros((0, 0), dtype=np.int64)
+        self.origin = np.zeros(2, dtype=np.int64)  # bin index of counts[0, 0]
+        self.excluded = 0
+
+    def _bins(self, values):
+        return np.floor(np.log10(values) * self.bins_per_decade).astype(np.int64)
+
+    def add(self, x, y):
+        valid = x > 0
+        self.excluded += int(valid.size - np.count_nonzero(valid))
+        if not valid.all():
+            x, y = x[valid], y[valid]
+        if x.size == 0:
+            return
+        ix = self._bins(x)
+        iy = self._bins(np.maximum(y, self.y_floor))
+        low = np.array([ix.min(), iy.min()])
+        high = np.array([ix.max(), iy.max()]) + 1
+        if self.counts.size == 0:
+            self.origin = low
+            self.counts = np.zeros(high - low, dtype=np.int64)
+        else:
+            end = self.origin + self.counts.shape
+            new_origin, new_end = np.minimum(self.origin, low), np.maximum(end, high)
+            if (new_origin != self.origin).any() or (new_end != end).any():
+                grown = np.zeros(new_end - new_origin, dtype=np.int64)
+                offset = self.origin - new_origin
+                grown[offset[0]:offset[0] + self.counts.shape[0],
+                      offset[1]:offset[1] + self.counts.shape[1]] = self.counts
+                self.origin, self.counts = new_origin, grown
+        ix -= self.origin[0]
+        iy -= self.origin[1]
+        ix *= self.counts.shape[1]
+        ix += iy
+        self.counts += np.bincount(ix, minlength=self.counts.size).reshape(self.counts.shape)
+
+    def edges(self):
+        """Bin edges (x_edges, y_edges)"""
+        return tuple(10.0**(np.arange(o, o + n + 1) / self.bins_per_decade)
+                     for o, n in zip(self.origin, self.counts.shape))
+
+class RelativisticAccumulator:
+    """
+    Streaming relativistic analysis: feed chunks of density and velocity
+    components with add(); summary statistics and the joint (density,
+    gamma - 1) histogram are updated on the fly with buffers reused between
+    chunks, so memory does not grow with the number of cells.
+    """
+    def __init__(self, c=1.0, bins_per_decade=HISTOGRAM_BINS_PER_DECADE):
+        self.c = c
+        self.histogram = JointHistogram(bins_per_decade)
+        self.cells = 0
+        self.density_sum = 0.0
+        self.gamma_sum = 0.0
+        self.density_min, self.density_max = np.inf, -np.inf
+        self.velocity_max = 0.0
+        self.gamma_min, self.gamma_max = np.inf, -np.inf
+        self._speed = self._gamma = None
+
+    def add(self, rho, vel1, vel2=None, vel3=None):
+        rho = np.ravel(rho)
+        if rho.size == 0:
+            return
+        speed, gamma = fused_speed_gamma(np.ravel(vel1),
+                                         None if vel2 is None else np.ravel(vel2),
+                                         None if vel3 is None else np.ravel(vel3),
+                                         self._speed, self._gamma, self.c)
+        if self._speed is None or speed.size > self._speed.size:
+            self._speed, self._gamma = speed, gamma
+        self.cells += rho.size
+        self.density_sum += float(np.sum(rho, dtype=np.float64))
+        self.gamma_sum += float(np.sum(gamma))
+        self.density_min = min(self.density_min, float(rho.min()))
+        self.density_max = max(self.density_max, float(rho.max()))
+        self.velocity_max = max(self.velocity_max, float(speed.max()))
+        self.gamma_min = min(self.gamma_min, float(gamma.min()))
+        self.gamma_max = max(self.gamma_max, float(gamma.max()))
+        # gamma - 1 into the speed buffer, which is no longer needed
+        np.subtract(gamma, 1.0, out=speed)
+        self.histogram.add(rho, speed)
+
+    def results(self):
+        """Summary statistics and the joint histogram as a dictionary"""
+        n = max(self.cells, 1)
+        density_edges, gamma_edges = self.histogram.edges()
+        return {
+            'cells': self.cells,
+            'mean_density': self.density_sum / n,
+            'min_density': self.density_min,
+            'max_density': self.density_max,
+            'max_velocity': self.velocity_max,
+            'mean_gamma': self.gamma_sum / n,
+            'min_gamma': self.gamma_min,
+            'max_gamma': self.gamma_max,
+            'histogram': self.histogram.counts,
+            'density_edges': density_edges,
+            'gamma_minus_one_edges': gamma_edges,
+            'excluded_cells': self.histogram.excluded
+        }
+
+def _athena_vtk_layout(filename):
+    """
+    Byte offsets of the cell arrays of an Athena++ legacy binary VTK file:
+    (number of cells, {name: (offset, components)}), or None for other files
+    """
+    layout = {}
+    with open(filename, 'rb') as f:
+        if not f.readline().startswith(b'# vtk DataFile'):
+            return None
+        f.readline()
+        if f.readline().strip() != b'BINARY':
+            return None
+        cells = None
+        while True:
+            line = f.readline()
+            if not line:
+                break
+            words = line.split()
+            if not words:
+                continue
+            key = words[0]
+            if key in (b'X_COORDINATES', b'Y_COORDINATES', b'Z_COORDINATES', b'POINTS'):
+                components = 3 if key == b'POINTS' else 1
+                f.seek(int(words[1]) * components * 4, 1)
+            elif key == b'CELL_DATA':
+                cells = int(words[1])
+            elif key in (b'SCALARS', b'VECTORS') and cells is not None:
+                if key == b'SCALARS':
+                    if f.readline().split()[:1] != [b'LOOKUP_TABLE']:
+                        return None
+                components = 3 if key == b'VECTORS' else 1
+                layout[words[1].decode()] = (f.tell(), components)
+                f.seek(cells * components * 4, 1)
+            elif key == b'POINT_DATA':
+                return None
+    return (cells, layout) if cells and layout else None
+
+def _vtk_chunks(filename, cells, layout, chunk_cells):
+    names = {'rho': 'rho', 'density': 'rho', 'press': 'press', 'pressure': 'press'}
+    vectors = [name for name, (_, n) in layout.items() if n == 3 and name in ('vel', 'velocity')]
+    buffers = {}
+    with open(filename, 'rb') as f:
+        for start in range(0, cells, chunk_cells):
+            count = min(chunk_cells, cells - start)
+            chunk = {}
+            for name, (offset, components) in layout.items():
+                if name not in names and name not in vectors:
+                    continue
+                buffer = buffers.get(name)
+                if buffer is None or buffer.size < count * components:
+                    buffer = buffers[name] = np.empty(chunk_cells * components, dtype='>f4')
+                values = buffer[:count * components]
+                f.seek(offset + start * components * 4)
+                if f.readinto(memoryview(values).cast('B')) != values.nbytes:
+                    raise ValueError(f"{filename}: field {name} is truncated")
+                if components == 3:
+                    values = values.reshape(count, 3)
+                    for i in range(3):
+                        chunk[f'vel{i + 1}'] = values[:, i]
+                else:
+                    chunk[names[name]] = values
+            yield chunk
+
+def _hdf5_chunks(filename, chunk_cells):
+    with h5py.File(filename, 'r') as f:
+        # Per-variable datasets, or Athena++ 'prim'/'cons' blocks (var, meshblock, k, j, i)
+        fields = {var: (f[var], ()) for var in ['rho', 'press', 'vel1', 'vel2', 'vel3'] if var in f}
+        if not fields and 'VariableNames' in f.attrs:
+            names = [n.decode() if isinstance(n, bytes) else str(n) for n in f.attrs['VariableNames']]
+            datasets = [n.decode() if isinstance(n, bytes) else str(n) for n in f.attrs['DatasetNames']]
+            counts = np.atleast_1d(f.attrs['NumVariables'])
+            first = 0
+            for dataset, count in zip(datasets, counts):
+                for i in range(int(count)):
+                    name = names[first + i]
+                    if name in ('rho', 'press', 'vel1', 'vel2', 'vel3') and name not in fields:
+                        fields[name] = (f[dataset], (i,))
+                first += int(count)
+        if not fields:
+            return
+        dataset, prefix = next(iter(fields.values()))
+        shape = dataset.shape[len(prefix):]
+        # Meshblocks (if any) and rows along the next axis, chunk_cells at a time
+        blocks = shape[0] if len(prefix) else 1
+        block_shape = shape[1:] if len(prefix) else shape
+        row_cells = int(np.prod(block_shape[1:])) if len(block_shape) > 1 else 1
+        rows = max(1, chunk_cells // row_cells)
+        for b in range(blocks):
+            for k0 in range(0, block_shape[0], rows):
+                k1 = min(k0 + rows, block_shape[0])
+                block = (b,) if len(prefix) else ()
+                yield {var: ds[prefix + block + (slice(k0, k1),)].reshape(-1)
+                       for var, (ds, prefix) in fields.items()}
+
+def _text_chunks(filename, chunk_cells):
+    # Columns: x, y, z, time, rho, vel1, vel2, vel3, press
+    columns = {'rho': 4, 'vel1': 5, 'vel2': 6, 'vel3': 7, 'press': 8}
+    with open(filename) as f:
+        while True:
+            lines = list(itertools.islice(f, chunk_cells))
+            if not lines:
+                break
+            table = np.atleast_2d(np.loadtxt(lines))
+            yield {var: table[:, col] for var, col in columns.items() if col < table.shape[1]}
+
+def iter_athena_chunks(source, chunk_cells=CHUNK_CELLS):
+    """
+    Yield dictionaries of flat chunks ('rho', 'vel1', ... of at most
+    chunk_cells cells) from an output file or an in-memory data dictionary.
+    Athena++ binary VTK, HDF5 and text files are read chunk by chunk; other
+    VTK files go through the VTK reader first.
+    """
+    if isinstance(source, dict):
+        n = np.size(source['rho'])
+        flat = {var: np.ravel(source[var]) for var in ['rho', 'press', 'vel1', 'vel2', 'vel3']
+                if var in source}
+        for start in range(0, n, chunk_cells):
+            yield {var: values[start:start + chunk_cells] for var, values in flat.items()}
+        return
+    _, ext = os.path.splitext(source)
+    if ext.lower() in ['.vtk', '.vtu', '.vtp']:
+        layout = _athena_vtk_layout(source) if ext.lower() == '.vtk' else None
+        if layout is not None:
+            yield from _vtk_chunks(source, layout[0], layout[1], chunk_cells)
+        else:
+            _, data = read_athena_vtk(source)
+            if data is not None:
+                yield from iter_athena_chunks(data, chunk_cells)
+    elif ext.lower() in ['.h5', '.hdf5', '.athdf']:
+        yield from _hdf5_chunks(source, chunk_cells)
+    else:
+        yield from _text_chunks(source, chunk_cells)
+
+def analyze_relativistic_effects_chunked(source, chunk_cells=CHUNK_CELLS, c=1.0):
+    """
+    Relativistic analysis of a file or data dictionary in constant memory:
+    summary statistics and the joint (density, gamma - 1) histogram
+    """
+    accumulator = RelativisticAccumulator(c)
+    try:
+        for chunk in iter_athena_chunks(source, chunk_cells):
+            if 'rho' not in chunk or 'vel1' not in chunk:
+                print("Required variables not found in data")
+                return None
+            accumulator.add(chunk['rho'], chunk['vel1'], chunk.get('vel2'), chunk.get('vel3'))
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return None
+    if accumulator.cells == 0:
+        print("No cells found in data")
+        return None
+    return accumulator.results()
+
 def analyze_time_density_model(data, time, alpha=0.01, omega=1.0):
     """Analyze results from a time-density model simulation and compare with theory"""
     if 'rho' not in data:
@@ -252,6 +565,28 @@ def plot_density_timedilation(rel_data, output_file=None):
     else:
         plt.show()
 
+def plot_density_gamma_histogram(stats, output_file=None):
+    """Plot the joint (density, gamma - 1) histogram from the chunked analysis"""
+    from matplotlib.colors import LogNorm
+    plt.figure(figsize=(10, 6))
+    
+    counts = np.ma.masked_equal(stats['histogram'].T, 0)
+    plt.pcolormesh(stats['density_edges'], stats['gamma_minus_one_edges'], counts,
+                   norm=LogNorm(vmin=1, vmax=max(int(counts.max()), 1)), cmap='viridis')
+    plt.colorbar(label='Cells')
+    plt.xlabel('Density')
+    plt.ylabel('γ - 1')
+    plt.title('Relationship Between Density and Time Dilation')
+    plt.xscale('log')
+    plt.yscale('log')
+    plt.grid(True, alpha=0.3)
+    
+    if output_file:
+        plt.savefig(output_file, dpi=300)
+        print(f"Plot saved to: {output_file}")
+    else:
+        plt.show()
+
 def plot_time_density_comparison(results, output_file=None):
     """Plot comparison between theoretical and simulated time-density"""
     plt.figure(figsize=(12, 8))
@@ -326,13 +661,13 @@ def main():
     if len(sys.argv) > 3:
         analysis_type = sys.argv[3]
     
-    # Read data using the unified reader function
-    time, data = read_athena_data_any_format(input_file)
-    if data is None:
-        return
-    
     # Perform analysis based on type
     if analysis_type == 'time-density':
+        # Read data using the unified reader function
+        time, data = read_athena_data_any_format(input_file)
+        if data is None:
+            return
+        
         # Get parameters if provided
         alpha = float(sys.argv[4]) if len(sys.argv) > 4 else 0.01
         omega = float(sys.argv[5]) if len(sys.argv) > 5 else 1.0
@@ -359,21 +694,22 @@ def main():
             print(f"Modulated velocity: {results['modulated_velocity']:.6e}")
         
     else:  # 'relativistic' or any other value defaults to relativistic analysis
-        # Analyze relativistic effects
+        # Analyze relativistic effects, streaming over the file in chunks
         print("Performing relativistic analysis...")
-        rel_data = analyze_relativistic_effects(data)
-        if rel_data is None:
+        stats = analyze_relativistic_effects_chunked(input_file)
+        if stats is None:
             return
         
         # Create plot
-        plot_density_timedilation(rel_data, output_file)
+        plot_density_gamma_histogram(stats, output_file)
         
         # Print some statistics
         print("\nData Statistics:")
-        print(f"Mean density: {np.mean(rel_data['density']):.6e}")
-        print(f"Max velocity: {np.max(rel_data['velocity']):.6f}")
-        print(f"Mean time dilation factor: {np.mean(rel_data['gamma']):.6f}")
-        print(f"Max time dilation factor: {np.max(rel_data['gamma']):.6f}")
+        print(f"Cells: {stats['cells']}")
+        print(f"Mean density: {stats['mean_density']:.6e}")
+        print(f"Max velocity: {stats['max_velocity']:.6f}")
+        print(f"Mean time dilation factor: {stats['mean_gamma']:.6f}")
+        print(f"Max time dilation factor: {stats['max_gamma']:.6f}")
 
 if __name__ == "__main__":
     main()
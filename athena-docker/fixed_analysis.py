@@ -9,6 +9,13 @@ import numpy as np
 import matplotlib.pyplot as plt
 import sys
 import os
+# The repository's float32 readers (utils/ one level up) when run from a checkout
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try:
+    from utils.athena_io import read_table, read_vtk_components
+    ATHENA_IO_AVAILABLE = True
+except ImportError:
+    ATHENA_IO_AVAILABLE = False
 try:
     import vtk
     from vtk.util import numpy_support
@@ -115,22 +122,35 @@ def read_athena_data(filename):
     ext = ext.lower()
     
     try:
-        if ext == '.vtk' or ext == '.vtu' or ext == '.vtp':
+        if ext == '.vtk' and ATHENA_IO_AVAILABLE:
+            # Athena++ binary VTK: float32 fields, vector components as views of one array
+            print(f"Loading VTK data from {filename}")
+            try:
+                time, data = read_vtk_components(filename)
+                print(f"Successfully read VTK file: {filename} with {len(data)} data fields")
+                return time, data
+            except ValueError:
+                return read_athena_vtk(filename)  # not an Athena++ binary VTK file
+        elif ext == '.vtk' or ext == '.vtu' or ext == '.vtp':
             return read_athena_vtk(filename)
         else:
             # Try to read as text format
             print(f"Loading data from {filename}")
-            data = np.loadtxt(filename)
+            if ATHENA_IO_AVAILABLE:
+                data = read_table(filename)
+            else:
+                data = np.loadtxt(filename, dtype=np.float32, ndmin=2)
             
-            # Organize data into a structured dictionary
+            # Organize data into a structured dictionary of float32 column views
             # Columns are typically: x, y, z, time, rho, vel1, vel2, vel3, press
-            time = data[0, 3]  # All rows have same time, so take from first row
+            time = float(data[0, 3])  # All rows have same time, so take from first row
+            zeros = np.zeros(len(data), dtype=data.dtype)  # one shared array for missing columns
             fields = {
                 'rho': data[:, 4],
                 'vel1': data[:, 5],
-                'vel2': data[:, 6] if data.shape[1] > 6 else np.zeros_like(data[:, 0]),
-                'vel3': data[:, 7] if data.shape[1] > 7 else np.zeros_like(data[:, 0]),
-                'press': data[:, 8] if data.shape[1] > 8 else np.zeros_like(data[:, 0]),
+                'vel2': data[:, 6] if data.shape[1] > 6 else zeros,
+                'vel3': data[:, 7] if data.shape[1] > 7 else zeros,
+                'press': data[:, 8] if data.shape[1] > 8 else zeros,
                 'x': data[:, 0],
                 'y': data[:, 1],
                 'z': data[:, 2],
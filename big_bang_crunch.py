@@ -1,105 +1,86 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from mpl_toolkits.mplot3d.art3d import Line3DCollection
-from matplotlib.animation import FuncAnimation, PillowWriter
 import os
 
+from utils.animation_engine import (PersistentAnimation, edge_segments, sphere_grid,
+                                    grid_wireframe_segments, grid_surface_polygons)
+from utils.parallel_render import render_parallel
+from utils.projection import plane_rotations, project
+from utils.topology import hypercube
+
 # Set up output directory and file path
 output_dir = "timespace_sim"
-os.makedirs(output_dir, exist_ok=True)
-save_path = os.path.join(output_dir, "cube_sphere_emergent_space.gif")
+save_path = os.path.join(output_dir, "big_bang_crunch.gif")
 
 # 3D cube (unit cube centered at origin)
-cube_vertices = np.array([[x, y, z]
-                          for x in (-1, 1)
-                          for y in (-1, 1)
-                          for z in (-1, 1)])
-
-cube_edges = [(i, j) for i in range(len(cube_vertices))
-              for j in range(i+1, len(cube_vertices))
-              if np.sum(np.abs(cube_vertices[i] - cube_vertices[j])) == 2]
+cube_vertices = 2 * hypercube(3).vertices - 1
+cube_edges = hypercube(3).edges
 
 # Generate tesseract (4D cube)
 def generate_tesseract():
-    return np.array([[int(x) for x in f"{i:04b}"] for i in range(16)])
+    return hypercube(4).vertices
 
-# Project 4D to 3D
+# Project 4D to 3D (theta may be an array of per-frame angles)
 def project_4d(points4d, theta):
-    rot = np.array([ 
-        [np.cos(theta), 0, 0, -np.sin(theta)],
-        [0, 1, 0, 0],
-        [0, 0, 1, 0],
-        [np.sin(theta), 0, 0, np.cos(theta)]
-    ])
-    rotated = points4d @ rot.T
-    perspective = 1 / (2 - rotated[:, 3])
-    projected = rotated[:, :3] * perspective[:, None]
-    return projected
+    return project(points4d, plane_rotations(4, [(0, 3)], theta), distance=2.0)
 
 # 4D tesseract setup
 tesseract4d = generate_tesseract()
-tesseract_edges = [(i, j) for i in range(len(tesseract4d))
-                   for j in range(i+1, len(tesseract4d))
-                   if np.sum(np.abs(tesseract4d[i] - tesseract4d[j])) == 1]
-
-# Animation
-fig = plt.figure(figsize=(6, 6))
-ax = fig.add_subplot(111, projection='3d')
-ax.axis('off')
-
-def update(frame):
-    ax.cla()
-    ax.set_xlim(-2, 2)
-    ax.set_ylim(-2, 2)
-    ax.set_zlim(-2, 2)
-    ax.axis('off')
-
-    # Define sphere grid variables (moved outside conditional blocks)
-    u, v = np.mgrid[0:2*np.pi:30j, 0:np.pi:15j]
-    x = np.sqrt(3) * np.cos(u) * np.sin(v)
-    y = np.sqrt(3) * np.sin(u) * np.sin(v)
-    z = np.sqrt(3) * np.cos(v)
-
-    # PHASE 1: Big Bang (Pyramid)
-    if frame < 30:
-        lines = [[cube_vertices[i], cube_vertices[j]] for i, j in cube_edges]
-        ax.add_collection3d(Line3DCollection(lines, colors='deepskyblue', linewidths=2))
-
-        # Overlay sphere touching cube corners
-        ax.plot_surface(x, y, z, color='gray', alpha=0.1, linewidth=0)
+tesseract_edges = hypercube(4).edges
+
+def build_scene(n_frames=80):
+    """Precompute every frame's geometry and create the persistent artists"""
+    # Precompute all frames up front
+    frames = np.arange(n_frames)
+    phase1 = frames < 30
+    phase3 = frames >= 60
+
+    # Sphere grid is computed once (it used to be rebuilt with np.mgrid every frame)
+    sphere = sphere_grid(np.sqrt(3))
 
     # PHASE 2: Emergent Space + Cube Expansion
-    elif frame < 60:
-        alpha = max(0, 1 - (frame - 30)/40)
-        theta = (frame - 30) * np.pi / 50
-        projected = project_4d(tesseract4d, theta)
-        lines = [[projected[i], projected[j]] for i, j in tesseract_edges]
-        ax.add_collection3d(Line3DCollection(lines, colors=(1, 0.3, 0.3, alpha), linewidths=1.5))
-
-        # Optional: decay sphere effect
-        r = np.sqrt(3)
-        ax.plot_wireframe(r * x, r * y, r * z, color='gray', alpha=0.05 + 0.2*alpha, linewidth=0.2)
-    
-    # PHASE 3: Big Crunch (Optional)
-    else:
-        # Contraction phase - inverse of expansion
-        progress = (frame - 60) / 20  # 0 to 1 over last 20 frames
-        scale = 1 - 0.8 * progress  # Scale from 1 down to 0.2
-        
-        # Shrinking tesseract
-        theta = np.pi / 2 - progress * np.pi / 4  # Reverse rotation
-        projected = project_4d(tesseract4d, theta)
-        scaled_proj = projected * scale
-        
-        lines = [[scaled_proj[i], scaled_proj[j]] for i, j in tesseract_edges]
-        ax.add_collection3d(Line3DCollection(lines, colors=(1, 0.3, 0.3, 0.8), linewidths=1.5))
-        
-        # Shrinking sphere
-        r = np.sqrt(3) * scale * 0.8
-        ax.plot_wireframe(r * x, r * y, r * z, color='gray', alpha=0.2, linewidth=0.2)
-
-# Generate animation with 80 frames
-ani = FuncAnimation(fig, update, frames=80, interval=80)
-writer = PillowWriter(fps=10)
-ani.save(save_path, writer=writer)
-print(f"GIF saved to: {save_path}")
+    alpha = np.clip(1 - (frames - 30) / 40, 0, 1)
+    theta = (frames - 30) * np.pi / 50
+    scale = np.ones(n_frames)
+    wire_radius = np.full(n_frames, np.sqrt(3))
+    tesseract_alpha = alpha.copy()
+    wire_alpha = 0.05 + 0.2 * alpha
+
+    # PHASE 3: Big Crunch - contraction is the inverse of expansion
+    progress = (frames[phase3] - 60) / 20  # 0 to 1 over last 20 frames
+    scale[phase3] = 1 - 0.8 * progress  # Scale from 1 down to 0.2
+    theta[phase3] = np.pi / 2 - progress * np.pi / 4  # Reverse rotation
+    wire_radius[phase3] = np.sqrt(3) * scale[phase3] * 0.8
+    tesseract_alpha[phase3] = 0.8
+    wire_alpha[phase3] = 0.2
+
+    # Shrinking tesseract and sphere for every frame in one batched pass
+    projected = project_4d(tesseract4d, theta) * scale[:, None, None]
+    tesseract_segments = edge_segments(projected, tesseract_edges)
+    wire_segments = grid_wireframe_segments(wire_radius[:, None, None, None] * sphere)
+    tesseract_colors = np.column_stack([np.ones(n_frames), np.full(n_frames, 0.3),
+                                        np.full(n_frames, 0.3), tesseract_alpha])
+    wire_colors = np.column_stack([np.full((n_frames, 3), 0.5), wire_alpha])
+
+    # Animation: artists are created once and updated in place
+    scene = PersistentAnimation(n_frames, limits=(-2, 2), box_aspect=False)
+
+    # PHASE 1: Big Bang with a sphere overlay touching the cube corners
+    scene.add_lines(edge_segments(cube_vertices, cube_edges), visible=phase1,
+                    colors='deepskyblue', linewidths=2)
+    scene.add_polygons(grid_surface_polygons(sphere), visible=phase1,
+                       facecolors=(0.5, 0.5, 0.5, 0.1), linewidths=0)
+
+    # PHASES 2-3: tesseract and decaying/shrinking sphere wireframe
+    scene.add_lines(tesseract_segments, visible=~phase1, frame_colors=tesseract_colors,
+                    linewidths=1.5)
+    scene.add_lines(wire_segments, visible=~phase1, frame_colors=wire_colors, linewidths=0.2)
+    return scene
+
+def main(output_path=save_path, workers=None):
+    """Render the animation across worker processes and save the GIF"""
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    render_parallel(build_scene, output_path, fps=10, workers=workers)
+    print(f"GIF saved to: {output_path}")
+
+if __name__ == "__main__":
+    main()
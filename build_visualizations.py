@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Incremental build of the Genesis-Sphere visualizations
+Every GIF/PNG in timespace_sim/ is a target with a script, the function to
+call, its parameters and its outputs. A target is rebuilt only when the
+content hash of its script, the local modules it imports, its extra inputs
+or its parameters changed, or when one of its outputs is missing or was
+modified. Stale targets run concurrently in a process pool; scripts are
+only imported inside the workers, so a no-op build never loads matplotlib.
+
+Usage: python build_visualizations.py [targets...] [--force] [--jobs N] [--list]
+"""
+
+import argparse
+import ast
+import hashlib
+import importlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = "timespace_sim"
+CACHE_FILE = os.path.join(OUTPUT_DIR, ".build_cache.json")
+
+# script: module at the repository root; function: its entry point;
+# params: keyword arguments; output_arg: keyword that receives the output
+# path (or directory for multi-output targets); parallel: the function
+# accepts workers= for its own frame-level parallelism
+TARGETS = {
+    'genesis_timespace': {
+        'script': 'genesis_timespace.py', 'function': 'main', 'params': {},
+        'output_arg': 'output_path', 'parallel': True,
+        'outputs': [os.path.join(OUTPUT_DIR, 'emergent_space.gif')],
+    },
+    'cube_sphere_emergent_space': {
+        'script': 'cube_sphere_emergent_space.py', 'function': 'main', 'params': {},
+        'output_arg': 'output_path', 'parallel': True,
+        'outputs': [os.path.join(OUTPUT_DIR, 'cube_sphere_emergent_space.gif')],
+    },
+    'cube_to_tesseract': {
+        'script': 'cube_to_tesseract.py', 'function': 'main', 'params': {},
+        'output_arg': 'output_path', 'parallel': True,
+        'outputs': [os.path.join(OUTPUT_DIR, 'cube_to_tesseract.gif')],
+    },
+    'big_bang_crunch': {
+        'script': 'big_bang_crunch.py', 'function': 'main', 'params': {},
+        'output_arg': 'output_path', 'parallel': True,
+        'outputs': [os.path.join(OUTPUT_DIR, 'big_bang_crunch.gif')],
+    },
+    'singularity_animation': {
+        'script': 'singularity_animation.py', 'function': 'main', 'params': {},
+        'output_arg': 'output_path', 'parallel': True,
+        'outputs': [os.path.join(OUTPUT_DIR, 'singularity_animation.gif')],
+    },
+    'singularity_plot': {
+        'script': 'singularity_plot.py', 'function': 'plot_singularity_density',
+        'params': {'n': 2, 't_min': 0.01, 't_max': 10, 'points': 1000},
+        'output_arg': 'output_path',
+        'outputs': [os.path.join(OUTPUT_DIR, 'singularity_density_plot.png')],
+    },
+    'gravitational_time_dilation': {
+        'script': 'gravitational_time_dilation.py', 'function': 'main', 'params': {},
+        'output_arg': 'output_dir',
+        'outputs': [os.path.join(OUTPUT_DIR, 'time_density_dilation.png'),
+                    os.path.join(OUTPUT_DIR, 'temporal_flow_concepts.png')],
+    },
+}
+
+
+def _local_module_path(name):
+    """Map a dotted module name to a .py file in this repository, if it is one"""
+    path = os.path.join(ROOT, *name.split('.')) + '.py'
+    return path if os.path.isfile(path) else None
+
+
+def find_dependencies(script):
+    """Return the script plus every repository module it imports, transitively"""
+    pending = [os.path.join(ROOT, script)]
+    found = set()
+    while pending:
+        path = pending.pop()
+        if path in found:
+            continue
+        found.add(path)
+        with open(path, 'rb') as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                # "from utils.x import y" may also name a submodule y
+                names = [node.module] + [f"{node.module}.{alias.name}" for alias in node.names]
+            else:
+                continue
+            for name in names:
+                module_path = _local_module_path(name)
+                if module_path:
+                    pending.append(module_path)
+    return sorted(found)
+
+
+def _file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def target_hash(name, spec):
+    """Content hash of everything that determines a target's outputs"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps({'target': name, 'function': spec['function'],
+                              'params': spec['params'], 'outputs': spec['outputs']},
+                             sort_keys=True).encode('utf-8'))
+    inputs = find_dependencies(spec['script'])
+    inputs += [os.path.join(ROOT, p) for p in spec.get('inputs', [])]
+    for path in inputs:
+        digest.update(os.path.relpath(path, ROOT).encode('utf-8'))
+        digest.update(_file_digest(path).encode('ascii'))
+    return digest.hexdigest()
+
+
+def _output_stamp(path):
+    """Cheap fingerprint of an output: (size, mtime_ns), or None if missing"""
+    try:
+        st = os.stat(os.path.join(ROOT, path))
+    except FileNotFoundError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def load_cache():
+    try:
+        with open(os.path.join(ROOT, CACHE_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_cache(cache):
+    path = os.path.join(ROOT, CACHE_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def is_stale(name, digest, cache):
+    """A target is stale if its inputs changed or an output is missing/modified"""
+    entry = cache.get(name)
+    if entry is None or entry.get('hash') != digest:
+        return True
+    spec = TARGETS[name]
+    return any(entry.get('outputs', {}).get(path) != _output_stamp(path)
+               for path in spec['outputs'])
+
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use('Agg')
+    os.chdir(ROOT)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+
+
+def build_target(name, render_workers=1):
+    """Import the target's script and call its entry point (runs in a worker)"""
+    spec = TARGETS[name]
+    start = time.perf_counter()
+    module = importlib.import_module(os.path.splitext(spec['script'])[0])
+    kwargs = dict(spec['params'])
+    outputs = spec['outputs']
+    kwargs[spec['output_arg']] = (outputs[0] if spec['output_arg'] != 'output_dir'
+                                  else os.path.dirname(outputs[0]))
+    if spec.get('parallel'):
+        kwargs['workers'] = render_workers
+    getattr(module, spec['function'])(**kwargs)
+
+    import matplotlib.pyplot as plt
+    plt.close('all')
+    missing = [path for path in outputs if not os.path.exists(path)]
+    if missing:
+        raise RuntimeError(f"{name} did not write {', '.join(missing)}")
+    return time.perf_counter() - start
+
+
+def build(names=None, force=False, jobs=None):
+    """
+    Rebuild the stale targets.
+
+    Parameters:
+    -----------
+    names : list of str
+        Targets to consider (default: all)
+    force : bool
+        Rebuild even if the cache says the outputs are current
+    jobs : int
+        Targets built concurrently (default: os.cpu_count())
+
+    Returns:
+    --------
+    bool : True if every target is up to date afterwards
+    """
+    names = list(names or TARGETS)
+    unknown = [name for name in names if name not in TARGETS]
+    if unknown:
+        raise ValueError(f"Unknown target(s): {', '.join(unknown)}")
+
+    cache = load_cache()
+    digests = {name: target_hash(name, TARGETS[name]) for name in names}
+    stale = [name for name in names if force or is_stale(name, digests[name], cache)]
+    for name in names:
+        if name not in stale:
+            print(f"[up to date] {name}")
+    if not stale:
+        return True
+
+    cpus = os.cpu_count() or 1
+    jobs = max(1, min(jobs or cpus, len(stale)))
+    # Cores left over by target-level parallelism go to frame rendering
+    render_workers = max(1, cpus // jobs)
+
+    ok = True
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(jobs, mp_context=context, initializer=_init_worker) as pool:
+        futures = {pool.submit(build_target, name, render_workers): name for name in stale}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                elapsed = future.result()
+            except Exception as e:
+                ok = False
+                cache.pop(name, None)
+                print(f"[failed]     {name}: {e}")
+            else:
+                cache[name] = {'hash': digests[name],
+                               'outputs': {path: _output_stamp(path)
+                                           for path in TARGETS[name]['outputs']}}
+                print(f"[built]      {name} ({elapsed:.1f} s)")
+            save_cache(cache)
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the Genesis-Sphere visualizations')
+    parser.add_argument('targets', nargs='*', help='Targets to build (default: all)')
+    parser.add_argument('--force', action='store_true', help='Rebuild even if up to date')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help='Targets built in parallel (default: number of CPUs)')
+    parser.add_argument('--list', action='store_true', help='List targets and their state')
+    args = parser.parse_args()
+
+    if args.list:
+        cache = load_cache()
+        for name, spec in TARGETS.items():
+            state = 'stale' if is_stale(name, target_hash(name, spec), cache) else 'up to date'
+            print(f"{name:30s} {state:11s} {', '.join(spec['outputs'])}")
+        return 0
+
+    try:
+        return 0 if build(args.targets, force=args.force, jobs=args.jobs) else 1
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
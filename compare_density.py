@@ -7,13 +7,20 @@ Compares density profiles between time-density model and standard simulations
 import numpy as np
 import matplotlib.pyplot as plt
 import os
+import sys
+
+from utils.athena_io import read_table
+
+def load_profile(filename):
+    """Load a tabular simulation output (columns: x, y, z, time, rho, ...) as float32"""
+    return read_table(filename)
 
 def compare_density_profiles(file1, file2, output_file=None):
     """Compare density profiles from two different simulation outputs"""
     try:
         # Load data from both files
-        time_density = np.loadtxt(file1)
-        standard = np.loadtxt(file2)
+        time_density = load_profile(file1)
+        standard = load_profile(file2)
         
         # Create plot
         plt.figure(figsize=(10, 6))
@@ -47,9 +54,8 @@ def compare_density_profiles(file1, file2, output_file=None):
         
     return True
 
-if __name__ == "__main__":
-    import sys
-    
+def main():
+    """Main function to process command line arguments"""
     if len(sys.argv) < 3:
         print("Usage: python compare_density.py <time_density_file> <standard_file> [output_plot.png]")
         print("Example: python compare_density.py time_density.out1.00000 standard.out1.00000 comparison.png")
@@ -71,3 +77,6 @@ if __name__ == "__main__":
         output_file = sys.argv[3] if len(sys.argv) > 3 else None
         
         compare_density_profiles(file1, file2, output_file)
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ and generates comprehensive reports on time-density relationships.
 
 import os
 import sys
+import asyncio
 import subprocess
 import numpy as np
 import matplotlib.pyplot as plt
@@ -16,6 +17,11 @@ import pandas as pd
 import datetime
 import json
 import argparse
+import sqlite3
+
+from utils import snapshot_index, tracing
+from utils.athena_io import read_table
+from utils.pipeline import Pipeline, Stage
 
 # Constants and configurations
 DOCKER_IMAGE = "athena-custom"
@@ -23,15 +29,26 @@ OUTPUT_DIR = "simulation_results"
 REPORT_FILENAME = "simulation_comparison_report.pdf"
 CONFIG_FILE = "simulation_config.json"
 
-def run_docker_simulation(simulation_type, input_file, output_prefix):
-    """Run an Athena simulation in Docker with the specified parameters"""
-    print(f"\n{'='*80}\nRunning {simulation_type} simulation\n{'='*80}")
-    
+# Parameter column indices
+PARAM_INDICES = {
+    'x': 0,      # Position
+    'rho': 4,    # Density
+    'vel1': 5,   # X-Velocity
+    'vel2': 6,   # Y-Velocity
+    'vel3': 7,   # Z-Velocity
+    'press': 8   # Pressure
+}
+COLUMN_NAMES = ['x', 'y', 'z', 'time', 'rho', 'vel1', 'vel2', 'vel3', 'press']
+
+# Simulations compared: (label, config key prefix; also the CSV file prefix)
+SIMULATIONS = (('standard', 'standard'), ('time-density', 'time_density'))
+
+def docker_command(input_file, output_prefix):
+    """Docker command line running Athena on input_file into OUTPUT_DIR"""
     # Create the output directory if it doesn't exist
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     
-    # Build the Docker command
-    cmd = [
+    return [
         "docker", "run", "--rm",
         "-v", f"{os.path.abspath(os.getcwd())}:/workspace",
         "-w", "/workspace",
@@ -41,29 +58,39 @@ def run_docker_simulation(simulation_type, input_file, output_prefix):
         "-d", OUTPUT_DIR,
         f"-o {output_prefix}"
     ]
+
+def check_simulation_output(simulation_type, output_prefix, stdout, stderr):
+    """Check a finished Athena run for fatal errors and its first output file"""
+    # Check if the output contains a fatal error message
+    if "FATAL ERROR" in stdout or "FATAL ERROR" in stderr:
+        print(f"Athena simulation failed with error:")
+        print(stdout)
+        print(stderr)
+        return False
+        
+    print(f"Successfully completed {simulation_type} simulation.")
+    
+    # Check if output files were created
+    expected_file = os.path.join(OUTPUT_DIR, f"{output_prefix}.out1.00000")
+    if not os.path.exists(expected_file):
+        print(f"Warning: Output file {expected_file} was not created.")
+        return False
+        
+    return True
+
+def run_docker_simulation(simulation_type, input_file, output_prefix):
+    """Run an Athena simulation in Docker with the specified parameters"""
+    print(f"\n{'='*80}\nRunning {simulation_type} simulation\n{'='*80}")
+    
+    # Build the Docker command
+    cmd = docker_command(input_file, output_prefix)
     
     # Execute the command
     try:
         print(f"Running command: {' '.join(cmd)}")
         # Capture the output to check for errors
         process = subprocess.run(cmd, check=True, capture_output=True, text=True)
-        
-        # Check if the output contains a fatal error message
-        if "FATAL ERROR" in process.stdout or "FATAL ERROR" in process.stderr:
-            print(f"Athena simulation failed with error:")
-            print(process.stdout)
-            print(process.stderr)
-            return False
-            
-        print(f"Successfully completed {simulation_type} simulation.")
-        
-        # Check if output files were created
-        expected_file = os.path.join(OUTPUT_DIR, f"{output_prefix}.out1.00000")
-        if not os.path.exists(expected_file):
-            print(f"Warning: Output file {expected_file} was not created.")
-            return False
-            
-        return True
+        return check_simulation_output(simulation_type, output_prefix, process.stdout, process.stderr)
     except subprocess.CalledProcessError as e:
         print(f"Error running {simulation_type} simulation: {e}")
         if e.stdout:
@@ -72,11 +99,43 @@ def run_docker_simulation(simulation_type, input_file, output_prefix):
             print(f"stderr: {e.stderr}")
         return False
 
+async def run_docker_simulation_async(simulation_type, input_file, output_prefix):
+    """run_docker_simulation as an asyncio subprocess, so other stages run meanwhile"""
+    print(f"\n{'='*80}\nRunning {simulation_type} simulation\n{'='*80}")
+    cmd = docker_command(input_file, output_prefix)
+    print(f"Running command: {' '.join(cmd)}")
+    try:
+        process = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.PIPE,
+                                                       stderr=asyncio.subprocess.PIPE)
+    except OSError as e:
+        print(f"Error running {simulation_type} simulation: {e}")
+        return False
+    try:
+        stdout, stderr = await process.communicate()
+    except asyncio.CancelledError:
+        # Another stage failed: do not leave the run behind
+        process.kill()
+        await process.wait()
+        raise
+    stdout = stdout.decode(errors='replace')
+    stderr = stderr.decode(errors='replace')
+    if process.returncode:
+        print(f"Error running {simulation_type} simulation: Command {cmd} returned "
+              f"non-zero exit status {process.returncode}.")
+        if stdout:
+            print(f"stdout: {stdout}")
+        if stderr:
+            print(f"stderr: {stderr}")
+        return False
+    return check_simulation_output(simulation_type, output_prefix, stdout, stderr)
+
 def load_simulation_data(filename):
     """Load data from an Athena output file"""
     try:
         print(f"Loading data from {filename}")
-        data = np.loadtxt(filename)
+        with tracing.span('load', file=filename):
+            # float32 storage, parsed in chunks within the memory budget
+            data = read_table(filename)
         return data
     except Exception as e:
         print(f"Error loading simulation data from {filename}: {e}")
@@ -158,26 +217,17 @@ def create_comparison_plots(standard_data, time_density_data, params_to_plot=Non
     plt.tight_layout()
     return fig, plots
 
-def calculate_statistics(standard_data, time_density_data):
-    """Calculate statistics comparing the two simulations"""
-    if standard_data is None or time_density_data is None:
-        print("Cannot calculate statistics: Missing data.")
-        return None
-    
-    # Parameter column indices
-    param_indices = {
-        'x': 0,      # Position
-        'rho': 4,    # Density
-        'vel1': 5,   # X-Velocity
-        'vel2': 6,   # Y-Velocity
-        'vel3': 7,   # Z-Velocity
-        'press': 8   # Pressure
-    }
-    
-    # Statistics to calculate for each parameter
-    stats = {}
-    
-    for param, idx in param_indices.items():
+def summarize_run(data):
+    """Per-parameter mean, max and min of one simulation (columns are float32; means in float64)"""
+    return {param: {'mean': np.mean(data[:, idx], dtype=np.float64),
+                    'max': float(np.max(data[:, idx])),
+                    'min': float(np.min(data[:, idx]))}
+            for param, idx in PARAM_INDICES.items() if param != 'x'}
+
+def difference_statistics(standard_data, time_density_data):
+    """Absolute and relative difference statistics between the two simulations"""
+    differences = {}
+    for param, idx in PARAM_INDICES.items():
         if param == 'x':
             continue  # Skip position column
             
@@ -193,22 +243,39 @@ def calculate_statistics(standard_data, time_density_data):
         denominator[denominator < 1e-10] = 1e-10
         rel_diff = abs_diff / denominator * 100.0
         
-        # Store statistics
+        differences[param] = {
+            'mean_abs_diff': np.mean(abs_diff, dtype=np.float64),
+            'max_abs_diff': float(np.max(abs_diff)),
+            'mean_rel_diff': np.mean(rel_diff, dtype=np.float64),
+            'max_rel_diff': float(np.max(rel_diff))
+        }
+    return differences
+
+def combine_statistics(standard_summary, time_density_summary, differences):
+    """Merge per-run summaries and difference statistics into the report statistics"""
+    stats = {}
+    for param, diff in differences.items():
+        std, td = standard_summary[param], time_density_summary[param]
         stats[param] = {
-            'mean_standard': np.mean(std_values),
-            'mean_time_density': np.mean(td_values),
-            'max_standard': np.max(std_values),
-            'max_time_density': np.max(td_values),
-            'min_standard': np.min(std_values),
-            'min_time_density': np.min(td_values),
-            'mean_abs_diff': np.mean(abs_diff),
-            'max_abs_diff': np.max(abs_diff),
-            'mean_rel_diff': np.mean(rel_diff),
-            'max_rel_diff': np.max(rel_diff)
+            'mean_standard': std['mean'],
+            'mean_time_density': td['mean'],
+            'max_standard': std['max'],
+            'max_time_density': td['max'],
+            'min_standard': std['min'],
+            'min_time_density': td['min'],
         }
-    
+        stats[param].update(diff)
     return stats
 
+def calculate_statistics(standard_data, time_density_data):
+    """Calculate statistics comparing the two simulations"""
+    if standard_data is None or time_density_data is None:
+        print("Cannot calculate statistics: Missing data.")
+        return None
+    
+    return combine_statistics(summarize_run(standard_data), summarize_run(time_density_data),
+                              difference_statistics(standard_data, time_density_data))
+
 def generate_pdf_report(standard_data, time_density_data, stats, config):
     """Generate a comprehensive PDF report with plots and statistics"""
     if standard_data is None or time_density_data is None:
@@ -350,22 +417,12 @@ def generate_pdf_report(standard_data, time_density_data, stats, config):
     print(f"PDF report generated: {report_path}")
     return True
 
-def export_data_csv(standard_data, time_density_data, stats):
-    """Export the simulation data and statistics to CSV files"""
-    if standard_data is None or time_density_data is None:
-        print("Cannot export data: Missing data.")
-        return False
-    
-    # Create DataFrames for the simulation data
-    column_names = ['x', 'y', 'z', 'time', 'rho', 'vel1', 'vel2', 'vel3', 'press']
-    
-    standard_df = pd.DataFrame(standard_data, columns=column_names)
-    standard_df.to_csv(os.path.join(OUTPUT_DIR, 'standard_simulation.csv'), index=False)
-    
-    time_density_df = pd.DataFrame(time_density_data, columns=column_names)
-    time_density_df.to_csv(os.path.join(OUTPUT_DIR, 'time_density_simulation.csv'), index=False)
-    
-    # Create a DataFrame for the statistics
+def export_run_csv(data, filename):
+    """Export one simulation's data to a CSV file in OUTPUT_DIR"""
+    pd.DataFrame(data, columns=COLUMN_NAMES).to_csv(os.path.join(OUTPUT_DIR, filename), index=False)
+
+def export_statistics_csv(stats):
+    """Export the comparison statistics to simulation_statistics.csv"""
     stats_data = []
     for param, param_stats in stats.items():
         param_row = {'parameter': param}
@@ -374,6 +431,16 @@ def export_data_csv(standard_data, time_density_data, stats):
     
     stats_df = pd.DataFrame(stats_data)
     stats_df.to_csv(os.path.join(OUTPUT_DIR, 'simulation_statistics.csv'), index=False)
+
+def export_data_csv(standard_data, time_density_data, stats):
+    """Export the simulation data and statistics to CSV files"""
+    if standard_data is None or time_density_data is None:
+        print("Cannot export data: Missing data.")
+        return False
+    
+    export_run_csv(standard_data, 'standard_simulation.csv')
+    export_run_csv(time_density_data, 'time_density_simulation.csv')
+    export_statistics_csv(stats)
     
     print(f"Data exported to CSV files in {OUTPUT_DIR}")
     return True
@@ -389,11 +456,40 @@ def main():
                         help='Run the Docker simulations (default: False)')
     parser.add_argument('--output-dir', type=str, default=OUTPUT_DIR,
                         help=f'Output directory (default: {OUTPUT_DIR})')
+    parser.add_argument('--sequential', action='store_true',
+                        help='Run every step one after the other instead of the overlapping pipeline')
+    parser.add_argument('--parallel-simulations', type=int, default=1,
+                        help='Simulations allowed to run at the same time (default: 1)')
+    parser.add_argument('--workers', type=int, default=min(2, os.cpu_count() or 1),
+                        help='Worker processes for statistics and rendering; 1 runs them in '
+                             'threads of this process (default: 2, or 1 on a single core)')
+    parser.add_argument('--index', type=str, default=os.environ.get(snapshot_index.INDEX_ENV),
+                        help=f'Record the runs, snapshots and comparison statistics in this '
+                             f'snapshot index (default: ${snapshot_index.INDEX_ENV}, off when unset)')
+    parser.add_argument('--trace', type=str, default=tracing.trace_path_from_env(),
+                        help=f'Record stage timings and peak memory to this Chrome trace JSON '
+                             f'file (default: ${tracing.TRACE_ENV}, off when unset)')
     args = parser.parse_args()
     
     OUTPUT_DIR = args.output_dir  # Now we can assign to it after declaration
     os.makedirs(OUTPUT_DIR, exist_ok=True)
+    if args.index:
+        snapshot_index.enable(args.index)
     
+    if not args.trace:
+        return run_comparison(args)
+    tracer = tracing.enable()
+    try:
+        with tracing.span('compare_simulations'):
+            return run_comparison(args)
+    finally:
+        tracing.disable()
+        trace_path, summary_path = tracer.write(args.trace)
+        print(f"\n===== Stage Timings =====\n{tracer.format_summary()}")
+        print(f"Trace written to {trace_path} (summary: {summary_path})")
+
+def run_comparison(args):
+    """Run the comparison workflow for parsed command-line arguments"""
     # Load configuration
     try:
         with open(args.config, 'r') as f:
@@ -415,25 +511,79 @@ def main():
         with open(args.config, 'w') as f:
             json.dump(config, f, indent=2)
     
+    if args.sequential:
+        stats = run_sequential(args, config)
+    else:
+        stats = asyncio.run(run_pipelined(args, config))
+    if stats is None:
+        return 1
+    if snapshot_index.active_index():
+        index_comparison(snapshot_index.active_index(), config, stats)
+    
+    # Display a quick summary on the command line
+    print("\n===== Quick Summary =====")
+    for param, param_stats in stats.items():
+        param_name = param.capitalize()
+        if param == 'rho':
+            param_name = 'Density'
+        elif param.startswith('vel'):
+            param_name = f'Velocity {param[-1]}'
+        elif param == 'press':
+            param_name = 'Pressure'
+            
+        print(f"{param_name}:")
+        print(f"  Standard (mean): {param_stats['mean_standard']:.6e}")
+        print(f"  Time-Density (mean): {param_stats['mean_time_density']:.6e}")
+        print(f"  Relative Difference: {param_stats['mean_rel_diff']:.2f}%")
+    
+    print(f"\nFull report saved to {os.path.join(OUTPUT_DIR, REPORT_FILENAME)}")
+    print(f"Data exported to CSV files in {OUTPUT_DIR}")
+    
+    return 0
+
+def index_comparison(index_path, config, stats):
+    """
+    Record both runs (input deck parameters; td_params for the time-density
+    run) and the statistics. Indexing problems are reported, never raised.
+    """
+    try:
+        with snapshot_index.SnapshotIndex(index_path) as index:
+            run_ids = {}
+            for _, key in SIMULATIONS:
+                input_file = config[f"{key}_input"]
+                params = {'td_params': config.get('td_params', {})} if key == 'time_density' else None
+                run_ids[key] = index.add_run(OUTPUT_DIR, config[f"{key}_output"],
+                                             input_file if os.path.exists(input_file) else None,
+                                             params=params)
+            index.record_comparison(run_ids['standard'], run_ids['time_density'], stats)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"Warning: could not record the comparison in {index_path}: {e}", file=sys.stderr)
+        return
+    print(f"Runs and statistics recorded in {index_path}")
+
+def run_sequential(args, config):
+    """Simulate, load, analyze and render one step after the other; returns the statistics"""
     # Run simulations if requested
     if args.run_simulations:
         # Run standard simulation
-        success1 = run_docker_simulation(
-            "standard",
-            config["standard_input"],
-            config["standard_output"]
-        )
+        with tracing.span('docker', simulation='standard', file=config["standard_input"]):
+            success1 = run_docker_simulation(
+                "standard",
+                config["standard_input"],
+                config["standard_output"]
+            )
         
         # Run time-density simulation
-        success2 = run_docker_simulation(
-            "time-density",
-            config["time_density_input"],
-            config["time_density_output"]
-        )
+        with tracing.span('docker', simulation='time-density', file=config["time_density_input"]):
+            success2 = run_docker_simulation(
+                "time-density",
+                config["time_density_input"],
+                config["time_density_output"]
+            )
         
         if not (success1 and success2):
             print("One or more simulations failed. Exiting.")
-            return 1
+            return None
     
     # Load simulation results
     standard_data = load_simulation_data(os.path.join(OUTPUT_DIR, f"{config['standard_output']}.out1.00000"))
@@ -441,37 +591,92 @@ def main():
     
     if standard_data is None or time_density_data is None:
         print("Failed to load simulation data. Exiting.")
-        return 1
+        return None
     
     # Calculate statistics
-    stats = calculate_statistics(standard_data, time_density_data)
+    with tracing.span('statistics'):
+        stats = calculate_statistics(standard_data, time_density_data)
     
     # Generate PDF report
-    generate_pdf_report(standard_data, time_density_data, stats, config)
+    with tracing.span('pdf_report', file=os.path.join(OUTPUT_DIR, REPORT_FILENAME)):
+        generate_pdf_report(standard_data, time_density_data, stats, config)
     
     # Export data to CSV
-    export_data_csv(standard_data, time_density_data, stats)
+    with tracing.span('csv_export'):
+        export_data_csv(standard_data, time_density_data, stats)
     
-    # Display a quick summary on the command line
-    print("\n===== Quick Summary =====")
-    for param, param_stats in stats.items():
-        param_name = param.capitalize()
-        if param == 'rho':
-            param_name = 'Density'
-        elif param.startswith('vel'):
-            param_name = f'Velocity {param[-1]}'
-        elif param == 'press':
-            param_name = 'Pressure'
-            
-        print(f"{param_name}:")
-        print(f"  Standard (mean): {param_stats['mean_standard']:.6e}")
-        print(f"  Time-Density (mean): {param_stats['mean_time_density']:.6e}")
-        print(f"  Relative Difference: {param_stats['mean_rel_diff']:.2f}%")
+    return stats
     
-    print(f"\nFull report saved to {os.path.join(OUTPUT_DIR, REPORT_FILENAME)}")
+
+def _init_worker(output_dir):
+    """Process-pool initializer: the workers write into the same output directory"""
+    global OUTPUT_DIR
+    OUTPUT_DIR = output_dir
+
+async def _traced(name, awaitable, **args):
+    with tracing.span(name, **args):
+        return await awaitable
+
+def _load_run(run):
+    run['data'] = load_simulation_data(run['path'])
+    if run['data'] is None:
+        raise RuntimeError("Failed to load simulation data")
+    return run
+
+async def run_pipelined(args, config):
+    """
+    Run the workflow as an asyncio pipeline: each simulation runs as a
+    subprocess, its output is loaded in a thread and summarized and exported
+    (process pool, thread) while the next simulation is still running; the
+    comparison statistics, PDF report and statistics CSV follow once both
+    runs are in. Returns the statistics, or None on failure.
+    """
+    runs = [{'simulation': label, 'key': key, 'input': config[f"{key}_input"],
+             'output': config[f"{key}_output"],
+             'path': os.path.join(OUTPUT_DIR, f"{config[f'{key}_output']}.out1.00000")}
+            for label, key in SIMULATIONS]
+
+    async def simulate(run):
+        if args.run_simulations:
+            with tracing.span('docker', simulation=run['simulation'], file=run['input']):
+                success = await run_docker_simulation_async(run['simulation'], run['input'],
+                                                            run['output'])
+            if not success:
+                raise RuntimeError("One or more simulations failed")
+        return run
+
+    async def analyze(run):
+        summary = pipeline.call('process', summarize_run, run['data'])
+        export = pipeline.call('thread', export_run_csv, run['data'], f"{run['key']}_simulation.csv")
+        run['summary'], _ = await asyncio.gather(
+            _traced('statistics', summary, simulation=run['simulation']),
+            _traced('csv_export', export, simulation=run['simulation']))
+        return run
+
+    stages = [Stage('simulate', simulate, 'async', max(1, args.parallel_simulations)),
+              Stage('load', _load_run, 'thread', 2),
+              Stage('analyze', analyze, 'async', 2)]
+    async with Pipeline(stages, process_workers=max(1, args.workers), initializer=_init_worker,
+                        initargs=(OUTPUT_DIR,)) as pipeline:
+        pipeline.warm()
+        try:
+            runs = {run['key']: run for run in await pipeline.run(runs)}
+        except RuntimeError as e:
+            print(f"{e}. Exiting.")
+            return None
+        standard, time_density = runs['standard'], runs['time_density']
+        
+        # Comparison statistics, then the report and statistics CSV side by side
+        differences = await _traced('statistics', pipeline.call(
+            'process', difference_statistics, standard['data'], time_density['data']))
+        stats = combine_statistics(standard['summary'], time_density['summary'], differences)
+        await asyncio.gather(
+            _traced('pdf_report', pipeline.call('process', generate_pdf_report, standard['data'],
+                                                time_density['data'], stats, config),
+                    file=os.path.join(OUTPUT_DIR, REPORT_FILENAME)),
+            _traced('csv_export', pipeline.call('thread', export_statistics_csv, stats)))
     print(f"Data exported to CSV files in {OUTPUT_DIR}")
-    
-    return 0
+    return stats
 
 if __name__ == "__main__":
     sys.exit(main())
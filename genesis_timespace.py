@@ -1,12 +1,11 @@
-import matplotlib.pyplot as plt
 import numpy as np
 import os
-from mpl_toolkits.mplot3d.art3d import Poly3DCollection
-from matplotlib.animation import FuncAnimation, PillowWriter
+
+from utils.animation_engine import PersistentAnimation
+from utils.parallel_render import render_parallel
 
 # Output settings
 output_dir = "timespace_sim"
-os.makedirs(output_dir, exist_ok=True)
 gif_path = os.path.join(output_dir, "emergent_space.gif")
 
 # Define cube vertices and faces
@@ -23,55 +22,37 @@ cube_faces = [
     [1, 2, 6, 5], [3, 0, 4, 7]
 ]
 
-# Function to draw a cube
-def draw_cube(ax, vertices, faces, alpha=0.4, color='cyan'):
-    for face in faces:
-        square = [vertices[i] for i in face]
-        poly3d = Poly3DCollection([square], alpha=alpha, facecolors=color, edgecolor='k')
-        ax.add_collection3d(poly3d)
-
-# Animation frame update function
-def update(frame):
-    ax.clear()
-    ax.set_title(f"Time Step {frame}", fontsize=12)
-    ax.set_xlim(0, 1.5)
-    ax.set_ylim(0, 1.5)
-    ax.set_zlim(0, 1.5)
-    ax.set_box_aspect([1, 1, 1])
-    ax.axis('off')
-
-    if frame == 0:
-        pass  # Void
-    elif frame == 1:
-        ax.scatter([0.5], [0.5], [0.5], color='black')  # Point
-    elif frame == 2:
-        ax.plot([0.5, 1], [0.5, 0.5], [0.5, 0.5], color='black')  # Line
-    elif frame == 3:
-        ax.plot_trisurf(
-            [0.5, 1, 1],
-            [0.5, 0.5, 1],
-            [0.5, 0.5, 0.5],
-            color='gray', alpha=0.6
-        )  # Triangle
-    elif frame == 4:
-        tetra = [[0.5, 0.5, 0.5], [1, 0.5, 0.5], [1, 1, 0.5], [0.75, 0.75, 1]]
-        tetra_faces = [
-            [tetra[0], tetra[1], tetra[2]],
-            [tetra[0], tetra[1], tetra[3]],
-            [tetra[1], tetra[2], tetra[3]],
-            [tetra[2], tetra[0], tetra[3]]
-        ]
-        for face in tetra_faces:
-            poly3d = Poly3DCollection([face], alpha=0.6, facecolors='lightblue', edgecolor='k')
-            ax.add_collection3d(poly3d)
-    else:
-        draw_cube(ax, cube_vertices, cube_faces)
-
-# Build the animation
-fig = plt.figure(figsize=(6, 6))
-ax = fig.add_subplot(111, projection='3d')
-anim = FuncAnimation(fig, update, frames=6, interval=1000)
-
-# Save to GIF
-anim.save(gif_path, writer=PillowWriter(fps=1))
-print(f"GIF saved to: {gif_path}")
+# Tetrahedron and its faces
+tetra = np.array([[0.5, 0.5, 0.5], [1, 0.5, 0.5], [1, 1, 0.5], [0.75, 0.75, 1]])
+tetra_faces = [[0, 1, 2], [0, 1, 3], [1, 2, 3], [2, 0, 3]]
+
+def build_scene(n_frames=6):
+    """Create one persistent artist per stage, each shown on its own frame"""
+    frames = np.arange(n_frames)
+    scene = PersistentAnimation(n_frames, limits=(0, 1.5))
+    scene.set_titles([f"Time Step {frame}" for frame in frames])
+
+    # Frame 0 is the void; frame 1 a point
+    scene.add_points([[0.5, 0.5, 0.5]], visible=frames == 1,
+                     color='black', marker='o', linestyle='')
+    # Line
+    scene.add_points([[0.5, 0.5, 0.5], [1, 0.5, 0.5]], visible=frames == 2, color='black')
+    # Triangle
+    scene.add_polygons([[[0.5, 0.5, 0.5], [1, 0.5, 0.5], [1, 1, 0.5]]], visible=frames == 3,
+                       facecolors='gray', alpha=0.6)
+    # Tetrahedron
+    scene.add_polygons(tetra[tetra_faces], visible=frames == 4,
+                       alpha=0.6, facecolors='lightblue', edgecolor='k')
+    # Cube
+    scene.add_polygons(cube_vertices[cube_faces], visible=frames >= 5,
+                       alpha=0.4, facecolors='cyan', edgecolor='k')
+    return scene
+
+def main(output_path=gif_path, workers=None):
+    """Render the animation across worker processes and save the GIF"""
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    render_parallel(build_scene, output_path, fps=1, workers=workers)
+    print(f"GIF saved to: {output_path}")
+
+if __name__ == "__main__":
+    main()
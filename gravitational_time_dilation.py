@@ -2,6 +2,8 @@ import numpy as np
 import matplotlib.pyplot as plt
 import os
 
+from utils.adaptive_sampling import adaptive_sample, cumulative_trapezoid
+
 # Constants
 G = 6.67430e-11  # Gravitational constant (m^3 kg^-1 s^-2)
 c = 3e8  # Speed of light (m/s)
@@ -13,6 +15,9 @@ omega = 0.1  # Projection factor for 4D to 3D (tesseract rotation factor)
 beta = 1e9  # Temporal drag coefficient
 epsilon = 1e5  # Small constant to avoid division by zero
 
+# Output directory for the figures
+output_dir = "timespace_sim"
+
 # Time Dilation Function (Gravitational)
 def gravitational_time_dilation(r, M):
     return np.sqrt(1 - (2 * G * M) / (r * c**2))
@@ -41,83 +46,107 @@ def effective_time(t, alpha, omega, beta, epsilon):
 
 # Perceived Time (Integration of Flow Ratio)
 def perceived_time(t_values, beta, epsilon):
-    flow_ratios = [temporal_flow_ratio(t, beta, epsilon) for t in t_values]
-    # Numerical integration using trapezoidal rule
-    dt = t_values[1] - t_values[0]
-    perceived = np.zeros_like(t_values)
-    for i in range(1, len(t_values)):
-        perceived[i] = perceived[i-1] + 0.5 * dt * (flow_ratios[i-1] + flow_ratios[i])
-    return perceived
-
-# Simulating over time
-time_values = np.linspace(1, t_max, 1000)
-time_densities = [time_density(t, alpha, omega) for t in time_values]
-time_curvatures = [time_curvature(rho) for rho in time_densities]
-
-# Calculate new metrics
-flow_ratios = [temporal_flow_ratio(t, beta, epsilon) for t in time_values]
-effective_times = [effective_time(t, alpha, omega, beta, epsilon) for t in time_values]
-perceived_times = perceived_time(time_values, beta, epsilon)
-
-# Gravitational Time Dilation for constant distance (to compare)
-gravitational_dilations = [gravitational_time_dilation(r, M) for _ in time_values]
-
-# Create output directory if it doesn't exist
-output_dir = "timespace_sim"
-os.makedirs(output_dir, exist_ok=True)
-
-# Plotting the Time-Density and Curvature over Time
-plt.figure(figsize=(12, 6))
-
-# Plot Time Density and Curvature
-plt.subplot(1, 2, 1)
-plt.plot(time_values, time_densities, label='Time Density (ρ(t))')
-plt.plot(time_values, time_curvatures, label='Time Curvature (T(t))', linestyle='dashed')
-plt.xlabel('Time (s)')
-plt.ylabel('Density / Curvature')
-plt.title('Time Density and Curvature over Time')
-plt.legend()
-
-# Plot Gravitational Time Dilation vs Time
-plt.subplot(1, 2, 2)
-plt.plot(time_values, gravitational_dilations, label='Gravitational Time Dilation', color='red')
-plt.xlabel('Time (s)')
-plt.ylabel('Time Dilation Factor')
-plt.title('Gravitational Time Dilation over Time')
-plt.legend()
-
-plt.tight_layout()
-plt.savefig(os.path.join(output_dir, 'time_density_dilation.png'), dpi=300)
-
-# New plot for Temporal Flow concepts
-plt.figure(figsize=(15, 5))
-
-# Plot Temporal Flow Ratio
-plt.subplot(1, 3, 1)
-plt.plot(time_values, flow_ratios, label='R(t)', color='purple')
-plt.xlabel('Time (s)')
-plt.ylabel('Flow Ratio')
-plt.title('Temporal Flow Ratio')
-plt.legend()
-
-# Plot Effective Time
-plt.subplot(1, 3, 2)
-plt.plot(time_values, effective_times, label='Tₑffₑctᵢᵥₑ(t)', color='green')
-plt.xlabel('Time (s)')
-plt.ylabel('Effective Time')
-plt.title('Effective Time (Curvature * Flow)')
-plt.legend()
-
-# Plot Perceived Time
-plt.subplot(1, 3, 3)
-plt.plot(time_values, perceived_times, label='Tₚₑᵣcₑᵢᵥₑd(t)', color='blue')
-plt.plot(time_values, time_values, label='Linear Time', color='gray', linestyle='--')
-plt.xlabel('Observer Time (s)')
-plt.ylabel('Perceived Time')
-plt.title('Perceived vs Linear Time')
-plt.legend()
-
-plt.tight_layout()
-plt.savefig(os.path.join(output_dir, 'temporal_flow_concepts.png'), dpi=300)
-
-plt.show()
+    flow_ratios = temporal_flow_ratio(np.asarray(t_values), beta, epsilon)
+    # Numerical integration using the trapezoidal rule (works on non-uniform grids)
+    return cumulative_trapezoid(flow_ratios, t_values)
+
+def main(output_dir=output_dir):
+    """Compute the time-density curves and save both figures to output_dir"""
+    # Simulating over time: the grid is refined adaptively where R(t) bends
+    # instead of using 1000 evenly spaced points
+    flow_curve = adaptive_sample(lambda t: temporal_flow_ratio(t, beta, epsilon),
+                                 1, t_max, tol=1e-4, max_points=4000)
+    time_values = flow_curve.t
+    flow_ratios = flow_curve.y
+
+    # sin(omega*t) has period pi/omega (~31 s), so the density curve can only be
+    # drawn as a line if the sampler resolves it within its point budget;
+    # otherwise the exact oscillation envelope S(t) in [1/2, 1] is drawn instead
+    density_curve = adaptive_sample(lambda t: time_density(t, alpha, omega), 1, t_max,
+                                    tol=1e-3, max_points=4000, max_step=np.pi / omega / 8)
+    density_resolved = density_curve.converged
+    if density_resolved:
+        time_values = np.union1d(time_values, density_curve.t)
+        flow_ratios = temporal_flow_ratio(time_values, beta, epsilon)
+    time_densities = time_density(time_values, alpha, omega)
+    time_curvatures = time_curvature(time_densities)
+    D_values = 1 + alpha * time_values**2  # envelope: rho in [D/2, D]
+
+    # Calculate new metrics
+    effective_times = effective_time(time_values, alpha, omega, beta, epsilon)
+    perceived_times = perceived_time(time_values, beta, epsilon)
+
+    # Gravitational Time Dilation for constant distance (to compare); it does not
+    # depend on t, so it is evaluated once (maps of many masses: utils/dilation_field.py)
+    gravitational_dilations = np.full(time_values.shape, gravitational_time_dilation(r, M))
+
+    # Create output directory if it doesn't exist
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Plotting the Time-Density and Curvature over Time
+    plt.figure(figsize=(12, 6))
+
+    # Plot Time Density and Curvature
+    plt.subplot(1, 2, 1)
+    if density_resolved:
+        plt.plot(time_values, time_densities, label='Time Density (ρ(t))')
+        plt.plot(time_values, time_curvatures, label='Time Curvature (T(t))', linestyle='dashed')
+    else:
+        plt.fill_between(time_values, D_values / 2, D_values, alpha=0.4,
+                         label='Time Density (ρ(t)) envelope')
+        plt.fill_between(time_values, 1 / D_values, 2 / D_values, alpha=0.4, hatch='//',
+                         label='Time Curvature (T(t)) envelope')
+    plt.xlabel('Time (s)')
+    plt.ylabel('Density / Curvature')
+    plt.title('Time Density and Curvature over Time')
+    plt.legend()
+
+    # Plot Gravitational Time Dilation vs Time
+    plt.subplot(1, 2, 2)
+    plt.plot(time_values, gravitational_dilations, label='Gravitational Time Dilation', color='red')
+    plt.xlabel('Time (s)')
+    plt.ylabel('Time Dilation Factor')
+    plt.title('Gravitational Time Dilation over Time')
+    plt.legend()
+
+    plt.tight_layout()
+    plt.savefig(os.path.join(output_dir, 'time_density_dilation.png'), dpi=300)
+
+    # New plot for Temporal Flow concepts
+    plt.figure(figsize=(15, 5))
+
+    # Plot Temporal Flow Ratio
+    plt.subplot(1, 3, 1)
+    plt.plot(time_values, flow_ratios, label='R(t)', color='purple')
+    plt.xlabel('Time (s)')
+    plt.ylabel('Flow Ratio')
+    plt.title('Temporal Flow Ratio')
+    plt.legend()
+
+    # Plot Effective Time
+    plt.subplot(1, 3, 2)
+    if density_resolved:
+        plt.plot(time_values, effective_times, label='Tₑffₑctᵢᵥₑ(t)', color='green')
+    else:
+        plt.fill_between(time_values, flow_ratios / D_values, 2 * flow_ratios / D_values,
+                         color='green', alpha=0.4, label='Tₑffₑctᵢᵥₑ(t) envelope')
+    plt.xlabel('Time (s)')
+    plt.ylabel('Effective Time')
+    plt.title('Effective Time (Curvature * Flow)')
+    plt.legend()
+
+    # Plot Perceived Time
+    plt.subplot(1, 3, 3)
+    plt.plot(time_values, perceived_times, label='Tₚₑᵣcₑᵢᵥₑd(t)', color='blue')
+    plt.plot(time_values, time_values, label='Linear Time', color='gray', linestyle='--')
+    plt.xlabel('Observer Time (s)')
+    plt.ylabel('Perceived Time')
+    plt.title('Perceived vs Linear Time')
+    plt.legend()
+
+    plt.tight_layout()
+    plt.savefig(os.path.join(output_dir, 'temporal_flow_concepts.png'), dpi=300)
+
+if __name__ == "__main__":
+    main()
+    plt.show()
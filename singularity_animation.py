@@ -1,70 +1,64 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation, PillowWriter
 import os
 
-# Create output directory
+from utils.adaptive_sampling import adaptive_sample
+from utils.animation_engine import PersistentAnimation
+from utils.parallel_render import render_parallel
+
+# Output settings
 output_dir = "timespace_sim"
-os.makedirs(output_dir, exist_ok=True)
 output_path = os.path.join(output_dir, "singularity_animation.gif")
 
-# Time range and epsilon (reduced number of points for better performance)
-t = np.linspace(-5, 5, 200)  # Reduced from 1000 to 200 points
+# Time range and epsilon
 epsilon = 0.01
 
-# Pre-calculate data
-density = 1 / (t**2 + epsilon)  # Density curve
-volume = t**2 + epsilon  # Volume curve
-
-# Initialize the figure
-fig, ax = plt.subplots(figsize=(10, 6))
+# Pre-calculate data on one adaptive grid shared by both curves: points
+# cluster around the 1/(t² + ε) spike at t=0 instead of being spread evenly
+curve = adaptive_sample(lambda t: [1 / (t**2 + epsilon), t**2 + epsilon],
+                        -5, 5, tol=1e-4, max_points=4000)
+t = curve.t
+density, volume = curve.y  # Density and volume curves
 
-# Create initial plot
-line_density, = ax.plot([], [], label='Density ρ(t) = 1 / (t² + ε)', color='crimson', linewidth=2)
-line_volume, = ax.plot([], [], label='Volume V(t) = t² + ε', color='deepskyblue', linestyle='--', linewidth=2)
-ax.axvline(0, color='gray', linestyle=':', label='Singularity (t=0)')
+# Number of animation frames
+frames = 100
 
-# Set up plot aesthetics
-ax.set_xlim(-5, 5)
-ax.set_ylim(0, min(10, np.max(density) * 1.1))  # Dynamic y limit
-ax.set_xlabel("Time (t)", fontsize=12)
-ax.set_ylabel("Value", fontsize=12)
-ax.set_title("Universe Evolution: Density and Volume Near Singularity", fontsize=14)
-ax.legend(loc='upper right')
-ax.grid(True, alpha=0.3)
+def revealed_window(frame):
+    """Grid points shown at `frame`, growing out from the middle"""
+    # The revealed window grows evenly in time even though the grid is not
+    # uniform, with its edges interpolated between grid points
+    half_width = 5 * frame / frames
+    start = np.searchsorted(t, -half_width, side='right')
+    end = np.searchsorted(t, half_width, side='left')
+    return np.concatenate([[-half_width], t[start:end], [half_width]])
 
-# Initialize function
-def init():
-    line_density.set_data([], [])
-    line_volume.set_data([], [])
-    return line_density, line_volume
+def build_scene(n_frames=frames):
+    """Precompute every frame's revealed curves and create the persistent artists"""
+    t_shown = [revealed_window(frame) for frame in range(n_frames)]
 
-# Update function (simplified to improve performance)
-def update(frame):
-    # Use frame to determine how much of the data to show (starting from the middle)
-    mid = len(t) // 2
-    start = max(0, mid - frame)
-    end = min(len(t), mid + frame)
-    
-    # Update both lines at once
-    line_density.set_data(t[start:end], density[start:end])
-    line_volume.set_data(t[start:end], volume[start:end])
-    
-    return line_density, line_volume
+    scene = PersistentAnimation(n_frames, figsize=(10, 6), projection=None)
+    ax = scene.ax
+    scene.add_curve(t_shown, [np.interp(window, t, density) for window in t_shown],
+                    label='Density ρ(t) = 1 / (t² + ε)', color='crimson', linewidth=2)
+    scene.add_curve(t_shown, [np.interp(window, t, volume) for window in t_shown],
+                    label='Volume V(t) = t² + ε', color='deepskyblue', linestyle='--', linewidth=2)
+    ax.axvline(0, color='gray', linestyle=':', label='Singularity (t=0)')
 
-# Create animation with fewer frames
-frames = 100  # Reduced number of frames
-ani = FuncAnimation(fig, update, frames=frames, init_func=init, blit=True, interval=50)
+    # Set up plot aesthetics
+    ax.set_xlim(-5, 5)
+    ax.set_ylim(0, min(10, np.max(density) * 1.1))  # Dynamic y limit
+    ax.set_xlabel("Time (t)", fontsize=12)
+    ax.set_ylabel("Value", fontsize=12)
+    ax.set_title("Universe Evolution: Density and Volume Near Singularity", fontsize=14)
+    ax.legend(loc='upper right')
+    ax.grid(True, alpha=0.3)
+    return scene
 
-# Save animation with explicit PillowWriter
-try:
+def main(output_path=output_path, workers=None):
+    """Render the animation across worker processes and save the GIF"""
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
     print(f"Saving animation to {output_path}...")
-    writer = PillowWriter(fps=15)  # Reduced fps for smaller file
-    ani.save(output_path, writer=writer)
+    render_parallel(build_scene, output_path, fps=15, workers=workers)
     print(f"Animation saved successfully!")
-except Exception as e:
-    print(f"Error saving animation: {e}")
 
-# Show the plot
-plt.tight_layout()
-plt.show()
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,10 @@ import numpy as np
 import matplotlib.pyplot as plt
 import os
 
-def plot_singularity_density(n=2, t_min=0.01, t_max=10, points=1000, save=True):
+from utils.adaptive_sampling import adaptive_sample
+
+def plot_singularity_density(n=2, t_min=0.01, t_max=10, points=1000, save=True, tol=1e-4,
+                             output_path=os.path.join("timespace_sim", "singularity_density_plot.png")):
     """
     Plots the relationship between density and time near cosmic singularities.
     
@@ -15,19 +18,23 @@ def plot_singularity_density(n=2, t_min=0.01, t_max=10, points=1000, save=True):
     t_max : float
         Maximum time value (approaching Big Crunch, conceptually)
     points : int
-        Number of data points to plot
+        Maximum number of data points (budget of the adaptive sampler)
     save : bool
         Whether to save the plot to a file
+    tol : float
+        Allowed interpolation error relative to the density range
+    output_path : str
+        File the plot is saved to when save is True
     
     Returns:
     --------
     None
     """
-    # Define time range, avoiding t = 0 to prevent division by zero
-    t = np.linspace(t_min, t_max, points)
-    
-    # Calculate density as a function of time: ρ(t) = 1 / t^n
-    rho = 1 / (t ** n)
+    # Calculate density as a function of time: ρ(t) = 1 / t^n, on a grid
+    # refined adaptively towards the steep region near t_min (avoiding t = 0)
+    curve = adaptive_sample(lambda t: 1 / (t ** n), t_min, t_max, tol=tol,
+                            max_points=points)
+    t, rho = curve.t, curve.y
     
     # Create figure
     plt.figure(figsize=(10, 6))
@@ -56,9 +63,7 @@ def plot_singularity_density(n=2, t_min=0.01, t_max=10, points=1000, save=True):
     
     # Save the figure to the project's output directory
     if save:
-        output_dir = "timespace_sim"
-        os.makedirs(output_dir, exist_ok=True)
-        output_path = os.path.join(output_dir, "singularity_density_plot.png")
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
         plt.savefig(output_path, dpi=300)
         print(f"Plot saved to: {output_path}")
 
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Thin client for the warm analysis daemon
+Sends an analysis script and its arguments to utils/analysis_daemon.py over
+a Unix socket and prints the captured output, exiting with the script's
+return code. The daemon is started in the background on first use. This
+module only uses the standard library so that a call costs an interpreter
+start and a round trip, not NumPy/matplotlib/vtk imports.
+
+Messages in both directions are a 4-byte big-endian length followed by
+UTF-8 JSON.
+
+Usage: python -m utils.analysis_client run athena_analysis output.vtk plot.png
+       python -m utils.analysis_client status | stop
+"""
+
+import argparse
+import json
+import os
+import socket
+import struct
+import sys
+import time
+
+SOCKET_ENV = 'GENESIS_DAEMON_SOCKET'
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+START_TIMEOUT = 120.0  # seconds to wait for a freshly started daemon (imports, preloading)
+MAX_MESSAGE_BYTES = 1 << 30
+
+_HEADER = struct.Struct('>I')
+
+
+def default_socket_path():
+    """$GENESIS_DAEMON_SOCKET, else a per-user socket in $TMPDIR (or /tmp)"""
+    path = os.environ.get(SOCKET_ENV)
+    if path:
+        return path
+    user = os.getuid() if hasattr(os, 'getuid') else os.environ.get('USERNAME', 'user')
+    return os.path.join(os.environ.get('TMPDIR', '/tmp'), f'genesis-analysis-{user}.sock')
+
+
+def send_message(sock, message):
+    payload = json.dumps(message).encode('utf-8')
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _receive_exactly(sock, n):
+    chunks = []
+    while n:
+        chunk = sock.recv(min(n, 1 << 20))
+        if not chunk:
+            raise ConnectionError("connection closed mid-message")
+        chunks.append(chunk)
+        n -= len(chunk)
+    return b''.join(chunks)
+
+
+def receive_message(sock):
+    """Next message from the socket, or None if the peer closed the connection"""
+    header = sock.recv(_HEADER.size, socket.MSG_WAITALL)
+    if not header:
+        return None
+    if len(header) < _HEADER.size:
+        header += _receive_exactly(sock, _HEADER.size - len(header))
+    (length,) = _HEADER.unpack(header)
+    if length > MAX_MESSAGE_BYTES:
+        raise ValueError(f"message of {length} bytes exceeds the {MAX_MESSAGE_BYTES} byte limit")
+    return json.loads(_receive_exactly(sock, length).decode('utf-8'))
+
+
+def request(message, socket_path=None, timeout=None):
+    """Send one request to the daemon and return its reply (raises OSError if it is not running)"""
+    if not hasattr(socket, 'AF_UNIX'):
+        raise OSError("the analysis daemon needs Unix domain sockets; run the script directly")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path or default_socket_path())
+        send_message(sock, message)
+        reply = receive_message(sock)
+    if reply is None:
+        raise ConnectionError("the daemon closed the connection without replying")
+    return reply
+
+
+def start_daemon(socket_path=None, log_path=None):
+    """Start the daemon in the background and wait until it answers"""
+    import subprocess  # only needed here; kept off the per-call import path
+    socket_path = socket_path or default_socket_path()
+    log_path = log_path or os.path.splitext(socket_path)[0] + '.log'
+    with open(log_path, 'ab') as log:
+        subprocess.Popen([sys.executable, '-m', 'utils.analysis_daemon', '--socket', socket_path],
+                         cwd=REPO_DIR, stdin=subprocess.DEVNULL, stdout=log, stderr=log,
+                         start_new_session=True)
+    deadline = time.monotonic() + START_TIMEOUT
+    while True:
+        try:
+            return request({'command': 'ping'}, socket_path)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise OSError(f"daemon did not start within {START_TIMEOUT:.0f} s (see {log_path})")
+            time.sleep(0.05)
+
+
+def run(script, argv, socket_path=None, autostart=True):
+    """
+    Run `script` with command-line arguments `argv` in the daemon, relative
+    to the current directory.
+
+    Returns:
+    --------
+    The reply dictionary ('returncode', 'stdout', 'stderr', 'seconds', ...)
+    """
+    message = {'command': 'run', 'script': script, 'argv': list(argv), 'cwd': os.getcwd()}
+    try:
+        return request(message, socket_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        if not autostart:
+            raise
+    start_daemon(socket_path)
+    return request(message, socket_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Client for the warm analysis daemon')
+    parser.add_argument('--socket', default=None, help=f'Socket path (default: ${SOCKET_ENV} '
+                        f'or {default_socket_path()})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run', help='Run an analysis script in the daemon')
+    run_parser.add_argument('--no-start', action='store_true',
+                            help='Fail instead of starting the daemon when it is not running')
+    run_parser.add_argument('script', help='Script name (see "status")')
+    run_parser.add_argument('args', nargs=argparse.REMAINDER, help='Script arguments')
+    subparsers.add_parser('start', help='Start the daemon if it is not running')
+    subparsers.add_parser('status', help='Show scripts, cache and request statistics')
+    subparsers.add_parser('stop', help='Shut the daemon down')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'run':
+            reply = run(args.script, args.args, args.socket, not args.no_start)
+            if not reply.get('ok'):
+                print(f"Error: {reply.get('error')}", file=sys.stderr)
+                return 1
+            sys.stdout.write(reply['stdout'])
+            sys.stderr.write(reply['stderr'])
+            return reply['returncode']
+        if args.command == 'start':
+            try:
+                reply = request({'command': 'ping'}, args.socket)
+            except (FileNotFoundError, ConnectionRefusedError):
+                reply = start_daemon(args.socket)
+            print(f"Daemon running (pid {reply['pid']})")
+            return 0
+        if args.command == 'status':
+            print(json.dumps(request({'command': 'status'}, args.socket), indent=2))
+            return 0
+        request({'command': 'shutdown'}, args.socket)
+        print("Daemon stopped")
+        return 0
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Warm analysis daemon for the Genesis-Sphere analysis scripts
+Keeps Python, NumPy, matplotlib (Agg), vtk, h5py and the analysis scripts
+themselves loaded in one long-lived process listening on a Unix socket,
+together with a byte-budgeted LRU cache of recently read snapshots, so a
+call made through utils/analysis_client.py costs tens of milliseconds
+instead of seconds of imports and file parsing.
+
+A request runs a script's main() with the client's arguments and working
+directory and returns its captured stdout/stderr and return code. Requests
+are executed one at a time (argv, cwd and stdout are process-wide); other
+clients wait in the socket backlog. Scripts whose source file changes are
+reloaded, and cached snapshots are keyed by path, size and modification
+time. Arrays handed out from the cache are read-only views.
+
+Usage: python -m utils.analysis_daemon [--socket PATH] [--cache-mb 1024] [--idle-timeout 3600]
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import os
+import socketserver
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+
+from utils.analysis_client import REPO_DIR, default_socket_path, receive_message, send_message
+
+# Scripts served by the daemon: source path (relative to the repository) and
+# the reader functions whose results are cached
+SCRIPTS = {
+    'athena_analysis': {'path': os.path.join('athena-docker', 'athena_analysis.py'),
+                        'readers': ['read_athena_data_any_format']},
+    'fixed_analysis': {'path': os.path.join('athena-docker', 'fixed_analysis.py'),
+                       'readers': ['read_athena_data']},
+    'compare_density': {'path': 'compare_density.py', 'readers': ['load_profile']},
+    'vtk_reader': {'path': os.path.join('utils', 'vtk_reader.py'),
+                   'readers': ['read_athena_vtk']},
+}
+
+DEFAULT_CACHE_MB = 1024
+DEFAULT_IDLE_TIMEOUT = 3600.0  # seconds without requests before the daemon exits (0: never)
+POLL_INTERVAL = 0.5
+
+
+def _freeze(value):
+    """Read-only views of the arrays in a reader result (containers are copied)"""
+    if isinstance(value, np.ndarray):
+        view = value.view()
+        view.flags.writeable = False
+        return view
+    if isinstance(value, dict):
+        return {key: _freeze(item) for key, item in value.items()}
+    if isinstance(value, (tuple, list)):
+        return type(value)(_freeze(item) for item in value)
+    return value
+
+
+def _nbytes(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(_nbytes(item) for item in value.values())
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(item) for item in value)
+    return 0
+
+
+def _failed(value):
+    """Readers report errors by returning None or (None, None)"""
+    return value is None or (isinstance(value, tuple) and any(item is None for item in value))
+
+
+class SnapshotCache:
+    """Byte-budgeted LRU cache of reader results keyed by (script, reader, file state)"""
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_MB * 2**20):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def wrap(self, script, name, reader):
+        """Cached version of reader(filename, ...)"""
+        def cached_reader(filename, *args, **kwargs):
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                return reader(filename, *args, **kwargs)
+            key = (script, name, os.path.abspath(filename), stat.st_size, stat.st_mtime_ns,
+                   args, tuple(sorted(kwargs.items())))
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return _freeze(entry[0])
+                self.misses += 1
+            value = reader(filename, *args, **kwargs)
+            if not _failed(value):
+                self.put(key, _freeze(value), _nbytes(value))
+            return value
+        cached_reader.__wrapped__ = reader
+        return cached_reader
+
+    def put(self, key, value, nbytes):
+        with self._lock:
+            if nbytes > self.max_bytes:
+                return
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[1]
+            self._entries[key] = (value, nbytes)
+            self.size += nbytes
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+
+    def drop(self, script):
+        """Forget the entries of one script (after it is reloaded)"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == script]:
+                self.size -= self._entries.pop(key)[1]
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.size,
+                    'max_bytes': self.max_bytes, 'hits': self.hits, 'misses': self.misses}
+
+
+class ScriptRunner:
+    """Loaded analysis scripts (reloaded when their source changes) and the snapshot cache"""
+
+    def __init__(self, cache):
+        self.cache = cache
+        self._modules = {}  # name -> (module, mtime_ns)
+        self.errors = {}
+
+    def module(self, name):
+        if name not in SCRIPTS:
+            raise KeyError(f"unknown script {name!r}; available: {', '.join(sorted(SCRIPTS))}")
+        spec = SCRIPTS[name]
+        path = os.path.join(REPO_DIR, spec['path'])
+        mtime = os.stat(path).st_mtime_ns
+        loaded = self._modules.get(name)
+        if loaded is not None and loaded[1] == mtime:
+            return loaded[0]
+        module_spec = importlib.util.spec_from_file_location(f'_daemon_{name}', path)
+        module = importlib.util.module_from_spec(module_spec)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                module_spec.loader.exec_module(module)
+        except ImportError as e:
+            self.errors[name] = str(e)
+            raise ValueError(f"{name} cannot be loaded: {e}")
+        self.errors.pop(name, None)
+        for reader in spec['readers']:
+            setattr(module, reader, self.cache.wrap(name, reader, getattr(module, reader)))
+        if loaded is not None:
+            self.cache.drop(name)
+        self._modules[name] = (module, mtime)
+        return module
+
+    def preload(self):
+        """Load every script now so the first requests are warm too"""
+        for name in SCRIPTS:
+            try:
+                self.module(name)
+            except (OSError, ValueError) as e:
+                print(f"Warning: {e}", file=sys.stderr)
+
+    def run(self, name, argv, cwd):
+        """
+        Run a script's main() as if called as `script argv...` from cwd.
+
+        Returns:
+        --------
+        (return code, captured stdout, captured stderr)
+        """
+        module = self.module(name)
+        stdout, stderr = io.StringIO(), io.StringIO()
+        saved_argv, saved_cwd = sys.argv, os.getcwd()
+        returncode = 0
+        try:
+            os.chdir(cwd)
+            sys.argv = [module.__file__] + [str(a) for a in argv]
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                try:
+                    result = module.main()
+                    returncode = result if isinstance(result, int) else 0
+                except SystemExit as e:
+                    if e.code is None or isinstance(e.code, int):
+                        returncode = e.code or 0
+                    else:
+                        print(e.code, file=sys.stderr)
+                        returncode = 1
+                except Exception:
+                    traceback.print_exc()
+                    returncode = 1
+        finally:
+            sys.argv = saved_argv
+            os.chdir(saved_cwd)
+            plt.close('all')
+        return returncode, stdout.getvalue(), stderr.getvalue()
+
+    def status(self):
+        return {name: ('loaded' if name in self._modules else self.errors.get(name, 'not loaded'))
+                for name in SCRIPTS}
+
+
+class AnalysisRequestHandler(socketserver.BaseRequestHandler):
+    """Commands: ping, status, run (script, argv, cwd), shutdown"""
+
+    def handle(self):
+        server = self.server
+        try:
+            message = receive_message(self.request)
+        except (OSError, ValueError) as e:
+            print(f"Bad request: {e}", file=sys.stderr)
+            return
+        if message is None:
+            return
+        server.last_request = time.monotonic()
+        command = message.get('command')
+        try:
+            if command == 'ping':
+                reply = {'ok': True, 'pid': os.getpid()}
+            elif command == 'status':
+                reply = {'ok': True, 'pid': os.getpid(), 'socket': server.server_address,
+                         'uptime': time.monotonic() - server.started, 'requests': server.requests,
+                         'scripts': server.runner.status(), 'cache': server.runner.cache.stats()}
+            elif command == 'run':
+                hits = server.runner.cache.hits
+                start = time.perf_counter()
+                returncode, stdout, stderr = server.runner.run(
+                    message['script'], message.get('argv', []), message.get('cwd', os.getcwd()))
+                server.requests += 1
+                reply = {'ok': True, 'returncode': returncode, 'stdout': stdout, 'stderr': stderr,
+                         'seconds': time.perf_counter() - start,
+                         'cache_hits': server.runner.cache.hits - hits}
+            elif command == 'shutdown':
+                server.stopping = True
+                reply = {'ok': True, 'pid': os.getpid()}
+            else:
+                reply = {'ok': False, 'error': f"unknown command {command!r}"}
+        except KeyError as e:
+            reply = {'ok': False, 'error': str(e.args[0]) if e.args else 'missing field'}
+        except (OSError, ValueError) as e:
+            reply = {'ok': False, 'error': str(e)}
+        try:
+            send_message(self.request, reply)
+        except OSError as e:
+            print(f"Could not reply: {e}", file=sys.stderr)
+
+
+class AnalysisDaemon(socketserver.UnixStreamServer):
+    """Single-threaded Unix socket server around a ScriptRunner"""
+
+    def __init__(self, socket_path, runner, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        _claim_socket_path(socket_path)
+        old_umask = os.umask(0o177)  # socket usable by this user only
+        try:
+            super().__init__(socket_path, AnalysisRequestHandler)
+        finally:
+            os.umask(old_umask)
+        self.runner = runner
+        self.idle_timeout = idle_timeout
+        self.timeout = POLL_INTERVAL
+        self.started = self.last_request = time.monotonic()
+        self.requests = 0
+        self.stopping = False
+
+    def serve_until_stopped(self):
+        """Handle requests until a shutdown request or the idle timeout"""
+        while not self.stopping:
+            self.handle_request()
+            if self.idle_timeout and time.monotonic() - self.last_request > self.idle_timeout:
+                break
+
+    def server_close(self):
+        super().server_close()
+        with contextlib.suppress(OSError):
+            os.unlink(self.server_address)
+
+
+def _claim_socket_path(path):
+    """Remove a stale socket file; refuse if a daemon is still answering on it"""
+    if not os.path.exists(path):
+        return
+    import socket
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+        except OSError:
+            os.unlink(path)
+            return
+    raise OSError(f"a daemon is already listening on {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Warm analysis daemon (Unix socket)')
+    parser.add_argument('--socket', default=None,
+                        help=f'Socket path (default: {default_socket_path()})')
+    parser.add_argument('--cache-mb', type=int, default=DEFAULT_CACHE_MB,
+                        help=f'Snapshot cache size in MB (default: {DEFAULT_CACHE_MB})')
+    parser.add_argument('--idle-timeout', type=float, default=DEFAULT_IDLE_TIMEOUT,
+                        help='Exit after this many seconds without requests (0: never)')
+    parser.add_argument('--no-preload', action='store_true',
+                        help='Load scripts on first use instead of at startup')
+    args = parser.parse_args()
+
+    socket_path = args.socket or default_socket_path()
+    runner = ScriptRunner(SnapshotCache(args.cache_mb * 2**20))
+    if not args.no_preload:
+        runner.preload()
+    try:
+        daemon = AnalysisDaemon(socket_path, runner, args.idle_timeout)
+    except OSError as e:
+        print(f"Error: {e}")
+        return 1
+    print(f"Analysis daemon (pid {os.getpid()}) listening on {socket_path}", flush=True)
+    try:
+        daemon.serve_until_stopped()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
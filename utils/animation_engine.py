@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Persistent-artist animation engine for the Genesis-Sphere visualizations
+Artists are created once and only their segment/vertex data is swapped per
+frame, so no script has to call ax.cla() and rebuild its collections.
+"""
+
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.animation import FuncAnimation
+from mpl_toolkits.mplot3d.art3d import Line3DCollection, Poly3DCollection
+
+from utils.gif_writer import StreamingGifWriter, build_palette
+
+
+def edge_segments(points, edges):
+    """Gather (..., V, 3) points into (..., E, 2, 3) line segments in one indexing pass"""
+    return np.asarray(points)[..., np.asarray(edges), :]
+
+
+def sphere_grid(radius=1.0, n_u=30, n_v=15):
+    """Return the (n_u, n_v, 3) surface grid of a sphere, computed once"""
+    u, v = np.mgrid[0:2*np.pi:n_u*1j, 0:np.pi:n_v*1j]
+    return radius * np.stack([np.cos(u) * np.sin(v),
+                              np.sin(u) * np.sin(v),
+                              np.cos(v)], axis=-1)
+
+
+def grid_wireframe_segments(grid):
+    """Convert an (..., N, M, 3) surface grid into (..., E, 2, 3) wireframe segments"""
+    rows = np.stack([grid[..., :-1, :, :], grid[..., 1:, :, :]], axis=-2)
+    cols = np.stack([grid[..., :, :-1, :], grid[..., :, 1:, :]], axis=-2)
+    shape = grid.shape[:-3]
+    return np.concatenate([rows.reshape(shape + (-1, 2, 3)),
+                           cols.reshape(shape + (-1, 2, 3))], axis=-3)
+
+
+def grid_surface_polygons(grid):
+    """Convert an (..., N, M, 3) surface grid into (..., P, 4, 3) quad polygons"""
+    quads = np.stack([grid[..., :-1, :-1, :], grid[..., 1:, :-1, :],
+                      grid[..., 1:, 1:, :], grid[..., :-1, 1:, :]], axis=-2)
+    return quads.reshape(grid.shape[:-3] + (-1, 4, 3))
+
+
+def _per_frame(values, n_frames, item_ndim):
+    """Broadcast static data to a per-frame array (frames first)"""
+    values = np.asarray(values, dtype=float)
+    if values.ndim == item_ndim:
+        return np.broadcast_to(values, (n_frames,) + values.shape)
+    if values.shape[0] != n_frames:
+        raise ValueError(f"Expected {n_frames} frames of data, got {values.shape[0]}")
+    return values
+
+
+class _Track:
+    """Base class for an artist plus the per-frame data that drives it"""
+
+    def __init__(self, artist, n_frames, visible=None, frame_colors=None):
+        self.artist = artist
+        self.visible = (np.ones(n_frames, dtype=bool) if visible is None
+                        else np.asarray(visible, dtype=bool))
+        # Per-frame RGBA colours, (frames, 4); None keeps the initial style
+        self.colors = (None if frame_colors is None
+                       else _per_frame(frame_colors, n_frames, 1))
+        self._shown = None
+
+    def update(self, frame):
+        shown = bool(self.visible[frame])
+        if shown != self._shown:
+            self.artist.set_visible(shown)
+            self._shown = shown
+        if shown:
+            if self.colors is not None:
+                self.set_color(self.colors[frame])
+            self.set_data(frame)
+
+    def set_color(self, rgba):
+        self.artist.set_color(rgba)
+
+    def set_data(self, frame):
+        raise NotImplementedError
+
+
+class LineTrack(_Track):
+    """Line3DCollection whose (frames, E, 2, 3) segments are precomputed"""
+
+    def __init__(self, ax, segments, n_frames, visible=None, frame_colors=None, **style):
+        self.segments = _per_frame(segments, n_frames, 3)
+        self._static = np.asarray(segments).ndim == 3
+        artist = Line3DCollection(self.segments[0], **style)
+        ax.add_collection3d(artist)
+        super().__init__(artist, n_frames, visible, frame_colors)
+        self._current = None
+
+    def set_data(self, frame):
+        if self._static and self._current is not None:
+            return
+        self.artist.set_segments(self.segments[frame])
+        self._current = frame
+
+
+class PolyTrack(_Track):
+    """Poly3DCollection whose (frames, P, K, 3) vertices are precomputed"""
+
+    def __init__(self, ax, verts, n_frames, visible=None, frame_colors=None, **style):
+        self.verts = _per_frame(verts, n_frames, 3)
+        self._static = np.asarray(verts).ndim == 3
+        artist = Poly3DCollection(self.verts[0], **style)
+        ax.add_collection3d(artist)
+        super().__init__(artist, n_frames, visible, frame_colors)
+        self._current = None
+
+    def set_color(self, rgba):
+        self.artist.set_facecolor(rgba)
+
+    def set_data(self, frame):
+        if self._static and self._current is not None:
+            return
+        self.artist.set_verts(self.verts[frame])
+        self._current = frame
+
+
+class PointTrack(_Track):
+    """Line3D marker/polyline whose (frames, N, 3) points are precomputed"""
+
+    def __init__(self, ax, points, n_frames, visible=None, frame_colors=None, **style):
+        self.points = _per_frame(points, n_frames, 2)
+        artist, = ax.plot(self.points[0, :, 0], self.points[0, :, 1],
+                          self.points[0, :, 2], **style)
+        super().__init__(artist, n_frames, visible, frame_colors)
+
+    def set_data(self, frame):
+        pts = self.points[frame]
+        self.artist.set_data_3d(pts[:, 0], pts[:, 1], pts[:, 2])
+
+
+class CurveTrack(_Track):
+    """2D Line2D whose per-frame x and y data are precomputed (frames may differ in length)"""
+
+    def __init__(self, ax, xs, ys, n_frames, visible=None, frame_colors=None, **style):
+        if len(xs) != n_frames or len(ys) != n_frames:
+            raise ValueError(f"Expected {n_frames} frames of data, got {len(xs)} and {len(ys)}")
+        self.xs, self.ys = xs, ys
+        artist, = ax.plot(xs[0], ys[0], **style)
+        super().__init__(artist, n_frames, visible, frame_colors)
+
+    def set_data(self, frame):
+        self.artist.set_data(self.xs[frame], self.ys[frame])
+
+
+class PersistentAnimation:
+    """
+    Owns a 3D axes whose static settings are applied once (or, with
+    projection=None, a 2D axes the caller sets up) and a list of tracks
+    that are updated in place for every frame.
+    """
+
+    def __init__(self, n_frames, limits=(-2, 2), title=None, figsize=(6, 6),
+                 box_aspect=True, fig=None, projection='3d'):
+        self.n_frames = n_frames
+        self.fig = fig if fig is not None else plt.figure(figsize=figsize)
+        self.ax = self.fig.add_subplot(111, projection=projection)
+        if projection == '3d':
+            self.configure_axes(limits, box_aspect)
+        # A fixed title position skips the per-draw tight-bbox layout pass
+        self.title = self.ax.set_title(title or "", fontsize=12, y=1.0)
+        self.titles = None
+        self.tracks = []
+
+    def configure_axes(self, limits, box_aspect=True):
+        """Static axis setup; done once instead of on every frame"""
+        lo, hi = limits
+        self.ax.set_xlim(lo, hi)
+        self.ax.set_ylim(lo, hi)
+        self.ax.set_zlim(lo, hi)
+        if box_aspect:
+            self.ax.set_box_aspect([1, 1, 1])
+        self.ax.axis('off')
+
+    def set_titles(self, titles):
+        """Per-frame title strings (a list of length n_frames)"""
+        self.titles = list(titles)
+
+    def add_lines(self, segments, **kwargs):
+        return self._add(LineTrack(self.ax, segments, self.n_frames, **kwargs))
+
+    def add_polygons(self, verts, **kwargs):
+        return self._add(PolyTrack(self.ax, verts, self.n_frames, **kwargs))
+
+    def add_points(self, points, **kwargs):
+        return self._add(PointTrack(self.ax, points, self.n_frames, **kwargs))
+
+    def add_curve(self, xs, ys, **kwargs):
+        return self._add(CurveTrack(self.ax, xs, ys, self.n_frames, **kwargs))
+
+    def _add(self, track):
+        self.tracks.append(track)
+        return track
+
+    def update(self, frame):
+        """Swap the data of every track to the given frame"""
+        if self.titles is not None:
+            self.title.set_text(self.titles[frame])
+        for track in self.tracks:
+            track.update(frame)
+        return [track.artist for track in self.tracks]
+
+    def animation(self, interval=100):
+        return FuncAnimation(self.fig, self.update, frames=self.n_frames,
+                             interval=interval)
+
+    def render_frame(self, frame):
+        """Update to `frame`, draw once and return the (H, W, 4) RGBA buffer"""
+        self.update(frame)
+        self.fig.canvas.draw()
+        return np.asarray(self.fig.canvas.buffer_rgba())
+
+    def save(self, path, fps=10, frames=None, palette_samples=4):
+        """Render every frame (one draw each) and stream it into the GIF"""
+        frames = list(range(self.n_frames) if frames is None else frames)
+        samples = np.unique(np.linspace(0, len(frames) - 1, palette_samples).astype(int))
+        palette = build_palette([self.render_frame(frames[i]).copy() for i in samples])
+        with StreamingGifWriter(path, fps=fps, palette=palette) as writer:
+            for frame in frames:
+                writer.write_rgba(self.render_frame(frame))
+        return path
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Native Athena++ input/output handling for the Genesis-Sphere project
+Parses Athena++ legacy binary VTK (RECTILINEAR_GRID) files with NumPy only.
+Field arrays are returned as memory-mapped big-endian float32 views, so a
+caller that needs one slice of one field never reads the rest of the file;
+VTKField reads slabs into native float32 buffers instead (byte-swapped in
+place), so streaming passes over large runs do not keep file pages mapped.
+Also writes VTK files byte-compatible with Athena++, reads formatted text
+tables as float32, reads and writes history (.hst) files and parses
+athinput parameter files. Snapshots read in full are recorded in the
+snapshot index while one is enabled (utils/snapshot_index.py).
+"""
+
+import itertools
+import os
+import re
+
+import numpy as np
+
+from utils import snapshot_index
+from utils.memory_budget import STORAGE_DTYPE, slab_rows, slabs
+
+# Athena++ writes big-endian float32 for coordinates and cell data
+VTK_DTYPE = np.dtype('>f4')
+
+
+def read_vtk_header(filename):
+    """
+    Scan an Athena++ legacy VTK file and locate every data block.
+
+    Returns:
+    --------
+    dict with 'time', 'cycle', 'variables', 'dimensions' (face counts),
+    'cell_shape' (nz, ny, nx), 'coordinates' {axis: (offset, count)} and
+    'fields' {name: (offset, components)}
+    """
+    header = {'time': 0.0, 'cycle': 0, 'variables': None,
+              'coordinates': {}, 'fields': {}}
+    size = os.path.getsize(filename)
+    with open(filename, 'rb') as f:
+        f.readline()  # "# vtk DataFile Version ..."
+        comment = f.readline().decode('ascii', 'replace')
+        match = re.search(r'time=\s*([-+0-9.eE]+)', comment)
+        if match:
+            header['time'] = float(match.group(1))
+        match = re.search(r'cycle=\s*(\d+)', comment)
+        if match:
+            header['cycle'] = int(match.group(1))
+        match = re.search(r'variables=\s*(\S+)', comment)
+        if match:
+            header['variables'] = match.group(1)
+
+        n_cells = None
+        while f.tell() < size:
+            line = f.readline().decode('ascii', 'replace').strip()
+            if not line:
+                continue
+            tokens = line.split()
+            keyword = tokens[0]
+            if keyword == 'BINARY':
+                continue
+            if keyword == 'ASCII':
+                raise ValueError(f"{filename}: only BINARY Athena VTK files are supported")
+            if keyword == 'DATASET' and tokens[1] != 'RECTILINEAR_GRID':
+                raise ValueError(f"{filename}: unsupported dataset {tokens[1]}")
+            if keyword == 'DIMENSIONS':
+                header['dimensions'] = tuple(int(t) for t in tokens[1:4])
+            elif keyword.endswith('_COORDINATES'):
+                count = int(tokens[1])
+                header['coordinates'][keyword[0].lower()] = (f.tell(), count)
+                f.seek(count * VTK_DTYPE.itemsize, os.SEEK_CUR)
+            elif keyword in ('CELL_DATA', 'POINT_DATA'):
+                n_cells = int(tokens[1])
+            elif keyword in ('SCALARS', 'VECTORS'):
+                components = 3 if keyword == 'VECTORS' else 1
+                if keyword == 'SCALARS':
+                    if len(tokens) > 3:
+                        components = int(tokens[3])
+                    f.readline()  # LOOKUP_TABLE default
+                header['fields'][tokens[1]] = (f.tell(), components)
+                f.seek(n_cells * components * VTK_DTYPE.itemsize, os.SEEK_CUR)
+
+    nx, ny, nz = (max(d - 1, 1) for d in header['dimensions'])
+    header['cell_shape'] = (nz, ny, nx)
+    return header
+
+
+def read_vtk_coordinates(filename, header=None):
+    """Return the face coordinates {'x1f', 'x2f', 'x3f'} as float64 arrays"""
+    header = header or read_vtk_header(filename)
+    coords = {}
+    with open(filename, 'rb') as f:
+        for axis, name in zip('xyz', ('x1f', 'x2f', 'x3f')):
+            offset, count = header['coordinates'][axis]
+            f.seek(offset)
+            coords[name] = np.fromfile(f, dtype=VTK_DTYPE, count=count).astype(np.float64)
+    return coords
+
+
+def open_vtk_field(filename, name, header=None):
+    """
+    Memory-map one field as a big-endian float32 array.
+
+    Scalars have shape (nz, ny, nx), vectors (nz, ny, nx, 3). Nothing is
+    read until the returned array (or a slice of it) is accessed.
+    """
+    header = header or read_vtk_header(filename)
+    offset, components = header['fields'][name]
+    shape = header['cell_shape'] + ((components,) if components > 1 else ())
+    return np.memmap(filename, dtype=VTK_DTYPE, mode='r', offset=offset, shape=shape)
+
+
+class VTKField:
+    """
+    One field of a VTK file read in slabs along nz: `field[k0:k1]` returns
+    cells k0:k1 as a new native float32 array, read with one seek and
+    byte-swapped in place. Has `shape` and `dtype`, so it can be passed
+    wherever slab-wise array-likes are accepted (the analysis tools,
+    write_athena_vtk); np.asarray(field) loads it whole.
+    """
+
+    def __init__(self, filename, name, header=None):
+        header = header or read_vtk_header(filename)
+        self.filename = filename
+        self.name = name
+        self.offset, components = header['fields'][name]
+        self.shape = header['cell_shape'] + ((components,) if components > 1 else ())
+        self.dtype = STORAGE_DTYPE
+        self.ndim = len(self.shape)
+        self._row_values = int(np.prod(self.shape[1:]))
+
+    def read(self, k0, k1, out=None):
+        """Cells k0:k1 as native float32, into `out` (an array of that shape) when given"""
+        shape = (k1 - k0,) + self.shape[1:]
+        if out is None:
+            out = np.empty(shape, dtype=STORAGE_DTYPE)
+        buffer = out.reshape(-1).view(VTK_DTYPE)
+        with open(self.filename, 'rb') as f:
+            f.seek(self.offset + k0 * self._row_values * VTK_DTYPE.itemsize)
+            if f.readinto(memoryview(buffer).cast('B')) != buffer.nbytes:
+                raise ValueError(f"{self.filename}: field {self.name} is truncated")
+        buffer.byteswap(inplace=True)
+        return out
+
+    def __getitem__(self, index):
+        if isinstance(index, slice) and index.step in (None, 1):
+            k0, k1, _ = index.indices(self.shape[0])
+            return self.read(k0, max(k0, k1))
+        return self.load()[index]
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __array__(self, dtype=None, copy=None):
+        array = self.load()
+        return array if dtype is None else array.astype(dtype, copy=False)
+
+    def load(self):
+        """The whole field as one native float32 array, read slab by slab"""
+        out = np.empty(self.shape, dtype=STORAGE_DTYPE)
+        for k0, k1 in slabs(self.shape[0], self._row_values * STORAGE_DTYPE.itemsize):
+            self.read(k0, k1, out[k0:k1])
+        return out
+
+
+def load_vtk_field(filename, name, header=None):
+    """Read one field into memory as a native float32 array (no float64 or second copy)"""
+    return VTKField(filename, name, header).load()
+
+
+def read_athena_vtk_native(filename, fields=None, load=False):
+    """
+    Read an Athena++ VTK file without the vtk package.
+
+    Returns (time, data) like utils.vtk_reader.read_athena_vtk, where data
+    holds the face coordinates and the requested fields (default: all) as
+    lazy memory-mapped arrays, or as native float32 arrays when `load` is
+    set.
+    """
+    header = read_vtk_header(filename)
+    data = read_vtk_coordinates(filename, header)
+    for name in (fields or header['fields']):
+        data[name] = (load_vtk_field(filename, name, header) if load
+                      else open_vtk_field(filename, name, header))
+    if load and fields is None:
+        snapshot_index.record_read(filename, {name: data[name] for name in header['fields']},
+                                   header['time'], header['cycle'], header['cell_shape'])
+    return header['time'], data
+
+
+def read_vtk_components(filename):
+    """
+    Read an Athena++ VTK file as (time, data) with every field loaded as
+    native float32 and each vector split into components (vel -> vel1,
+    vel2, vel3) that are views of the one array, not separate copies.
+    """
+    time_value, data = read_athena_vtk_native(filename, load=True)
+    for name in [name for name, values in data.items() if values.ndim == 4]:
+        vector = data.pop(name)
+        for i in range(vector.shape[-1]):
+            data[f"{name}{i + 1}"] = vector[..., i]
+    return time_value, data
+
+
+def read_table(filename, dtype=STORAGE_DTYPE):
+    """
+    Read an Athena++ formatted text table ('#' comment lines) as a 2D
+    array of `dtype` (float32 by default). Rows are parsed in chunks that
+    fit the memory budget, so the float64 parse buffer stays small and
+    only the float32 result grows with the file.
+    """
+    with open(filename, 'rb') as f:
+        n_rows = sum(1 for line in f if line.strip() and not line.lstrip().startswith(b'#'))
+    with open(filename) as f:
+        lines = (line for line in f if line.strip() and not line.lstrip().startswith('#'))
+        first = np.loadtxt(itertools.islice(lines, 1), ndmin=2)
+        if first.size == 0:
+            return np.empty((0, 0), dtype=dtype)
+        table = np.empty((n_rows, first.shape[1]), dtype=dtype)
+        table[0] = first[0]
+        # the float64 parse of a chunk and the list of row tokens it comes from
+        step = slab_rows(first.shape[1] * 64)
+        row = 1
+        while row < n_rows:
+            chunk = np.loadtxt(itertools.islice(lines, step), ndmin=2)
+            table[row:row + len(chunk)] = chunk
+            row += len(chunk)
+    snapshot_index.record_table(filename, table)
+    return table
+
+
+def write_athena_vtk(filename, time, cycle, coords, fields, variables='prim'):
+    """
+    Write an Athena++-style legacy binary VTK file.
+
+    Parameters:
+    -----------
+    filename : str
+        Output path
+    time, cycle : float, int
+        Simulation time and cycle written into the header comment
+    coords : dict
+        Face coordinates 'x1f', 'x2f', 'x3f'. A collapsed dimension (one
+        cell) is written as a single coordinate at the cell centre, as
+        Athena++ does.
+    fields : list of (name, array)
+        Cell data in write order; arrays of shape (nz, ny, nx) are written
+        as SCALARS, (nz, ny, nx, 3) as VECTORS. Data are written in slabs
+        along nz, so memory maps and other array-likes with `shape` and
+        slicing (e.g. fields computed slab by slab) are never loaded whole.
+    """
+    axes = []
+    for name in ('x1f', 'x2f', 'x3f'):
+        faces = np.asarray(coords[name], dtype=np.float64)
+        if faces.size == 2:
+            faces = 0.5 * (faces[:1] + faces[1:])
+        axes.append(faces)
+    n_cells = int(np.prod([max(a.size - 1, 1) for a in axes]))
+
+    with open(filename, 'wb') as f:
+        f.write(b"# vtk DataFile Version 2.0\n")
+        f.write(f"# Athena++ data at time={time:e}  cycle={cycle}  "
+                f"variables={variables} \n".encode('ascii'))
+        f.write(b"BINARY\nDATASET RECTILINEAR_GRID\n")
+        f.write(("DIMENSIONS " + " ".join(str(a.size) for a in axes) + "\n").encode('ascii'))
+        for label, faces in zip('XYZ', axes):
+            f.write(f"{label}_COORDINATES {faces.size} float\n".encode('ascii'))
+            f.write(faces.astype(VTK_DTYPE).tobytes())
+            f.write(b"\n")
+        f.write(f"CELL_DATA {n_cells}\n".encode('ascii'))
+        for index, (name, array) in enumerate(fields):
+            if not hasattr(array, 'shape'):
+                array = np.asarray(array)
+            if index:
+                f.write(b"\n")
+            if len(array.shape) == 4:
+                f.write(f"VECTORS {name} float\n".encode('ascii'))
+            else:
+                f.write(f"SCALARS {name} float\nLOOKUP_TABLE default\n".encode('ascii'))
+            row_values = int(np.prod(array.shape[1:]))
+            for k0, k1 in slabs(array.shape[0], 2 * row_values * VTK_DTYPE.itemsize):
+                f.write(np.ascontiguousarray(array[k0:k1], dtype=VTK_DTYPE).tobytes())
+
+
+HISTORY_COLUMNS = ['time', 'dt', 'mass', '1-mom', '2-mom', '3-mom',
+                   '1-KE', '2-KE', '3-KE', 'tot-E']
+
+
+def write_history_header(f, columns=HISTORY_COLUMNS):
+    """Write the two Athena++ .hst header lines to an open text file"""
+    labels = "".join(f"{f'[{i}]={name}':13s}" for i, name in enumerate(columns, 1))
+    f.write("# Athena++ history data\n")
+    f.write(f"# {labels}\n")
+
+
+def write_history_row(f, values):
+    """Append one row of history values in the Athena++ %13.5e layout"""
+    f.write("".join(f"{value:13.5e}" for value in values) + "\n")
+
+
+def read_history(filename):
+    """
+    Read an Athena++ .hst file into {column label: array}.
+
+    Labels come from the last "# [1]=time ..." header line; rows are kept
+    in file order (a restarted run may repeat times).
+    """
+    labels = None
+    with open(filename) as f:
+        for line in f:
+            if line.startswith('#') and '[1]=' in line:
+                labels = re.findall(r'\[\d+\]=(\S+)', line)
+    if labels is None:
+        raise ValueError(f"{filename}: no Athena++ history header")
+    table = np.atleast_2d(np.loadtxt(filename, comments='#'))
+    if table.size == 0:
+        table = np.empty((0, len(labels)))
+    if table.shape[1] != len(labels):
+        raise ValueError(f"{filename}: {table.shape[1]} columns but {len(labels)} labels")
+    return {label: table[:, i] for i, label in enumerate(labels)}
+
+
+def _parse_value(text):
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+
+def read_athinput(filename, overrides=None):
+    """
+    Parse an athinput file into {block: {key: value}}.
+
+    Values are converted to int or float where possible; the free-text
+    <comment> block is skipped. `overrides` takes Athena++ command-line
+    style entries ("block/key=value").
+    """
+    params = {}
+    block = None
+    with open(filename) as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            if line.startswith('<') and line.endswith('>'):
+                block = line[1:-1].strip()
+                params.setdefault(block, {})
+            elif block not in (None, 'comment') and '=' in line:
+                key, value = (part.strip() for part in line.split('=', 1))
+                params[block][key] = _parse_value(value)
+    for entry in overrides or []:
+        path, _, value = entry.partition('=')
+        block, slash, key = path.partition('/')
+        if not slash or not key:
+            raise ValueError(f"Override must look like block/key=value, got {entry!r}")
+        params.setdefault(block, {})[key] = _parse_value(value.strip())
+    return params
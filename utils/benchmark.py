@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the Genesis-Sphere analysis pipeline
+Times the snapshot readers, the time-density kernels, the comparison
+statistics, report generation and rendering on synthetic Athena++-like
+datasets (utils.synthetic_data) at scaling grid sizes, and writes the
+timings as JSON. A saved result can serve as the baseline of a later run:
+`compare` flags every benchmark that got slower than a threshold.
+
+Benchmarks whose optional dependencies (vtk, h5py, pandas) are missing are
+recorded as skipped with the reason, so results from different machines
+stay comparable benchmark by benchmark.
+
+Usage: python -m utils.benchmark run [--suite quick|full] [-o results.json]
+       python -m utils.benchmark compare baseline.json results.json [--threshold 0.25]
+"""
+
+import argparse
+import contextlib
+import datetime
+import importlib.util
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from utils.athena_io import read_athena_vtk_native, read_history
+from utils.synthetic_data import generate, parse_size, size_label
+
+SUITES = {
+    'quick': ['64x64', '256x256', '64x64x64', '128x128x128'],
+    'full': ['64x64', '256x256', '512x512', '64x64x64', '128x128x128', '256x256x256',
+             '512x512x512'],
+}
+
+KERNEL_MAX_POINTS = 1 << 24  # kernel inputs beyond this do not fit comfortably in memory
+DEFAULT_THRESHOLD = 0.25
+MIN_DIFFERENCE = 1e-3  # seconds; slowdowns below this are timer noise
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Data handed to a benchmark factory: size label, cell shape (nz, ny, nx),
+# {format: [paths]} of the dataset and a scratch directory for outputs
+BenchContext = namedtuple('BenchContext', ['label', 'shape', 'files', 'workdir'])
+
+
+class SkipBenchmark(Exception):
+    """Raised by a benchmark factory that cannot run here (reason in the message)"""
+
+
+# name -> (factory, per_size, full_only); a factory builds the timed callable
+BENCHMARKS = {}
+
+
+def benchmark(name, per_size=True, full_only=False):
+    """Register a benchmark factory: factory(context) -> zero-argument callable to time"""
+    def register(factory):
+        BENCHMARKS[name] = (factory, per_size, full_only)
+        return factory
+    return register
+
+
+def _require(context, fmt):
+    paths = context.files.get(fmt)
+    if not paths:
+        raise SkipBenchmark(f"no {fmt} dataset at this size")
+    return paths
+
+
+def _import_repo_module(name, path=None):
+    """Import a repository script, turning a missing optional dependency into a skip"""
+    try:
+        if path is None:
+            return importlib.import_module(name)
+        spec = importlib.util.spec_from_file_location(name, os.path.join(REPO_DIR, path))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    except ImportError as e:
+        raise SkipBenchmark(f"{name} needs a missing package ({e})")
+
+
+def _quiet(function):
+    """Wrap a chatty repository function so its prints do not pollute the output"""
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return function()
+    return run
+
+
+@benchmark('read_vtk_native')
+def _read_vtk_native(context):
+    path = _require(context, 'vtk')[0]
+
+    def run():
+        _, data = read_athena_vtk_native(path)
+        return [float(np.sum(data[name], dtype=np.float64)) for name in ('rho', 'press', 'vel')]
+    return run
+
+
+@benchmark('read_vtk_vtk_reader')
+def _read_vtk_vtk_reader(context):
+    path = _require(context, 'vtk')[0]
+    vtk_reader = _import_repo_module('utils.vtk_reader')
+    return _quiet(lambda: vtk_reader.read_athena_vtk(path))
+
+
+@benchmark('read_athdf')
+def _read_athdf(context):
+    path = _require(context, 'athdf')[0]
+    analysis = _import_repo_module('athena_analysis', os.path.join('athena-docker',
+                                                                   'athena_analysis.py'))
+    return _quiet(lambda: analysis.read_athena_data(path))
+
+
+@benchmark('relativistic_analysis_chunked')
+def _relativistic_analysis_chunked(context):
+    path = _require(context, 'vtk')[0]
+    analysis = _import_repo_module('athena_analysis', os.path.join('athena-docker',
+                                                                   'athena_analysis.py'))
+    return _quiet(lambda: analysis.analyze_relativistic_effects_chunked(path)['mean_gamma'])
+
+
+@benchmark('read_table')
+def _read_table(context):
+    path = _require(context, 'table')[1]
+    compare = _import_repo_module('compare_simulations')
+    return _quiet(lambda: compare.load_simulation_data(path))
+
+
+@benchmark('read_hst')
+def _read_hst(context):
+    path = _require(context, 'hst')[0]
+    return lambda: read_history(path)
+
+
+@benchmark('calculate_statistics')
+def _calculate_statistics(context):
+    paths = _require(context, 'table')
+    compare = _import_repo_module('compare_simulations')
+    standard, time_density = (np.loadtxt(p) for p in paths)
+    return lambda: compare.calculate_statistics(standard, time_density)
+
+
+@benchmark('generate_pdf_report')
+def _generate_pdf_report(context):
+    paths = _require(context, 'table')
+    compare = _import_repo_module('compare_simulations')
+    standard, time_density = (np.loadtxt(p) for p in paths)
+    stats = compare.calculate_statistics(standard, time_density)
+    config = {'standard_input': 'standard.in', 'time_density_input': 'time_density.in',
+              'standard_output': 'standard', 'time_density_output': 'time_density'}
+
+    def run():
+        compare.OUTPUT_DIR = context.workdir
+        return compare.generate_pdf_report(standard, time_density, stats, config)
+    return _quiet(run)
+
+
+@benchmark('time_density_kernels')
+def _time_density_kernels(context):
+    n = int(np.prod(context.shape))
+    if n > KERNEL_MAX_POINTS:
+        raise SkipBenchmark(f"{n} points exceed KERNEL_MAX_POINTS ({KERNEL_MAX_POINTS})")
+    gtd = _import_repo_module('gravitational_time_dilation')
+    t = np.linspace(1.0, gtd.t_max, n)
+    r = np.linspace(gtd.r, 100 * gtd.r, n)
+
+    def run():
+        gtd.gravitational_time_dilation(r, gtd.M)
+        gtd.effective_time(t, gtd.alpha, gtd.omega, gtd.beta, gtd.epsilon)
+        return gtd.perceived_time(t, gtd.beta, gtd.epsilon)
+    return run
+
+
+@benchmark('profile_radial')
+def _profile_radial(context):
+    from utils.geometry import geometry_from_vtk
+    from utils.profiles import profile_binner
+    path = _require(context, 'vtk')[0]
+    binner = profile_binner(geometry_from_vtk(path))
+
+    def run():
+        _, data = read_athena_vtk_native(path, ['rho'])
+        return binner.profile(data['rho'], 'radial')
+    return run
+
+
+@benchmark('conservation_budget')
+def _conservation_budget(context):
+    from utils.conservation import snapshot_budget
+    from utils.geometry import geometry_from_vtk
+    path = _require(context, 'vtk')[0]
+    geometry = geometry_from_vtk(path)
+    return lambda: snapshot_budget(path, geometry, 5.0 / 3.0)
+
+
+@benchmark('render_slice')
+def _render_slice(context):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    path = _require(context, 'vtk')[0]
+
+    def run():
+        _, data = read_athena_vtk_native(path, ['rho'])
+        plane = np.asarray(data['rho'][data['rho'].shape[0] // 2], dtype=np.float32)
+        fig, ax = plt.subplots(figsize=(6, 6))
+        ax.imshow(plane, origin='lower', cmap='viridis')
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', dpi=100)
+        plt.close(fig)
+        return buffer.tell()
+    return run
+
+
+@benchmark('singularity_plot', per_size=False)
+def _singularity_plot(context):
+    import matplotlib
+    matplotlib.use('Agg')
+    plot = _import_repo_module('singularity_plot')
+    output = os.path.join(context.workdir, 'singularity_density_plot.png')
+    return _quiet(lambda: plot.plot_singularity_density(output_path=output))
+
+
+@benchmark('gravitational_time_dilation_figures', per_size=False)
+def _gravitational_figures(context):
+    import matplotlib
+    matplotlib.use('Agg')
+    gtd = _import_repo_module('gravitational_time_dilation')
+    return _quiet(lambda: gtd.main(output_dir=context.workdir))
+
+
+@benchmark('singularity_animation', per_size=False, full_only=True)
+def _singularity_animation(context):
+    import matplotlib
+    matplotlib.use('Agg')
+    animation = _import_repo_module('singularity_animation')
+    output = os.path.join(context.workdir, 'singularity_animation.gif')
+    return _quiet(lambda: animation.main(output_path=output))
+
+
+def measure(run, repeats=5, warmup=1, max_seconds=30.0):
+    """
+    Time a callable: `warmup` untimed calls, then up to `repeats` timed
+    calls, stopping early once `max_seconds` have been spent (at least one).
+
+    Returns:
+    --------
+    list of wall-clock durations in seconds
+    """
+    for _ in range(warmup):
+        run()
+    times = []
+    start = time.perf_counter()
+    while len(times) < max(1, repeats):
+        t0 = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - t0)
+        if time.perf_counter() - start > max_seconds:
+            break
+    return times
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment():
+    """Machine and software description stored with every result file"""
+    return {'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(), 'numpy': np.__version__,
+            'platform': platform.platform(), 'cpus': os.cpu_count(), 'commit': _git_commit()}
+
+
+def run_suite(data_dir, sizes, names=None, repeats=5, warmup=1, max_seconds=30.0,
+              full=False, verbose=False):
+    """
+    Generate (or reuse) the datasets and run the benchmarks.
+
+    Parameters:
+    -----------
+    data_dir : str
+        Directory of the synthetic datasets
+    sizes : list of str
+        Grid sizes such as '256x256' or '128x128x128'
+    names : list of str, optional
+        Benchmarks to run (default: all registered ones)
+    full : bool
+        Include the benchmarks registered as full-suite only
+
+    Returns:
+    --------
+    dict with 'meta' (environment) and 'results' {key: entry}, keys being
+    'name[size]' for per-size benchmarks and 'name' otherwise; entries hold
+    'status' ('ok', 'skipped' or 'error'), 'reason', 'times', 'min' and 'median'
+    """
+    names = names or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f"Unknown benchmarks: {', '.join(unknown)}")
+    shapes = [parse_size(size) for size in sizes]
+    datasets = generate(data_dir, shapes, verbose=verbose)
+    sys.path.insert(0, REPO_DIR)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        contexts = [BenchContext(size_label(shape), shape, datasets[size_label(shape)], workdir)
+                    for shape in shapes]
+        for name in names:
+            factory, per_size, full_only = BENCHMARKS[name]
+            if full_only and not full:
+                continue
+            for context in (contexts if per_size else
+                            [BenchContext(None, None, {}, workdir)]):
+                key = f"{name}[{context.label}]" if per_size else name
+                entry = {'benchmark': name, 'size': context.label,
+                         'cells': int(np.prod(context.shape)) if per_size else None,
+                         'status': 'ok', 'reason': None, 'times': [],
+                         'min': None, 'median': None}
+                try:
+                    times = measure(factory(context), repeats, warmup, max_seconds)
+                    entry.update(times=times, min=min(times), median=float(np.median(times)))
+                except SkipBenchmark as e:
+                    entry.update(status='skipped', reason=str(e))
+                except Exception as e:  # a failing benchmark must not stop the suite
+                    entry.update(status='error', reason=f"{type(e).__name__}: {e}")
+                results[key] = entry
+                if verbose:
+                    print(_format_entry(key, entry))
+    return {'meta': environment(), 'results': results}
+
+
+def _format_entry(key, entry):
+    if entry['status'] != 'ok':
+        return f"  {key:48s} {entry['status']}: {entry['reason']}"
+    return (f"  {key:48s} median {1000 * entry['median']:10.2f} ms  "
+            f"min {1000 * entry['min']:10.2f} ms  ({len(entry['times'])} runs)")
+
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD, min_difference=MIN_DIFFERENCE):
+    """
+    Compare the median timings of two result dicts.
+
+    A benchmark regresses when its median grew by more than `threshold`
+    (relative) and by more than `min_difference` seconds; it improved when
+    it shrank by the same margins.
+
+    Returns:
+    --------
+    list of (key, baseline median, current median, ratio, verdict) for the
+    benchmarks that ran in both, verdict being 'regression', 'improved' or 'ok'
+    """
+    rows = []
+    for key, entry in current['results'].items():
+        base = baseline['results'].get(key)
+        if not base or base['status'] != 'ok' or entry['status'] != 'ok':
+            continue
+        old, new = base['median'], entry['median']
+        ratio = new / old if old > 0 else float('inf')
+        verdict = 'ok'
+        if ratio > 1 + threshold and new - old > min_difference:
+            verdict = 'regression'
+        elif ratio < 1 / (1 + threshold) and old - new > min_difference:
+            verdict = 'improved'
+        rows.append((key, old, new, ratio, verdict))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark suite on synthetic Athena++ datasets')
+    sub = parser.add_subparsers(dest='command', required=True)
+    run = sub.add_parser('run', help='Run the benchmarks and write the timings as JSON')
+    run.add_argument('--suite', choices=sorted(SUITES), default='quick',
+                     help='Grid sizes to run (full goes up to 512³ and takes a while)')
+    run.add_argument('--sizes', nargs='+', default=None, help='Explicit sizes, e.g. 256x256')
+    run.add_argument('--only', nargs='+', default=None, choices=sorted(BENCHMARKS),
+                     help='Run only these benchmarks')
+    run.add_argument('-d', '--data-dir', default='benchmark_data',
+                     help='Synthetic dataset directory (reused across runs)')
+    run.add_argument('--repeats', type=int, default=5, help='Timed calls per benchmark')
+    run.add_argument('--max-seconds', type=float, default=30.0,
+                     help='Stop repeating a benchmark after this much time')
+    run.add_argument('-o', '--output', default='benchmark_results.json', help='Result file')
+    run.add_argument('--baseline', default=None, help='Compare against this result file')
+    run.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    compare = sub.add_parser('compare', help='Flag regressions against a baseline')
+    compare.add_argument('baseline', help='Baseline result file')
+    compare.add_argument('current', help='Current result file')
+    compare.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                         help='Relative slowdown flagged as a regression (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'run':
+            sizes = args.sizes or SUITES[args.suite]
+            print(f"Running benchmarks on {', '.join(sizes)}")
+            current = run_suite(args.data_dir, sizes, args.only, args.repeats,
+                                max_seconds=args.max_seconds, full=args.suite == 'full',
+                                verbose=True)
+            with open(args.output, 'w') as f:
+                json.dump(current, f, indent=2)
+            print(f"Results written to {args.output}")
+            if not args.baseline:
+                return 0
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        else:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+            with open(args.current) as f:
+                current = json.load(f)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    rows = compare_results(baseline, current, args.threshold)
+    print(f"\nBaseline {baseline['meta'].get('commit')} ({baseline['meta'].get('timestamp')}) "
+          f"vs current {current['meta'].get('commit')} ({current['meta'].get('timestamp')})")
+    print(f"  {'benchmark':48s} {'baseline':>11s} {'current':>11s} {'ratio':>7s}")
+    for key, old, new, ratio, verdict in rows:
+        flag = {'regression': 'REGRESSION', 'improved': 'improved'}.get(verdict, '')
+        print(f"  {key:48s} {1000 * old:9.2f}ms {1000 * new:9.2f}ms {ratio:7.2f} {flag}")
+    missing = sorted(set(baseline['results']) - set(current['results']))
+    if missing:
+        print(f"Not in the current run: {', '.join(missing)}")
+    regressions = sum(verdict == 'regression' for *_, verdict in rows)
+    print(f"{regressions} regression(s) above {100 * args.threshold:.0f}%")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Conservation and energy-budget engine for Athena++ runs
+Integrates mass, momentum and kinetic, internal and total energy over the
+grid with the real cell volumes of utils.geometry (Cartesian or
+spherical_polar), plus the mass and energy fluxes through the domain
+boundary using the face areas. Each snapshot is reduced in slabs with a
+few matrix-vector products over the density-weighted volumes, so one pass
+over a run yields the full budget time series without float64 copies of
+whole fields; slabs are sized by the memory budget (utils.memory_budget).
+The result can be cross-checked against the run's .hst file.
+
+Boundary fluxes are only counted on outflow faces; reflecting, polar and
+periodic faces carry no net flux. The boundary kinds come from the run's
+athinput file (-i); without one every face is treated as outflow, and the
+drift "including boundary fluxes" is then meaningless for closed boxes.
+
+Momenta and kinetic energies are per native component, as in Athena++
+history output; on spherical_polar grids momentum is therefore not a
+conserved quantity (geometric source terms).
+
+Usage: python -m utils.conservation vtk_output/ -i time_density_blast.in --hst Blast.hst [-o budget.hst]
+"""
+
+import argparse
+import glob
+import os
+
+import numpy as np
+
+from utils.athena_io import (VTKField, read_athinput, read_history, read_vtk_header,
+                             write_history_header, write_history_row)
+from utils.geometry import athinput_boundaries, geometry_from_vtk
+from utils.memory_budget import slabs
+
+BUDGET_COLUMNS = ['time', 'mass', '1-mom', '2-mom', '3-mom', '1-KE', '2-KE', '3-KE',
+                  'internal-E', 'tot-E', 'mass-flux', 'energy-flux']
+
+# Budget columns that Athena++ .hst files also record
+HISTORY_CHECK_COLUMNS = ['mass', '1-mom', '2-mom', '3-mom', '1-KE', '2-KE', '3-KE', 'tot-E']
+
+# Boundary kinds whose faces carry no net mass or energy flux
+CLOSED_BOUNDARIES = ('reflecting', 'polar', 'polar_wedge', 'periodic')
+
+# float32 reads plus the float64 working copies of one cell in a slab
+BYTES_PER_CELL = 160
+
+
+def _fields(path, header):
+    """(rho, press or None, vel, Etot or None) slab readers of a prim or cons snapshot"""
+    names = header['fields']
+    if 'rho' in names and 'press' in names and 'vel' in names:
+        return (VTKField(path, 'rho', header), VTKField(path, 'press', header),
+                VTKField(path, 'vel', header), None)
+    if 'dens' in names and 'Etot' in names and 'mom' in names:
+        return (VTKField(path, 'dens', header), None,
+                VTKField(path, 'mom', header), VTKField(path, 'Etot', header))
+    raise ValueError(f"{path}: needs rho/press/vel (prim) or dens/Etot/mom (cons) fields")
+
+
+def snapshot_budget(path, geometry, gamma, header=None, boundaries=None):
+    """
+    Volume-integrated budget of one snapshot.
+
+    boundaries : dict, optional
+        {'ix1': kind, ...} as from utils.geometry.athinput_boundaries;
+        faces not listed are treated as outflow
+
+    Returns:
+    --------
+    dict keyed by BUDGET_COLUMNS; 'mass-flux' and 'energy-flux' are the net
+    outward rates through the outflow faces of the domain boundary,
+    estimated from the boundary cells (Athena++ outflow ghost cells copy them)
+    """
+    header = header or read_vtk_header(path)
+    if header['cell_shape'] != geometry.shape:
+        raise ValueError(f"{path}: grid {header['cell_shape']} differs from {geometry.shape}")
+    rho, press, vel, etot = _fields(path, header)
+    conserved = etot is not None
+
+    mass, internal, total = 0.0, 0.0, 0.0
+    momentum, kinetic = np.zeros(3), np.zeros(3)
+    fluxes = np.zeros(2)
+    nz, ny, nx = geometry.shape
+    for k0, k1 in slabs(nz, BYTES_PER_CELL * ny * nx):
+        v = geometry.volume_slab(k0, k1).ravel()
+        d_s, vel_s = rho[k0:k1], vel[k0:k1]
+        e_s = etot[k0:k1] if conserved else press[k0:k1]
+        d = d_s.ravel().astype(np.float64)
+        m = vel_s.reshape(-1, 3).astype(np.float64)
+        if conserved:
+            # m holds momentum densities
+            mass += v @ d
+            momentum += m.T @ v
+            kinetic += 0.5 * ((m**2).T @ (v / d))
+            total += v @ e_s.ravel().astype(np.float64)
+        else:
+            w = v * d
+            mass += w.sum()
+            momentum += m.T @ w
+            kinetic += 0.5 * ((m**2).T @ w)
+            internal += v @ e_s.ravel().astype(np.float64)
+        fluxes += _boundary_fluxes(geometry, k0, k1, d_s, vel_s, e_s, conserved, gamma,
+                                   boundaries or {})
+    if conserved:
+        internal = total - kinetic.sum()
+    else:
+        internal /= gamma - 1.0
+        total = internal + kinetic.sum()
+
+    return dict(zip(BUDGET_COLUMNS, [header['time'], mass, *momentum, *kinetic,
+                                     internal, total, *fluxes]))
+
+
+def _boundary_fluxes(geometry, k0, k1, rho, vel, energy, conserved, gamma, boundaries):
+    """
+    Net outward mass and energy flux through the boundary faces of every
+    active direction that lie in the slab k0:k1 along x3. `energy` holds
+    the pressure (prim) or total energy density (cons) of the slab. Faces
+    with a closed boundary kind (CLOSED_BOUNDARIES) contribute nothing.
+    """
+    fluxes = np.zeros(2)
+    for d in (1, 2, 3):
+        n = geometry.widths[d].size
+        if n < 2:
+            continue
+        axis = 3 - d
+        for side, cell, face, sign in (('i', 0, 0, -1.0), ('o', n - 1, n, 1.0)):
+            if boundaries.get(f'{side}x{d}', 'outflow') in CLOSED_BOUNDARIES:
+                continue
+            if d == 3 and not k0 <= cell < k1:
+                continue
+            index = [slice(None)] * 3
+            index[axis] = slice(cell - k0, cell - k0 + 1) if d == 3 else slice(cell, cell + 1)
+            index = tuple(index)
+            area = np.broadcast_to(geometry.face_area(d, face, k0, k1), rho[index].shape)
+            d_b = rho[index].astype(np.float64)
+            v_b = vel[index].astype(np.float64)
+            e_b = energy[index].astype(np.float64)
+            if conserved:
+                vn = v_b[..., d - 1] / d_b
+                p_b = (gamma - 1.0) * (e_b - 0.5 * np.sum(v_b**2, axis=-1) / d_b)
+            else:
+                vn = v_b[..., d - 1]
+                p_b = e_b
+                e_b = p_b / (gamma - 1.0) + 0.5 * d_b * np.sum(v_b**2, axis=-1)
+            fluxes += sign * np.array([np.sum(area * d_b * vn), np.sum(area * (e_b + p_b) * vn)])
+    return fluxes
+
+
+def run_gamma(athinput=None, default=5.0 / 3.0):
+    """Adiabatic index from the <hydro> block of an athinput file"""
+    if not athinput:
+        return default
+    return float(read_athinput(athinput).get('hydro', {}).get('gamma', default))
+
+
+def budget_series(files, athinput=None, coord=None, gamma=None):
+    """
+    Budget time series of a run in one pass over its snapshots.
+
+    Returns:
+    --------
+    {column: array} keyed by BUDGET_COLUMNS, plus 'escaped-mass' and
+    'escaped-energy' (time integrals of the boundary fluxes, trapezoid rule
+    over the snapshot times) so that mass + escaped-mass is conserved
+    """
+    if not files:
+        raise ValueError("No snapshot files given")
+    gamma = gamma or run_gamma(athinput)
+    header = read_vtk_header(files[0])
+    geometry = geometry_from_vtk(files[0], coord, athinput, header)
+    boundaries = athinput_boundaries(athinput) if athinput else {}
+    rows = []
+    for index, path in enumerate(files):
+        rows.append(snapshot_budget(path, geometry, gamma, header if index == 0 else None,
+                                    boundaries))
+    series = {name: np.array([row[name] for row in rows]) for name in BUDGET_COLUMNS}
+    order = np.argsort(series['time'], kind='stable')
+    series = {name: values[order] for name, values in series.items()}
+    for flux, escaped in (('mass-flux', 'escaped-mass'), ('energy-flux', 'escaped-energy')):
+        values = series[flux]
+        series[escaped] = np.concatenate(
+            [[0.0], np.cumsum(0.5 * np.diff(series['time']) * (values[1:] + values[:-1]))])
+    return series
+
+
+def compare_with_history(series, history, columns=HISTORY_CHECK_COLUMNS):
+    """
+    Cross-check a budget against .hst columns interpolated to the snapshot times.
+
+    Differences are relative to the column's magnitude; momenta use the
+    momentum scale sqrt(2 * mass * kinetic energy), since they are often ~0.
+
+    Returns:
+    --------
+    {column: max relative difference} over the snapshot times covered by the .hst
+    """
+    times, keep = np.unique(history['time'][::-1], return_index=True)
+    keep = len(history['time']) - 1 - keep  # last occurrence of each time (restarts)
+    covered = (series['time'] >= times[0]) & (series['time'] <= times[-1])
+    if not covered.any():
+        raise ValueError("The history file does not cover the snapshot times")
+    t = series['time'][covered]
+    kinetic = sum(series[f'{i}-KE'] for i in (1, 2, 3))[covered]
+    momentum_scale = np.sqrt(2 * np.abs(series['mass'][covered]) * kinetic).max()
+    differences = {}
+    for name in columns:
+        if name not in history:
+            continue
+        expected = np.interp(t, times, history[name][keep])
+        actual = series[name][covered]
+        scale = momentum_scale if name.endswith('-mom') else np.abs(expected).max()
+        scale = scale if scale > 0 else 1.0
+        differences[name] = float(np.abs(actual - expected).max() / scale)
+    return differences
+
+
+def write_budget(series, path):
+    """Write the budget series in the Athena++ .hst layout"""
+    columns = BUDGET_COLUMNS + ['escaped-mass', 'escaped-energy']
+    with open(path, 'w') as f:
+        write_history_header(f, columns)
+        for row in zip(*(series[name] for name in columns)):
+            write_history_row(f, row)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mass, momentum and energy budget of a run')
+    parser.add_argument('run', help='Output directory or glob pattern of VTK snapshots')
+    parser.add_argument('-i', '--input', default=None,
+                        help='athinput file (coordinates, collapsed extents, gamma)')
+    parser.add_argument('--coord', choices=('cartesian', 'spherical_polar'), default=None)
+    parser.add_argument('--gamma', type=float, default=None, help='Adiabatic index override')
+    parser.add_argument('--hst', default=None, help='Cross-check against this .hst file')
+    parser.add_argument('--tolerance', type=float, default=1e-3,
+                        help='Largest relative difference accepted in the .hst check')
+    parser.add_argument('-o', '--output', default=None, help='Write the budget as a .hst-style file')
+    args = parser.parse_args()
+
+    pattern = os.path.join(args.run, '*.vtk') if os.path.isdir(args.run) else args.run
+    files = sorted(glob.glob(pattern))
+    try:
+        if not files:
+            raise ValueError(f"No VTK snapshots match {args.run}")
+        series = budget_series(files, args.input, args.coord, args.gamma)
+        differences = compare_with_history(series, read_history(args.hst)) if args.hst else None
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    print(f"{'time':>12s} {'mass':>13s} {'kinetic':>13s} {'internal':>13s} {'total E':>13s} "
+          f"{'mass+escaped':>13s} {'E+escaped':>13s}")
+    kinetic = series['1-KE'] + series['2-KE'] + series['3-KE']
+    for i, t in enumerate(series['time']):
+        print(f"{t:12.5g} {series['mass'][i]:13.6e} {kinetic[i]:13.6e} "
+              f"{series['internal-E'][i]:13.6e} {series['tot-E'][i]:13.6e} "
+              f"{series['mass'][i] + series['escaped-mass'][i]:13.6e} "
+              f"{series['tot-E'][i] + series['escaped-energy'][i]:13.6e}")
+    for name, label in (('mass', 'escaped-mass'), ('tot-E', 'escaped-energy')):
+        start = series[name][0]
+        drift = (series[name] + series[label] - start) / (abs(start) or 1.0)
+        print(f"{name} drift (including boundary fluxes): max {np.abs(drift).max():.3e}")
+
+    status = 0
+    if differences is not None:
+        print(f"\nCross-check against {args.hst}:")
+        for name, value in differences.items():
+            flag = 'ok' if value <= args.tolerance else 'MISMATCH'
+            print(f"  {name:6s} max relative difference {value:.3e}  {flag}")
+            if value > args.tolerance:
+                status = 2
+    if args.output:
+        write_budget(series, args.output)
+        print(f"Budget written to {args.output}")
+    return status
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
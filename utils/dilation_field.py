@@ -0,0 +1,575 @@
+#!/usr/bin/env python3
+"""
+Multi-body gravitational time-dilation fields
+Computes the Newtonian potential Φ of many point masses and the weak-field
+dilation factor sqrt(1 + 2Φ/c²) (sqrt(1 - 2GM/rc²) for a single mass) on
+2D or 3D rectilinear grids. Small problems are summed directly in blocks,
+with the pair distances coming from one matrix product per block; large
+ones use a Barnes–Hut tree: target cells are grouped into small boxes and
+each box walks an octree of the masses, taking far nodes as monopoles
+through a second-order Taylor expansion about the box centre and only
+the near leaves cell by cell. Box batches can run in worker processes.
+The result can be combined with the time-density field of the
+Genesis-Sphere model (time curvature × temporal flow ratio).
+
+Usage: python -m utils.dilation_field --random 100000 --grid 256x256x256 --extent 1e10 -o dilation.npz --plot dilation.png
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from utils.hydro_solver import temporal_flow_ratio, time_density
+from utils.memory_budget import memory_budget, slab_rows
+
+G = 6.67430e-11  # Gravitational constant (m^3 kg^-1 s^-2)
+C = 3e8  # Speed of light (m/s), as in gravitational_time_dilation.py
+
+METHODS = ('auto', 'direct', 'tree')
+
+DIRECT_MAX_PAIRS = 1e7  # auto: exact direct summation up to this many mass-cell pairs
+SOURCE_BLOCK = 1024  # masses per block of the direct summation
+LEAF_SIZE = 8  # masses per tree leaf
+MAX_DEPTH = 48
+BOX_CELLS = 64  # target cells per tree-walk box (4³ in 3D, 8² in 2D)
+EXPANSION_RATIO = 0.5  # local expansions only for nodes beyond 2 / theta box radii
+WALK_BYTES_PER_BOX = 1 << 19  # frontier and near-field working set of one box
+
+# axes: (x, y, z) cell-centre coordinates; potential, dilation: (nz, ny, nx);
+# stats: method, timings and interaction counts
+DilationField = namedtuple('DilationField', ['axes', 'potential', 'dilation', 'stats'])
+
+# Tree worker state (set by _init_worker)
+_worker = None
+
+
+def grid_axes(shape, extent, center=(0.0, 0.0, 0.0)):
+    """
+    Cell-centre axes (x, y, z) of a grid of shape (nz, ny, nx) spanning
+    `extent` (scalar or per axis) around `center`; collapsed axes hold the
+    centre coordinate only.
+    """
+    extent = np.broadcast_to(np.asarray(extent, dtype=np.float64), (3,))
+    axes = []
+    for n, length, c in zip(reversed(shape), extent, center):
+        if n > 1:
+            faces = np.linspace(c - 0.5 * length, c + 0.5 * length, n + 1)
+            axes.append(0.5 * (faces[:-1] + faces[1:]))
+        else:
+            axes.append(np.array([float(c)]))
+    return tuple(axes)
+
+
+def dilation_factor(potential, c=C):
+    """Weak-field dilation sqrt(1 + 2Φ/c²); 0 where 2Φ/c² < -1 (inside a horizon)"""
+    return np.sqrt(np.maximum(1.0 + 2.0 * potential / c**2, 0.0))
+
+
+def effective_dilation(dilation, t, alpha, omega, beta, epsilon, density=None):
+    """
+    Combine a dilation field with the time-density model: dilation × time
+    curvature 1/ρ × temporal flow ratio R(t). ρ is the time-density ρ(t),
+    or a local density field (e.g. from a time_density run) when given.
+    """
+    rho = time_density(t, alpha, omega) if density is None else np.asarray(density)
+    return dilation / rho * temporal_flow_ratio(t, beta, epsilon)
+
+
+def _as_masses(positions, masses):
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+    masses = np.broadcast_to(np.asarray(masses, dtype=np.float64), (positions.shape[0],))
+    if positions.shape[0] == 0:
+        raise ValueError("No point masses given")
+    return positions, np.ascontiguousarray(masses)
+
+
+def direct_potential(axes, positions, masses, softening=0.0, g=G):
+    """
+    Potential on the grid by direct summation over all masses, in blocks of
+    SOURCE_BLOCK masses and as many cells as fit the memory budget.
+    Coordinates are taken relative to the grid centre, so the distances
+    from |x|² + |c|² - 2 x·c stay accurate.
+    """
+    positions, masses = _as_masses(positions, masses)
+    shape = tuple(len(a) for a in reversed(axes))
+    origin = np.array([0.5 * (a[0] + a[-1]) for a in axes])
+    local = [a - o for a, o in zip(axes, origin)]
+    sources = positions - origin
+    source_norm = np.sum(sources**2, axis=1)
+    potential = np.empty(int(np.prod(shape)))
+    step = slab_rows(3 * 8 * min(SOURCE_BLOCK, masses.size))
+    eps2 = float(softening)**2
+    for a in range(0, potential.size, step):
+        b = min(a + step, potential.size)
+        iz, iy, ix = np.unravel_index(np.arange(a, b), shape)
+        targets = np.column_stack([local[0][ix], local[1][iy], local[2][iz]])
+        target_norm = np.sum(targets**2, axis=1)
+        total = np.zeros(b - a)
+        for j0 in range(0, masses.size, SOURCE_BLOCK):
+            j1 = min(j0 + SOURCE_BLOCK, masses.size)
+            d2 = targets @ sources[j0:j1].T
+            d2 *= -2.0
+            d2 += target_norm[:, None]
+            d2 += source_norm[None, j0:j1]
+            np.maximum(d2, 0.0, out=d2)
+            d2 += eps2
+            np.sqrt(d2, out=d2)
+            with np.errstate(divide='ignore'):
+                np.divide(1.0, d2, out=d2)
+            total += d2 @ masses[j0:j1]
+        potential[a:b] = -g * total
+    return potential.reshape(shape)
+
+
+class MassTree:
+    """
+    Octree over point masses, built level by level with vectorized sorts.
+
+    Nodes are numbered breadth first; node i holds the masses
+    perm[start[i]:start[i] + count[i]] and its children are the nodes
+    first_child[i] .. first_child[i] + n_children[i] - 1.
+
+    Attributes:
+    -----------
+    mass, com : node mass and centre of mass (n_nodes,), (n_nodes, 3)
+    radius : largest distance of a node's masses from its centre of mass
+    """
+
+    def __init__(self, positions, masses, leaf_size=LEAF_SIZE, max_depth=MAX_DEPTH):
+        positions, masses = _as_masses(positions, masses)
+        self.positions, self.masses = positions, masses
+        n = masses.size
+        lo, hi = positions.min(axis=0), positions.max(axis=0)
+        half = 0.5 * float(np.max(hi - lo)) * (1 + 1e-12) or 1.0
+        perm = np.arange(n)
+
+        start, count = [np.array([0])], [np.array([n])]
+        first_child, n_children = [], []
+        levels = []
+        level_start, level_count = start[0], count[0]
+        level_centre, level_half = (0.5 * (lo + hi))[None, :], np.array([half])
+        n_nodes, depth = 1, 0
+        while True:
+            levels.append((n_nodes - level_start.size, level_start, level_count))
+            split = level_count > leaf_size if depth < max_depth else np.zeros(level_start.size, bool)
+            first = np.zeros(level_start.size, dtype=np.int64)
+            kids = np.zeros(level_start.size, dtype=np.int64)
+            if split.any():
+                sp = np.flatnonzero(split)
+                seg_start, seg_count = level_start[sp], level_count[sp]
+                rank = np.repeat(np.arange(sp.size), seg_count)
+                pos = (np.arange(seg_count.sum()) - np.repeat(np.cumsum(seg_count) - seg_count,
+                                                             seg_count)
+                       + np.repeat(seg_start, seg_count))
+                p = perm[pos]
+                above = positions[p] >= level_centre[sp][rank]
+                key = rank * 8 + above[:, 0] + 2 * above[:, 1] + 4 * above[:, 2]
+                order = np.argsort(key, kind='stable')
+                perm[pos] = p[order]
+                keys, key_first, key_count = np.unique(key[order], return_index=True,
+                                                       return_counts=True)
+                parent, octant = keys // 8, keys % 8
+                kids[sp] = np.bincount(parent, minlength=sp.size)
+                first[sp] = n_nodes + np.searchsorted(parent, np.arange(sp.size))
+                sign = np.stack([(octant >> bit) & 1 for bit in range(3)], axis=1) * 2.0 - 1.0
+                child_half = level_half[sp][parent] / 2
+                level_centre = level_centre[sp][parent] + sign * child_half[:, None]
+                level_half = child_half
+                level_start, level_count = pos[key_first], key_count
+            first_child.append(first)
+            n_children.append(kids)
+            if not split.any():
+                break
+            start.append(level_start)
+            count.append(level_count)
+            n_nodes += level_start.size
+            depth += 1
+
+        self.perm = perm
+        self.start = np.concatenate(start)
+        self.count = np.concatenate(count)
+        self.first_child = np.concatenate(first_child)
+        self.n_children = np.concatenate(n_children)
+        self.depth = depth
+
+        # Node moments from prefix sums over the tree order
+        m = masses[perm]
+        x = positions[perm]
+        cm = np.concatenate([[0.0], np.cumsum(m)])
+        cmx = np.vstack([np.zeros((1, 3)), np.cumsum(m[:, None] * x, axis=0)])
+        end = self.start + self.count
+        self.mass = cm[end] - cm[self.start]
+        weight = np.where(self.mass > 0, self.mass, 1.0)
+        self.com = (cmx[end] - cmx[self.start]) / weight[:, None]
+        empty = self.mass <= 0  # massless nodes: use the geometric mean position
+        if empty.any():
+            cx = np.vstack([np.zeros((1, 3)), np.cumsum(x, axis=0)])
+            self.com[empty] = ((cx[end] - cx[self.start])[empty]
+                               / self.count[empty][:, None])
+        self.radius = np.zeros(self.start.size)
+        for offset, level_start, level_count in levels:
+            ids = offset + np.arange(level_start.size)
+            rank = np.repeat(np.arange(ids.size), level_count)
+            pos = (np.arange(level_count.sum()) - np.repeat(np.cumsum(level_count) - level_count,
+                                                           level_count)
+                   + np.repeat(level_start, level_count))
+            distance = np.sqrt(np.sum((x[pos] - self.com[ids][rank])**2, axis=1))
+            self.radius[ids] = np.maximum.reduceat(distance, np.cumsum(level_count) - level_count)
+
+    @property
+    def n_nodes(self):
+        return self.start.size
+
+
+def _boxes(shape):
+    """Box shape (bz, by, bx) of about BOX_CELLS cells over the active axes"""
+    active = [n > 1 for n in shape]
+    side = max(1, int(round(BOX_CELLS ** (1.0 / max(1, sum(active))))))
+    return tuple(min(side, n) if a else 1 for n, a in zip(shape, active))
+
+
+def _box_cells(axes, shape, box, ids):
+    """Per box: cell indices (iz, iy, ix) and coordinates (z, y, x), clipped at the grid edge"""
+    counts = [-(-n // b) for n, b in zip(shape, box)]
+    kz, ky, kx = np.unravel_index(ids, counts)
+    index = [np.minimum(k[:, None] * b + np.arange(b), n - 1)
+             for k, b, n in zip((kz, ky, kx), box, shape)]
+    coords = [axes[2][index[0]], axes[1][index[1]], axes[0][index[2]]]
+    return index, coords
+
+
+def _m2l(local, boxes, separation, d2, masses, eps2, g):
+    """Add far-node monopoles to the second-order local expansions of their boxes"""
+    s2 = d2 + eps2
+    inv = 1.0 / np.sqrt(s2)
+    inv3 = inv / s2
+    inv5 = inv3 / s2
+    gm = g * masses
+    n = local.shape[1]
+    terms = [-gm * inv]
+    terms += [gm * separation[:, i] * inv3 for i in range(3)]
+    for i, j in ((0, 0), (1, 1), (2, 2), (0, 1), (0, 2), (1, 2)):
+        hessian = -3.0 * gm * separation[:, i] * separation[:, j] * inv5
+        if i == j:
+            hessian += gm * inv3
+        terms.append(hessian)
+    for row, values in enumerate(terms):
+        local[row] += np.bincount(boxes, weights=values, minlength=n)
+
+
+def _tree_batch(tree, axes, shape, box, ids, theta, eps2, g):
+    """
+    Potential of the cells of boxes `ids`.
+
+    Returns:
+    --------
+    (values (n_boxes, bz, by, bx), number of far-node and near-mass interactions)
+    """
+    (iz, iy, ix), (z, y, x) = _box_cells(axes, shape, box, ids)
+    lo = np.column_stack([x.min(axis=1), y.min(axis=1), z.min(axis=1)])
+    hi = np.column_stack([x.max(axis=1), y.max(axis=1), z.max(axis=1)])
+    centre = 0.5 * (lo + hi)
+    radius = 0.5 * np.sqrt(np.sum((hi - lo)**2, axis=1))
+
+    n_boxes = ids.size
+    local = np.zeros((10, n_boxes))
+    near_box, near_source = [], []
+    pb = np.arange(n_boxes)
+    pn = np.zeros(n_boxes, dtype=np.int64)
+    n_far = 0
+    while pb.size:
+        separation = centre[pb] - tree.com[pn]
+        d2 = np.sum(separation**2, axis=1)
+        # Monopole test against the box's nearest possible cell
+        monopole = (tree.radius[pn] + theta * radius[pb])**2 < theta**2 * d2
+        expand = monopole & ((radius[pb] + tree.radius[pn])**2 < theta**2 * d2) \
+            & (radius[pb]**2 < (EXPANSION_RATIO * theta)**2 * d2)
+        if expand.any():
+            _m2l(local, pb[expand], separation[expand], d2[expand], tree.mass[pn[expand]],
+                 eps2, g)
+            n_far += int(expand.sum())
+        # Nodes close to the box but small enough: exact monopole at every cell
+        near = monopole & ~expand
+        near_box.append(pb[near])
+        near_source.append(-1 - pn[near])
+        pb, pn = pb[~monopole], pn[~monopole]
+        leaf = tree.n_children[pn] == 0
+        counts = tree.count[pn[leaf]]
+        near_box.append(np.repeat(pb[leaf], counts))
+        near_source.append(tree.perm[np.repeat(tree.start[pn[leaf]], counts)
+                                     + np.arange(counts.sum())
+                                     - np.repeat(np.cumsum(counts) - counts, counts)])
+        pb, pn = pb[~leaf], pn[~leaf]
+        kids = tree.n_children[pn]
+        offsets = np.arange(kids.sum()) - np.repeat(np.cumsum(kids) - kids, kids)
+        pb = np.repeat(pb, kids)
+        pn = np.repeat(tree.first_child[pn], kids) + offsets
+
+    # Far field: evaluate each box's expansion at its cells
+    dx = (x - centre[:, 0:1])[:, None, None, :]
+    dy = (y - centre[:, 1:2])[:, None, :, None]
+    dz = (z - centre[:, 2:3])[:, :, None, None]
+    L = [c[:, None, None, None] for c in local]
+    values = (L[0] + L[1] * dx + L[2] * dy + L[3] * dz
+              + 0.5 * (L[4] * dx**2 + L[5] * dy**2 + L[6] * dz**2)
+              + L[7] * dx * dy + L[8] * dx * dz + L[9] * dy * dz)
+
+    # Near field, cell by cell: masses (source >= 0) and node monopoles (-1 - node)
+    pair_box = np.concatenate(near_box)
+    pair_source = np.concatenate(near_source)
+    order = np.argsort(pair_box, kind='stable')
+    pair_box, pair_source = pair_box[order], pair_source[order]
+    cells = int(np.prod(box))
+    step = max(1, slab_rows(4 * 8 * cells))
+    for a in range(0, pair_box.size, step):
+        b = min(a + step, pair_box.size)
+        pbox, psource = pair_box[a:b], pair_source[a:b]
+        node = psource < 0
+        source = np.where(node[:, None], tree.com[np.where(node, -1 - psource, 0)],
+                          tree.positions[np.maximum(psource, 0)])
+        mass = np.where(node, tree.mass[np.where(node, -1 - psource, 0)],
+                        tree.masses[np.maximum(psource, 0)])
+        r2 = ((x[pbox] - source[:, 0:1])**2)[:, None, None, :] \
+            + ((y[pbox] - source[:, 1:2])**2)[:, None, :, None] \
+            + ((z[pbox] - source[:, 2:3])**2)[:, :, None, None]
+        r2 += eps2
+        with np.errstate(divide='ignore'):
+            contribution = -g * mass[:, None, None, None] / np.sqrt(r2)
+        segment = np.flatnonzero(np.concatenate([[True], pbox[1:] != pbox[:-1]]))
+        values[pbox[segment]] += np.add.reduceat(contribution, segment, axis=0)
+    return values, n_far, pair_box.size
+
+
+def _init_worker(tree, axes, shape, box, theta, eps2, g):
+    global _worker
+    _worker = (tree, axes, shape, box, theta, eps2, g)
+
+
+def _worker_batch(ids):
+    tree, axes, shape, box, theta, eps2, g = _worker
+    values, n_far, n_near = _tree_batch(tree, axes, shape, box, ids, theta, eps2, g)
+    return ids, values, n_far, n_near
+
+
+def tree_potential(axes, positions, masses, theta=0.5, softening=0.0, leaf_size=LEAF_SIZE,
+                   workers=None, g=G, tree=None):
+    """
+    Potential on the grid from a Barnes–Hut walk per box of target cells.
+
+    Parameters:
+    -----------
+    theta : float
+        Opening angle: a node is taken as a monopole when (box radius +
+        node radius) < theta × distance; smaller is more accurate
+    workers : int
+        Worker processes for the box batches (default: os.cpu_count();
+        1 runs in this process)
+    tree : MassTree, optional
+        Prebuilt tree of the masses (positions and masses are then ignored)
+
+    Returns:
+    --------
+    (potential (nz, ny, nx), stats dict with the interaction counts)
+    """
+    tree = tree or MassTree(positions, masses, leaf_size)
+    shape = tuple(len(a) for a in reversed(axes))
+    box = _boxes(shape)
+    n_boxes = int(np.prod([-(-n // b) for n, b in zip(shape, box)]))
+    batch = max(1, memory_budget() // WALK_BYTES_PER_BOX)
+    batches = [np.arange(a, min(a + batch, n_boxes)) for a in range(0, n_boxes, batch)]
+    eps2 = float(softening)**2
+    workers = workers or os.cpu_count() or 1
+
+    potential = np.empty(shape)
+    stats = {'nodes': tree.n_nodes, 'depth': tree.depth, 'boxes': n_boxes,
+             'far_interactions': 0, 'near_interactions': 0}
+
+    def store(ids, values, n_far, n_near):
+        (iz, iy, ix), _ = _box_cells(axes, shape, box, ids)
+        potential[iz[:, :, None, None], iy[:, None, :, None], ix[:, None, None, :]] = values
+        stats['far_interactions'] += n_far
+        stats['near_interactions'] += n_near
+
+    if workers <= 1 or len(batches) == 1:
+        for ids in batches:
+            store(ids, *_tree_batch(tree, axes, shape, box, ids, theta, eps2, g))
+    else:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(workers, len(batches)), mp_context=context,
+                                 initializer=_init_worker,
+                                 initargs=(tree, axes, shape, box, theta, eps2, g)) as pool:
+            for ids, values, n_far, n_near in pool.map(_worker_batch, batches):
+                store(ids, values, n_far, n_near)
+    return potential, stats
+
+
+def dilation_field(axes, positions, masses, method='auto', theta=0.5, softening=0.0,
+                   workers=None, g=G, c=C):
+    """
+    Potential and dilation factor of point masses on a grid.
+
+    Parameters:
+    -----------
+    axes : tuple of arrays
+        Cell-centre coordinates (x, y, z); see grid_axes
+    positions, masses : arrays
+        (N, 3) positions and (N,) masses (or one mass for all)
+    method : str
+        'direct', 'tree', or 'auto' (direct up to DIRECT_MAX_PAIRS mass-cell pairs)
+    theta, softening, workers :
+        Tree opening angle, Plummer softening length and worker processes
+
+    Returns:
+    --------
+    DilationField
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method!r}; choose from {', '.join(METHODS)}")
+    positions, masses = _as_masses(positions, masses)
+    n_cells = int(np.prod([len(a) for a in axes]))
+    if method == 'auto':
+        method = 'direct' if masses.size * n_cells <= DIRECT_MAX_PAIRS else 'tree'
+    start = time.perf_counter()
+    if method == 'direct':
+        potential = direct_potential(axes, positions, masses, softening, g)
+        stats = {'near_interactions': masses.size * n_cells}
+    else:
+        potential, stats = tree_potential(axes, positions, masses, theta, softening,
+                                          workers=workers, g=g)
+    stats.update(method=method, masses=int(masses.size), cells=n_cells,
+                 seconds=time.perf_counter() - start)
+    return DilationField(axes, potential, dilation_factor(potential, c), stats)
+
+
+def random_masses(n, extent, total_mass=1e30, seed=0):
+    """n equal masses (total_mass in all) Gaussian-distributed with σ = extent / 6 about the origin"""
+    rng = np.random.default_rng(seed)
+    return rng.normal(scale=extent / 6.0, size=(n, 3)), np.full(n, total_mass / n)
+
+
+def read_masses(filename):
+    """Point masses from a text file with columns x y z m ('#' comments)"""
+    table = np.atleast_2d(np.loadtxt(filename, comments='#'))
+    if table.shape[1] != 4:
+        raise ValueError(f"{filename}: expected 4 columns (x y z m), got {table.shape[1]}")
+    return table[:, :3], table[:, 3]
+
+
+def write_field(field, path, time_value=0.0):
+    """Save a DilationField as .npz (float64) or Athena-style VTK (potential and 1 - dilation)"""
+    if path.endswith('.vtk'):
+        from utils.athena_io import write_athena_vtk
+        coords = {}
+        for name, centres in zip(('x1f', 'x2f', 'x3f'), field.axes):
+            if centres.size > 1:
+                mid = 0.5 * (centres[:-1] + centres[1:])
+                coords[name] = np.concatenate([[2 * centres[0] - mid[0]], mid,
+                                               [2 * centres[-1] - mid[-1]]])
+            else:
+                coords[name] = centres
+        write_athena_vtk(path, time_value, 0, coords,
+                         [('potential', field.potential), ('dilation_deficit', 1.0 - field.dilation)],
+                         variables='dilation')
+    else:
+        np.savez(path, x=field.axes[0], y=field.axes[1], z=field.axes[2],
+                 potential=field.potential, dilation=field.dilation)
+    return path
+
+
+def plot_field(field, output_path, effective=None):
+    """Mid-plane map of 1 - dilation factor (and of the effective dilation when given)"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import LogNorm
+
+    k = field.potential.shape[0] // 2
+    x, y, _ = field.axes
+    maps = [(1.0 - field.dilation[k], '1 - sqrt(1 + 2Φ/c²)')]
+    if effective is not None:
+        maps.append((effective[k], 'effective dilation'))
+    fig, axes = plt.subplots(1, len(maps), figsize=(6.5 * len(maps), 5.5), squeeze=False)
+    for ax, (values, title) in zip(axes[0], maps):
+        positive = values[values > 0]
+        norm = LogNorm(positive.min(), positive.max()) if title.startswith('1 -') and \
+            positive.size else None
+        image = ax.pcolormesh(x, y, values, norm=norm, shading='nearest', cmap='magma')
+        fig.colorbar(image, ax=ax)
+        ax.set_aspect('equal')
+        ax.set_xlabel('x (m)')
+        ax.set_ylabel('y (m)')
+        ax.set_title(title)
+    fig.suptitle(f"{field.stats['masses']} masses, {field.stats['method']} method")
+    fig.tight_layout()
+    fig.savefig(output_path, dpi=120)
+    plt.close(fig)
+    return output_path
+
+
+def main():
+    from utils.synthetic_data import parse_size
+
+    parser = argparse.ArgumentParser(description='Gravitational time-dilation field of point masses')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--masses', help='Text file with columns x y z m (SI units)')
+    source.add_argument('--random', type=int, help='Number of random equal masses')
+    parser.add_argument('--total-mass', type=float, default=1e30,
+                        help='Total mass of the random masses (kg)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--grid', default='128x128', help='Grid size, e.g. 256x256 or 256x256x256')
+    parser.add_argument('--extent', type=float, default=1e10, help='Grid side length (m)')
+    parser.add_argument('--method', choices=METHODS, default='auto')
+    parser.add_argument('--theta', type=float, default=0.5, help='Tree opening angle')
+    parser.add_argument('--softening', type=float, default=0.0, help='Plummer softening length (m)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (tree method)')
+    parser.add_argument('--time', type=float, default=None,
+                        help='Combine with the time-density model at this time')
+    parser.add_argument('--alpha', type=float, default=1e-9)
+    parser.add_argument('--omega', type=float, default=0.1)
+    parser.add_argument('--beta', type=float, default=1e9)
+    parser.add_argument('--epsilon', type=float, default=1e5)
+    parser.add_argument('-o', '--output', default=None, help='Write the field (.npz or .vtk)')
+    parser.add_argument('--plot', default=None, help='Save a mid-plane map (PNG)')
+    args = parser.parse_args()
+
+    try:
+        shape = parse_size(args.grid)
+        if args.masses:
+            positions, masses = read_masses(args.masses)
+        else:
+            positions, masses = random_masses(args.random, args.extent, args.total_mass, args.seed)
+        field = dilation_field(grid_axes(shape, args.extent), positions, masses, args.method,
+                               args.theta, args.softening, args.workers)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    stats = field.stats
+    print(f"{stats['masses']} masses on {stats['cells']} cells: {stats['method']} method, "
+          f"{stats['seconds']:.2f} s")
+    if stats['method'] == 'tree':
+        print(f"  tree: {stats['nodes']} nodes, depth {stats['depth']}; {stats['boxes']} boxes, "
+              f"{stats['far_interactions']} far and {stats['near_interactions']} near interactions")
+    print(f"  potential: min {field.potential.min():.6e}  max {field.potential.max():.6e}")
+    print(f"  dilation factor: min {field.dilation.min():.12f}  max {field.dilation.max():.12f}")
+    effective = None
+    if args.time is not None:
+        effective = effective_dilation(field.dilation, args.time, args.alpha, args.omega,
+                                       args.beta, args.epsilon)
+        print(f"  effective dilation at t={args.time:g}: mean {effective.mean():.6e}")
+    if args.output:
+        write_field(field, args.output, args.time or 0.0)
+        print(f"Field written to {args.output}")
+    if args.plot:
+        plot_field(field, args.plot, effective)
+        print(f"Map saved to {args.plot}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+Reduced-order surrogate emulator for Genesis-Sphere simulation sweeps
+Builds a POD basis (SVD of the mean-subtracted snapshot matrix) from the
+outputs of a parameter sweep and interpolates the modal coefficients over
+(alpha, omega, beta, epsilon) with a cubic radial basis function. A
+prediction is one small RBF evaluation plus one matrix-vector product, so
+full fields for new parameters come back in milliseconds, together with an
+error estimate built from the basis truncation error and the
+leave-one-out interpolation error of the training runs.
+
+Training runs are the files compare_simulations.py already collects (the
+<output>.out1.00000 tables described by a simulation config with
+"td_params") or Athena VTK snapshots.
+
+Usage:
+  python -m utils.emulator train sweep.json -o emulator.npz
+  python -m utils.emulator predict emulator.npz --alpha 0.03 --omega 1.5 [-o predicted.out1.00000]
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from utils.athena_io import (open_vtk_field, read_vtk_coordinates, read_vtk_header,
+                             write_athena_vtk)
+
+PARAM_NAMES = ('alpha', 'omega', 'beta', 'epsilon')
+
+# Column layout of the tables compare_simulations.py loads and exports
+TABLE_COLUMNS = ['x', 'y', 'z', 'time', 'rho', 'vel1', 'vel2', 'vel3', 'press']
+TABLE_FIELDS = ['rho', 'vel1', 'vel2', 'vel3', 'press']
+VTK_FIELDS = ['rho', 'press', 'vel']
+
+MODEL_VERSION = 1
+
+
+def load_snapshot(path):
+    """
+    Read one training snapshot.
+
+    Returns:
+    --------
+    (fields, coords) where fields maps names to arrays and coords holds what
+    is needed to write a prediction back in the same format
+    """
+    if path.endswith('.vtk'):
+        header = read_vtk_header(path)
+        fields = {name: np.array(open_vtk_field(path, name, header), dtype=np.float64)
+                  for name in VTK_FIELDS if name in header['fields']}
+        coords = read_vtk_coordinates(path, header)
+        coords['time'] = header['time']
+        return fields, {'format': 'vtk', **coords}
+    table = np.atleast_2d(np.loadtxt(path))
+    if table.shape[1] != len(TABLE_COLUMNS):
+        raise ValueError(f"{path}: expected {len(TABLE_COLUMNS)} columns "
+                         f"({' '.join(TABLE_COLUMNS)}), got {table.shape[1]}")
+    fields = {name: table[:, TABLE_COLUMNS.index(name)] for name in TABLE_FIELDS}
+    coords = {'format': 'table',
+              'positions': table[:, :TABLE_COLUMNS.index('rho')]}
+    return fields, coords
+
+
+def _sweep_entries(manifest_path):
+    """Resolve a sweep manifest into [(params dict, snapshot path)]"""
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    output_dir = manifest.get('output_dir', 'simulation_results')
+    entries = []
+    for run in manifest['runs']:
+        if isinstance(run, str):
+            # A compare_simulations.py config: td_params + time_density_output
+            config_path = os.path.join(base, run)
+            with open(config_path) as f:
+                config = json.load(f)
+            params = config['td_params']
+            path = os.path.join(os.path.dirname(config_path), config.get('output_dir', output_dir),
+                                f"{config['time_density_output']}.out1.00000")
+        else:
+            params = run.get('td_params', run)
+            path = os.path.join(base, run['file'])
+        entries.append(({name: float(params[name]) for name in PARAM_NAMES}, path))
+    return entries
+
+
+def load_sweep(manifest_path):
+    """
+    Load every run of a sweep manifest.
+
+    The manifest is JSON with a "runs" list; each run is either the path of a
+    compare_simulations.py config file or {"td_params": {...}, "file": path}.
+
+    Returns:
+    --------
+    (params (n_runs, 4), snapshots {field: (n_runs, ...)}, coords)
+    """
+    entries = _sweep_entries(manifest_path)
+    if len(entries) < 2:
+        raise ValueError("A sweep needs at least two runs")
+    params = np.array([[p[name] for name in PARAM_NAMES] for p, _ in entries])
+    snapshots, coords = {}, None
+    for index, (_, path) in enumerate(entries):
+        fields, run_coords = load_snapshot(path)
+        coords = coords or run_coords
+        for name, values in fields.items():
+            if name not in snapshots:
+                snapshots[name] = np.empty((len(entries),) + values.shape)
+            if values.shape != snapshots[name].shape[1:]:
+                raise ValueError(f"{path}: field {name} has shape {values.shape}, "
+                                 f"expected {snapshots[name].shape[1:]}")
+            snapshots[name][index] = values
+    return params, snapshots, coords
+
+
+def _cubic_kernel(r):
+    return r**3
+
+
+class SurrogateEmulator:
+    """
+    POD + RBF emulator of simulation fields over (alpha, omega, beta, epsilon).
+
+    Fit with fit(params, snapshots), query with predict(alpha=..., ...), and
+    persist with save()/load().
+    """
+
+    def __init__(self):
+        self.fields = {}        # name -> shape
+        self.coords = None
+        self.stats = {}
+
+    # ------------------------------------------------------------------
+    # Parameter scaling
+    # ------------------------------------------------------------------
+    def _scale(self, params):
+        """Map raw parameters to the unit box of the active (varying) parameters"""
+        p = np.atleast_2d(np.asarray(params, dtype=np.float64))[:, self.active]
+        p = np.where(self.log_scale, np.log10(np.maximum(p, 1e-300)), p)
+        return (p - self.lo) / self.span
+
+    def _design(self, x):
+        """RBF kernel matrix against the centres plus the linear polynomial tail"""
+        r = np.linalg.norm(x[:, None, :] - self.centres[None, :, :], axis=-1)
+        return np.hstack([_cubic_kernel(r), np.ones((len(x), 1)), x])
+
+    # ------------------------------------------------------------------
+    # Training
+    # ------------------------------------------------------------------
+    def fit(self, params, snapshots, coords=None, rank=None, energy=0.9999):
+        """
+        Build the POD basis and the coefficient interpolant.
+
+        Parameters:
+        -----------
+        params : array (n_runs, 4)
+            alpha, omega, beta, epsilon of each training run
+        snapshots : dict
+            field name -> array (n_runs, ...) of that field in each run
+        coords : dict
+            Grid description from load_snapshot, kept for writing predictions
+        rank : int
+            Number of POD modes (default: enough to capture `energy`)
+        energy : float
+            Fraction of the snapshot variance the basis must capture
+        """
+        params = np.asarray(params, dtype=np.float64)
+        n_runs = params.shape[0]
+        self.coords = coords
+
+        # Parameters that vary across the sweep; wide positive ranges go log-scale
+        lo_raw, hi_raw = params.min(axis=0), params.max(axis=0)
+        self.active = np.flatnonzero(hi_raw > lo_raw)
+        if self.active.size == 0:
+            raise ValueError("All training runs share the same parameters")
+        self.param_bounds = np.stack([lo_raw, hi_raw])
+        self.log_scale = (lo_raw[self.active] > 0) & (hi_raw[self.active] / np.maximum(
+            lo_raw[self.active], 1e-300) > 10)
+        p = params[:, self.active]
+        p = np.where(self.log_scale, np.log10(np.maximum(p, 1e-300)), p)
+        self.lo = p.min(axis=0)
+        self.span = p.max(axis=0) - self.lo
+        self.centres = (p - self.lo) / self.span
+
+        # Snapshot matrix: fields flattened side by side, each scaled by its spread
+        self.fields = {name: values.shape[1:] for name, values in snapshots.items()}
+        blocks, self.field_scale = [], {}
+        for name, values in snapshots.items():
+            flat = values.reshape(n_runs, -1)
+            scale = float(np.std(flat)) or 1.0
+            self.field_scale[name] = scale
+            blocks.append(flat / scale)
+        matrix = np.hstack(blocks)
+        self.mean = matrix.mean(axis=0)
+        matrix -= self.mean
+
+        _, sigma, vt = np.linalg.svd(matrix, full_matrices=False)
+        if not np.any(sigma > 0):
+            raise ValueError("All training snapshots are identical; nothing to emulate")
+        if rank is None:
+            captured = np.cumsum(sigma**2) / np.sum(sigma**2)
+            rank = int(np.searchsorted(captured, energy) + 1)
+        rank = max(1, min(rank, n_runs - 1, sigma.size))
+        self.modes = vt[:rank]                       # (rank, features)
+        self.singular_values = sigma[:rank]
+        coefficients = matrix @ self.modes.T         # (n_runs, rank)
+
+        # Per-field RMS truncation error of the training runs (physical units)
+        residual = matrix - coefficients @ self.modes
+        self.truncation_error = self._field_rms(residual)
+
+        # Cubic RBF with linear tail: [[Phi, P], [P^T, 0]] [w; c] = [a; 0]
+        kernel = self._design(self.centres)
+        tail = kernel[:, n_runs:]
+        system = np.zeros((kernel.shape[1], kernel.shape[1]))
+        system[:n_runs] = kernel
+        system[n_runs:, :n_runs] = tail.T
+        rhs = np.vstack([coefficients, np.zeros((tail.shape[1], rank))])
+        inverse = np.linalg.pinv(system)
+        self.weights = inverse @ rhs
+
+        # Leave-one-out coefficient errors in closed form (Rippa):
+        # e_i = w_i / (M^-1)_ii, mapped back to per-field RMS errors
+        loo_coeff = self.weights[:n_runs] / np.diag(inverse)[:n_runs, None]
+        self.loo_error = np.array([list(self._field_rms(row[None] @ self.modes).values())
+                                   for row in loo_coeff])   # (n_runs, n_fields)
+
+        # Typical spacing between training runs in the scaled parameter box
+        distance = np.linalg.norm(self.centres[:, None] - self.centres[None], axis=-1)
+        np.fill_diagonal(distance, np.inf)
+        self.spacing = float(np.median(distance.min(axis=1))) or 1.0
+
+        self.stats = {'n_runs': n_runs, 'rank': rank,
+                      'captured_energy': float(np.sum(sigma[:rank]**2) / np.sum(sigma**2)),
+                      'loo_rms': dict(zip(self.fields, self.loo_error.mean(axis=0).tolist()))}
+        return self
+
+    def _field_rms(self, rows):
+        """Split (k, features) scaled rows into per-field RMS values in physical units"""
+        out, start = {}, 0
+        for name, shape in self.fields.items():
+            size = int(np.prod(shape))
+            block = rows[:, start:start + size] * self.field_scale[name]
+            out[name] = float(np.sqrt(np.mean(block**2)))
+            start += size
+        return out
+
+    # ------------------------------------------------------------------
+    # Prediction
+    # ------------------------------------------------------------------
+    def _params_vector(self, alpha=None, omega=None, beta=None, epsilon=None):
+        given = dict(alpha=alpha, omega=omega, beta=beta, epsilon=epsilon)
+        values = []
+        for i, name in enumerate(PARAM_NAMES):
+            if given[name] is not None:
+                values.append(given[name])
+            elif self.param_bounds[0, i] == self.param_bounds[1, i]:
+                # Parameters held fixed in the sweep default to their training value
+                values.append(self.param_bounds[0, i])
+            else:
+                raise ValueError(f"{name} varied in the training sweep "
+                                 f"({self.param_bounds[0, i]:g} to {self.param_bounds[1, i]:g}); "
+                                 f"give a value for it")
+        return np.array(values, dtype=np.float64)
+
+    def predict(self, alpha=None, omega=None, beta=None, epsilon=None):
+        """
+        Predict every field for one parameter set. Parameters held fixed in
+        the training sweep may be omitted; omitting one that varied raises
+        ValueError.
+
+        Returns:
+        --------
+        (fields, error) where fields maps names to arrays of the training
+        shape and error holds the estimated RMS error per field plus
+        'extrapolating' (True outside the training parameter box)
+        """
+        raw = self._params_vector(alpha, omega, beta, epsilon)
+        x = self._scale(raw)
+        coefficients = self._design(x) @ self.weights          # (1, rank)
+        flat = self.mean + coefficients[0] @ self.modes
+
+        fields, start = {}, 0
+        for name, shape in self.fields.items():
+            size = int(np.prod(shape))
+            fields[name] = (flat[start:start + size] * self.field_scale[name]).reshape(shape)
+            start += size
+
+        # Interpolation error: LOO errors of nearby runs, weighted by inverse
+        # squared distance and vanishing at the training points themselves
+        distance = np.linalg.norm(self.centres - x, axis=1)
+        nearest = float(distance.min())
+        weights = 1.0 / np.maximum(distance, 1e-12)**2
+        loo = weights @ self.loo_error / weights.sum()
+        outside = bool(np.any(x < -1e-9) or np.any(x > 1 + 1e-9))
+        factor = nearest / self.spacing
+        if not outside:
+            factor = min(factor, 1.0)
+        error = {name: float(np.hypot(self.truncation_error[name], factor * loo[i]))
+                 for i, name in enumerate(self.fields)}
+        error['extrapolating'] = outside
+        return fields, error
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def save(self, path):
+        """Write the model as a single uncompressed .npz (float32 modes)"""
+        meta = {'version': MODEL_VERSION, 'fields': {k: list(v) for k, v in self.fields.items()},
+                'field_scale': self.field_scale, 'truncation_error': self.truncation_error,
+                'spacing': self.spacing, 'stats': self.stats,
+                'coords_format': (self.coords or {}).get('format')}
+        arrays = {'modes': self.modes.astype(np.float32), 'mean': self.mean.astype(np.float32),
+                  'weights': self.weights, 'centres': self.centres,
+                  'singular_values': self.singular_values, 'loo_error': self.loo_error,
+                  'active': self.active, 'log_scale': self.log_scale, 'lo': self.lo,
+                  'span': self.span, 'param_bounds': self.param_bounds}
+        for key, value in (self.coords or {}).items():
+            if key != 'format':
+                arrays[f'coord_{key}'] = np.asarray(value)
+        with open(path, 'wb') as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        model = cls()
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            if meta['version'] != MODEL_VERSION:
+                raise ValueError(f"{path}: unsupported model version {meta['version']}")
+            model.fields = {k: tuple(v) for k, v in meta['fields'].items()}
+            model.field_scale = meta['field_scale']
+            model.truncation_error = meta['truncation_error']
+            model.spacing = meta['spacing']
+            model.stats = meta['stats']
+            model.modes = data['modes'].astype(np.float64)
+            model.mean = data['mean'].astype(np.float64)
+            for key in ('weights', 'centres', 'singular_values', 'loo_error', 'active',
+                        'log_scale', 'lo', 'span', 'param_bounds'):
+                setattr(model, key, data[key])
+            if meta['coords_format']:
+                model.coords = {'format': meta['coords_format']}
+                for key in data.files:
+                    if key.startswith('coord_'):
+                        value = data[key]
+                        model.coords[key[6:]] = value.item() if value.ndim == 0 else value
+        return model
+
+
+def write_prediction(model, fields, path, params):
+    """Write predicted fields in the training format (VTK or compare_simulations table)"""
+    coords = model.coords or {}
+    if coords.get('format') == 'vtk':
+        write_athena_vtk(path, float(coords.get('time', 0.0)), 0, coords,
+                         [(name, fields[name]) for name in VTK_FIELDS if name in fields])
+        return path
+    positions = coords.get('positions')
+    if positions is None:
+        raise ValueError("The model has no grid information to write a table")
+    table = np.column_stack([positions] + [fields[name] for name in TABLE_FIELDS])
+    header = (f"emulated alpha={params[0]} omega={params[1]} beta={params[2]} "
+              f"epsilon={params[3]}\n" + " ".join(TABLE_COLUMNS))
+    np.savetxt(path, table, header=header)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='POD/RBF surrogate emulator for simulation sweeps')
+    sub = parser.add_subparsers(dest='command', required=True)
+    train = sub.add_parser('train', help='Build a model from a sweep manifest')
+    train.add_argument('manifest', help='JSON sweep manifest')
+    train.add_argument('-o', '--output', default='emulator.npz', help='Model file')
+    train.add_argument('--rank', type=int, default=None, help='Number of POD modes')
+    train.add_argument('--energy', type=float, default=0.9999,
+                       help='Variance fraction captured when --rank is not given')
+    predict = sub.add_parser('predict', help='Predict fields for new parameters')
+    predict.add_argument('model', help='Model file written by train')
+    for name in PARAM_NAMES:
+        predict.add_argument(f'--{name}', type=float, default=None)
+    predict.add_argument('-o', '--output', default=None,
+                         help='Write the predicted fields (VTK or table, as trained)')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'train':
+            params, snapshots, coords = load_sweep(args.manifest)
+            model = SurrogateEmulator().fit(params, snapshots, coords, rank=args.rank,
+                                            energy=args.energy)
+            model.save(args.output)
+            print(f"Trained on {model.stats['n_runs']} runs with {model.stats['rank']} modes "
+                  f"({100 * model.stats['captured_energy']:.4f}% of the variance)")
+            for name, value in model.stats['loo_rms'].items():
+                print(f"  {name}: leave-one-out RMS error {value:.3e}")
+            print(f"Model saved to {args.output}")
+        else:
+            start = time.perf_counter()
+            model = SurrogateEmulator.load(args.model)
+            loaded = time.perf_counter()
+            fields, error = model.predict(args.alpha, args.omega, args.beta, args.epsilon)
+            done = time.perf_counter()
+            print(f"Loaded in {1000 * (loaded - start):.1f} ms, "
+                  f"predicted in {1000 * (done - loaded):.2f} ms")
+            if error['extrapolating']:
+                print("Warning: parameters are outside the training range (extrapolating)")
+            for name, values in fields.items():
+                print(f"  {name}: mean {values.mean():.6e}  min {values.min():.6e}  "
+                      f"max {values.max():.6e}  est. RMS error {error[name]:.2e}")
+            if args.output:
+                params = model._params_vector(args.alpha, args.omega, args.beta, args.epsilon)
+                write_prediction(model, fields, args.output, params)
+                print(f"Prediction written to {args.output}")
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Local binary frame server for the Genesis-Sphere WebGL visualization
+Serves precomputed projected polytope geometry and downsampled field slices
+as raw little-endian float32 buffers (ready for JavaScript typed arrays),
+with HTTP range requests and an in-memory LRU cache. The browser animates
+the buffers itself, so interactive exploration never waits on Python
+re-rendering a GIF.
+
+Usage: python -m utils.frame_server [--data-dir vtk_output] [--port 8765]
+Then open http://localhost:8765/ in a browser.
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from utils.animation_engine import edge_segments
+from utils.athena_io import open_vtk_field, read_vtk_coordinates, read_vtk_header
+from utils.lod_pyramid import open_pyramid
+from utils.projection import project, smooth_rotation
+from utils.topology import hypercube
+
+DEFAULT_PORT = 8765
+DEFAULT_DATA_DIR = "vtk_output"
+HTML_PAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         "4d_visualization.html")
+
+# Rotating polytopes offered to the page: dimension, rotation planes and
+# angular speed per plane (radians per frame at 60 fps)
+GEOMETRIES = {
+    'tesseract': {'n': 4, 'planes': [(0, 3)], 'speeds': [np.pi / 300]},
+    'tesseract_double': {'n': 4, 'planes': [(0, 3), (1, 2)],
+                         'speeds': [np.pi / 300, np.pi / 200]},
+    'penteract': {'n': 5, 'planes': [(0, 4), (1, 3)],
+                  'speeds': [np.pi / 300, np.pi / 450]},
+}
+GEOMETRY_FRAMES = 1200
+GEOMETRY_FPS = 60
+
+
+class LRUCache:
+    """Thread-safe byte-budgeted LRU cache of (metadata, payload) entries"""
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, meta, payload):
+        with self._lock:
+            if key in self._entries:
+                self.size -= len(self._entries.pop(key)[1])
+            self._entries[key] = (meta, payload)
+            self.size += len(payload)
+            while self.size > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def get_or_build(self, key, builder):
+        entry = self.get(key)
+        if entry is None:
+            meta, payload = builder()
+            self.put(key, meta, payload)
+            entry = (meta, payload)
+        return entry
+
+
+def build_geometry(name, n_frames=GEOMETRY_FRAMES):
+    """Project every frame of a rotating polytope to (frames, edges, 2, 3) float32"""
+    spec = GEOMETRIES[name]
+    polytope = hypercube(spec['n'])
+    vertices = polytope.vertices - 0.5  # centre on the origin
+    rotations = smooth_rotation(spec['n'], spec['planes'], n_frames, spec['speeds'])
+    segments = edge_segments(project(vertices, rotations, distance=2.0), polytope.edges)
+    payload = np.ascontiguousarray(segments, dtype='<f4').tobytes()
+    meta = {'name': name, 'dimension': spec['n'], 'frames': n_frames,
+            'edges': int(len(polytope.edges)), 'fps': GEOMETRY_FPS,
+            'dtype': 'float32', 'shape': list(segments.shape),
+            'frame_bytes': len(payload) // n_frames}
+    return meta, payload
+
+
+def build_field_slice(path, field, stride=1, component=0):
+    """
+    Downsampled mid-plane (ny, nx) slice of a VTK field as float32. When
+    the file has an up-to-date utils/lod_pyramid.py pyramid, power-of-two
+    strides come from the coarse level of matching cell size (block
+    averages rather than point samples, and a much smaller read). Other
+    strides sample the full-resolution field, so the slice is always
+    ceil(n / stride) cells across.
+    """
+    header = read_vtk_header(path)
+    level, step = 0, stride
+    pyramid = open_pyramid(path) if stride > 1 and stride & (stride - 1) == 0 else None
+    if pyramid is not None and field in pyramid.fields:
+        level = min(stride.bit_length() - 1, len(pyramid.levels) - 1)
+        array = pyramid.level_array(field, level)
+        step = max(1, stride >> level)
+    else:
+        array = open_vtk_field(path, field, header)
+    nz = array.shape[0]
+    plane = array[nz // 2, ::step, ::step]  # only this plane is read
+    if plane.ndim == 3:
+        if not 0 <= component < plane.shape[-1]:
+            raise ValueError(f"component must be 0 to {plane.shape[-1] - 1} for field {field}, "
+                             f"got {component}")
+        plane = plane[..., component]
+    values = np.ascontiguousarray(plane, dtype='<f4')
+    coords = read_vtk_coordinates(path, header)
+    meta = {'file': os.path.basename(path), 'field': field, 'time': header['time'],
+            'cycle': header['cycle'], 'shape': list(values.shape), 'dtype': 'float32',
+            'stride': stride, 'level': level, 'min': float(values.min()), 'max': float(values.max()),
+            'x1': [float(coords['x1f'][0]), float(coords['x1f'][-1])],
+            'x2': [float(coords['x2f'][0]), float(coords['x2f'][-1])]}
+    return meta, values.tobytes()
+
+
+def parse_range(header, length):
+    """Parse a single 'bytes=' Range header; returns (start, end) inclusive or None"""
+    match = re.fullmatch(r'bytes=(\d*)-(\d*)', (header or '').strip())
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    start, end = match.groups()
+    if start == '':
+        start, end = max(length - int(end), 0), length - 1
+    else:
+        start = int(start)
+        end = min(int(end), length - 1) if end else length - 1
+    if start >= length or start > end:
+        raise ValueError("unsatisfiable range")
+    return start, end
+
+
+class FrameServer(ThreadingHTTPServer):
+    """HTTP server holding the data directory and the shared LRU cache"""
+
+    daemon_threads = True
+
+    def __init__(self, address, data_dir=DEFAULT_DATA_DIR, cache_bytes=256 * 1024 * 1024):
+        super().__init__(address, FrameRequestHandler)
+        self.data_dir = data_dir
+        self.cache = LRUCache(cache_bytes)
+
+    def field_files(self):
+        if not os.path.isdir(self.data_dir):
+            return []
+        return sorted(f for f in os.listdir(self.data_dir) if f.endswith('.vtk'))
+
+    def manifest(self):
+        files = self.field_files()
+        fields = []
+        if files:
+            header = read_vtk_header(os.path.join(self.data_dir, files[0]))
+            fields = sorted(header['fields'])
+        return {'geometries': sorted(GEOMETRIES), 'files': files, 'fields': fields}
+
+    def precompute(self):
+        """Build every geometry up front so the first page load never waits"""
+        for name in GEOMETRIES:
+            self.cache.get_or_build(('geometry', name), lambda: build_geometry(name))
+
+
+class FrameRequestHandler(BaseHTTPRequestHandler):
+    """Routes: /, /api/manifest.json, /geometry/<name>.{json,bin},
+    /field/<file>/<field>.{json,bin}?stride=N&component=K"""
+
+    def do_HEAD(self):
+        self.handle_request(send_body=False)
+
+    def do_GET(self):
+        self.handle_request(send_body=True)
+
+    def handle_request(self, send_body):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = [p for p in url.path.split('/') if p]
+        try:
+            if not parts or parts == ['index.html']:
+                with open(HTML_PAGE, 'rb') as f:
+                    return self.send_payload(f.read(), 'text/html; charset=utf-8', send_body)
+            if parts == ['api', 'manifest.json']:
+                return self.send_json(self.server.manifest(), send_body)
+            if parts[0] == 'geometry' and len(parts) == 2:
+                name, ext = os.path.splitext(parts[1])
+                if name not in GEOMETRIES:
+                    return self.send_error(404, f"Unknown geometry {name}")
+                entry = self.server.cache.get_or_build(('geometry', name),
+                                                       lambda: build_geometry(name))
+                return self.send_entry(entry, ext, send_body)
+            if parts[0] == 'field' and len(parts) == 3:
+                filename = parts[1]
+                if filename not in self.server.field_files():
+                    return self.send_error(404, f"Unknown file {filename}")
+                field, ext = os.path.splitext(parts[2])
+                stride = max(1, int(query.get('stride', ['1'])[0]))
+                component = int(query.get('component', ['0'])[0])
+                path = os.path.join(self.server.data_dir, filename)
+                entry = self.server.cache.get_or_build(
+                    ('field', filename, field, stride, component),
+                    lambda: build_field_slice(path, field, stride, component))
+                return self.send_entry(entry, ext, send_body)
+            self.send_error(404)
+        except KeyError as e:
+            self.send_error(404, f"Unknown item {e}")
+        except (OSError, ValueError) as e:
+            self.send_error(400, str(e))
+
+    def send_entry(self, entry, ext, send_body):
+        meta, payload = entry
+        if ext == '.json':
+            return self.send_json(meta, send_body)
+        if ext == '.bin':
+            return self.send_payload(payload, 'application/octet-stream', send_body)
+        self.send_error(404)
+
+    def send_json(self, obj, send_body):
+        self.send_payload(json.dumps(obj).encode('utf-8'), 'application/json', send_body)
+
+    def send_payload(self, payload, content_type, send_body):
+        """Send a whole buffer, or the requested byte range of it"""
+        length = len(payload)
+        try:
+            byte_range = parse_range(self.headers.get('Range'), length)
+        except ValueError:
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{length}')
+            self.end_headers()
+            return
+        if byte_range is None:
+            start, end = 0, length - 1
+            self.send_response(200)
+        else:
+            start, end = byte_range
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{length}')
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(end - start + 1 if length else 0))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Expose-Headers', 'Content-Range, Content-Length')
+        self.end_headers()
+        if send_body and length:
+            self.wfile.write(memoryview(payload)[start:end + 1])
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Binary frame server for 4d_visualization.html')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR,
+                        help=f'Directory with Athena VTK outputs (default: {DEFAULT_DATA_DIR})')
+    parser.add_argument('--host', default='127.0.0.1', help='Bind address (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help=f'Port (default: {DEFAULT_PORT})')
+    parser.add_argument('--cache-mb', type=int, default=256,
+                        help='In-memory LRU cache size in MB (default: 256)')
+    args = parser.parse_args()
+
+    server = FrameServer((args.host, args.port), args.data_dir, args.cache_mb * 1024 * 1024)
+    server.precompute()
+    print(f"Serving 4D visualization at http://{args.host}:{args.port}/ "
+          f"(fields from {args.data_dir})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
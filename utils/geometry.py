@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Metric geometry of Athena++ rectilinear grids
+Cell volumes, face areas and cell-centre positions for Cartesian and
+spherical_polar grids, computed once per grid from the face coordinates
+and cached, so analysis tools can weight every cell by its real volume
+instead of averaging raw cell values.
+"""
+
+import hashlib
+
+import numpy as np
+
+from utils.athena_io import read_athinput, read_vtk_coordinates, read_vtk_header
+
+COORDINATE_SYSTEMS = ('cartesian', 'spherical_polar')
+
+_GEOMETRY_CACHE = {}
+
+
+def _along(values, d):
+    """Shape a 1D array of direction d (1=x1, 2=x2, 3=x3) to broadcast against (nz, ny, nx)"""
+    shape = [1, 1, 1]
+    shape[3 - d] = -1
+    return np.asarray(values, dtype=np.float64).reshape(shape)
+
+
+def _expand_faces(values, d, coord, limits):
+    """
+    Face coordinates of direction d. Athena++ VTK files store a collapsed
+    dimension as its cell centre only; its extent then comes from `limits`,
+    or defaults to a unit width (Cartesian) or an angular range starting
+    at 0 (spherical_polar angles).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.size > 1:
+        return values
+    if d in limits:
+        return np.asarray(limits[d], dtype=np.float64)
+    centre = float(values[0])
+    if coord == 'spherical_polar' and d > 1:
+        full = np.pi if d == 2 else 2 * np.pi
+        return np.array([0.0, 2 * centre if centre > 0 else full])
+    return np.array([centre - 0.5, centre + 0.5])
+
+
+class GridGeometry:
+    """
+    Geometry of a single-block grid.
+
+    Parameters:
+    -----------
+    faces : dict
+        Face coordinates {1: x1f, 2: x2f, 3: x3f}, n + 1 values each
+    coord : str
+        'cartesian' or 'spherical_polar' (x1 = r, x2 = θ, x3 = φ)
+
+    Attributes:
+    -----------
+    shape : (nz, ny, nx)
+    centres, widths : per-direction 1D arrays
+    volume_factors : per-direction 1D factors whose outer product is the volume
+    volume : (nz, ny, nx) cell volumes (built lazily; volume_slab gives slabs)
+    face_area_factors : {d: per-direction 1D factors} of the direction-d face
+        areas (n + 1 entries along d); face_area() evaluates them
+    """
+
+    def __init__(self, faces, coord='cartesian'):
+        if coord not in COORDINATE_SYSTEMS:
+            raise ValueError(f"Unsupported coordinate system: {coord}")
+        self.coord = coord
+        self.faces = {d: np.asarray(faces[d], dtype=np.float64) for d in (1, 2, 3)}
+        self.centres = {d: 0.5 * (f[:-1] + f[1:]) for d, f in self.faces.items()}
+        self.widths = {d: np.diff(f) for d, f in self.faces.items()}
+        self.shape = tuple(self.widths[d].size for d in (3, 2, 1))
+        self.key = None
+
+        if coord == 'cartesian':
+            factors = [self.widths[1], self.widths[2], self.widths[3]]
+        else:
+            r_l, r_r = self.faces[1][:-1], self.faces[1][1:]
+            factors = [(r_r**3 - r_l**3) / 3.0,
+                       np.cos(self.faces[2][:-1]) - np.cos(self.faces[2][1:]),
+                       self.widths[3]]
+        self.volume_factors = factors
+        self._volume = None
+
+        dx = self.widths
+        if coord == 'cartesian':
+            area_factors = {d: [np.ones(dx[e].size + 1) if e == d else dx[e] for e in (1, 2, 3)]
+                            for d in (1, 2, 3)}
+        else:
+            dr2 = (r_r**2 - r_l**2) / 2.0
+            area_factors = {1: [self.faces[1]**2, factors[1], dx[3]],
+                            2: [dr2, np.sin(self.faces[2]), dx[3]],
+                            3: [dr2, dx[2], np.ones(dx[3].size + 1)]}
+        self.face_area_factors = area_factors
+
+    def cache_key(self):
+        """`key` when built by grid_geometry, else a digest of the coordinate system and faces"""
+        if self.key is not None:
+            return self.key
+        digest = hashlib.sha1(self.coord.encode('ascii'))
+        for d in (1, 2, 3):
+            digest.update(self.faces[d].tobytes())
+        return digest.hexdigest()
+
+    def face_area(self, d, face, k0=0, k1=None):
+        """
+        Areas of the direction-d faces with index `face` (0..n), for the
+        slab k0:k1 along x3 (faces of x3 ignore the slab): an array
+        broadcastable to (k1 - k0, ny, nx) with length 1 along direction d
+        """
+        factors = list(self.face_area_factors[d])
+        factors[d - 1] = factors[d - 1][face:face + 1]
+        if d != 3:
+            factors[2] = factors[2][k0:k1]
+        return _along(factors[0], 1) * _along(factors[1], 2) * _along(factors[2], 3)
+
+    @property
+    def volume(self):
+        """(nz, ny, nx) float64 cell volumes, built on first use (see volume_slab)"""
+        if self._volume is None:
+            self._volume = self.volume_slab(0, self.shape[0])
+        return self._volume
+
+    def volume_slab(self, k0, k1):
+        """Cell volumes of the slab k0:k1 along x3, (k1 - k0, ny, nx) float64"""
+        factors = self.volume_factors
+        return _along(factors[0], 1) * _along(factors[1], 2) * _along(factors[2][k0:k1], 3)
+
+    def cartesian_centres(self, k0=0, k1=None):
+        """Cell-centre positions (x, y, z), each (nz, ny, nx), or of the slab k0:k1 along x3"""
+        k1 = self.shape[0] if k1 is None else k1
+        shape = (k1 - k0,) + self.shape[1:]
+        centres = {1: self.centres[1], 2: self.centres[2], 3: self.centres[3][k0:k1]}
+        x1, x2, x3 = (_along(centres[d], d) + np.zeros(shape) for d in (1, 2, 3))
+        if self.coord == 'cartesian':
+            return x1, x2, x3
+        return (x1 * np.sin(x2) * np.cos(x3), x1 * np.sin(x2) * np.sin(x3), x1 * np.cos(x2))
+
+    def spherical_centres(self, center=(0.0, 0.0, 0.0), k0=0, k1=None):
+        """
+        Spherical radius and polar angle of every cell centre, (nz, ny, nx),
+        or of the slab k0:k1 along x3. For Cartesian grids they are measured
+        from `center`.
+        """
+        k1 = self.shape[0] if k1 is None else k1
+        shape = (k1 - k0,) + self.shape[1:]
+        if self.coord == 'spherical_polar':
+            r = _along(self.centres[1], 1) + np.zeros(shape)
+            theta = _along(self.centres[2], 2) + np.zeros(shape)
+            return r, theta
+        x = _along(self.centres[1], 1) - center[0]
+        y = _along(self.centres[2], 2) - center[1]
+        z = _along(self.centres[3][k0:k1], 3) - center[2]
+        r = np.sqrt(x**2 + y**2 + z**2)
+        theta = np.arccos(np.clip(np.divide(z, r, out=np.zeros_like(r), where=r > 0), -1, 1))
+        return r, theta
+
+    def max_radius(self, center=(0.0, 0.0, 0.0)):
+        """Largest spherical radius of a cell centre (from `center` on Cartesian grids)"""
+        if self.coord == 'spherical_polar':
+            return float(self.centres[1].max())
+        return float(np.sqrt(sum(np.abs(self.centres[d] - center[d - 1]).max()**2
+                                 for d in (1, 2, 3))))
+
+
+def grid_geometry(coords, coord='cartesian', limits=None):
+    """
+    Cached GridGeometry for face coordinates {'x1f', 'x2f', 'x3f'} as returned
+    by utils.athena_io.read_vtk_coordinates.
+
+    limits : dict, optional
+        {direction: (min, max)} of collapsed dimensions (see _expand_faces)
+    """
+    limits = limits or {}
+    digest = hashlib.sha1(coord.encode('ascii'))
+    for d, name in zip((1, 2, 3), ('x1f', 'x2f', 'x3f')):
+        digest.update(np.ascontiguousarray(coords[name], dtype=np.float64).tobytes())
+        digest.update(repr(limits.get(d)).encode('ascii'))
+    key = digest.hexdigest()
+    geometry = _GEOMETRY_CACHE.get(key)
+    if geometry is None:
+        faces = {d: _expand_faces(coords[name], d, coord, limits)
+                 for d, name in zip((1, 2, 3), ('x1f', 'x2f', 'x3f'))}
+        geometry = GridGeometry(faces, coord)
+        geometry.key = key
+        _GEOMETRY_CACHE[key] = geometry
+    return geometry
+
+
+def athinput_grid(filename):
+    """Coordinate system and {direction: (min, max)} mesh limits of an athinput file"""
+    params = read_athinput(filename)
+    mesh = params.get('mesh', {})
+    coord = mesh.get('coord', params.get('job', {}).get('coord', 'cartesian'))
+    limits = {d: (float(mesh[f'x{d}min']), float(mesh[f'x{d}max'])) for d in (1, 2, 3)
+              if f'x{d}min' in mesh and f'x{d}max' in mesh}
+    return coord, limits
+
+
+def athinput_boundaries(filename):
+    """Boundary conditions {'ix1': kind, 'ox1': ..., ...} from the <mesh> block of an athinput file"""
+    mesh = read_athinput(filename).get('mesh', {})
+    return {f'{side}x{d}': str(mesh[f'{side}x{d}_bc']) for side in 'io' for d in (1, 2, 3)
+            if f'{side}x{d}_bc' in mesh}
+
+
+def geometry_from_vtk(filename, coord=None, athinput=None, header=None):
+    """
+    Cached geometry of an Athena++ VTK file. The coordinate system and the
+    extent of collapsed dimensions come from the run's athinput file when
+    given; coord overrides it (default 'cartesian').
+    """
+    limits = {}
+    if athinput:
+        input_coord, limits = athinput_grid(athinput)
+        coord = coord or input_coord
+    header = header or read_vtk_header(filename)
+    return grid_geometry(read_vtk_coordinates(filename, header), coord or 'cartesian', limits)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Streaming GIF encoder for the Genesis-Sphere animations
+Frames are quantized onto one shared palette and written to disk as soon as
+they arrive, so memory stays bounded no matter how many frames there are.
+"""
+
+import numpy as np
+from PIL import Image, GifImagePlugin
+
+
+def build_palette(samples):
+    """Median-cut GIF palette shared by all frames, built from a few sample frames"""
+    # Median cut keeps the faint wireframes that octree quantization drops
+    stacked = np.concatenate([np.asarray(rgba)[..., :3] for rgba in samples], axis=0)
+    image = Image.fromarray(np.ascontiguousarray(stacked), 'RGB')
+    return image.quantize(256, method=Image.Quantize.MEDIANCUT)
+
+
+def palette_image(palette_bytes):
+    """Rebuild a palette image from raw RGB palette bytes (e.g. in a worker process)"""
+    palette = Image.new('P', (1, 1))
+    palette.putpalette(palette_bytes)
+    return palette
+
+
+def palette_bytes(palette):
+    """Raw RGB bytes of a palette image, cheap to send to worker processes"""
+    return bytes(palette.getpalette('RGB'))
+
+
+def rgba_to_palette(rgba, palette):
+    """Map an RGBA buffer onto a shared palette (a cheap nearest-colour lookup)"""
+    image = Image.fromarray(np.ascontiguousarray(np.asarray(rgba)[..., :3]), 'RGB')
+    return image.quantize(palette=palette, dither=Image.Dither.NONE)
+
+
+class StreamingGifWriter:
+    """
+    Write palette frames to a GIF one at a time.
+
+    The header is emitted with the first frame and every later frame is
+    encoded and flushed immediately, unlike PIL's save_all which holds the
+    whole sequence in memory.
+    """
+
+    def __init__(self, path, fps=10, loop=0, palette=None):
+        self.path = path
+        self.duration = int(round(1000 / fps))
+        self.loop = loop
+        self.palette = palette
+        self.n_frames = 0
+        self._fp = open(path, 'wb')
+
+    def write(self, image):
+        """Append a palette ('P') image"""
+        if self.n_frames == 0:
+            header, _ = GifImagePlugin.getheader(
+                image.copy(), info={'loop': self.loop, 'duration': self.duration,
+                                    'optimize': False})
+            self._fp.writelines(header)
+        self._fp.writelines(GifImagePlugin.getdata(image, duration=self.duration))
+        self.n_frames += 1
+
+    def write_indexed(self, data, size):
+        """Append a frame given as raw palette-index bytes of the given (W, H) size"""
+        image = Image.frombytes('P', size, data)
+        image.putpalette(self.palette.getpalette('RGB'))
+        self.write(image)
+
+    def write_rgba(self, rgba):
+        """Quantize an RGBA buffer onto the shared palette and append it"""
+        self.write(rgba_to_palette(rgba, self.palette))
+
+    def close(self):
+        if self._fp is not None:
+            self._fp.write(b';')  # GIF trailer
+            self._fp.close()
+            self._fp = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,683 @@
+#!/usr/bin/env python3
+"""
+Vectorized finite-volume hydrodynamics solver for the Genesis-Sphere project
+A NumPy-only counterpart of the Athena++ runs used for parameter screening:
+adiabatic Euler equations in 1D/2D/3D on Cartesian or spherical-polar
+grids, PLM reconstruction, HLLE/HLLC Riemann solvers and RK2 (or VL2) time
+integration. Every update works on whole grid sweeps, split into slabs along
+the outermost axis that are evaluated concurrently by a thread pool (NumPy
+releases the GIL inside its kernels). Unlike the time_density problem
+generator, which only applies TimeDensity/TemporalFlowRatio to the initial
+state, the temporal flow ratio can act as a source term throughout the run.
+Outputs are Athena++-compatible VTK and .hst files.
+
+Usage: python -m utils.hydro_solver -i time_density_spherical_fixed2.in -d hydro_output [block/key=value ...]
+"""
+
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from utils.athena_io import (read_athinput, write_athena_vtk, write_history_header,
+                             write_history_row)
+
+# Primitive (rho, v1, v2, v3, p) and conserved (rho, m1, m2, m3, E) indices;
+# the normal velocity/momentum of direction d (1, 2, 3) is index d
+IDN, IV1, IV2, IV3, IPR = 0, 1, 2, 3, 4
+IM1, IM2, IM3, IEN = 1, 2, 3, 4
+
+NGHOST = 2
+MIN_SLAB = 8  # smallest slab (cells along the slab axis) worth a thread
+
+
+def time_density(t, alpha, omega):
+    """Time-density ρ(t) = S(t)·D(t), as in the time_density problem generator"""
+    return (1.0 + alpha * t**2) / (1.0 + np.sin(omega * t)**2)
+
+
+def temporal_flow_ratio(t, beta, epsilon):
+    """Temporal flow ratio R(t) = 1 / (1 + β/(|t| + ε))"""
+    return 1.0 / (1.0 + beta / (np.abs(t) + epsilon))
+
+
+def _along(values, d):
+    """Shape a 1D array of direction d (1=x1, 2=x2, 3=x3) to broadcast against (5, nz, ny, nx)"""
+    shape = [1, 1, 1, 1]
+    shape[4 - d] = -1
+    return np.asarray(values, dtype=np.float64).reshape(shape)
+
+
+def _index(ax, start, stop, ndim=4):
+    index = [slice(None)] * ndim
+    index[ax] = slice(start, stop)
+    return tuple(index)
+
+
+class Mesh:
+    """
+    Single-block grid: face/centre coordinates and the finite-volume
+    geometry factors of each direction.
+
+    For direction d the flux divergence of a cell is
+    cell_factor[d] * (face_weight[d][i+1] F[i+1] - face_weight[d][i] F[i]),
+    which reduces to (A_{i+1} F_{i+1} - A_i F_i) / V with the separable
+    face areas and volumes of the coordinate system.
+    """
+
+    def __init__(self, nx, x1lim, x2lim, x3lim, coord='cartesian', x1rat=1.0):
+        if coord not in ('cartesian', 'spherical_polar'):
+            raise ValueError(f"Unsupported coordinate system: {coord}")
+        self.coord = coord
+        self.n = {d: int(n) for d, n in zip((1, 2, 3), nx)}
+        self.active = [d for d in (1, 2, 3) if self.n[d] > 1]
+        if not self.active or self.active != list(range(1, len(self.active) + 1)):
+            raise ValueError(f"Active dimensions must be x1[, x2[, x3]], got nx={nx}")
+        self.ghosts = {d: (NGHOST if d in self.active else 0) for d in (1, 2, 3)}
+        self.shape = (self.n[3], self.n[2], self.n[1])
+
+        self.faces = {}
+        for d, (lo, hi) in zip((1, 2, 3), (x1lim, x2lim, x3lim)):
+            n = self.n[d]
+            if d == 1 and x1rat != 1.0:
+                ratio = x1rat ** np.arange(n + 1)
+                self.faces[d] = lo + (hi - lo) * (ratio - 1) / (x1rat ** n - 1)
+            else:
+                self.faces[d] = np.linspace(lo, hi, n + 1)
+        self.centres = {d: 0.5 * (f[:-1] + f[1:]) for d, f in self.faces.items()}
+        self.widths = {d: np.diff(f) for d, f in self.faces.items()}
+
+        if coord == 'cartesian':
+            self._cartesian_geometry()
+        else:
+            self._spherical_geometry()
+
+    def _cartesian_geometry(self):
+        dx = self.widths
+        self.face_weight = {d: None for d in self.active}
+        self.cell_factor = {d: _along(1.0 / dx[d], d) for d in self.active}
+        self.volume = _along(dx[1], 1) * _along(dx[2], 2) * _along(dx[3], 3)
+        self.cfl_width = {d: _along(dx[d], d) for d in self.active}
+
+    def _spherical_geometry(self):
+        r_l, r_r = self.faces[1][:-1], self.faces[1][1:]
+        th_l, th_r = self.faces[2][:-1], self.faces[2][1:]
+        dr3 = (r_r**3 - r_l**3) / 3.0
+        dr2 = (r_r**2 - r_l**2) / 2.0
+        dcos = np.cos(th_l) - np.cos(th_r)
+        dphi = self.widths[3]
+
+        self.face_weight = {1: _along(self.faces[1]**2, 1),
+                            2: _along(np.sin(self.faces[2]), 2),
+                            3: None}
+        self.cell_factor = {1: _along(1.0 / dr3, 1),
+                            2: _along(dr2 / dr3, 1) * _along(1.0 / dcos, 2),
+                            3: _along(dr2 / dr3, 1) * _along(self.widths[2] / dcos, 2)
+                               * _along(1.0 / dphi, 3)}
+        self.face_weight = {d: self.face_weight[d] for d in self.active}
+        self.cell_factor = {d: self.cell_factor[d] for d in self.active}
+        self.volume = _along(dr3, 1) * _along(dcos, 2) * _along(dphi, 3)
+
+        # Volume averages of 1/r and cot(θ) for the geometric source terms
+        self.inv_r = _along(dr2 / dr3, 1)
+        self.cot_theta = _along((np.sin(th_r) - np.sin(th_l)) / dcos, 2)
+
+        r = _along(self.centres[1], 1)
+        widths = {1: _along(self.widths[1], 1),
+                  2: r * _along(self.widths[2], 2),
+                  3: r * _along(np.sin(self.centres[2]), 2) * _along(dphi, 3)}
+        self.cfl_width = {d: widths[d] for d in self.active}
+
+    def cartesian_centres(self):
+        """Cell-centre positions (x, y, z), broadcastable to (nz, ny, nx)"""
+        x1, x2, x3 = (_along(self.centres[d], d)[0] for d in (1, 2, 3))
+        if self.coord == 'cartesian':
+            return x1, x2, x3
+        return (x1 * np.sin(x2) * np.cos(x3), x1 * np.sin(x2) * np.sin(x3),
+                x1 * np.cos(x2) + 0 * x3)
+
+    def coordinates(self):
+        return {'x1f': self.faces[1], 'x2f': self.faces[2], 'x3f': self.faces[3]}
+
+
+def _prim_to_cons(w, gamma):
+    u = np.empty_like(w)
+    u[IDN] = w[IDN]
+    u[IM1:IM3 + 1] = w[IDN] * w[IV1:IV3 + 1]
+    u[IEN] = w[IPR] / (gamma - 1.0) + 0.5 * w[IDN] * (w[IV1]**2 + w[IV2]**2 + w[IV3]**2)
+    return u
+
+
+def _flux(w, u, d):
+    """Physical flux of direction d from matching primitive/conserved states"""
+    f = u * w[d]
+    f[d] += w[IPR]
+    f[IEN] += w[IPR] * w[d]
+    return f
+
+
+def hlle_flux(wl, wr, d, gamma):
+    """HLLE flux across faces with normal direction d from left/right primitive states"""
+    ul, ur = _prim_to_cons(wl, gamma), _prim_to_cons(wr, gamma)
+    cl = np.sqrt(gamma * wl[IPR] / wl[IDN])
+    cr = np.sqrt(gamma * wr[IPR] / wr[IDN])
+    bp = np.maximum(np.maximum(wl[d] + cl, wr[d] + cr), 0.0)
+    bm = np.minimum(np.minimum(wl[d] - cl, wr[d] - cr), 0.0)
+    flux = bp * _flux(wl, ul, d) - bm * _flux(wr, ur, d) + bp * bm * (ur - ul)
+    flux /= bp - bm
+    return flux
+
+
+def hllc_flux(wl, wr, d, gamma):
+    """HLLC flux across faces with normal direction d from left/right primitive states"""
+    ul, ur = _prim_to_cons(wl, gamma), _prim_to_cons(wr, gamma)
+    fl, fr = _flux(wl, ul, d), _flux(wr, ur, d)
+    dl, dr, vl, vr, pl, pr = wl[IDN], wr[IDN], wl[d], wr[d], wl[IPR], wr[IPR]
+    cl = np.sqrt(gamma * pl / dl)
+    cr = np.sqrt(gamma * pr / dr)
+    sl = np.minimum(vl - cl, vr - cr)
+    sr = np.maximum(vl + cl, vr + cr)
+
+    ml, mr = dl * (sl - vl), dr * (sr - vr)
+    sm = (pr - pl + ml * vl - mr * vr) / (ml - mr)
+    p_star = 0.5 * (pl + pr + ml * (sm - vl) + mr * (sm - vr))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fsl = sm * (sl * ul - fl)
+        fsl[d] += sl * p_star
+        fsl[IEN] += sl * p_star * sm
+        fsl /= sl - sm
+        fsr = sm * (sr * ur - fr)
+        fsr[d] += sr * p_star
+        fsr[IEN] += sr * p_star * sm
+        fsr /= sr - sm
+    return np.where(sl >= 0, fl, np.where(sm >= 0, fsl, np.where(sr > 0, fsr, fr)))
+
+
+RIEMANN_SOLVERS = {'hlle': hlle_flux, 'hll': hlle_flux, 'hllc': hllc_flux}
+
+
+class TemporalFlowSource:
+    """
+    Temporal flow ratio as a run-time source term.
+
+    Adds S = (R(t) - 1)·dU/dt to the tendency, i.e. the fluid evolves at the
+    local clock rate R(t) = 1 / (1 + β/(|t| + ε)): frozen near the
+    singularity and approaching ordinary hydrodynamics as R -> 1. Register
+    it last so it scales the hydro and geometric terms together.
+    """
+
+    def __init__(self, beta, epsilon):
+        self.beta = beta
+        self.epsilon = epsilon
+
+    def __call__(self, solver, t, w, dudt):
+        dudt *= temporal_flow_ratio(t, self.beta, self.epsilon)
+
+
+class HydroSolver:
+    """
+    Adiabatic hydrodynamics on a single Mesh block.
+
+    Parameters:
+    -----------
+    mesh : Mesh
+        Grid and geometry
+    cons : ndarray
+        Initial conserved state (5, nz, ny, nx)
+    gamma : float
+        Adiabatic index
+    riemann : str
+        'hllc' or 'hlle'
+    xorder : int
+        1 (donor cell) or 2 (PLM with van Leer limiter)
+    integrator : str
+        'rk2' (Heun), 'vl2' (van Leer predictor-corrector) or 'rk1'
+    cfl : float
+        Courant number
+    boundaries : dict
+        {'ix1': 'outflow'|'reflecting'|'periodic'|'polar'|'polar_wedge', 'ox1': ..., ...};
+        polar_wedge (Athena++'s pole of a φ wedge) is treated as polar
+    sources : list
+        Callables source(solver, t, prim, dudt) adding to dudt in place
+    threads : int
+        Slab worker threads (default: os.cpu_count())
+    """
+
+    def __init__(self, mesh, cons, gamma=5.0 / 3.0, riemann='hllc', xorder=2,
+                 integrator='rk2', cfl=0.3, boundaries=None, sources=(), time=0.0,
+                 threads=None, dfloor=1e-10, pfloor=1e-10):
+        if riemann not in RIEMANN_SOLVERS:
+            raise ValueError(f"Unknown Riemann solver: {riemann}")
+        if integrator not in ('rk1', 'rk2', 'vl2'):
+            raise ValueError(f"Unknown integrator: {integrator}")
+        if xorder not in (1, 2):
+            raise ValueError(f"xorder must be 1 or 2, got {xorder}")
+        self.mesh = mesh
+        self.u = np.array(cons, dtype=np.float64)
+        if self.u.shape != (5,) + mesh.shape:
+            raise ValueError(f"Expected conserved state of shape {(5,) + mesh.shape}, "
+                             f"got {self.u.shape}")
+        self.gamma = gamma
+        self.riemann = RIEMANN_SOLVERS[riemann]
+        self.xorder = xorder
+        self.integrator = integrator
+        self.cfl = cfl
+        self.sources = list(sources)
+        self.time = time
+        self.cycle = 0
+        self.dt = None
+        self.dfloor = dfloor
+        self.pfloor = pfloor
+
+        self.boundaries = {f'{side}x{d}': 'outflow' for side in 'io' for d in (1, 2, 3)}
+        self.boundaries.update(boundaries or {})
+        for name, kind in self.boundaries.items():
+            if kind not in ('outflow', 'reflecting', 'periodic', 'polar', 'polar_wedge'):
+                raise ValueError(f"Unsupported boundary condition {name}={kind}")
+
+        g = mesh.ghosts
+        self._w = np.zeros((5, mesh.n[3] + 2 * g[3], mesh.n[2] + 2 * g[2],
+                            mesh.n[1] + 2 * g[1]))
+        self._interior = (slice(None), slice(g[3], g[3] + mesh.n[3]),
+                          slice(g[2], g[2] + mesh.n[2]), slice(g[1], g[1] + mesh.n[1]))
+
+        # Slabs along the outermost active direction, one task each
+        self._slab_dir = mesh.active[-1]
+        n_slab = mesh.n[self._slab_dir]
+        threads = threads or os.cpu_count() or 1
+        n_slabs = max(1, min(threads, n_slab // MIN_SLAB))
+        bounds = np.linspace(0, n_slab, n_slabs + 1).astype(int)
+        self._slabs = list(zip(bounds[:-1], bounds[1:]))
+        self._pool = ThreadPoolExecutor(n_slabs) if n_slabs > 1 else None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ------------------------------------------------------------------
+    # State conversion and boundaries
+    # ------------------------------------------------------------------
+    def cons_to_prim(self, u, out=None):
+        """Primitive variables (with density/pressure floors) from conserved ones"""
+        w = np.empty_like(u) if out is None else out
+        w[IDN] = np.maximum(u[IDN], self.dfloor)
+        w[IV1:IV3 + 1] = u[IM1:IM3 + 1] / w[IDN]
+        kinetic = 0.5 * w[IDN] * (w[IV1]**2 + w[IV2]**2 + w[IV3]**2)
+        w[IPR] = np.maximum((self.gamma - 1.0) * (u[IEN] - kinetic), self.pfloor)
+        return w
+
+    @property
+    def prim(self):
+        return self.cons_to_prim(self.u)
+
+    def _fill_ghosts(self, w):
+        """Fill the ghost zones of the padded primitive array, direction by direction"""
+        for d in self.mesh.active:
+            ax, n, g = 4 - d, self.mesh.n[d], NGHOST
+            for side in 'io':
+                kind = self.boundaries[f'{side}x{d}']
+                if kind == 'polar_wedge':
+                    kind = 'polar'
+                if side == 'i':
+                    ghost = np.arange(g - 1, -1, -1)          # g-1, ..., 0
+                    source = {'outflow': np.full(g, g), 'reflecting': g + np.arange(g),
+                              'periodic': g + n - 1 - np.arange(g)}
+                else:
+                    ghost = g + n + np.arange(g)              # g+n, ..., g+n+g-1
+                    source = {'outflow': np.full(g, g + n - 1),
+                              'reflecting': g + n - 1 - np.arange(g),
+                              'periodic': g + np.arange(g)}
+                source['polar'] = source['reflecting']
+                index = [slice(None)] * 4
+                index[ax] = ghost
+                w[tuple(index)] = np.take(w, source[kind], axis=ax)
+                if kind in ('reflecting', 'polar'):
+                    w[(d,) + tuple(index[1:])] *= -1.0
+                if kind == 'polar':
+                    w[(IV3,) + tuple(index[1:])] *= -1.0
+
+    def _load(self, u):
+        """Convert u into the interior of the padded primitive array and fill ghosts"""
+        self.cons_to_prim(u, out=self._w[self._interior])
+        self._fill_ghosts(self._w)
+        return self._w
+
+    # ------------------------------------------------------------------
+    # Spatial operator
+    # ------------------------------------------------------------------
+    def _face_fluxes(self, w, d, ax):
+        """Reconstruct along array axis ax and solve the Riemann problem on every face"""
+        m = w.shape[ax]
+        if self.xorder == 1:
+            wl = w[_index(ax, 1, m - 2)]
+            wr = w[_index(ax, 2, m - 1)]
+        else:
+            centre = w[_index(ax, 1, m - 1)]
+            dl = centre - w[_index(ax, 0, m - 2)]
+            dr = w[_index(ax, 2, m)] - centre
+            product = dl * dr
+            slope = np.zeros_like(product)
+            np.divide(2.0 * product, dl + dr, out=slope, where=product > 0)
+            slope *= 0.5
+            wl = (centre + slope)[_index(ax, 0, m - 3)]
+            wr = (centre - slope)[_index(ax, 1, m - 2)]
+            for state in (wl, wr):
+                np.maximum(state[IDN], self.dfloor, out=state[IDN])
+                np.maximum(state[IPR], self.pfloor, out=state[IPR])
+        return self.riemann(wl, wr, d, self.gamma)
+
+    def _slab_tendency(self, w, dudt, s0, s1):
+        """Flux divergence and geometric sources for interior cells [s0, s1) of the slab axis"""
+        mesh = self.mesh
+        sa = 4 - self._slab_dir
+
+        def slab(array, extra=0):
+            if array is None or array.shape[sa] == 1:
+                return array
+            return array[_index(sa, s0, s1 + extra)]
+
+        out = dudt[_index(sa, s0, s1)]
+        for d in mesh.active:
+            ax = 4 - d
+            index = [slice(None)] * 4
+            for a in (1, 2, 3):
+                da = 4 - a
+                g, n = mesh.ghosts[da], mesh.n[da]
+                if a == ax:
+                    index[a] = slice(s0, s1 + 2 * g) if a == sa else slice(0, n + 2 * g)
+                else:
+                    index[a] = slice(g + s0, g + s1) if a == sa else slice(g, g + n)
+            flux = self._face_fluxes(w[tuple(index)], d, ax)
+
+            weight = mesh.face_weight[d]
+            if weight is not None:
+                flux *= slab(weight, extra=1) if ax == sa else weight
+            m = flux.shape[ax]
+            out -= slab(mesh.cell_factor[d]) * (flux[_index(ax, 1, m)] - flux[_index(ax, 0, m - 1)])
+
+        if mesh.coord == 'spherical_polar':
+            g = mesh.ghosts
+            cells = list(self._interior)
+            cells[sa] = slice(g[self._slab_dir] + s0, g[self._slab_dir] + s1)
+            rho, v1, v2, v3, p = w[tuple(cells)]
+            inv_r, cot = slab(mesh.inv_r)[0], slab(mesh.cot_theta)[0]
+            out[IM1] += inv_r * (rho * (v2**2 + v3**2) + 2.0 * p)
+            out[IM2] += inv_r * (cot * (rho * v3**2 + p) - rho * v1 * v2)
+            out[IM3] -= inv_r * rho * v3 * (v1 + cot * v2)
+
+    def tendency(self, u, t):
+        """dU/dt of conserved state u at time t (hydro, geometry and registered sources)"""
+        w = self._load(u)
+        dudt = np.zeros_like(u)
+        if self._pool is None:
+            for s0, s1 in self._slabs:
+                self._slab_tendency(w, dudt, s0, s1)
+        else:
+            list(self._pool.map(lambda bounds: self._slab_tendency(w, dudt, *bounds),
+                                self._slabs))
+        prim = w[self._interior]
+        for source in self.sources:
+            source(self, t, prim, dudt)
+        return dudt
+
+    # ------------------------------------------------------------------
+    # Time integration
+    # ------------------------------------------------------------------
+    def new_timestep(self):
+        """CFL-limited time step of the current state"""
+        w = self.prim
+        c = np.sqrt(self.gamma * w[IPR] / w[IDN])
+        dt = min(float(np.min(self.mesh.cfl_width[d] / (np.abs(w[d]) + c)))
+                 for d in self.mesh.active)
+        return self.cfl * dt
+
+    def step(self, dt=None):
+        """Advance one cycle; returns the time step taken"""
+        dt = self.new_timestep() if dt is None else dt
+        u0, t = self.u, self.time
+        if self.integrator == 'rk1':
+            self.u = u0 + dt * self.tendency(u0, t)
+        elif self.integrator == 'rk2':
+            u1 = u0 + dt * self.tendency(u0, t)
+            self.u = 0.5 * (u0 + u1 + dt * self.tendency(u1, t + dt))
+        else:
+            xorder, self.xorder = self.xorder, 1
+            try:
+                u_half = u0 + 0.5 * dt * self.tendency(u0, t)
+            finally:
+                self.xorder = xorder
+            self.u = u0 + dt * self.tendency(u_half, t + 0.5 * dt)
+        self.time += dt
+        self.cycle += 1
+        self.dt = dt
+        return dt
+
+    # ------------------------------------------------------------------
+    # Diagnostics
+    # ------------------------------------------------------------------
+    def history(self):
+        """One .hst row: time, dt, mass, momenta, kinetic energies, total energy"""
+        volume = self.mesh.volume
+        u = self.u
+        dt = self.new_timestep()  # Athena++ records the upcoming step
+        rho = np.maximum(u[IDN], self.dfloor)
+        row = [self.time, dt, np.sum(u[IDN] * volume)]
+        row += [np.sum(u[m] * volume) for m in (IM1, IM2, IM3)]
+        row += [np.sum(0.5 * u[m]**2 / rho * volume) for m in (IM1, IM2, IM3)]
+        row.append(np.sum(u[IEN] * volume))
+        return [float(value) for value in row]
+
+    def output_fields(self, variables='prim'):
+        """(name, array) pairs in Athena++ VTK order"""
+        if variables == 'prim':
+            w = self.prim
+            return [('rho', w[IDN]), ('press', w[IPR]),
+                    ('vel', np.moveaxis(w[IV1:IV3 + 1], 0, -1))]
+        if variables == 'cons':
+            return [('dens', self.u[IDN]), ('Etot', self.u[IEN]),
+                    ('mom', np.moveaxis(self.u[IM1:IM3 + 1], 0, -1))]
+        raise ValueError(f"Unsupported output variables: {variables}")
+
+
+# ----------------------------------------------------------------------
+# Problem generators: (mesh, problem params, time, gamma) -> conserved state
+# ----------------------------------------------------------------------
+def pgen_time_density(mesh, params, t, gamma):
+    """Port of athena-docker/src/pgen/time_density.cpp (sets conserved variables as it does)"""
+    alpha = params.get('alpha', 0.01)
+    omega = params.get('omega', 1.0)
+    beta = params.get('beta', 0.5)
+    epsilon = params.get('epsilon', 0.001)
+    pressure = params.get('pressure', 1.0)
+    rho = time_density(t, alpha, omega)
+    flow_ratio = temporal_flow_ratio(t, beta, epsilon)
+
+    u = np.zeros((5,) + mesh.shape)
+    u[IDN] = rho
+    u[IM1] = flow_ratio * 0.1
+    u[IEN] = pressure * flow_ratio / (gamma - 1.0) + 0.5 * rho * (flow_ratio * 0.1)**2
+    return u
+
+
+def pgen_blast(mesh, params, t, gamma):
+    """Spherical over-pressure region (Athena++ blast.cpp parameters or the repo's names)"""
+    d_amb = params.get('ambient_density', params.get('damb', 1.0))
+    p_amb = params.get('ambient_pressure', params.get('pamb', 1.0))
+    d_in = params.get('blast_density', d_amb * params.get('drat', 1.0))
+    p_in = params.get('blast_pressure', p_amb * params.get('prat', 1.0))
+    radius = params.get('radius', 0.5)
+
+    x, y, z = mesh.cartesian_centres()
+    if 'center_x1' in params and mesh.coord == 'spherical_polar':
+        r0 = params['center_x1']
+        th0 = params.get('center_x2', 0.5 * np.pi)
+        ph0 = params.get('center_x3', 0.0)
+        centre = (r0 * np.sin(th0) * np.cos(ph0), r0 * np.sin(th0) * np.sin(ph0),
+                  r0 * np.cos(th0))
+    else:
+        centre = tuple(params.get(f'center_x{d}', params.get(f'x{d}_0', 0.0)) for d in (1, 2, 3))
+    inside = (x - centre[0])**2 + (y - centre[1])**2 + (z - centre[2])**2 < radius**2
+
+    w = np.zeros((5,) + mesh.shape)
+    w[IDN] = np.where(inside, d_in, d_amb)
+    w[IPR] = np.where(inside, p_in, p_amb)
+    return _prim_to_cons(w, gamma)
+
+
+def pgen_shock_tube(mesh, params, t, gamma):
+    """Riemann problem along x1 (Athena++ shock_tube.cpp parameter names)"""
+    x1 = _along(mesh.centres[1], 1)[0]
+    left = x1 < params.get('xshock', 0.5 * (mesh.faces[1][0] + mesh.faces[1][-1]))
+    w = np.zeros((5,) + mesh.shape)
+    for index, suffix, default_l, default_r in ((IDN, 'd', 1.0, 0.125), (IV1, 'u', 0.0, 0.0),
+                                                 (IPR, 'p', 1.0, 0.1)):
+        w[index] = np.where(left, params.get(f'{suffix}l', default_l),
+                            params.get(f'{suffix}r', default_r))
+    return _prim_to_cons(w, gamma)
+
+
+PROBLEMS = {'time_density': pgen_time_density, 'blast': pgen_blast,
+            'shock_tube': pgen_shock_tube}
+
+
+def _as_bool(value):
+    if isinstance(value, str):
+        return value.lower() in ('true', 'yes', 'on', '1')
+    return bool(value)
+
+
+def solver_from_params(params, threads=None):
+    """Build the Mesh, initial state and HydroSolver described by athinput parameters"""
+    job, mesh_p = params.get('job', {}), params.get('mesh', {})
+    hydro, time_p = params.get('hydro', {}), params.get('time', {})
+    problem = params.get('problem', {})
+    problem_id = job.get('problem_id', 'time_density')
+    if problem_id not in PROBLEMS:
+        raise ValueError(f"No NumPy problem generator for '{problem_id}' "
+                         f"(available: {', '.join(sorted(PROBLEMS))})")
+
+    mesh = Mesh([mesh_p.get(f'nx{d}', 1) for d in (1, 2, 3)],
+                *[(mesh_p.get(f'x{d}min', -0.5), mesh_p.get(f'x{d}max', 0.5)) for d in (1, 2, 3)],
+                coord=job.get('coord', 'cartesian'), x1rat=mesh_p.get('x1rat', 1.0))
+    gamma = hydro.get('gamma', 5.0 / 3.0)
+    boundaries = {f'{side}x{d}': mesh_p[f'{side}x{d}_bc']
+                  for side in 'io' for d in (1, 2, 3) if f'{side}x{d}_bc' in mesh_p}
+
+    sources = []
+    if _as_bool(problem.get('flow_source', problem_id == 'time_density')):
+        sources.append(TemporalFlowSource(problem.get('beta', 0.5),
+                                          problem.get('epsilon', 0.001)))
+
+    t0 = time_p.get('start_time', 0.0)
+    cons = PROBLEMS[problem_id](mesh, problem, t0, gamma)
+    integrator = time_p.get('integrator', 'rk2')
+    return HydroSolver(mesh, cons, gamma=gamma,
+                       riemann=str(hydro.get('riemann', 'hllc')).lower(),
+                       xorder=hydro.get('xorder', time_p.get('xorder', 2)),
+                       integrator=integrator, cfl=time_p.get('cfl_number', 0.3),
+                       boundaries=boundaries, sources=sources, time=t0, threads=threads,
+                       dfloor=hydro.get('dfloor', 1e-10), pfloor=hydro.get('pfloor', 1e-10))
+
+
+def run_athinput(input_file, output_dir='.', overrides=None, threads=None, verbose=False):
+    """
+    Run an athinput file to tlim/nlim, writing its vtk and hst outputs.
+
+    VTK files are named <problem_id>.block0.<id>.<NNNNN>.vtk and the history
+    <problem_id>.hst, as Athena++ names them; out_dir entries in the input
+    file are ignored in favour of output_dir.
+
+    Returns:
+    --------
+    HydroSolver in its final state
+    """
+    params = read_athinput(input_file, overrides)
+    problem_id = params.get('job', {}).get('problem_id', 'time_density')
+    time_p = params.get('time', {})
+    tlim = time_p.get('tlim', 1.0)
+    nlim = time_p.get('nlim', -1)
+    ncycle_out = time_p.get('ncycle_out', 1)
+    os.makedirs(output_dir, exist_ok=True)
+
+    outputs = []
+    for block in sorted((b for b in params if b.startswith('output')),
+                        key=lambda b: int(b[6:] or 0)):
+        spec = params[block]
+        file_type = spec.get('file_type')
+        if file_type not in ('vtk', 'hst'):
+            print(f"Skipping <{block}>: file_type {file_type} is not supported")
+            continue
+        outputs.append({'type': file_type, 'dt': spec.get('dt', tlim),
+                        'id': spec.get('id', f"out{block[6:]}"),
+                        'variable': spec.get('variable', 'prim'),
+                        'next_time': time_p.get('start_time', 0.0), 'number': 0,
+                        'last_time': None})
+
+    hst_path = os.path.join(output_dir, f"{problem_id}.hst")
+
+    def write_outputs(solver, force=False):
+        for out in outputs:
+            due = solver.time >= out['next_time'] - 1e-12 * max(1.0, abs(tlim))
+            if not (due or (force and out['last_time'] != solver.time)):
+                continue
+            if out['type'] == 'vtk':
+                name = f"{problem_id}.block0.{out['id']}.{out['number']:05d}.vtk"
+                write_athena_vtk(os.path.join(output_dir, name), solver.time, solver.cycle,
+                                 solver.mesh.coordinates(),
+                                 solver.output_fields(out['variable']), out['variable'])
+                out['number'] += 1
+            else:
+                new_file = out['last_time'] is None
+                with open(hst_path, 'w' if new_file else 'a') as f:
+                    if new_file:
+                        write_history_header(f)
+                    write_history_row(f, solver.history())
+            out['last_time'] = solver.time
+            if due:
+                skipped = np.floor((solver.time - out['next_time']) / out['dt'])
+                out['next_time'] += out['dt'] * (max(skipped, 0) + 1)
+
+    with solver_from_params(params, threads) as solver:
+        write_outputs(solver)
+        while solver.time < tlim and (nlim < 0 or solver.cycle < nlim):
+            dt = solver.new_timestep()
+            solver.step(min(dt, tlim - solver.time))
+            if verbose and ncycle_out > 0 and solver.cycle % ncycle_out == 0:
+                print(f"cycle={solver.cycle} time={solver.time:e} dt={solver.dt:e}")
+            write_outputs(solver)
+        write_outputs(solver, force=True)
+    return solver
+
+
+def main():
+    parser = argparse.ArgumentParser(description='NumPy finite-volume hydro solver for athinput files')
+    parser.add_argument('-i', '--input', required=True, help='athinput file')
+    parser.add_argument('-d', '--output-dir', default='.', help='Output directory (default: .)')
+    parser.add_argument('-t', '--threads', type=int, default=None,
+                        help='Slab worker threads (default: number of CPUs)')
+    parser.add_argument('-q', '--quiet', action='store_true', help='No per-cycle log')
+    parser.add_argument('overrides', nargs='*', help='Parameter overrides block/key=value')
+    args = parser.parse_args()
+
+    try:
+        solver = run_athinput(args.input, args.output_dir, args.overrides,
+                              threads=args.threads, verbose=not args.quiet)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+    print(f"Finished at time={solver.time:e} after {solver.cycle} cycles; "
+          f"outputs in {args.output_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
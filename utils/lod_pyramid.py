@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Multi-resolution level-of-detail pyramids for large fields
+Writes, next to a snapshot, levels 1, 2, ... coarsened 2x per level along
+every direction with more than one cell, until a single cell remains. Each
+level holds the volume-weighted mean of every field (vectors per
+component) and the min and max over the fine cells it covers, so a coarse
+preview keeps the extremes visible. Level 0 is the snapshot itself.
+
+Levels are plain .npy files in a `<snapshot>.lod/` directory (or
+`<store>.lod/<frame>/` for frames of a utils/snapshot_store.py store),
+built slab by slab within the memory budget and read through memory maps,
+so asking for "the finest level under N cells" of a region reads only
+that region of that level. Cell volumes are those of the run's coordinate
+system (utils/geometry.py), so spherical_polar cells at larger r and
+near θ = π/2 weigh more.
+
+Usage: python -m utils.lod_pyramid build vtk_output/*.vtk [-i athinput.blast]
+       python -m utils.lod_pyramid preview big.vtk --field rho --max-cells 65536 -o thumb.png
+"""
+
+import argparse
+import contextlib
+import glob
+import json
+import os
+import time
+
+import numpy as np
+
+from utils.athena_io import VTKField, read_vtk_coordinates, read_vtk_header
+from utils.geometry import athinput_grid, grid_geometry
+from utils.memory_budget import STORAGE_DTYPE, slab_rows
+
+PYRAMID_FORMAT = 'genesis-lod-pyramid'
+PYRAMID_VERSION = 2  # 2: volumes of the run's coordinate system
+PYRAMID_SUFFIX = '.lod'
+META_FILE = 'pyramid.json'
+STATS = ('mean', 'min', 'max')
+FACE_NAMES = ('x1f', 'x2f', 'x3f')
+
+
+def pyramid_path(source, frame=None):
+    """Pyramid directory of a VTK file, or of one frame of a snapshot store"""
+    if frame is None:
+        return source + PYRAMID_SUFFIX
+    return os.path.join(source + PYRAMID_SUFFIX, f"{frame:06d}")
+
+
+@contextlib.contextmanager
+def _open_source(source, frame=None):
+    """
+    (time, cycle, face coordinates, {field: slab-readable array-like}) of a
+    snapshot, as a context; a store opened for a frame is closed on exit
+    """
+    if frame is None:
+        header = read_vtk_header(source)
+        fields = {name: VTKField(source, name, header) for name in header['fields']}
+        yield header['time'], header['cycle'], read_vtk_coordinates(source, header), fields
+        return
+    from utils.snapshot_store import SnapshotStore
+    with SnapshotStore(source) as store:
+        meta = store.frames[frame]
+        fields = {name: store.field(frame, name) for name in store.fields}
+        yield meta['time'], meta['cycle'], dict(store.coords), fields
+
+
+def _pairs(n):
+    """reduceat indices grouping n cells in twos (the last group is single when n is odd)"""
+    return np.arange(0, n, 2)
+
+
+def _coarse_faces(faces, cells):
+    faces = np.asarray(faces, dtype=np.float64)
+    if faces.size != cells + 1:
+        return faces
+    return np.append(faces[:-1:2], faces[-1])
+
+
+def _block_weights(wz, wy, wx, vector):
+    weights = wz[:, None, None] * wy[None, :, None] * wx[None, None, :]
+    return weights[..., None] if vector else weights
+
+
+def coarsen(mean, low, high, wz, wy, wx):
+    """
+    One 2x coarsening step of a slab with an even number of rows (or the
+    last, odd slab): volume-weighted mean of `mean`, min of `low` and max
+    of `high` over each 2x2x2 block. wz, wy, wx are the per-direction
+    volume factors of the fine cells (GridGeometry.volume_factors).
+
+    Returns:
+    --------
+    (mean, min, max) float32 arrays
+    """
+    vector = mean.ndim == 4
+    iz, iy, ix = _pairs(len(wz)), _pairs(len(wy)), _pairs(len(wx))
+    weighted = np.asarray(mean, dtype=np.float64) * _block_weights(wz, wy, wx, vector)
+    for axis, index in enumerate((iz, iy, ix)):
+        weighted = np.add.reduceat(weighted, index, axis=axis)
+        low = np.minimum.reduceat(low, index, axis=axis)
+        high = np.maximum.reduceat(high, index, axis=axis)
+    volume = _block_weights(np.add.reduceat(wz, iz), np.add.reduceat(wy, iy),
+                            np.add.reduceat(wx, ix), vector)
+    return ((weighted / volume).astype(STORAGE_DTYPE), low.astype(STORAGE_DTYPE),
+            high.astype(STORAGE_DTYPE))
+
+
+def _level_file(path, level, field, stat):
+    return os.path.join(path, f"level{level:02d}", f"{field}.{stat}.npy")
+
+
+def build_pyramid(source, frame=None, output=None, fields=None, coord=None, athinput=None):
+    """
+    Write the pyramid of a VTK snapshot (or of frame `frame` of a snapshot
+    store) and return its directory. Each level is computed from the one
+    before in slabs of rows along nz. Means are weighted by the cell volumes
+    of the run's coordinate system, which (with the extent of collapsed
+    dimensions) comes from its athinput file when given; coord overrides it
+    (default 'cartesian').
+    """
+    limits = {}
+    if athinput:
+        input_coord, limits = athinput_grid(athinput)
+        coord = coord or input_coord
+    with _open_source(source, frame) as (time_value, cycle, faces, arrays):
+        geometry = grid_geometry(faces, coord or 'cartesian', limits)
+        return _write_levels(output or pyramid_path(source, frame), source, frame, time_value,
+                             cycle, faces, arrays, fields, geometry)
+
+
+def _write_levels(output, source, frame, time_value, cycle, faces, arrays, fields, geometry):
+    names = list(fields or arrays)
+    shape = tuple(arrays[names[0]].shape[:3])
+    # per-direction volume factors, separable in both coordinate systems (z, y, x order)
+    widths = geometry.volume_factors[::-1]
+    level_faces = {name: np.asarray(faces[name], dtype=np.float64) for name in FACE_NAMES}
+    levels = [{'shape': list(shape), 'faces': {k: v.tolist() for k, v in level_faces.items()}}]
+    # Level 0 is read from the source: its min and max are the values themselves
+    current = {name: (arrays[name], arrays[name], arrays[name]) for name in names}
+    level = 0
+    while max(shape) > 1:
+        level += 1
+        wz, wy, wx = widths
+        coarse_shape = tuple(len(_pairs(n)) for n in shape)
+        os.makedirs(os.path.dirname(_level_file(output, level, names[0], 'mean')), exist_ok=True)
+        next_level = {}
+        for name in names:
+            mean, low, high = current[name]
+            trailing = tuple(mean.shape[3:])
+            outputs = [np.lib.format.open_memmap(_level_file(output, level, name, stat), mode='w+',
+                                                 dtype=STORAGE_DTYPE,
+                                                 shape=coarse_shape + trailing)
+                       for stat in STATS]
+            # three fine slabs plus float64 temporaries per fine row
+            row_bytes = int(np.prod(mean.shape[1:])) * (3 * 4 + 3 * 8)
+            step = max(2, slab_rows(row_bytes) // 2 * 2)
+            for k0 in range(0, shape[0], step):
+                k1 = min(k0 + step, shape[0])
+                fine = np.asarray(mean[k0:k1])
+                if low is mean:
+                    slab = coarsen(fine, fine, fine, wz[k0:k1], wy, wx)
+                else:
+                    slab = coarsen(fine, np.asarray(low[k0:k1]), np.asarray(high[k0:k1]),
+                                   wz[k0:k1], wy, wx)
+                for out, values in zip(outputs, slab):
+                    out[k0 // 2:k0 // 2 + len(values)] = values
+            for out in outputs:
+                out.flush()
+            next_level[name] = tuple(outputs)
+        current = next_level
+        widths = [np.add.reduceat(w, _pairs(len(w))) for w in widths]
+        level_faces = {name: _coarse_faces(level_faces[name], n)
+                       for name, n in zip(FACE_NAMES, shape[::-1])}
+        shape = coarse_shape
+        levels.append({'shape': list(shape), 'faces': {k: v.tolist() for k, v in level_faces.items()}})
+    meta = {'format': PYRAMID_FORMAT, 'version': PYRAMID_VERSION,
+            'source': os.path.abspath(source), 'frame': frame, 'coord': geometry.coord,
+            'time': time_value,
+            'cycle': cycle, 'fields': {name: (arrays[name].shape[3] if len(arrays[name].shape) == 4
+                                              else 1) for name in names},
+            'stats': list(STATS), 'levels': levels}
+    with open(os.path.join(output, META_FILE), 'w') as f:
+        json.dump(meta, f)
+    return output
+
+
+class Pyramid:
+    """
+    Reader of a pyramid directory.
+
+    Attributes:
+    -----------
+    levels : list of dict
+        Per level: 'shape' (nz, ny, nx) and 'faces' {'x1f', 'x2f', 'x3f'}
+    fields : dict
+        {name: components}
+    """
+
+    def __init__(self, path):
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        if meta.get('format') != PYRAMID_FORMAT:
+            raise ValueError(f"{path} is not a level-of-detail pyramid")
+        self.path = path
+        self.meta = meta
+        self.levels = [{'shape': tuple(level['shape']),
+                        'faces': {k: np.asarray(v) for k, v in level['faces'].items()}}
+                       for level in meta['levels']]
+        self.fields = meta['fields']
+        self.time = meta['time']
+
+    def _index_range(self, level, region):
+        """Cell index slices (z, y, x) of a level covering region ((x1 lo, hi), (x2 ...), (x3 ...))"""
+        shape = self.levels[level]['shape']
+        slices = [slice(0, n) for n in shape]
+        if region is None:
+            return tuple(slices)
+        for axis, (name, bounds) in enumerate(zip(FACE_NAMES, region)):
+            if bounds is None:
+                continue
+            faces = self.levels[level]['faces'][name]
+            cells = shape[2 - axis]
+            if faces.size != cells + 1:
+                continue
+            lo = max(0, int(np.searchsorted(faces, bounds[0], side='right')) - 1)
+            hi = min(cells, max(lo + 1, int(np.searchsorted(faces, bounds[1], side='left'))))
+            slices[2 - axis] = slice(lo, hi)
+        return tuple(slices)
+
+    def cells(self, level, region=None):
+        return int(np.prod([s.stop - s.start for s in self._index_range(level, region)]))
+
+    def level_under(self, max_cells, region=None):
+        """The finest level whose cells covering `region` number at most max_cells"""
+        for level in range(len(self.levels)):
+            if self.cells(level, region) <= max_cells:
+                return level
+        return len(self.levels) - 1
+
+    def level_array(self, field, level, stat='mean'):
+        """Read-only memory map of one statistic of a field on a coarse level (level >= 1)"""
+        if not 1 <= level < len(self.levels):
+            raise ValueError(f"level must be 1 to {len(self.levels) - 1}, got {level}")
+        return np.load(_level_file(self.path, level, field, stat), mmap_mode='r')
+
+    def read(self, field, level, region=None, stat='mean'):
+        """
+        One statistic of a field on one level, cropped to `region`.
+
+        Returns:
+        --------
+        (values, faces): float32 array (nz, ny, nx[, components]) and the
+        face coordinates {'x1f', 'x2f', 'x3f'} of the returned cells
+        """
+        if field not in self.fields:
+            raise ValueError(f"field {field!r} not in the pyramid ({', '.join(self.fields)})")
+        if stat not in STATS:
+            raise ValueError(f"stat must be one of {', '.join(STATS)}, got {stat!r}")
+        index = self._index_range(level, region)
+        if level == 0:
+            # the source itself; VTKField/StoreField read only rows index[0]
+            with _open_source(self.meta['source'], self.meta['frame']) as (_, _, _, arrays):
+                values = np.asarray(arrays[field][index[0]])[:, index[1], index[2]]
+        else:
+            values = np.array(self.level_array(field, level, stat)[index])
+        faces = {}
+        for axis, name in enumerate(FACE_NAMES):
+            level_faces = self.levels[level]['faces'][name]
+            cells = self.levels[level]['shape'][2 - axis]
+            s = index[2 - axis]
+            faces[name] = level_faces[s.start:s.stop + 1] if level_faces.size == cells + 1 else level_faces
+        return values, faces
+
+    def read_under(self, field, max_cells, region=None, stat='mean'):
+        """read() of the finest level under max_cells cells; returns (values, faces, level)"""
+        level = self.level_under(max_cells, region)
+        values, faces = self.read(field, level, region, stat)
+        return values, faces, level
+
+
+def open_pyramid(source, frame=None):
+    """
+    The pyramid of a snapshot, or None if it has not been built, was
+    written by an older version or (for a VTK file) is older than the file.
+    Stored frames never change, so their pyramids stay valid when frames
+    are appended to the store.
+    """
+    path = pyramid_path(source, frame)
+    meta_file = os.path.join(path, META_FILE)
+    if not os.path.exists(meta_file):
+        return None
+    if frame is None and os.path.getmtime(meta_file) < os.path.getmtime(source):
+        return None
+    pyramid = Pyramid(path)
+    return pyramid if pyramid.meta.get('version') == PYRAMID_VERSION else None
+
+
+def preview_plane(values, component=None):
+    """Mid-plane (ny, nx) of a level (or its only plane in 2D), one component of vectors"""
+    plane = values[values.shape[0] // 2]
+    if plane.ndim == 3:
+        plane = (np.linalg.norm(plane, axis=-1) if component is None else plane[..., component])
+    return plane
+
+
+def _parse_frames(text, count):
+    if text is None:
+        return list(range(count))
+    frames = []
+    for part in text.split(','):
+        start, _, stop = part.partition('-')
+        frames += list(range(int(start), int(stop or start) + 1))
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Level-of-detail pyramids for large fields')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help='Build pyramids of VTK files or store frames')
+    build_parser.add_argument('inputs', nargs='+', help='VTK files, glob patterns or .gsnap stores')
+    build_parser.add_argument('--frames', help='Store frames such as 0-9,20 (default: all)')
+    build_parser.add_argument('--force', action='store_true', help='Rebuild up-to-date pyramids')
+    build_parser.add_argument('-i', '--input', default=None,
+                              help='athinput file of the run (coordinate system and collapsed extents)')
+    build_parser.add_argument('--coord', choices=('cartesian', 'spherical_polar'), default=None)
+    preview_parser = subparsers.add_parser('preview', help='Save a mid-plane thumbnail')
+    preview_parser.add_argument('input', help='VTK file (or .gsnap store with --frame)')
+    preview_parser.add_argument('--frame', type=int, help='Frame of a store')
+    preview_parser.add_argument('--field', default='rho')
+    preview_parser.add_argument('--stat', default='mean', choices=STATS)
+    preview_parser.add_argument('--max-cells', type=int, default=1 << 16,
+                                help='Largest level to read, in cells (default: 65536)')
+    preview_parser.add_argument('-o', '--output', required=True, help='Image file (PNG)')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'build':
+            for pattern in args.inputs:
+                for source in sorted(glob.glob(pattern)) or [pattern]:
+                    if source.endswith('.gsnap'):
+                        from utils.snapshot_store import SnapshotStore
+                        with SnapshotStore(source) as store:
+                            frames = _parse_frames(args.frames, len(store))
+                    else:
+                        frames = [None]
+                    for frame in frames:
+                        label = source if frame is None else f"{source} frame {frame}"
+                        if not args.force and open_pyramid(source, frame) is not None:
+                            print(f"{label}: up to date")
+                            continue
+                        start = time.perf_counter()
+                        path = build_pyramid(source, frame, coord=args.coord,
+                                             athinput=args.input)
+                        print(f"{label}: {len(Pyramid(path).levels) - 1} levels in {path} "
+                              f"({time.perf_counter() - start:.2f} s)")
+            return 0
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        start = time.perf_counter()
+        pyramid = open_pyramid(args.input, args.frame)
+        if pyramid is None:
+            label = args.input if args.frame is None else f"{args.input} frame {args.frame}"
+            raise ValueError(f"no up-to-date pyramid for {label}; run 'build' first")
+        values, _, level = pyramid.read_under(args.field, args.max_cells, stat=args.stat)
+        plane = preview_plane(values)
+        plt.imsave(args.output, plane, origin='lower', cmap='viridis')
+        print(f"Level {level} {tuple(values.shape[:3])} of {args.field} written to {args.output} "
+              f"({time.perf_counter() - start:.3f} s)")
+        return 0
+    except (OSError, ValueError, KeyError, IndexError) as e:
+        print(f"Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Precision policy and memory budget for the analysis tools
+Snapshot fields are stored and passed around as native float32 (Athena++
+writes float32); only reductions accumulate in float64. Large arrays are
+processed in slabs along their first axis, sized so that the working set
+of one slab stays within a configurable memory budget instead of scaling
+with the grid.
+
+The budget defaults to 256 MiB and can be set with set_memory_budget() or
+the GENESIS_MEMORY_BUDGET environment variable (e.g. "1G", "512M").
+"""
+
+import os
+import re
+
+import numpy as np
+
+STORAGE_DTYPE = np.dtype(np.float32)  # field storage
+ACCUMULATOR_DTYPE = np.dtype(np.float64)  # sums, means and integrals
+
+MEMORY_BUDGET_ENV = 'GENESIS_MEMORY_BUDGET'
+DEFAULT_MEMORY_BUDGET = 256 * 2**20
+
+_UNITS = {'': 1, 'K': 2**10, 'M': 2**20, 'G': 2**30, 'T': 2**40}
+
+_budget = None
+
+
+def parse_bytes(text):
+    """'512M', '2G', '1.5GiB' or a plain byte count -> bytes"""
+    match = re.fullmatch(r'\s*([0-9.]+)\s*([kKmMgGtT]?)(i?[bB])?\s*', str(text))
+    if not match:
+        raise ValueError(f"Memory size must look like 512M or 2G, got {text!r}")
+    return int(float(match.group(1)) * _UNITS[match.group(2).upper()])
+
+
+def memory_budget():
+    """Current budget in bytes (set_memory_budget, else $GENESIS_MEMORY_BUDGET, else 256 MiB)"""
+    if _budget is not None:
+        return _budget
+    value = os.environ.get(MEMORY_BUDGET_ENV)
+    return parse_bytes(value) if value else DEFAULT_MEMORY_BUDGET
+
+
+def set_memory_budget(value):
+    """Set the budget (bytes or a string like '1G'); None restores the default"""
+    global _budget
+    _budget = None if value is None else parse_bytes(value)
+    return _budget
+
+
+def slab_rows(row_bytes, budget=None):
+    """Rows of `row_bytes` working-set bytes each that fit the budget (at least 1)"""
+    budget = memory_budget() if budget is None else budget
+    return max(1, int(budget // max(1, row_bytes)))
+
+
+def slabs(n_rows, row_bytes, budget=None):
+    """Yield (start, stop) row ranges covering n_rows within the budget"""
+    step = slab_rows(row_bytes, budget)
+    for start in range(0, n_rows, step):
+        yield start, min(start + step, n_rows)
+
+
+def native(array, dtype=STORAGE_DTYPE):
+    """
+    Native-endian `dtype` version of an array or slab. Arrays that already
+    qualify are returned as they are; a writable big-endian float32 array
+    is byte-swapped in place rather than copied.
+    """
+    array = np.asarray(array)
+    if array.dtype == dtype:
+        return array
+    if (array.dtype.kind == dtype.kind and array.dtype.itemsize == dtype.itemsize
+            and array.flags.writeable and array.flags.owndata):
+        return array.byteswap(inplace=True).view(array.dtype.newbyteorder('='))
+    return array.astype(dtype)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Process-parallel frame renderer for the Genesis-Sphere animations
+Frame ranges are split across worker processes, each owning its own figure.
+Workers render to in-memory RGBA buffers, map them onto a shared palette and
+hand the frames back in order to a streaming GIF encoder. Only a bounded
+number of chunks is ever in flight, so memory does not grow with the
+number of frames.
+"""
+
+import os
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from utils.gif_writer import (StreamingGifWriter, build_palette, palette_bytes,
+                              palette_image, rgba_to_palette)
+
+# Scene owned by the current worker process (built once by _init_worker)
+_scene = None
+
+
+def _init_worker(scene_factory, factory_args):
+    """Build this worker's private figure/scene"""
+    global _scene
+    import matplotlib
+    matplotlib.use('Agg')
+    _scene = scene_factory(*factory_args)
+
+
+def _frame_count():
+    return _scene.n_frames
+
+
+def _render_rgba(frames):
+    """Render frames to full RGBA buffers (used for palette sampling)"""
+    return [_scene.render_frame(frame).copy() for frame in frames]
+
+
+def _render_range(start, stop, raw_palette):
+    """Render frames [start, stop) and return their palette-index bytes"""
+    palette = palette_image(raw_palette)
+    size, chunk = None, []
+    for frame in range(start, stop):
+        image = rgba_to_palette(_scene.render_frame(frame), palette)
+        size = image.size
+        chunk.append(image.tobytes())
+    return size, chunk
+
+
+def render_parallel(scene_factory, path, fps=10, workers=None, chunk_size=4,
+                    max_pending=None, palette_samples=4, factory_args=()):
+    """
+    Render an animation to a GIF using a pool of worker processes.
+
+    Parameters:
+    -----------
+    scene_factory : callable
+        Top-level (picklable) function returning an object with `n_frames`
+        and `render_frame(frame) -> RGBA array`, e.g. a PersistentAnimation
+    path : str
+        Output GIF path
+    fps : int
+        Frames per second of the GIF
+    workers : int
+        Number of worker processes (default: os.cpu_count()); 1 renders in-process
+    chunk_size : int
+        Consecutive frames rendered per task
+    max_pending : int
+        Maximum chunks in flight (default: 2 * workers); bounds memory use
+    palette_samples : int
+        Frames sampled to build the shared GIF palette
+    factory_args : tuple
+        Positional arguments passed to scene_factory in every worker
+
+    Returns:
+    --------
+    str : the output path
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        return scene_factory(*factory_args).save(path, fps=fps,
+                                                 palette_samples=palette_samples)
+
+    max_pending = max_pending or 2 * workers
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                             initargs=(scene_factory, factory_args)) as pool:
+        n_frames = pool.submit(_frame_count).result()
+        samples = np.unique(np.linspace(0, n_frames - 1, palette_samples).astype(int))
+        palette = build_palette(pool.submit(_render_rgba, samples.tolist()).result())
+        raw_palette = palette_bytes(palette)
+
+        ranges = iter([(start, min(start + chunk_size, n_frames))
+                       for start in range(0, n_frames, chunk_size)])
+        pending = deque()
+
+        def submit_next():
+            frame_range = next(ranges, None)
+            if frame_range is not None:
+                pending.append(pool.submit(_render_range, *frame_range, raw_palette))
+
+        for _ in range(max_pending):
+            submit_next()
+
+        with StreamingGifWriter(path, fps=fps, palette=palette) as writer:
+            # Consume chunks strictly in order; refill the window as each drains
+            while pending:
+                size, chunk = pending.popleft().result()
+                submit_next()
+                for data in chunk:
+                    writer.write_indexed(data, size)
+    return path
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Asyncio pipeline of bounded stages
+Moves items (e.g. simulation runs) through a chain of stages connected by
+bounded asyncio queues, so that run A is loaded and analysed while run B
+is still simulating. Each stage calls its function either in the event
+loop (coroutine functions such as subprocess runs), in a thread pool
+(blocking I/O such as file loading) or in a process pool (NumPy work that
+would otherwise hold the GIL), with a given number of concurrent workers.
+A stage can only get `queue_size` items ahead of the next one, which
+bounds the data held in flight, and the wall time of a campaign
+approaches that of its slowest stage instead of the sum of all stages.
+
+Process pools use the spawn start method, as in utils/parallel_render.py;
+pass an initializer to set up module state (e.g. output directories) in
+the workers. With process_workers=1 there is no pool: 'process' work runs
+in the thread pool instead, which avoids the spawn start-up cost on
+single-core machines.
+
+Usage: async with Pipeline(stages) as pipeline: results = await pipeline.run(items)
+"""
+
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+EXECUTORS = ('async', 'thread', 'process')
+DEFAULT_QUEUE_SIZE = 1
+
+# function(item) returns the item passed on to the next stage; executor is
+# one of EXECUTORS; workers is the number of items the stage handles at once
+Stage = namedtuple('Stage', ['name', 'function', 'executor', 'workers'],
+                   defaults=('thread', 1))
+
+_DONE = object()  # end-of-stream marker
+
+
+class Pipeline:
+    """
+    Stages plus the thread and process pools they (and one-off join steps
+    submitted with call()) run in. Use as an async context manager so that
+    the pools are shut down.
+    """
+
+    def __init__(self, stages, queue_size=DEFAULT_QUEUE_SIZE, process_workers=None,
+                 initializer=None, initargs=()):
+        for stage in stages:
+            if stage.executor not in EXECUTORS:
+                raise ValueError(f"Stage {stage.name}: executor must be one of "
+                                 f"{', '.join(EXECUTORS)}, got {stage.executor!r}")
+            if stage.workers < 1:
+                raise ValueError(f"Stage {stage.name}: needs at least one worker")
+        self.stages = list(stages)
+        self.queue_size = max(1, queue_size)
+        self.process_workers = process_workers or max(
+            1, min(os.cpu_count() or 1, sum(s.workers for s in stages if s.executor == 'process')))
+        in_process = self.process_workers <= 1
+        thread_workers = sum(s.workers for s in stages
+                             if s.executor == 'thread' or (in_process and s.executor == 'process'))
+        self.threads = ThreadPoolExecutor(max_workers=max(4, thread_workers),
+                                          thread_name_prefix='pipeline')
+        self.processes = None if in_process else ProcessPoolExecutor(
+            max_workers=self.process_workers, mp_context=multiprocessing.get_context('spawn'),
+            initializer=initializer, initargs=initargs)
+
+    def warm(self):
+        """Start the worker processes now (spawn imports take a while) rather than on first use"""
+        for _ in range(self.process_workers if self.processes else 0):
+            self.processes.submit(int)
+
+    async def call(self, executor, function, *args):
+        """Run function(*args) in the 'thread' or 'process' pool (or await it for 'async')"""
+        if executor not in EXECUTORS:
+            raise ValueError(f"executor must be one of {', '.join(EXECUTORS)}, got {executor!r}")
+        if executor == 'async':
+            return await function(*args)
+        loop = asyncio.get_running_loop()
+        if executor == 'thread' or self.processes is None:
+            # Carry the caller's context along (as asyncio.to_thread does), e.g. for tracing
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(self.threads, functools.partial(context.run, function, *args))
+        return await loop.run_in_executor(self.processes, function, *args)
+
+    async def _worker(self, stage, source, sink):
+        while True:
+            item = await source.get()
+            if item is _DONE:
+                await source.put(_DONE)  # let the stage's other workers see it too
+                return
+            await sink.put(await self.call(stage.executor, stage.function, item))
+
+    async def _stage(self, stage, source, sink):
+        await asyncio.gather(*[self._worker(stage, source, sink) for _ in range(stage.workers)])
+        await sink.put(_DONE)
+
+    async def run(self, items):
+        """
+        Push items through every stage.
+
+        Returns:
+        --------
+        list of the last stage's results, in order of completion
+
+        The first exception raised by a stage cancels the other stages and
+        is re-raised here.
+        """
+        queues = [asyncio.Queue(self.queue_size) for _ in self.stages] + [asyncio.Queue()]
+
+        async def feed():
+            for item in items:
+                await queues[0].put(item)
+            await queues[0].put(_DONE)
+
+        tasks = [asyncio.ensure_future(feed())]
+        tasks += [asyncio.ensure_future(self._stage(stage, queues[i], queues[i + 1]))
+                  for i, stage in enumerate(self.stages)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        results = []
+        while True:
+            item = queues[-1].get_nowait()
+            if item is _DONE:
+                return results
+            results.append(item)
+
+    def close(self):
+        self.threads.shutdown(wait=True, cancel_futures=True)
+        if self.processes is not None:
+            self.processes.shutdown(wait=True, cancel_futures=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        # Pool shutdown blocks until running tasks finish; keep the loop responsive
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+        return False
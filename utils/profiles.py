@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Volume-weighted radial, angular and (r, θ) profiles of Athena++ snapshots
+Bins every cell by its spherical radius and polar angle and averages fields
+with the cell volumes as weights, so profiles of spherical_polar runs are
+physically meaningful shell/cone averages rather than averages over raw
+rows. The cell-to-bin map and the per-bin volumes are computed once per
+grid and cached; each profile of each snapshot is then a weighted
+np.bincount per slab, with slabs sized by the memory budget.
+
+Usage: python -m utils.profiles vtk_output/blast.block0.blast_td.*.vtk --field rho --kind radial -i time_density_blast.in --plot profiles.png
+"""
+
+import argparse
+import glob
+import hashlib
+
+import numpy as np
+
+from utils.athena_io import VTKField, read_vtk_header
+from utils.geometry import geometry_from_vtk
+from utils.memory_budget import slabs
+
+PROFILE_KINDS = ('radial', 'theta', 'rtheta')
+
+# Working set per cell of a slab: building the bin map (float64 r, θ and
+# int64 indices) and accumulating a profile (float64 weights and values)
+BUILD_BYTES_PER_CELL = 64
+PROFILE_BYTES_PER_CELL = 96
+
+_BINNER_CACHE = {}
+
+
+def default_edges(geometry, center=(0.0, 0.0, 0.0)):
+    """
+    Default (r_edges, theta_edges): the native faces on spherical_polar
+    grids (one bin per radial shell / polar cone), otherwise evenly spaced
+    bins out to the largest cell-centre radius.
+    """
+    if geometry.coord == 'spherical_polar':
+        return geometry.faces[1], geometry.faces[2]
+    n_r = max(geometry.shape) // 2 or 1
+    return (np.linspace(0.0, geometry.max_radius(center) * (1 + 1e-12), n_r + 1),
+            np.linspace(0.0, np.pi, max(n_r // 2, 1) + 1))
+
+
+class ProfileBinner:
+    """
+    Cell-to-bin map of one grid.
+
+    The radial and polar bin of every cell is stored in the smallest
+    unsigned integer type that holds the bin count, with one extra
+    'outside' bin for cells beyond the edges; (r, θ) bins and the cell
+    volumes are rebuilt per slab, so a binner costs a few bytes per cell.
+
+    Parameters:
+    -----------
+    geometry : utils.geometry.GridGeometry
+    r_edges, theta_edges : array
+        Bin edges (default: see default_edges); cells outside are ignored
+    center : tuple
+        Origin of r and θ on Cartesian grids
+    """
+
+    def __init__(self, geometry, r_edges=None, theta_edges=None, center=(0.0, 0.0, 0.0)):
+        defaults = default_edges(geometry, center)
+        self.geometry = geometry
+        self.r_edges = np.asarray(defaults[0] if r_edges is None else r_edges, dtype=np.float64)
+        self.theta_edges = np.asarray(defaults[1] if theta_edges is None else theta_edges,
+                                      dtype=np.float64)
+        self.n_r, self.n_theta = self.r_edges.size - 1, self.theta_edges.size - 1
+        self.size = {'radial': self.n_r, 'theta': self.n_theta,
+                     'rtheta': self.n_r * self.n_theta}
+
+        self.index = {'radial': np.empty(geometry.shape, dtype=np.min_scalar_type(self.n_r)),
+                      'theta': np.empty(geometry.shape, dtype=np.min_scalar_type(self.n_theta))}
+        for k0, k1 in self._slabs(BUILD_BYTES_PER_CELL):
+            r, theta = geometry.spherical_centres(center, k0, k1)
+            ir = np.searchsorted(self.r_edges, r, side='right') - 1
+            it = np.searchsorted(self.theta_edges, theta, side='right') - 1
+            # A cell exactly on the last edge belongs to the last bin
+            ir[r == self.r_edges[-1]] = self.n_r - 1
+            it[theta == self.theta_edges[-1]] = self.n_theta - 1
+            outside = (ir < 0) | (ir >= self.n_r) | (it < 0) | (it >= self.n_theta)
+            ir[outside] = self.n_r
+            it[outside] = self.n_theta
+            self.index['radial'][k0:k1] = ir
+            self.index['theta'][k0:k1] = it
+        self.bin_volume = self._sums(None, None, PROFILE_KINDS)
+
+    def _slabs(self, bytes_per_cell):
+        nz, ny, nx = self.geometry.shape
+        return slabs(nz, bytes_per_cell * ny * nx)
+
+    def _slab_index(self, kind, k0, k1):
+        """Flat bin index of the cells k0:k1; the outside bin is size[kind]"""
+        if kind != 'rtheta':
+            return self.index[kind][k0:k1].ravel()
+        ir = self.index['radial'][k0:k1].ravel().astype(np.int64)
+        it = self.index['theta'][k0:k1].ravel()
+        return np.where((ir < self.n_r) & (it < self.n_theta), ir * self.n_theta + it,
+                        self.size['rtheta'])
+
+    def _sums(self, field, weight, kinds):
+        """
+        Per-bin float64 sums of volume (× weight) (× field), accumulated over
+        slabs: {kind: (n_bins,)}, or (n_bins, components) with a field
+        """
+        sums = {}
+        for k0, k1 in self._slabs(PROFILE_BYTES_PER_CELL):
+            w = self.geometry.volume_slab(k0, k1).ravel()
+            if weight is not None:
+                w = w * np.asarray(weight[k0:k1], dtype=np.float64).ravel()
+            columns = [w]
+            if field is not None:
+                values = np.asarray(field[k0:k1])
+                values = values.reshape(w.size, -1)
+                columns = [w * values[:, c] for c in range(values.shape[1])]
+            for kind in kinds:
+                index = self._slab_index(kind, k0, k1)
+                n = self.size[kind] + 1
+                part = np.column_stack([np.bincount(index, weights=c, minlength=n)
+                                        for c in columns])
+                sums[kind] = part if kind not in sums else sums[kind] + part
+        return {kind: (values[:-1, 0] if field is None else values[:-1])
+                for kind, values in sums.items()}
+
+    def profile(self, field, kind='radial', weight=None):
+        """
+        Weighted bin averages of a field of shape (nz, ny, nx) or
+        (nz, ny, nx, 3). The field (and weight) may be arrays, memory maps
+        or slab readers such as utils.athena_io.VTKField; they are read
+        slab by slab within the memory budget and summed in float64.
+
+        weight : array, optional
+            Extra per-cell weight (e.g. density for mass-weighted profiles)
+
+        Returns:
+        --------
+        (n_bins,), or (n_r, n_theta) for kind='rtheta'; vectors get a
+        trailing component axis. Empty bins are NaN.
+        """
+        if kind not in PROFILE_KINDS:
+            raise ValueError(f"Unknown profile kind: {kind}")
+        if not hasattr(field, 'shape'):
+            field = np.asarray(field)
+        components = field.shape[3] if len(field.shape) == 4 else 0
+        norm = (self.bin_volume[kind] if weight is None
+                else self._sums(None, weight, [kind])[kind])
+        sums = self._sums(field, weight, [kind])[kind]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / norm[:, None]
+        means[norm == 0] = np.nan
+        means = means if components else means[:, 0]
+        if kind == 'rtheta':
+            return means.reshape((self.n_r, self.n_theta) + means.shape[1:])
+        return means
+
+    def centres(self, kind='radial'):
+        """Bin centres: r, θ, or (r, θ) for kind='rtheta'"""
+        r = 0.5 * (self.r_edges[:-1] + self.r_edges[1:])
+        theta = 0.5 * (self.theta_edges[:-1] + self.theta_edges[1:])
+        return {'radial': r, 'theta': theta, 'rtheta': (r, theta)}[kind]
+
+
+def profile_binner(geometry, r_edges=None, theta_edges=None, center=(0.0, 0.0, 0.0)):
+    """Cached ProfileBinner for a geometry from utils.geometry.grid_geometry"""
+    digest = hashlib.sha1(geometry.cache_key().encode('ascii'))
+    for values in (r_edges, theta_edges, center):
+        digest.update(b'-' if values is None
+                      else np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    key = digest.hexdigest()
+    binner = _BINNER_CACHE.get(key)
+    if binner is None:
+        binner = _BINNER_CACHE[key] = ProfileBinner(geometry, r_edges, theta_edges, center)
+    return binner
+
+
+def profile_sequence(files, field='rho', kind='radial', coord=None, athinput=None,
+                     r_edges=None, theta_edges=None, center=(0.0, 0.0, 0.0),
+                     weight_field=None):
+    """
+    Profiles of one field for every snapshot of a run.
+
+    Parameters:
+    -----------
+    files : list of str
+        Athena++ VTK snapshots of one run (same grid)
+    field : str
+        Field name ('rho', 'press', 'vel', ...)
+    kind : str
+        'radial', 'theta' or 'rtheta'
+    coord, athinput : str
+        Coordinate system and/or the run's athinput file (see
+        utils.geometry.geometry_from_vtk)
+    weight_field : str, optional
+        Field used as an extra weight ('rho' gives mass-weighted profiles)
+
+    Returns:
+    --------
+    (times (n,), binner, profiles (n, ...))
+    """
+    if not files:
+        raise ValueError("No snapshot files given")
+    header = read_vtk_header(files[0])
+    geometry = geometry_from_vtk(files[0], coord, athinput, header)
+    binner = profile_binner(geometry, r_edges, theta_edges, center)
+    times, profiles = [], []
+    for path in files:
+        header = read_vtk_header(path)
+        if header['cell_shape'] != geometry.shape:
+            raise ValueError(f"{path}: grid {header['cell_shape']} differs from {geometry.shape}")
+        if field not in header['fields']:
+            raise ValueError(f"{path}: no field {field}")
+        weight = VTKField(path, weight_field, header) if weight_field else None
+        profiles.append(binner.profile(VTKField(path, field, header), kind, weight))
+        times.append(header['time'])
+    return np.array(times), binner, np.array(profiles)
+
+
+def plot_profiles(times, binner, profiles, kind, field, output_path):
+    """Profiles coloured by time, or the meridional (r, θ) map of the last snapshot"""
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(8, 6))
+    if kind == 'rtheta':
+        r, theta = binner.r_edges, binner.theta_edges
+        rr, tt = np.meshgrid(r, theta, indexing='ij')
+        values = profiles[-1] if profiles.ndim == 3 else np.linalg.norm(profiles[-1], axis=-1)
+        mesh = ax.pcolormesh(rr * np.sin(tt), rr * np.cos(tt), values, shading='flat')
+        fig.colorbar(mesh, ax=ax, label=field)
+        ax.set_aspect('equal')
+        ax.set_xlabel('r sin θ')
+        ax.set_ylabel('r cos θ')
+        ax.set_title(f'{field} at t = {times[-1]:.3g}')
+    else:
+        x = binner.centres(kind)
+        colors = plt.cm.viridis(np.linspace(0, 1, len(times)))
+        for t, values, color in zip(times, profiles, colors):
+            if values.ndim == 2:
+                values = np.linalg.norm(values, axis=-1)
+            ax.plot(x, values, color=color, lw=1)
+        mappable = plt.cm.ScalarMappable(cmap='viridis',
+                                         norm=plt.Normalize(times.min(), times.max()))
+        fig.colorbar(mappable, ax=ax, label='time')
+        ax.set_xlabel('r' if kind == 'radial' else 'θ')
+        ax.set_ylabel(f'volume-weighted <{field}>')
+        ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+    fig.savefig(output_path, dpi=150)
+    plt.close(fig)
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Volume-weighted profiles of Athena++ snapshots')
+    parser.add_argument('files', nargs='+', help='VTK snapshots of one run')
+    parser.add_argument('--field', default='rho', help='Field to profile')
+    parser.add_argument('--kind', choices=PROFILE_KINDS, default='radial')
+    parser.add_argument('-i', '--input', default=None,
+                        help='athinput file of the run (coordinate system and collapsed extents)')
+    parser.add_argument('--coord', choices=('cartesian', 'spherical_polar'), default=None)
+    parser.add_argument('--nr', type=int, default=None, help='Radial bins (default: native)')
+    parser.add_argument('--ntheta', type=int, default=None, help='Polar bins (default: native)')
+    parser.add_argument('--center', type=float, nargs=3, default=(0.0, 0.0, 0.0),
+                        help='Origin of r on Cartesian grids')
+    parser.add_argument('--mass-weighted', action='store_true', help='Weight by rho as well')
+    parser.add_argument('-o', '--output', default=None, help='Save the profiles as .npz')
+    parser.add_argument('--plot', default=None, help='Save a plot of the profiles')
+    args = parser.parse_args()
+
+    files = sorted(f for pattern in args.files for f in (glob.glob(pattern) or [pattern]))
+    try:
+        header = read_vtk_header(files[0])
+        geometry = geometry_from_vtk(files[0], args.coord, args.input, header)
+        r_edges = theta_edges = None
+        if args.nr or args.ntheta:
+            default_r, default_theta = default_edges(geometry, args.center)
+            if args.nr:
+                r_edges = np.linspace(default_r[0], default_r[-1], args.nr + 1)
+            if args.ntheta:
+                theta_edges = np.linspace(default_theta[0], default_theta[-1], args.ntheta + 1)
+        times, binner, profiles = profile_sequence(
+            files, args.field, args.kind, args.coord, args.input, r_edges, theta_edges,
+            args.center, 'rho' if args.mass_weighted else None)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    print(f"{len(files)} snapshots, {geometry.coord} grid {geometry.shape}, "
+          f"{binner.size[args.kind]} {args.kind} bins")
+    if args.kind != 'rtheta':
+        x = binner.centres(args.kind)
+        last = profiles[-1] if profiles.ndim == 2 else np.linalg.norm(profiles[-1], axis=-1)
+        step = max(1, x.size // 16)
+        print(f"{'r' if args.kind == 'radial' else 'theta':>12s} {args.field + ' (t=%.3g)' % times[-1]:>16s}")
+        for xi, value in zip(x[::step], last[::step]):
+            print(f"{xi:12.5g} {value:16.6e}")
+    if args.output:
+        np.savez(args.output, times=times, r_edges=binner.r_edges,
+                 theta_edges=binner.theta_edges, profiles=profiles)
+        print(f"Profiles saved to {args.output}")
+    if args.plot:
+        plot_profiles(times, binner, profiles, args.kind, args.field, args.plot)
+        print(f"Plot saved to {args.plot}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Batched N-dimensional rotation and projection engine for the Genesis-Sphere project
+Builds rotation matrices for any dimension n from any set of rotation planes
+(including double rotations such as xw + yz) for every frame at once, and
+projects all vertices of all frames down to 3D in a single einsum over a
+(frames x vertices x n) array.
+"""
+
+import numpy as np
+
+
+def plane_rotations(n, planes, angles):
+    """
+    Rotation matrices composed from Givens rotations in the given planes.
+
+    Parameters:
+    -----------
+    n : int
+        Dimension of the space
+    planes : list of (int, int)
+        Coordinate planes to rotate in, e.g. [(0, 3)] for the x-w plane or
+        [(0, 3), (1, 2)] for a double rotation
+    angles : float or array
+        Scalar (same angle in every plane), (frames,) for a single plane,
+        (len(planes),) for a single frame, or (frames, len(planes))
+
+    Returns:
+    --------
+    ndarray : (n, n) for a scalar angle, otherwise (frames, n, n)
+    """
+    planes = [tuple(plane) for plane in planes]
+    for i, j in planes:
+        if i == j or not (0 <= i < n and 0 <= j < n):
+            raise ValueError(f"Invalid rotation plane ({i}, {j}) for dimension {n}")
+
+    angles = np.asarray(angles, dtype=float)
+    scalar = angles.ndim == 0
+    if angles.ndim == 0:
+        angles = np.full((1, len(planes)), float(angles))
+    elif angles.ndim == 1 and len(planes) == 1:
+        angles = angles[:, None]
+    elif angles.ndim == 1:
+        # One angle per plane, single frame
+        angles = angles[None, :]
+        scalar = True
+    if angles.shape[1] != len(planes):
+        raise ValueError(f"Expected {len(planes)} angles per frame, got {angles.shape[1]}")
+
+    cos, sin = np.cos(angles), np.sin(angles)
+    rotation = np.broadcast_to(np.eye(n), (angles.shape[0], n, n)).copy()
+    # Each Givens rotation only mixes two rows, so compose them row-wise
+    for p, (i, j) in enumerate(planes):
+        c, s = cos[:, p, None], sin[:, p, None]
+        row_i, row_j = rotation[:, i, :].copy(), rotation[:, j, :]
+        rotation[:, i, :] = c * row_i - s * row_j
+        rotation[:, j, :] = s * row_i + c * row_j
+    return rotation[0] if scalar else rotation
+
+
+def smooth_rotation(n, planes, n_frames, speeds, phases=0.0):
+    """(frames, n, n) rotations at constant angular speed (radians/frame) per plane"""
+    t = np.arange(n_frames, dtype=float)[:, None]
+    angles = t * np.atleast_1d(np.asarray(speeds, dtype=float)) + phases
+    return plane_rotations(n, planes, angles)
+
+
+def project(points, rotations, mode='perspective', distance=2.0, target_dim=3):
+    """
+    Rotate n-D points and project them down to target_dim.
+
+    Parameters:
+    -----------
+    points : array
+        (V, n) static vertices or (frames, V, n) per-frame vertices
+    rotations : array
+        (n, n) or (frames, n, n) rotation matrices
+    mode : str
+        'perspective' divides by (distance - x_k) for every dropped axis k,
+        from the last down to target_dim; 'orthographic' simply drops them
+    distance : float
+        Viewer distance along each dropped axis (perspective mode)
+    target_dim : int
+        Output dimension
+
+    Returns:
+    --------
+    ndarray : (V, target_dim) or (frames, V, target_dim)
+    """
+    points = np.asarray(points, dtype=float)
+    rotations = np.asarray(rotations, dtype=float)
+    subscripts = {(2, 2): 'ij,vj->vi', (3, 2): 'fij,vj->fvi',
+                  (2, 3): 'ij,fvj->fvi', (3, 3): 'fij,fvj->fvi'}
+    rotated = np.einsum(subscripts[rotations.ndim, points.ndim], rotations, points,
+                        optimize=True)
+
+    if mode == 'orthographic':
+        return rotated[..., :target_dim]
+    if mode != 'perspective':
+        raise ValueError(f"Unknown projection mode: {mode}")
+
+    n = rotated.shape[-1]
+    if n <= target_dim:
+        return rotated
+    # Fold the successive perspective divisions into one scale per vertex
+    scale = np.ones(rotated.shape[:-1])
+    for k in range(n - 1, target_dim - 1, -1):
+        scale = scale / (distance - rotated[..., k] * scale)
+    return rotated[..., :target_dim] * scale[..., None]
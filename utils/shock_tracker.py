@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Vectorized shock-front tracking for blast runs
+Finds the leading shock of every snapshot from the relative pressure (or
+density) jump across neighbouring cells, evaluated on the whole grid at
+once. Cells are grouped by their direction from the blast centre; the
+shock radius of a direction is the distance of its outermost flagged cell,
+found with one scatter-max over direction bins precomputed per grid. Grids
+are processed in slabs sized by the memory budget. Frames of
+any number of runs are tracked in parallel worker processes, giving shock
+radius, speed and asymmetry against time for each run.
+
+Usage: python -m utils.shock_tracker standard_output/ td_output/ -i time_density_blast.in --plot shock.png
+"""
+
+import argparse
+import csv
+import glob
+import hashlib
+import multiprocessing
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from utils.athena_io import VTKField, read_athinput, read_vtk_header
+from utils.geometry import geometry_from_vtk
+from utils.memory_budget import slabs
+
+# times (n,), radii (n, n_directions) with NaN where no shock was found,
+# directions: angle (2D) / sign (1D) / (θ, φ) pairs (3D) of each direction bin;
+# radius: direction average, speed: d radius / dt, asymmetry: (max - min) / mean,
+# spread: standard deviation / mean over directions
+ShockTrack = namedtuple('ShockTrack', ['times', 'radii', 'directions', 'radius',
+                                       'speed', 'asymmetry', 'spread'])
+
+# Working set per cell of a slab: building the direction bins (float64
+# positions and angles) and computing jumps (float64 field, padded copy, neighbours)
+BUILD_BYTES_PER_CELL = 96
+JUMP_BYTES_PER_CELL = 64
+
+_TRACKER_CACHE = {}
+
+
+def blast_centre(athinput=None):
+    """
+    Blast centre in Cartesian coordinates from the <problem> block
+    (center_x1.. or x1_0.., in the run's native coordinates); the origin
+    when there is no input file or no centre.
+    """
+    if not athinput:
+        return (0.0, 0.0, 0.0)
+    params = read_athinput(athinput)
+    problem = params.get('problem', {})
+    coord = params.get('mesh', {}).get('coord', params.get('job', {}).get('coord', 'cartesian'))
+    if coord == 'spherical_polar':
+        if 'center_x1' not in problem:
+            return (0.0, 0.0, 0.0)
+        r, theta, phi = (float(problem.get(key, default)) for key, default in
+                         (('center_x1', 0.0), ('center_x2', 0.5 * np.pi), ('center_x3', 0.0)))
+        return (r * np.sin(theta) * np.cos(phi), r * np.sin(theta) * np.sin(phi),
+                r * np.cos(theta))
+    return tuple(float(problem.get(f'center_x{d}', problem.get(f'x{d}_0', 0.0)))
+                 for d in (1, 2, 3))
+
+
+class ShockTracker:
+    """
+    Direction bin and float32 distance from the centre of every cell of
+    one grid.
+
+    Parameters:
+    -----------
+    geometry : utils.geometry.GridGeometry
+    center : tuple
+        Blast centre (x, y, z)
+    n_directions : int
+        Angular bins in the plane of a 2D grid, or polar bins of a 3D grid
+        (which get 2 * n_directions azimuthal bins); default: half the
+        smallest active cell count, between 8 and 64. 1D grids always have
+        two directions, either side of the centre
+    threshold : float
+        Minimum relative jump |q[i+1] - q[i-1]| / min(q[i+1], q[i-1])
+        flagged as shocked
+    relative : float
+        A cell is also required to reach this fraction of the largest jump
+        on the grid, which keeps weak waves and noise out as the shock weakens
+    """
+
+    def __init__(self, geometry, center=(0.0, 0.0, 0.0), n_directions=None, threshold=0.05,
+                 relative=0.3):
+        self.geometry = geometry
+        self.threshold = threshold
+        self.relative = relative
+        active = [d for d in (1, 2, 3) if geometry.widths[d].size > 1]
+        self.axes = [3 - d for d in active]
+        ndim = len(active)
+        if n_directions is None:
+            n_directions = max(8, min(64, min(geometry.widths[d].size for d in active) // 2))
+
+        n_bins = 2 if ndim == 1 else n_directions if ndim == 2 else 2 * n_directions**2
+        self.bins = np.empty(geometry.shape, dtype=np.min_scalar_type(n_bins - 1))
+        self.distance = np.empty(geometry.shape, dtype=np.float32)
+        for k0, k1 in slabs(geometry.shape[0], BUILD_BYTES_PER_CELL * self._row_cells):
+            self.bins[k0:k1], self.distance[k0:k1] = self._direction_bins(
+                geometry, center, active, n_directions, k0, k1)
+
+        if ndim == 1:
+            self.directions = np.array([-1.0, 1.0])
+            self.weights = np.ones(2)
+        elif ndim == 2:
+            edges = np.linspace(-np.pi, np.pi, n_directions + 1)
+            self.directions = 0.5 * (edges[:-1] + edges[1:])
+            self.weights = np.ones(n_directions)
+        else:
+            n_theta, n_phi = n_directions, 2 * n_directions
+            theta_edges = np.linspace(0, np.pi, n_theta + 1)
+            phi_edges = np.linspace(-np.pi, np.pi, n_phi + 1)
+            tc = 0.5 * (theta_edges[:-1] + theta_edges[1:])
+            pc = 0.5 * (phi_edges[:-1] + phi_edges[1:])
+            self.directions = np.stack(np.meshgrid(tc, pc, indexing='ij'), -1).reshape(-1, 2)
+            self.weights = np.repeat(np.cos(theta_edges[:-1]) - np.cos(theta_edges[1:]), n_phi)
+
+    @property
+    def _row_cells(self):
+        return self.geometry.shape[1] * self.geometry.shape[2]
+
+    @staticmethod
+    def _direction_bins(geometry, center, active, n_directions, k0, k1):
+        """Direction bin and distance from the centre of the cells k0:k1 along x3"""
+        x, y, z = geometry.cartesian_centres(k0, k1)
+        dx, dy, dz = x - center[0], y - center[1], z - center[2]
+        distance = np.sqrt(dx**2 + dy**2 + dz**2)
+
+        if len(active) == 1:
+            # Either side of the centre along the single active axis
+            d = active[0]
+            shape = [1, 1, 1]
+            shape[3 - d] = -1
+            values = geometry.centres[d][k0:k1] if d == 3 else geometry.centres[d]
+            native = values.reshape(shape)
+            if geometry.coord == 'cartesian':
+                origin = center[d - 1]
+            else:
+                origin = np.sqrt(center[0]**2 + center[1]**2 + center[2]**2)
+            return native >= origin, distance
+        if len(active) == 2:
+            if geometry.coord == 'spherical_polar':
+                # Meridional plane: cylindrical radius and height
+                u, v = np.hypot(x, y) - np.hypot(center[0], center[1]), dz
+            else:
+                planes = {(1, 2): (dx, dy), (1, 3): (dx, dz), (2, 3): (dy, dz)}
+                u, v = planes[tuple(active)]
+            edges = np.linspace(-np.pi, np.pi, n_directions + 1)
+            bins = np.searchsorted(edges, np.arctan2(v, u), side='right') - 1
+            return np.clip(bins, 0, n_directions - 1), distance
+        theta = np.arccos(np.clip(dz / np.where(distance > 0, distance, 1), -1, 1))
+        phi = np.arctan2(dy, dx)
+        n_theta, n_phi = n_directions, 2 * n_directions
+        theta_edges = np.linspace(0, np.pi, n_theta + 1)
+        phi_edges = np.linspace(-np.pi, np.pi, n_phi + 1)
+        it = np.clip(np.searchsorted(theta_edges, theta, side='right') - 1, 0, n_theta - 1)
+        ip = np.clip(np.searchsorted(phi_edges, phi, side='right') - 1, 0, n_phi - 1)
+        return it * n_phi + ip, distance
+
+    def jumps(self, field, k0=0, k1=None):
+        """
+        Largest relative jump across each cell along the active axes,
+        (nz, ny, nx), or (k1 - k0, ny, nx) for the slab k0:k1 along x3 (read
+        with one halo row on each side)
+        """
+        nz = self.geometry.shape[0]
+        k1 = nz if k1 is None else k1
+        lo, hi = max(k0 - 1, 0), min(k1 + 1, nz)
+        q = np.asarray(field[lo:hi], dtype=np.float64)
+        jump = np.zeros(q.shape)
+        for axis in self.axes:
+            padded = np.concatenate([np.take(q, [0], axis=axis), q,
+                                     np.take(q, [-1], axis=axis)], axis=axis)
+            n = q.shape[axis]
+            left = np.take(padded, np.arange(n), axis=axis)
+            right = np.take(padded, np.arange(2, n + 2), axis=axis)
+            floor = np.maximum(np.minimum(np.abs(left), np.abs(right)), 1e-300)
+            np.maximum(jump, np.abs(right - left) / floor, out=jump)
+        return jump[k0 - lo:k1 - lo]
+
+    def front(self, field):
+        """
+        Shock radius of every direction bin (NaN where nothing is flagged).
+
+        The field (an array, memory map or utils.athena_io.VTKField) is
+        processed in slabs; cells above `threshold` are kept as candidates
+        until the largest jump, and with it the flagging level, is known.
+        """
+        row_cells = self._row_cells
+        peak, cells, jumps = 0.0, [], []
+        for k0, k1 in slabs(self.geometry.shape[0], JUMP_BYTES_PER_CELL * row_cells):
+            jump = self.jumps(field, k0, k1).ravel()
+            peak = max(peak, float(jump.max()))
+            hit = np.flatnonzero(jump >= self.threshold)
+            cells.append(hit + k0 * row_cells)
+            jumps.append(jump[hit])
+        level = max(self.threshold, self.relative * peak)
+        cells = np.concatenate(cells)[np.concatenate(jumps) >= level]
+        radii = np.full(self.directions.shape[0], -np.inf)
+        np.maximum.at(radii, self.bins.ravel()[cells],
+                      self.distance.ravel()[cells].astype(np.float64))
+        radii[radii == -np.inf] = np.nan
+        return radii
+
+
+def shock_tracker(geometry, center=(0.0, 0.0, 0.0), n_directions=None, threshold=0.05,
+                  relative=0.3):
+    """Cached ShockTracker per (geometry, centre, settings)"""
+    key = hashlib.sha1(repr((geometry.cache_key(), tuple(map(float, center)),
+                             n_directions, threshold, relative)).encode('ascii')).hexdigest()
+    tracker = _TRACKER_CACHE.get(key)
+    if tracker is None:
+        tracker = _TRACKER_CACHE[key] = ShockTracker(geometry, center, n_directions,
+                                                     threshold, relative)
+    return tracker
+
+
+def _track_frames(paths, field, coord, athinput, center, n_directions, threshold, relative):
+    """Shock radii of a list of snapshots of one run (runs in a worker)"""
+    results = []
+    for path in paths:
+        header = read_vtk_header(path)
+        geometry = geometry_from_vtk(path, coord, athinput, header)
+        tracker = shock_tracker(geometry, center, n_directions, threshold, relative)
+        results.append((header['time'], tracker.front(VTKField(path, field, header))))
+    return results
+
+
+def summarize(times, radii, directions, weights=None):
+    """Build a ShockTrack from per-direction radii"""
+    times = np.asarray(times, dtype=np.float64)
+    radii = np.asarray(radii, dtype=np.float64)
+    valid = np.isfinite(radii)
+    w = np.ones(radii.shape[1]) if weights is None else np.asarray(weights, dtype=np.float64)
+    w = np.where(valid, w, 0.0)
+    total = w.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        radius = np.where(total > 0, np.nansum(radii * w, axis=1) / total, np.nan)
+        spread = np.sqrt(np.nansum(w * (radii - radius[:, None])**2, axis=1) / total) / radius
+        asymmetry = (np.nanmax(np.where(valid, radii, -np.inf), axis=1)
+                     - np.nanmin(np.where(valid, radii, np.inf), axis=1)) / radius
+    asymmetry[total == 0] = np.nan
+    speed = np.gradient(radius, times) if times.size > 1 else np.full(times.size, np.nan)
+    return ShockTrack(times, radii, directions, radius, speed, asymmetry, spread)
+
+
+def run_files(run):
+    """Snapshot files of a run given as a directory or a glob pattern"""
+    pattern = os.path.join(run, '*.vtk') if os.path.isdir(run) else run
+    files = sorted(glob.glob(pattern))
+    if not files:
+        raise ValueError(f"No VTK snapshots match {run}")
+    return files
+
+
+def track_runs(runs, field='press', coord=None, athinput=None, center=None, n_directions=None,
+               threshold=0.05, relative=0.3, workers=None, chunk_size=4):
+    """
+    Track the shock of several runs, spreading all frames over a process pool.
+
+    Parameters:
+    -----------
+    runs : dict
+        {label: list of VTK snapshot paths}
+    field : str
+        'press' (default) or 'rho'
+    coord, athinput : str
+        Coordinate system and/or athinput file shared by the runs
+    center : tuple
+        Blast centre (x, y, z); default: from the athinput <problem> block
+    workers : int
+        Worker processes (default: os.cpu_count()); 1 tracks in-process
+
+    Returns:
+    --------
+    {label: ShockTrack}
+    """
+    center = tuple(center) if center is not None else blast_centre(athinput)
+    options = (field, coord, athinput, center, n_directions, threshold, relative)
+    tasks = [(label, files[i:i + chunk_size]) for label, files in runs.items()
+             for i in range(0, len(files), chunk_size)]
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tasks)))
+    if workers == 1:
+        results = [_track_frames(paths, *options) for _, paths in tasks]
+    else:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(workers, mp_context=context) as pool:
+            results = list(pool.map(_track_frames, *zip(*[(paths,) + options
+                                                           for _, paths in tasks])))
+
+    frames = {label: [] for label in runs}
+    for (label, _), chunk in zip(tasks, results):
+        frames[label].extend(chunk)
+
+    tracks = {}
+    for label, files in runs.items():
+        geometry = geometry_from_vtk(files[0], coord, athinput)
+        tracker = shock_tracker(geometry, center, n_directions, threshold, relative)
+        times = [t for t, _ in frames[label]]
+        radii = np.array([r for _, r in frames[label]])
+        tracks[label] = summarize(times, radii, tracker.directions, tracker.weights)
+    return tracks
+
+
+def compare_tracks(reference, other):
+    """Shock radius difference other - reference on the reference times (interpolated)"""
+    valid = np.isfinite(other.radius)
+    if valid.sum() < 2:
+        return np.full(reference.times.size, np.nan)
+    return np.interp(reference.times, other.times[valid], other.radius[valid],
+                     left=np.nan, right=np.nan) - reference.radius
+
+
+def write_tracks_csv(tracks, path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['run', 'time', 'radius', 'speed', 'asymmetry', 'spread'])
+        for label, track in tracks.items():
+            for row in zip(track.times, track.radius, track.speed, track.asymmetry, track.spread):
+                writer.writerow([label] + [f"{value:.6e}" for value in row])
+    return path
+
+
+def plot_tracks(tracks, output_path):
+    """Shock radius, speed and asymmetry against time for every run"""
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(3, 1, figsize=(9, 10), sharex=True)
+    for label, track in tracks.items():
+        axes[0].plot(track.times, track.radius, 'o-', ms=3, label=label)
+        axes[1].plot(track.times, track.speed, 'o-', ms=3, label=label)
+        axes[2].plot(track.times, track.asymmetry, 'o-', ms=3, label=label)
+    for ax, label in zip(axes, ('shock radius', 'shock speed', '(max - min) / mean radius')):
+        ax.set_ylabel(label)
+        ax.grid(True, alpha=0.3)
+    axes[0].legend()
+    axes[-1].set_xlabel('time')
+    fig.tight_layout()
+    fig.savefig(output_path, dpi=150)
+    plt.close(fig)
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Track blast-wave shock fronts in VTK snapshots')
+    parser.add_argument('runs', nargs='+',
+                        help='Runs: output directories or glob patterns of VTK snapshots')
+    parser.add_argument('-i', '--input', default=None,
+                        help='athinput file (coordinates, collapsed extents, blast centre)')
+    parser.add_argument('--coord', choices=('cartesian', 'spherical_polar'), default=None)
+    parser.add_argument('--field', default='press', help='Field whose jumps mark the shock')
+    parser.add_argument('--center', type=float, nargs=3, default=None,
+                        help='Blast centre x y z (default: from the athinput file)')
+    parser.add_argument('--directions', type=int, default=None,
+                        help='Direction bins (default: from the grid size)')
+    parser.add_argument('--threshold', type=float, default=0.05,
+                        help='Minimum relative jump flagged as a shock')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes')
+    parser.add_argument('-o', '--output', default=None, help='Write the tracks as CSV')
+    parser.add_argument('--plot', default=None, help='Save a plot of the tracks')
+    args = parser.parse_args()
+
+    try:
+        runs = {run.rstrip('/'): run_files(run) for run in args.runs}
+        tracks = track_runs(runs, args.field, args.coord, args.input, args.center,
+                            args.directions, args.threshold, workers=args.workers)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    for label, track in tracks.items():
+        print(f"\n{label}: {track.times.size} snapshots")
+        print(f"{'time':>12s} {'radius':>12s} {'speed':>12s} {'asymmetry':>12s}")
+        for t, r, v, a in zip(track.times, track.radius, track.speed, track.asymmetry):
+            print(f"{t:12.5g} {r:12.5g} {v:12.5g} {a:12.5g}")
+    if len(tracks) >= 2:
+        labels = list(tracks)
+        reference = tracks[labels[0]]
+        for label in labels[1:]:
+            delta = compare_tracks(reference, tracks[label])
+            if np.isfinite(delta).any():
+                print(f"\n{label} - {labels[0]}: radius difference mean {np.nanmean(delta):.4g}, "
+                      f"at the last common time {delta[np.isfinite(delta)][-1]:.4g}")
+    if args.output:
+        write_tracks_csv(tracks, args.output)
+        print(f"\nTracks written to {args.output}")
+    if args.plot:
+        plot_tracks(tracks, args.plot)
+        print(f"Plot saved to {args.plot}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Slice-movie renderer for VTK, athdf and snapshot-store field sequences
+Renders one 2D slice of a field (a vector component or magnitude) across
+a sequence of snapshots to a GIF, a video (through ffmpeg) or a directory
+of PNG frames. Only the slice plane of each snapshot is read: one seek
+for slices normal to x3, strided reads of a memory map otherwise. The
+colour range is fixed for the whole movie, from one pass over the planes
+(or from --vmin/--vmax). Each frame is then mapped straight to 8-bit
+colormap indices through a per-pixel cell lookup computed once, so the
+colormap doubles as the GIF/PNG palette and no matplotlib figure is
+involved. Frame chunks are rendered in worker processes (spawn start
+method, as in utils/parallel_render.py) and written in order.
+
+Usage: python -m utils.slice_movie "run/*.vtk" --field rho -o rho.gif
+       python -m utils.slice_movie run.gsnap --field vel --component 0 --axis x2 -o frames/
+"""
+
+import argparse
+import glob
+import multiprocessing
+import os
+import shutil
+import subprocess
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from utils.athena_io import open_vtk_field, read_vtk_coordinates, read_vtk_header
+from utils.gif_writer import StreamingGifWriter, palette_image
+
+try:
+    import h5py
+    H5PY_AVAILABLE = True
+except ImportError:
+    H5PY_AVAILABLE = False
+
+AXES = ('x1', 'x2', 'x3')
+FACE_NAMES = ('x1f', 'x2f', 'x3f')
+VIDEO_EXTENSIONS = ('.mp4', '.webm', '.mkv', '.mov', '.avi')
+DEFAULT_CHUNK_SIZE = 8
+
+# What to draw: slice normal to `axis` at cell `index`; rows/cols are the
+# cell index of every output pixel (rows already flipped so x increases upward)
+MovieSpec = namedtuple('MovieSpec', ['field', 'component', 'axis', 'index', 'rows', 'cols',
+                                     'vmin', 'vmax', 'log'])
+Movie = namedtuple('Movie', ['path', 'frames', 'size', 'vmin', 'vmax'])
+
+_stores = {}  # snapshot stores opened by this process, by path
+
+
+def _store(path):
+    from utils.snapshot_store import SnapshotStore
+    if path not in _stores:
+        _stores[path] = SnapshotStore(path)
+    return _stores[path]
+
+
+def expand_inputs(inputs):
+    """(path, frame) of every snapshot: files and glob patterns in order (each glob sorted), all frames of .gsnap stores"""
+    frames = []
+    for pattern in inputs:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            if path.endswith('.gsnap'):
+                frames += [(path, i) for i in range(len(_store(path)))]
+            else:
+                frames.append((path, None))
+    return frames
+
+
+def _athdf_layout(f):
+    """Cell shape (nz, ny, nx), meshblock size (nk, nj, ni) and (l3, l2, l1) block locations"""
+    if int(f.attrs.get('MaxLevel', 0)) > 0:
+        raise ValueError("athdf files with mesh refinement are not supported")
+    nx, ny, nz = (int(n) for n in f.attrs['RootGridSize'])
+    ni, nj, nk = (int(n) for n in f.attrs['MeshBlockSize'])
+    locations = np.asarray(f['LogicalLocations'])[:, ::-1]
+    return (nz, ny, nx), (nk, nj, ni), locations
+
+
+def _athdf_variable(f, field):
+    names = [n.decode() if isinstance(n, bytes) else str(n) for n in f.attrs['VariableNames']]
+    datasets = [n.decode() if isinstance(n, bytes) else str(n) for n in f.attrs['DatasetNames']]
+    first = 0
+    for dataset, count in zip(datasets, np.atleast_1d(f.attrs['NumVariables'])):
+        if field in names[first:first + int(count)]:
+            return f[dataset], names.index(field) - first
+        first += int(count)
+    raise ValueError(f"field {field!r} not found (variables: {', '.join(names)})")
+
+
+def _open_athdf(path):
+    if not H5PY_AVAILABLE:
+        raise ValueError(f"{path}: reading .athdf files requires the h5py package")
+    return h5py.File(path, 'r')
+
+
+def frame_grid(path, frame=None):
+    """(cell shape (nz, ny, nx), face coordinates {'x1f', 'x2f', 'x3f'}) of one snapshot"""
+    if frame is not None:
+        store = _store(path)
+        return store.shape, dict(store.coords)
+    if path.endswith('.athdf'):
+        with _open_athdf(path) as f:
+            shape, block, locations = _athdf_layout(f)
+            faces = {}
+            for axis, name in enumerate(FACE_NAMES):
+                d, block_faces = 2 - axis, np.asarray(f[name], dtype=np.float64)
+                faces[name] = np.empty(shape[d] + 1)
+                for b, location in enumerate(locations):
+                    start = location[d] * block[d]
+                    faces[name][start:start + block[d] + 1] = block_faces[b]
+        return shape, faces
+    header = read_vtk_header(path)
+    return header['cell_shape'], read_vtk_coordinates(path, header)
+
+
+def read_plane(path, frame, field, axis, index):
+    """
+    (time, plane) of one snapshot: cells with index `index` along `axis`
+    ('x1', 'x2' or 'x3') as float32, rows along the slower remaining axis.
+    Vectors keep their trailing component axis.
+    """
+    d = 2 - AXES.index(axis)  # array dimension of the slice axis in (k, j, i)
+    if frame is not None:
+        store = _store(path)
+        if field not in store.fields:
+            raise ValueError(f"field {field!r} not in {path} ({', '.join(store.fields)})")
+        if d == 0:
+            return store.frames[frame]['time'], store.read(frame, field, index, index + 1)[0]
+        shape = store.field_shape(field)
+        plane = np.empty(shape[:d] + shape[d + 1:], dtype=np.float32)
+        for _, k0, k1 in store.chunks():
+            rows = store.read(frame, field, k0, k1)
+            plane[k0:k1] = rows[:, index] if d == 1 else rows[:, :, index]
+        return store.frames[frame]['time'], plane
+    if path.endswith('.athdf'):
+        with _open_athdf(path) as f:
+            shape, block, locations = _athdf_layout(f)
+            dataset, variable = _athdf_variable(f, field)
+            e0, e1 = [e for e in range(3) if e != d]
+            plane = np.empty((shape[e0], shape[e1]), dtype=np.float32)
+            for b, location in enumerate(locations):
+                if location[d] != index // block[d]:
+                    continue
+                selection = [slice(None)] * 3
+                selection[d] = index % block[d]
+                r0, c0 = location[e0] * block[e0], location[e1] * block[e1]
+                plane[r0:r0 + block[e0], c0:c0 + block[e1]] = dataset[(variable, b) + tuple(selection)]
+            return float(f.attrs['Time']), plane
+    header = read_vtk_header(path)
+    if field not in header['fields']:
+        raise ValueError(f"field {field!r} not in {path} ({', '.join(header['fields'])})")
+    selection = [slice(None)] * 3
+    selection[d] = index
+    # only the plane's pages are touched
+    plane = np.array(open_vtk_field(path, field, header)[tuple(selection)], dtype=np.float32)
+    return header['time'], plane
+
+
+def pixel_map(faces, cells, pixels):
+    """Cell index under each of `pixels` equal pixels spanning the faces of one axis"""
+    faces = np.asarray(faces, dtype=np.float64)
+    if faces.size != cells + 1:
+        faces = np.arange(cells + 1.0)  # collapsed axis stored as a single coordinate
+    centers = faces[0] + (np.arange(pixels) + 0.5) * (faces[-1] - faces[0]) / pixels
+    return np.clip(np.searchsorted(faces, centers, side='right') - 1, 0, cells - 1)
+
+
+def _scalar_plane(frame, spec):
+    time_value, plane = read_plane(*frame, spec.field, spec.axis, spec.index)
+    if plane.ndim == 3:
+        plane = (np.sqrt(np.einsum('...c,...c->...', plane, plane, dtype=np.float64))
+                 if spec.component is None else plane[..., spec.component])
+    return time_value, plane
+
+
+def _value_range(frames, spec):
+    """Finite (min, max) of the slice planes of frames (positive values only with log)"""
+    low, high = np.inf, -np.inf
+    for frame in frames:
+        _, plane = _scalar_plane(frame, spec)
+        values = plane[np.isfinite(plane) & (plane > 0)] if spec.log else plane[np.isfinite(plane)]
+        if values.size:
+            low, high = min(low, float(values.min())), max(high, float(values.max()))
+    return low, high
+
+
+def rasterize(plane, spec):
+    """8-bit colormap indices (H, W) of a scalar plane: one gather and one scale"""
+    pixels = plane[spec.rows[:, None], spec.cols[None, :]].astype(np.float32)
+    if spec.log:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pixels = np.log10(pixels)
+    lo, hi = spec.vmin, spec.vmax
+    pixels -= lo
+    pixels *= 255.0 / (hi - lo) if hi > lo else 0.0
+    np.clip(pixels, 0, 255, out=pixels)
+    return np.nan_to_num(pixels, nan=0.0).astype(np.uint8)
+
+
+def _render_chunk(frames, spec, label, png_dir=None, raw_palette=None, first=0):
+    """Index bytes of each frame, or (with png_dir) write them as PNG files and return []"""
+    chunk = []
+    for number, frame in enumerate(frames, first):
+        time_value, plane = _scalar_plane(frame, spec)
+        image = Image.fromarray(rasterize(plane, spec), 'P')
+        if label:
+            ImageDraw.Draw(image).text((4, 2), f"t = {time_value:.4g}", fill=255)
+        if png_dir is None:
+            chunk.append(image.tobytes())
+        else:
+            image.putpalette(raw_palette)
+            image.save(os.path.join(png_dir, f"frame_{number:05d}.png"), optimize=False)
+    return chunk
+
+
+def _ordered(pool, function, tasks, max_pending):
+    """Results of function(*task) in task order, with at most max_pending tasks in flight"""
+    if pool is None:
+        for task in tasks:
+            yield function(*task)
+        return
+    tasks, pending = iter(tasks), deque()
+
+    def submit_next():
+        task = next(tasks, None)
+        if task is not None:
+            pending.append(pool.submit(function, *task))
+
+    for _ in range(max_pending):
+        submit_next()
+    while pending:
+        result = pending.popleft().result()
+        submit_next()
+        yield result
+
+
+class _VideoWriter:
+    """Pipe RGB frames to ffmpeg"""
+
+    def __init__(self, path, size, fps):
+        ffmpeg = shutil.which('ffmpeg')
+        if ffmpeg is None:
+            raise ValueError(f"writing {os.path.splitext(path)[1]} files needs ffmpeg on the "
+                             "PATH; write a .gif or a directory of PNG frames instead")
+        self.size = size
+        self.process = subprocess.Popen(
+            [ffmpeg, '-y', '-loglevel', 'error', '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+             '-s', f'{size[0]}x{size[1]}', '-r', str(fps), '-i', '-',
+             '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-pix_fmt', 'yuv420p', path],
+            stdin=subprocess.PIPE)
+
+    def write_rgb(self, rgb):
+        self.process.stdin.write(np.ascontiguousarray(rgb).tobytes())
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise ValueError(f"ffmpeg exited with status {self.process.returncode}")
+
+
+def colormap_lut(cmap='viridis'):
+    """(256, 3) uint8 RGB table of a matplotlib colormap"""
+    import matplotlib
+    return (matplotlib.colormaps[cmap](np.linspace(0.0, 1.0, 256))[:, :3] * 255
+            + 0.5).astype(np.uint8)
+
+
+def render_movie(inputs, output, field='rho', component=None, axis='x3', position=None,
+                 vmin=None, vmax=None, log=False, cmap='viridis', scale=1.0, fps=10,
+                 label=False, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Render a slice movie of `field` across the snapshots in `inputs`.
+
+    Parameters:
+    -----------
+    inputs : list of str
+        VTK/athdf files, glob patterns or .gsnap stores, in frame order
+    output : str
+        .gif, a video file (.mp4, .webm, ... through ffmpeg) or a directory
+        for PNG frames
+    component : int
+        Vector component to show (default: the magnitude)
+    axis, position : str, float
+        Slice normal ('x1', 'x2' or 'x3') and its coordinate (default: mid-plane)
+    vmin, vmax : float
+        Colour range (default: min and max over all slice planes, one pass);
+        with log=True these are values, not their logarithms
+    scale : float
+        Output pixels per cell
+    workers : int
+        Worker processes (default: os.cpu_count()); 1 renders in-process
+
+    Returns:
+    --------
+    Movie(path, frames, size (W, H), vmin, vmax)
+    """
+    if axis not in AXES:
+        raise ValueError(f"axis must be one of {', '.join(AXES)}, got {axis!r}")
+    frames = expand_inputs(inputs)
+    if not frames:
+        raise ValueError("no input snapshots")
+    shape, faces = frame_grid(*frames[0])
+    d = 2 - AXES.index(axis)
+    if position is None:
+        index = shape[d] // 2
+    else:
+        slice_faces = np.asarray(faces[FACE_NAMES[2 - d]])
+        index = int(np.clip(np.searchsorted(slice_faces, position, side='right') - 1,
+                            0, shape[d] - 1)) if slice_faces.size == shape[d] + 1 else 0
+    e0, e1 = [e for e in range(3) if e != d]
+    width, height = (max(1, int(round(shape[e] * scale))) for e in (e1, e0))
+    rows = pixel_map(faces[FACE_NAMES[2 - e0]], shape[e0], height)[::-1]
+    cols = pixel_map(faces[FACE_NAMES[2 - e1]], shape[e1], width)
+    spec = MovieSpec(field, component, axis, index, rows, cols, None, None, log)
+
+    workers = min(workers or os.cpu_count() or 1, -(-len(frames) // chunk_size))
+    chunks = [frames[i:i + chunk_size] for i in range(0, len(frames), chunk_size)]
+    pool = None if workers <= 1 else ProcessPoolExecutor(
+        workers, mp_context=multiprocessing.get_context('spawn'))
+    try:
+        if vmin is None or vmax is None:
+            ranges = list(_ordered(pool, _value_range, [(c, spec) for c in chunks], 2 * workers))
+            low = min(r[0] for r in ranges)
+            high = max(r[1] for r in ranges)
+            if not np.isfinite(low):
+                raise ValueError(f"no finite{' positive' if log else ''} values of {field} "
+                                 "in the slice planes")
+            vmin = low if vmin is None else vmin
+            vmax = high if vmax is None else vmax
+        if log and (vmin <= 0 or vmax <= 0):
+            raise ValueError("a log colour range needs positive vmin and vmax")
+        spec = spec._replace(vmin=float(np.log10(vmin)) if log else float(vmin),
+                             vmax=float(np.log10(vmax)) if log else float(vmax))
+        lut = colormap_lut(cmap)
+        extension = os.path.splitext(output)[1].lower()
+        if extension in ('.gif',) + VIDEO_EXTENSIONS:
+            writer = (StreamingGifWriter(output, fps=fps, palette=palette_image(lut.tobytes()))
+                      if extension == '.gif' else _VideoWriter(output, (width, height), fps))
+            try:
+                tasks = [(c, spec, label) for c in chunks]
+                for chunk in _ordered(pool, _render_chunk, tasks, 2 * workers):
+                    for data in chunk:
+                        if extension == '.gif':
+                            writer.write_indexed(data, (width, height))
+                        else:
+                            writer.write_rgb(lut[np.frombuffer(data, dtype=np.uint8)])
+            finally:
+                writer.close()
+        else:
+            os.makedirs(output, exist_ok=True)
+            tasks = [(c, spec, label, output, lut.tobytes(), i * chunk_size)
+                     for i, c in enumerate(chunks)]
+            for _ in _ordered(pool, _render_chunk, tasks, 2 * workers):
+                pass
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    return Movie(output, len(frames), (width, height), float(vmin), float(vmax))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render a field slice across a snapshot sequence')
+    parser.add_argument('inputs', nargs='+', help='VTK/athdf files, glob patterns or .gsnap stores')
+    parser.add_argument('-o', '--output', required=True,
+                        help='.gif, video file (.mp4 etc., needs ffmpeg) or directory for PNG frames')
+    parser.add_argument('--field', default='rho')
+    parser.add_argument('--component', type=int, default=None,
+                        help='Vector component (default: magnitude)')
+    parser.add_argument('--axis', choices=AXES, default='x3', help='Slice normal (default: x3)')
+    parser.add_argument('--position', type=float, default=None,
+                        help='Slice coordinate along the axis (default: mid-plane)')
+    parser.add_argument('--vmin', type=float, default=None)
+    parser.add_argument('--vmax', type=float, default=None)
+    parser.add_argument('--log', action='store_true', help='Logarithmic colour scale')
+    parser.add_argument('--cmap', default='viridis')
+    parser.add_argument('--scale', type=float, default=1.0, help='Pixels per cell (default: 1)')
+    parser.add_argument('--fps', type=int, default=10)
+    parser.add_argument('--label', action='store_true', help='Draw the snapshot time')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        movie = render_movie(args.inputs, args.output, args.field, args.component, args.axis,
+                             args.position, args.vmin, args.vmax, args.log, args.cmap, args.scale,
+                             args.fps, args.label, args.workers)
+    except (OSError, ValueError, KeyError, IndexError) as e:
+        print(f"Error: {e}")
+        return 1
+    seconds = time.perf_counter() - start
+    print(f"{movie.frames} frames ({movie.size[0]}x{movie.size[1]}) of {args.field} "
+          f"in [{movie.vmin:.4g}, {movie.vmax:.4g}] written to {movie.path} "
+          f"({seconds:.2f} s, {movie.frames / seconds:.1f} frames/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
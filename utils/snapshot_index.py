@@ -0,0 +1,617 @@
+#!/usr/bin/env python3
+"""
+Persistent snapshot and run metadata index
+An SQLite database with one row per run and per snapshot. A run is an
+output directory plus an Athena++ problem_id; its parameters come from the
+input deck and from simulation_config.json. A snapshot carries its format,
+size, checksum, time, cycle and per-field min/max/mean, and a comparison
+of two runs (compare_simulations.py) carries its difference statistics.
+Questions such as "all runs with beta=0.5 where the maximum pressure
+relative difference exceeds 10%" are then answered from the index in
+milliseconds without opening any data file.
+
+The index is filled incrementally: the `index` command scans files and
+skips those whose size and modification time are unchanged, and the
+readers in utils/athena_io.py record every snapshot they load while an
+index is enabled (enable(), or the GENESIS_INDEX environment variable set
+to the database path).
+
+Conditions are `name OP value` with OP one of = != < <= > >=:
+  beta=0.5               a run parameter ("problem/beta", or any name ending in /beta)
+  rho.max>2              a snapshot field statistic (min, max, mean)
+  press.max_rel_diff>10  a comparison statistic of a run (relative differences in %)
+  time>=0.5, cycle=0     snapshot time and cycle
+
+Usage: python -m utils.snapshot_index index vtk_output/ --input time_density_spherical.in
+       python -m utils.snapshot_index query beta=0.5 "press.max_rel_diff>10"
+       python -m utils.snapshot_index runs
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from utils.memory_budget import ACCUMULATOR_DTYPE, slabs
+
+try:
+    import h5py
+    H5PY_AVAILABLE = True
+except ImportError:
+    H5PY_AVAILABLE = False
+
+INDEX_ENV = 'GENESIS_INDEX'
+DEFAULT_INDEX = 'genesis_index.sqlite'
+CHECKSUM_BLOCK = 8 * 2**20
+FIELD_STATS = ('min', 'max', 'mean')
+SNAPSHOT_COLUMNS = ('time', 'cycle', 'size', 'format')
+OPERATORS = ('<=', '>=', '!=', '=', '<', '>')
+
+# Athena++ output names: problem_id[.block<N>].<output id>.<NNNNN>[.vtk|.athdf]
+_SNAPSHOT_NAME = re.compile(r'^([^.]+)\.(.+)\.(\d+)(?:\.(vtk|athdf))?$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    directory TEXT NOT NULL,
+    name TEXT NOT NULL,
+    input_file TEXT,
+    config_file TEXT,
+    updated REAL,
+    UNIQUE (directory, name)
+);
+CREATE TABLE IF NOT EXISTS run_params (
+    run_id INTEGER NOT NULL REFERENCES runs ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    value REAL,
+    text TEXT,
+    PRIMARY KEY (run_id, name)
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    snapshot_id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs ON DELETE CASCADE,
+    path TEXT NOT NULL UNIQUE,
+    stream TEXT,
+    number INTEGER,
+    format TEXT,
+    size INTEGER,
+    mtime_ns INTEGER,
+    checksum TEXT,
+    time REAL,
+    cycle INTEGER,
+    shape TEXT,
+    indexed REAL
+);
+CREATE TABLE IF NOT EXISTS field_stats (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots ON DELETE CASCADE,
+    field TEXT NOT NULL,
+    min REAL,
+    max REAL,
+    mean REAL,
+    PRIMARY KEY (snapshot_id, field)
+);
+CREATE TABLE IF NOT EXISTS comparisons (
+    comparison_id INTEGER PRIMARY KEY,
+    standard_run_id INTEGER NOT NULL REFERENCES runs ON DELETE CASCADE,
+    time_density_run_id INTEGER NOT NULL REFERENCES runs ON DELETE CASCADE,
+    updated REAL,
+    UNIQUE (standard_run_id, time_density_run_id)
+);
+CREATE TABLE IF NOT EXISTS comparison_stats (
+    comparison_id INTEGER NOT NULL REFERENCES comparisons ON DELETE CASCADE,
+    field TEXT NOT NULL,
+    stat TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (comparison_id, field, stat)
+);
+CREATE INDEX IF NOT EXISTS run_params_by_name ON run_params (name, value);
+CREATE INDEX IF NOT EXISTS snapshots_by_run ON snapshots (run_id, time);
+CREATE INDEX IF NOT EXISTS field_stats_by_field ON field_stats (field, max);
+CREATE INDEX IF NOT EXISTS comparison_stats_by_stat ON comparison_stats (field, stat, value);
+"""
+
+Condition = namedtuple('Condition', ['name', 'op', 'value'])
+
+_index_path = None
+
+
+def parse_condition(text):
+    """'beta=0.5' or 'press.max_rel_diff > 10' -> Condition (values are numbers when possible)"""
+    for op in OPERATORS:
+        name, found, value = text.partition(op)
+        if found and name.strip() and value.strip():
+            value = value.strip()
+            try:
+                value = float(value)
+            except ValueError:
+                pass
+            return Condition(name.strip(), '==' if op == '=' else op, value)
+    raise ValueError(f"Condition must look like name=value or name>value, got {text!r}")
+
+
+def split_snapshot_name(path):
+    """(problem_id, stream, number) of an Athena++ output file name ((stem, '', None) otherwise)"""
+    match = _SNAPSHOT_NAME.match(os.path.basename(path))
+    if not match:
+        return os.path.splitext(os.path.basename(path))[0], '', None
+    return match.group(1), match.group(2), int(match.group(3))
+
+
+def snapshot_format(path):
+    if path.endswith('.vtk'):
+        return 'vtk'
+    if path.endswith('.athdf'):
+        return 'athdf'
+    return 'table'
+
+
+def file_checksum(path):
+    """BLAKE2b digest (16 bytes, hex) of a file, read in blocks"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(CHECKSUM_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def flatten_params(params, prefix=''):
+    """Nested dictionaries -> {'block/key': scalar}"""
+    flat = {}
+    for key, value in params.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten_params(value, f"{name}/"))
+        elif isinstance(value, (bool, int, float, str)) or value is None:
+            flat[name] = value
+    return flat
+
+
+def field_statistics(array, components=1):
+    """
+    Min, max and mean of an array-like (ndarray, VTKField, h5py dataset)
+    read in slabs along its first axis within the memory budget.
+
+    Returns:
+    --------
+    list of (min, max, mean), one per component (last axis when components > 1)
+    """
+    shape = array.shape
+    row_values = int(np.prod(shape[1:])) if len(shape) > 1 else 1
+    low = np.full(components, np.inf)
+    high = np.full(components, -np.inf)
+    total = np.zeros(components, dtype=ACCUMULATOR_DTYPE)
+    count = 0
+    for k0, k1 in slabs(shape[0], row_values * 8):  # slab plus float64 partial sums
+        slab = np.asarray(array[k0:k1]).reshape(-1, components)
+        if not len(slab):
+            continue
+        low = np.minimum(low, slab.min(axis=0))
+        high = np.maximum(high, slab.max(axis=0))
+        total += slab.sum(axis=0, dtype=ACCUMULATOR_DTYPE)
+        count += len(slab)
+    if not count:
+        return [(None, None, None)] * components
+    return [(float(lo), float(hi), float(t / count)) for lo, hi, t in zip(low, high, total)]
+
+
+def _field_rows(fields):
+    """{name: array} -> {field: (min, max, mean)}; 3-component vectors become name1..name3"""
+    rows = {}
+    for name, array in fields.items():
+        components = array.shape[-1] if len(array.shape) == 4 else 1
+        stats = field_statistics(array, components)
+        if components == 1:
+            rows[name] = stats[0]
+        else:
+            rows.update({f"{name}{i + 1}": s for i, s in enumerate(stats)})
+    return rows
+
+
+def table_header(filename):
+    """(time, cycle, column labels) from the '#' header lines of an Athena++ text table"""
+    time_value, cycle, labels = None, None, None
+    with open(filename) as f:
+        for line in f:
+            if not line.startswith('#'):
+                break
+            match = re.search(r'time=\s*([-+0-9.eE]+)', line)
+            if match:
+                time_value = float(match.group(1))
+            match = re.search(r'cycle=\s*(\d+)', line)
+            if match:
+                cycle = int(match.group(1))
+            if '=' not in line:
+                labels = line[1:].split()
+    return time_value, cycle, labels
+
+
+def table_fields(table, labels):
+    """Columns of a text table by label (col0, col1, ... when the labels do not match)"""
+    if not labels or len(labels) != table.shape[1]:
+        labels = [f"col{i}" for i in range(table.shape[1])]
+    return {label: table[:, i] for i, label in enumerate(labels)}
+
+
+def _athdf_fields(f):
+    """{variable: array-like} of an .athdf file"""
+    names = [n.decode() if isinstance(n, bytes) else str(n) for n in f.attrs['VariableNames']]
+    datasets = [n.decode() if isinstance(n, bytes) else str(n) for n in f.attrs['DatasetNames']]
+    fields, first = {}, 0
+    for dataset, count in zip(datasets, np.atleast_1d(f.attrs['NumVariables'])):
+        for i in range(int(count)):
+            fields[names[first + i]] = _MeshBlockStack(f[dataset], i)
+        first += int(count)
+    return fields
+
+
+class _MeshBlockStack:
+    """
+    Variable `index` of an Athena++ (variable, meshblock, k, j, i) dataset
+    seen as one (meshblock * k, j, i) array that is read in row slices
+    """
+
+    def __init__(self, dataset, index):
+        self.dataset, self.index = dataset, index
+        _, blocks, self.nk, nj, ni = dataset.shape
+        self.shape = (blocks * self.nk, nj, ni)
+
+    def __getitem__(self, index):
+        k0, k1, _ = index.indices(self.shape[0])
+        parts = []
+        for block in range(k0 // self.nk, -(-k1 // self.nk)) if k1 > k0 else ():
+            start = block * self.nk
+            parts.append(self.dataset[self.index, block,
+                                      max(k0, start) - start:min(k1, start + self.nk) - start])
+        if not parts:
+            return np.empty((0,) + self.shape[1:], dtype=np.float32)
+        return np.concatenate(parts)
+
+
+class SnapshotIndex:
+    """
+    Connection to an index database (created on first use). Use as a
+    context manager, or call close().
+    """
+
+    def __init__(self, path=DEFAULT_INDEX, timeout=30.0):
+        self.path = path
+        self.db = sqlite3.connect(path, timeout=timeout)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute('PRAGMA foreign_keys = ON')
+        self.db.execute('PRAGMA journal_mode = WAL')  # readers never wait for a writer
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    # --- filling -----------------------------------------------------------
+
+    def add_run(self, directory, name, input_file=None, config_file=None, params=None):
+        """
+        Create or update a run and return its run_id. Parameters are read
+        from the input deck ("block/key") and the JSON config file, plus
+        `params` ({name: value}); existing parameters with the same names
+        are replaced.
+        """
+        from utils.athena_io import read_athinput
+        directory = os.path.abspath(directory)
+        with self.db:
+            self.db.execute(
+                'INSERT INTO runs (directory, name, input_file, config_file, updated) '
+                'VALUES (?, ?, ?, ?, ?) ON CONFLICT (directory, name) DO UPDATE SET '
+                'input_file = coalesce(excluded.input_file, input_file), '
+                'config_file = coalesce(excluded.config_file, config_file), '
+                'updated = excluded.updated',
+                (directory, name, input_file and os.path.abspath(input_file),
+                 config_file and os.path.abspath(config_file), time.time()))
+            run_id = self.db.execute('SELECT run_id FROM runs WHERE directory = ? AND name = ?',
+                                     (directory, name)).fetchone()[0]
+            flat = {}
+            if input_file:
+                flat.update(flatten_params(read_athinput(input_file)))
+            if config_file:
+                with open(config_file) as f:
+                    flat.update(flatten_params(json.load(f)))
+            flat.update(flatten_params(params or {}))
+            self.db.executemany(
+                'INSERT OR REPLACE INTO run_params (run_id, name, value, text) VALUES (?, ?, ?, ?)',
+                [(run_id, key, value if isinstance(value, (int, float)) else None,
+                  None if isinstance(value, (int, float)) else value)
+                 for key, value in flat.items()])
+        return run_id
+
+    def is_current(self, path):
+        """True when the file is indexed with its present size and modification time"""
+        stat = os.stat(path)
+        row = self.db.execute('SELECT size, mtime_ns FROM snapshots WHERE path = ?',
+                              (os.path.abspath(path),)).fetchone()
+        return row is not None and (row['size'], row['mtime_ns']) == (stat.st_size, stat.st_mtime_ns)
+
+    def record_snapshot(self, path, fields=None, time_value=None, cycle=None, shape=None,
+                        field_rows=None):
+        """
+        Record one snapshot: file facts, checksum, time/cycle and the
+        statistics of `fields` ({name: array-like}) or precomputed
+        `field_rows` ({field: (min, max, mean)}). Returns the snapshot_id.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        problem_id, stream, number = split_snapshot_name(path)
+        rows = dict(field_rows or {})
+        if fields:
+            rows.update(_field_rows(fields))
+        checksum = file_checksum(path)
+        run_id = self.add_run(os.path.dirname(path), problem_id)
+        with self.db:
+            self.db.execute('DELETE FROM snapshots WHERE path = ?', (path,))
+            cursor = self.db.execute(
+                'INSERT INTO snapshots (run_id, path, stream, number, format, size, mtime_ns, '
+                'checksum, time, cycle, shape, indexed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (run_id, path, stream, number, snapshot_format(path), stat.st_size,
+                 stat.st_mtime_ns, checksum, time_value, cycle,
+                 json.dumps([int(n) for n in shape]) if shape is not None else None, time.time()))
+            snapshot_id = cursor.lastrowid
+            self.db.executemany(
+                'INSERT INTO field_stats (snapshot_id, field, min, max, mean) VALUES (?, ?, ?, ?, ?)',
+                [(snapshot_id, field) + tuple(stats) for field, stats in rows.items()])
+        return snapshot_id
+
+    def index_file(self, path, force=False):
+        """
+        Read one snapshot file and record it, unless it is already current.
+
+        Returns:
+        --------
+        'indexed' or 'unchanged'
+        """
+        from utils.athena_io import VTKField, read_table, read_vtk_header
+        if not force and self.is_current(path):
+            return 'unchanged'
+        kind = snapshot_format(path)
+        if kind == 'vtk':
+            header = read_vtk_header(path)
+            fields = {name: VTKField(path, name, header) for name in header['fields']}
+            self.record_snapshot(path, fields, header['time'], header['cycle'], header['cell_shape'])
+        elif kind == 'athdf':
+            if not H5PY_AVAILABLE:
+                raise ValueError(f"{path}: indexing .athdf files requires the h5py package")
+            with h5py.File(path, 'r') as f:
+                fields = _athdf_fields(f)
+                shape = f.attrs['RootGridSize'][::-1] if 'RootGridSize' in f.attrs else None
+                self.record_snapshot(path, fields, float(f.attrs.get('Time', 0.0)),
+                                     int(f.attrs.get('NumCycles', 0)), shape)
+        else:
+            time_value, cycle, labels = table_header(path)
+            table = read_table(path)
+            self.record_snapshot(path, table_fields(table, labels), time_value, cycle, table.shape)
+        return 'indexed'
+
+    def record_comparison(self, standard_run_id, time_density_run_id, stats):
+        """Store (replace) the statistics {field: {stat: value}} of a run comparison"""
+        with self.db:
+            self.db.execute(
+                'INSERT INTO comparisons (standard_run_id, time_density_run_id, updated) '
+                'VALUES (?, ?, ?) ON CONFLICT (standard_run_id, time_density_run_id) '
+                'DO UPDATE SET updated = excluded.updated',
+                (standard_run_id, time_density_run_id, time.time()))
+            comparison_id = self.db.execute(
+                'SELECT comparison_id FROM comparisons WHERE standard_run_id = ? '
+                'AND time_density_run_id = ?', (standard_run_id, time_density_run_id)).fetchone()[0]
+            self.db.execute('DELETE FROM comparison_stats WHERE comparison_id = ?', (comparison_id,))
+            self.db.executemany(
+                'INSERT INTO comparison_stats (comparison_id, field, stat, value) VALUES (?, ?, ?, ?)',
+                [(comparison_id, field, stat, float(value))
+                 for field, values in stats.items() for stat, value in values.items()])
+        return comparison_id
+
+    # --- queries -----------------------------------------------------------
+
+    def _clause(self, condition):
+        """SQL for one condition: ('run' or 'snapshot', clause, arguments)"""
+        name, op, value = condition
+        if op not in ('==', '!=', '<', '<=', '>', '>='):
+            raise ValueError(f"Unknown operator {op!r}")
+        if name in SNAPSHOT_COLUMNS:
+            return 'snapshot', f"s.{name} {op} ?", [value]
+        field, dot, stat = name.rpartition('.')
+        if dot and stat in FIELD_STATS:
+            return 'snapshot', (f"EXISTS (SELECT 1 FROM field_stats f WHERE f.snapshot_id = "
+                                f"s.snapshot_id AND f.field = ? AND f.{stat} {op} ?)"), [field, value]
+        if dot:
+            return 'run', ("EXISTS (SELECT 1 FROM comparisons c JOIN comparison_stats cs "
+                           "USING (comparison_id) WHERE r.run_id IN (c.standard_run_id, "
+                           f"c.time_density_run_id) AND cs.field = ? AND cs.stat = ? "
+                           f"AND cs.value {op} ?)"), [field, stat, value]
+        column = 'value' if isinstance(value, float) else 'text'
+        return 'run', ("EXISTS (SELECT 1 FROM run_params p WHERE p.run_id = r.run_id AND "
+                       f"(p.name = ? OR p.name LIKE ?) AND p.{column} {op} ?)"), \
+            [name, f"%/{name}", value]
+
+    def query(self, conditions, snapshots=False):
+        """
+        Runs (or, with `snapshots`, snapshots) matching every condition
+        (Condition tuples or strings such as 'beta=0.5'). A run matches
+        snapshot conditions when at least one of its snapshots does.
+
+        Returns:
+        --------
+        list of sqlite3.Row: run_id, directory, name, input_file, snapshots
+        (the number of matching snapshots); or for snapshots run, path,
+        format, time, cycle, size, checksum
+        """
+        run_clauses, snapshot_clauses, arguments = [], [], {'run': [], 'snapshot': []}
+        for condition in conditions:
+            if isinstance(condition, str):
+                condition = parse_condition(condition)
+            level, clause, args = self._clause(condition)
+            (run_clauses if level == 'run' else snapshot_clauses).append(clause)
+            arguments[level] += args
+        run_where = ' AND '.join(run_clauses) or '1'
+        snapshot_where = ' AND '.join(snapshot_clauses) or '1'
+        if snapshots:
+            sql = (f"SELECT r.name AS run, s.path, s.format, s.time, s.cycle, s.size, s.checksum "
+                   f"FROM runs r JOIN snapshots s USING (run_id) WHERE {run_where} "
+                   f"AND {snapshot_where} ORDER BY r.directory, r.name, s.path")
+            return self.db.execute(sql, arguments['run'] + arguments['snapshot']).fetchall()
+        join = 'JOIN' if snapshot_clauses else 'LEFT JOIN'
+        sql = (f"SELECT r.run_id, r.directory, r.name, r.input_file, count(s.snapshot_id) AS "
+               f"snapshots FROM runs r {join} snapshots s ON s.run_id = r.run_id AND "
+               f"{snapshot_where} WHERE {run_where} GROUP BY r.run_id "
+               f"ORDER BY r.directory, r.name")
+        return self.db.execute(sql, arguments['snapshot'] + arguments['run']).fetchall()
+
+    def run_params(self, run_id):
+        return {row['name']: row['value'] if row['text'] is None else row['text']
+                for row in self.db.execute('SELECT name, value, text FROM run_params '
+                                           'WHERE run_id = ? ORDER BY name', (run_id,))}
+
+    def field_stats(self, path):
+        """{field: (min, max, mean)} of an indexed snapshot"""
+        return {row['field']: (row['min'], row['max'], row['mean'])
+                for row in self.db.execute(
+                    'SELECT f.field, f.min, f.max, f.mean FROM field_stats f JOIN snapshots s '
+                    'USING (snapshot_id) WHERE s.path = ?', (os.path.abspath(path),))}
+
+
+def enable(path=None):
+    """Record the snapshots the readers load into the index at `path` (default: $GENESIS_INDEX)"""
+    global _index_path
+    _index_path = path or os.environ.get(INDEX_ENV) or DEFAULT_INDEX
+    return _index_path
+
+
+def disable():
+    global _index_path
+    _index_path = None
+
+
+def active_index():
+    """Path of the enabled index, or None"""
+    return _index_path
+
+
+def record_table(filename, table):
+    """Reader hook for text tables (time, cycle and column labels come from the header)"""
+    def describe():
+        time_value, cycle, labels = table_header(filename)
+        return table_fields(table, labels), time_value, cycle, table.shape
+    _record(filename, describe)
+
+
+def record_read(filename, fields, time_value=None, cycle=None, shape=None):
+    """
+    Reader hook: record a snapshot that was just loaded, with statistics of
+    the in-memory `fields`, when an index is enabled and the file is not
+    current in it. Indexing problems are reported, never raised.
+    """
+    _record(filename, lambda: (fields, time_value, cycle, shape))
+
+
+def _record(filename, describe):
+    """Index `filename` with the (fields, time, cycle, shape) from `describe()` unless current"""
+    if _index_path is None:
+        return
+    try:
+        with SnapshotIndex(_index_path) as index:
+            if not index.is_current(filename):
+                index.record_snapshot(filename, *describe())
+    except (OSError, ValueError, IndexError, sqlite3.Error) as e:
+        print(f"Warning: could not index {filename}: {e}", file=sys.stderr)
+
+
+def expand_paths(patterns):
+    """Files named by paths, glob patterns or directories (their Athena++ outputs)"""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            files += [os.path.join(pattern, name) for name in sorted(os.listdir(pattern))
+                      if split_snapshot_name(name)[2] is not None]
+        else:
+            files += sorted(glob.glob(pattern)) or [pattern]
+    return files
+
+
+def _format_value(value):
+    return f"{value:.6g}" if isinstance(value, float) else str(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Snapshot and run metadata index (SQLite)')
+    parser.add_argument('--index', default=os.environ.get(INDEX_ENV) or DEFAULT_INDEX,
+                        help=f'Index database (default: ${INDEX_ENV} or {DEFAULT_INDEX})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    index_parser = subparsers.add_parser('index', help='Index snapshot files (unchanged files are skipped)')
+    index_parser.add_argument('paths', nargs='+', help='Files, glob patterns or directories')
+    index_parser.add_argument('--input', help='Input deck of the runs (parameters)')
+    index_parser.add_argument('--config', help='JSON configuration of the runs (parameters)')
+    index_parser.add_argument('--force', action='store_true', help='Re-read current files too')
+    query_parser = subparsers.add_parser('query', help='Find runs or snapshots by condition')
+    query_parser.add_argument('conditions', nargs='*', help='e.g. beta=0.5 "press.max_rel_diff>10"')
+    query_parser.add_argument('--snapshots', action='store_true', help='List matching snapshots')
+    query_parser.add_argument('--json', action='store_true', help='Print JSON')
+    subparsers.add_parser('runs', help='List runs with their parameters')
+    args = parser.parse_args()
+
+    try:
+        with SnapshotIndex(args.index) as index:
+            if args.command == 'index':
+                start = time.perf_counter()
+                counts, runs = {'indexed': 0, 'unchanged': 0}, set()
+                for path in expand_paths(args.paths):
+                    counts[index.index_file(path, args.force)] += 1
+                    runs.add((os.path.dirname(os.path.abspath(path)), split_snapshot_name(path)[0]))
+                if args.input or args.config:
+                    for directory, name in runs:
+                        index.add_run(directory, name, args.input, args.config)
+                print(f"{counts['indexed']} snapshots indexed, {counts['unchanged']} unchanged "
+                      f"({time.perf_counter() - start:.2f} s) in {args.index}")
+                return 0
+            if args.command == 'runs':
+                for row in index.query([]):
+                    params = index.run_params(row['run_id'])
+                    print(f"{os.path.join(row['directory'], row['name'])}: {row['snapshots']} "
+                          f"snapshots" + (f", {row['input_file']}" if row['input_file'] else ''))
+                    for key, value in params.items():
+                        print(f"  {key} = {_format_value(value)}")
+                return 0
+            start = time.perf_counter()
+            rows = index.query(args.conditions, args.snapshots)
+            elapsed = time.perf_counter() - start
+            if args.json:
+                print(json.dumps([dict(row) for row in rows], indent=2))
+                return 0
+            for row in rows:
+                if args.snapshots:
+                    print(f"{row['path']}  t={_format_value(row['time'])}  cycle={row['cycle']}")
+                else:
+                    print(f"{os.path.join(row['directory'], row['name'])}  "
+                          f"({row['snapshots']} snapshots)")
+            print(f"{len(rows)} {'snapshots' if args.snapshots else 'runs'} "
+                  f"({elapsed * 1000:.1f} ms)")
+            return 0
+    except (OSError, ValueError, KeyError, sqlite3.Error) as e:
+        print(f"Error: {e}")
+        return 1
+
+
+if os.environ.get(INDEX_ENV):
+    enable()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
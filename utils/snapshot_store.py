@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+"""
+Temporally delta-compressed snapshot storage
+Packs the snapshots of one run into a single file (a zip container) that
+stores the coordinates once and each frame's fields as deltas from the
+nearest preceding keyframe (every `keyframe_interval` frames), so any frame
+is decoded from two chunks: its own and its keyframe's.
+
+Fields are encoded per chunk of rows along nz (sized to the memory budget)
+as 32-bit integers:
+- lossless (default): the float32 bit patterns, reordered so that integer
+  order follows float order;
+- error-bounded (a per-field absolute bound e, or with `relative` a
+  fraction of the keyframe's range, or of its magnitude for a field that is
+  constant there): the quanta round(v / 2h), with the half-step h slightly
+  below e to leave room for the float32 rounding of the decoded values, so
+  every decoded value is within e of the original. A frame whose values
+  outgrow that room starts a new keyframe early.
+A frame stores the difference of its integers from the keyframe's, further
+differenced along x (the keyframe only the latter), zigzag-mapped and
+byte-shuffled (all first bytes, then all second bytes, ...) before
+deflate, which is what makes the small residuals compress well. Members are stored as frames/<frame>/<field>.<chunk>, so a
+reader touches only the chunks of the rows it asks for.
+
+Usage: python -m utils.snapshot_store pack vtk_output/*.vtk -o blast.gsnap [--error rho=1e-4]
+       python -m utils.snapshot_store info blast.gsnap
+       python -m utils.snapshot_store extract blast.gsnap 12 -o frame12.vtk
+"""
+
+import argparse
+import glob
+import json
+import os
+import zipfile
+
+import numpy as np
+
+from utils.athena_io import VTKField, read_vtk_coordinates, read_vtk_header, write_athena_vtk
+from utils.memory_budget import STORAGE_DTYPE, memory_budget, slab_rows
+
+STORE_FORMAT = 'genesis-snapshot-store'
+STORE_VERSION = 1
+DEFAULT_KEYFRAME_INTERVAL = 16
+DEFAULT_COMPRESSLEVEL = 3
+MAX_QUANTUM = 2**31 - 1  # quantized values are stored as int32
+ROUNDING = 2.0**-24  # largest relative rounding error of a float32 (half an ulp)
+RUN_MEMBER = 'run.json'
+
+_WORD = np.dtype('<u4')
+
+
+def _shuffle(words):
+    """Little-endian 32-bit words -> bytes grouped by significance"""
+    return np.ascontiguousarray(words.astype(_WORD, copy=False).view(np.uint8)
+                                .reshape(-1, 4).T).tobytes()
+
+
+def _unshuffle(data, count):
+    return np.frombuffer(data, dtype=np.uint8).reshape(4, count).T.copy().view(_WORD).reshape(-1)
+
+
+def _frame_prefix(frame):
+    return f"frames/{frame:06d}/"
+
+
+def _chunk_member(frame, field, chunk):
+    return f"{_frame_prefix(frame)}{field}.{chunk:04d}"
+
+
+def quantum(bound, magnitude):
+    """
+    Largest quantization half-step that keeps values up to `magnitude`
+    within an error bound: the bound less the float32 rounding of the
+    decoded values and a margin for the float64 arithmetic
+    """
+    half = bound * (1.0 - 2.0**-22) - (magnitude + bound) * ROUNDING
+    if half <= 0:
+        raise ValueError(f"error bound {bound:g} is below float32 resolution for values up to "
+                         f"{magnitude:g}; use a larger bound or store the field lossless")
+    return half
+
+
+def _key_quantum(bound, magnitude):
+    """
+    Half-step of a keyframe with values up to `magnitude`, with headroom
+    for later frames with larger values (at most 0.4% of the step) when
+    float32 leaves room for it
+    """
+    try:
+        return float(quantum(bound, max(2.0 * magnitude, bound * 2**16)))
+    except ValueError:
+        return float(quantum(bound, magnitude))
+
+
+def _fits(bound, magnitude, half):
+    """Whether values up to `magnitude` stay within `bound` with the half-step `half`"""
+    try:
+        return quantum(bound, magnitude) >= half
+    except ValueError:
+        return False
+
+
+def quantize(values, bound):
+    """round(values / 2·bound) as int32 (|error| <= bound after dequantize, before float32 rounding)"""
+    scaled = np.rint(np.asarray(values, dtype=np.float64) / (2.0 * bound))
+    if not np.all(np.isfinite(scaled)) or np.abs(scaled).max(initial=0) > MAX_QUANTUM:
+        raise ValueError(f"error bound {bound:g} is too small for the value range "
+                         "(or the field is not finite); use a larger bound or store it lossless")
+    return scaled.astype(np.int32)
+
+
+def to_integers(values, bound=None):
+    """
+    float32 values -> int32 whose differences are small for close values:
+    the quanta for an error bound, else the float bits reordered so that
+    integer order follows float order (negative magnitudes flipped)
+    """
+    if bound is not None:
+        return quantize(values, bound)
+    bits = np.ascontiguousarray(values, dtype=STORAGE_DTYPE).view(np.int32)
+    return bits ^ ((bits >> 31) & 0x7fffffff)
+
+
+def from_integers(integers, bound=None):
+    if bound is not None:
+        return (integers * (2.0 * bound)).astype(STORAGE_DTYPE)
+    return (integers ^ ((integers >> 31) & 0x7fffffff)).view(STORAGE_DTYPE)
+
+
+def _residual(integers, key=None):
+    """
+    Prediction residual as 32-bit words: difference from the keyframe,
+    then from the previous cell along x, zigzag-mapped so that small
+    negative residuals also have zero high bytes. Wraps around like the
+    inverse in _reconstruct, so it is exact for any input.
+    """
+    residual = integers - key if key is not None else integers.copy()
+    residual[..., 1:] -= residual[..., :-1].copy()
+    return ((residual << 1) ^ (residual >> 31)).view(np.uint32).reshape(-1)
+
+
+def _reconstruct(words, shape, key=None):
+    words = words.reshape(shape)
+    residual = (words >> 1).view(np.int32) ^ -(words & 1).view(np.int32)
+    integers = np.cumsum(residual, axis=-1, dtype=np.int32)
+    if key is not None:
+        integers += key
+    return integers
+
+
+class SnapshotStore:
+    """
+    A delta-compressed run file, opened for reading ('r'), to be written
+    ('w', needs coords, shape and fields) or to be appended to ('a').
+
+    Attributes:
+    -----------
+    shape : tuple
+        Cell shape (nz, ny, nx)
+    fields : dict
+        {name: components} (1 for scalars, 3 for vectors)
+    coords : dict
+        Face coordinates 'x1f', 'x2f', 'x3f' (float64)
+    frames : list of dict
+        Per frame: 'time', 'cycle', 'keyframe' (its keyframe's number),
+        'bounds' {field: absolute error bound or None}, 'quanta' {field:
+        quantization half-step or None} and 'source'
+    """
+
+    def __init__(self, path, mode='r', coords=None, shape=None, fields=None,
+                 keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, error_bounds=None, relative=False,
+                 variables='prim', compresslevel=DEFAULT_COMPRESSLEVEL):
+        if mode not in ('r', 'w', 'a'):
+            raise ValueError(f"mode must be 'r', 'w' or 'a', got {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.compresslevel = compresslevel
+        self.zip = zipfile.ZipFile(path, mode, zipfile.ZIP_DEFLATED, allowZip64=True)
+        self._key_cache = {}
+        self._key_cache_bytes = 0
+        if mode == 'w':
+            if coords is None or shape is None or not fields:
+                raise ValueError("a new store needs coords, shape and fields")
+            self.shape = tuple(int(n) for n in shape)
+            self.fields = dict(fields)
+            unknown = set(error_bounds or {}) - set(self.fields)
+            if unknown:
+                raise ValueError(f"error bounds for unknown fields: {', '.join(sorted(unknown))}")
+            row_bytes = int(np.prod(self.shape[1:])) * max(self.fields.values()) * 4
+            self.run = {'format': STORE_FORMAT, 'version': STORE_VERSION,
+                        'shape': list(self.shape), 'fields': self.fields,
+                        'keyframe_interval': max(1, int(keyframe_interval)),
+                        # a chunk, its keyframe chunk and the float64 quantization temporaries
+                        'chunk_rows': min(self.shape[0], slab_rows(row_bytes * 6)),
+                        'error_bounds': dict(error_bounds or {}), 'relative': bool(relative),
+                        'variables': variables}
+            self.coords = {name: np.asarray(coords[name], dtype=np.float64)
+                           for name in ('x1f', 'x2f', 'x3f')}
+            self.zip.writestr(RUN_MEMBER, json.dumps(self.run, indent=2))
+            for name, faces in self.coords.items():
+                with self.zip.open(f"coords/{name}.npy", 'w') as f:
+                    np.lib.format.write_array(f, faces)
+            self.frames = []
+        else:
+            self.run = json.loads(self.zip.read(RUN_MEMBER))
+            if self.run.get('format') != STORE_FORMAT:
+                raise ValueError(f"{path} is not a snapshot store")
+            if self.run.get('version', 0) > STORE_VERSION:
+                raise ValueError(f"{path}: store version {self.run['version']} is newer than "
+                                 f"this reader ({STORE_VERSION})")
+            self.shape = tuple(self.run['shape'])
+            self.fields = self.run['fields']
+            self.coords = {name: np.lib.format.read_array(self.zip.open(f"coords/{name}.npy"))
+                           for name in ('x1f', 'x2f', 'x3f')}
+            names = sorted(n for n in self.zip.namelist() if n.endswith('/frame.json'))
+            self.frames = [json.loads(self.zip.read(name)) for name in names]
+
+    # --- geometry ----------------------------------------------------------
+
+    @property
+    def chunk_rows(self):
+        return self.run['chunk_rows']
+
+    def chunks(self, k0=0, k1=None):
+        """(chunk, row start, row stop) of the chunks overlapping rows k0:k1"""
+        k1 = self.shape[0] if k1 is None else k1
+        step = self.chunk_rows
+        for chunk in range(k0 // step, -(-k1 // step)):
+            yield chunk, chunk * step, min((chunk + 1) * step, self.shape[0])
+
+    def field_shape(self, field, rows=None):
+        components = self.fields[field]
+        return ((self.shape[0] if rows is None else rows,) + self.shape[1:]
+                + ((components,) if components > 1 else ()))
+
+    def _planar_shape(self, field, rows):
+        """Encoded layout of a chunk: vector components one after the other"""
+        return (self.fields[field], rows) + self.shape[1:]
+
+    def __len__(self):
+        return len(self.frames)
+
+    # --- writing -----------------------------------------------------------
+
+    def add_frame(self, time, cycle, fields, source=None):
+        """
+        Append a frame. `fields` holds every field of the store as an array
+        or a slab-readable array-like (VTKField, memory map); they are
+        read one chunk at a time. Returns the frame number.
+        """
+        if self.mode == 'r':
+            raise ValueError(f"{self.path} is open for reading")
+        missing = set(self.fields) - set(fields)
+        if missing:
+            raise ValueError(f"frame is missing fields: {', '.join(sorted(missing))}")
+        frame = len(self.frames)
+        interval = self.run['keyframe_interval']
+        keyframe = frame - frame % interval
+        if self.frames and self.frames[-1]['keyframe'] > keyframe:
+            keyframe = self.frames[-1]['keyframe']  # a keyframe stored out of turn
+        extents = {field: self._extent(fields[field]) for field in self.fields
+                   if self.run['error_bounds'].get(field)}
+        magnitudes = {field: max(abs(low), abs(high)) for field, (low, high) in extents.items()}
+        if frame != keyframe:
+            bounds = self.frames[keyframe]['bounds']
+            quanta = self.frames[keyframe].get('quanta', bounds)
+            if any(not _fits(bounds[field], magnitudes[field], quanta[field]) for field in extents):
+                # Values outgrew the keyframe's rounding margin: store this frame on its own
+                keyframe = frame
+        if frame == keyframe:
+            if frame % interval == 0:
+                self._key_cache.clear()
+                self._key_cache_bytes = 0
+            bounds, quanta = {}, {}
+            for field in self.fields:
+                bound = self.run['error_bounds'].get(field)
+                if bound and self.run['relative']:
+                    low, high = extents[field]
+                    # a field constant over the keyframe is scaled by its magnitude (or 1)
+                    bound = bound * ((high - low) or magnitudes[field] or 1.0)
+                bounds[field] = float(bound) if bound else None
+                quanta[field] = _key_quantum(bound, magnitudes[field]) if bound else None
+        for field in self.fields:
+            array = fields[field]
+            if tuple(array.shape) != self.field_shape(field):
+                raise ValueError(f"field {field} has shape {tuple(array.shape)}, "
+                                 f"the store holds {self.field_shape(field)}")
+            for chunk, k0, k1 in self.chunks():
+                values = np.asarray(array[k0:k1], dtype=STORAGE_DTYPE)
+                values = np.moveaxis(values.reshape(self.field_shape(field, k1 - k0)[:3] + (-1,)), -1, 0)
+                integers = to_integers(values, quanta[field])
+                if frame != keyframe:
+                    words = _residual(integers, self._key_integers(keyframe, field, chunk))
+                else:
+                    words = _residual(integers)
+                    if self._key_cache_bytes + integers.nbytes <= memory_budget():
+                        self._key_cache[(keyframe, field, chunk)] = integers
+                        self._key_cache_bytes += integers.nbytes
+                self.zip.writestr(_chunk_member(frame, field, chunk), _shuffle(words),
+                                  compresslevel=self.compresslevel)
+        meta = {'time': float(time), 'cycle': int(cycle), 'keyframe': keyframe,
+                'bounds': bounds, 'quanta': quanta, 'source': source}
+        self.zip.writestr(_frame_prefix(frame) + 'frame.json', json.dumps(meta))
+        self.frames.append(meta)
+        return frame
+
+    def _extent(self, array):
+        """(min, max) of a field, read chunk by chunk"""
+        low, high = np.inf, -np.inf
+        for _, k0, k1 in self.chunks():
+            slab = np.asarray(array[k0:k1])
+            low, high = min(low, float(slab.min())), max(high, float(slab.max()))
+        return low, high
+
+    # --- reading -----------------------------------------------------------
+
+    def _chunk_integers(self, frame, field, chunk):
+        k0 = chunk * self.chunk_rows
+        shape = self._planar_shape(field, min(k0 + self.chunk_rows, self.shape[0]) - k0)
+        words = _unshuffle(self.zip.read(_chunk_member(frame, field, chunk)), int(np.prod(shape)))
+        keyframe = self.frames[frame]['keyframe']
+        key = None if frame == keyframe else self._key_integers(keyframe, field, chunk)
+        return _reconstruct(words, shape, key)
+
+    def _key_integers(self, keyframe, field, chunk):
+        key = (keyframe, field, chunk)
+        integers = self._key_cache.get(key)
+        if integers is None:
+            integers = self._chunk_integers(*key)
+            if self.mode == 'r':
+                # Keep the chunks of one keyframe only: readers go frame by frame
+                if any(k[0] != keyframe for k in self._key_cache):
+                    self._key_cache.clear()
+                self._key_cache[key] = integers
+        return integers
+
+    def _decode_chunk(self, frame, field, chunk):
+        meta = self.frames[frame]
+        half = meta.get('quanta', meta['bounds']).get(field)
+        values = np.moveaxis(from_integers(self._chunk_integers(frame, field, chunk), half), 0, -1)
+        return values if self.fields[field] > 1 else values[..., 0]
+
+    def read(self, frame, field, k0=0, k1=None, out=None):
+        """Rows k0:k1 (default: all) of one field of a frame as native float32"""
+        if not -len(self.frames) <= frame < len(self.frames):
+            raise ValueError(f"frame {frame} out of range (store has {len(self.frames)})")
+        frame %= len(self.frames)
+        k1 = self.shape[0] if k1 is None else min(k1, self.shape[0])
+        if out is None:
+            out = np.empty(self.field_shape(field, k1 - k0), dtype=STORAGE_DTYPE)
+        for chunk, c0, c1 in self.chunks(k0, k1):
+            values = self._decode_chunk(frame, field, chunk)
+            lo, hi = max(k0, c0), min(k1, c1)
+            out[lo - k0:hi - k0] = values[lo - c0:hi - c0]
+        return out
+
+    def field(self, frame, field):
+        """Slab-readable view of one field of a frame (like athena_io.VTKField)"""
+        return StoreField(self, frame, field)
+
+    def read_frame(self, frame, fields=None, load=True):
+        """
+        (time, data) like athena_io.read_athena_vtk_native: the face
+        coordinates plus the fields (default: all), loaded or as StoreField
+        views.
+        """
+        data = dict(self.coords)
+        for name in (fields or self.fields):
+            data[name] = self.read(frame, name) if load else self.field(frame, name)
+        return self.frames[frame]['time'], data
+
+    def close(self):
+        self.zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class StoreField:
+    """One field of one stored frame: `field[k0:k1]` decodes only the chunks of those rows"""
+
+    def __init__(self, store, frame, name):
+        self.store, self.frame, self.name = store, frame, name
+        self.shape = store.field_shape(name)
+        self.dtype = STORAGE_DTYPE
+        self.ndim = len(self.shape)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice) and index.step in (None, 1):
+            k0, k1, _ = index.indices(self.shape[0])
+            return self.store.read(self.frame, self.name, k0, max(k0, k1))
+        return self.load()[index]
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __array__(self, dtype=None, copy=None):
+        array = self.load()
+        return array if dtype is None else array.astype(dtype, copy=False)
+
+    def load(self):
+        return self.store.read(self.frame, self.name)
+
+
+def pack_vtk(paths, output, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, error_bounds=None,
+             relative=False, append=False, compresslevel=DEFAULT_COMPRESSLEVEL):
+    """
+    Pack Athena++ VTK snapshots of one run (in order) into a store. Every
+    file must have the same grid and fields as the first (or as the store
+    when appending). Returns the number of frames written.
+    """
+    store = None
+    created = not (append and os.path.exists(output))
+    try:
+        for path in paths:
+            header = read_vtk_header(path)
+            coords = read_vtk_coordinates(path, header)
+            fields = {name: VTKField(path, name, header) for name in header['fields']}
+            if store is None:
+                if not created:
+                    store = SnapshotStore(output, 'a', compresslevel=compresslevel)
+                else:
+                    store = SnapshotStore(output, 'w', coords, header['cell_shape'],
+                                          {name: components for name, (_, components)
+                                           in header['fields'].items()},
+                                          keyframe_interval, error_bounds, relative,
+                                          header['variables'] or 'prim', compresslevel)
+            for name in ('x1f', 'x2f', 'x3f'):
+                if not np.array_equal(coords[name].astype(np.float32),
+                                      store.coords[name].astype(np.float32)):
+                    raise ValueError(f"{path}: grid differs from the store's ({name})")
+            store.add_frame(header['time'], header['cycle'], fields, os.path.basename(path))
+    except BaseException:
+        if store is not None:
+            store.close()
+        if created and os.path.exists(output):
+            os.remove(output)  # no half-written store
+        raise
+    if store is not None:
+        store.close()
+    return len(paths)
+
+
+def parse_error_bounds(entries):
+    """['rho=1e-4', 'press=1e-3'] -> {'rho': 1e-4, 'press': 1e-3}"""
+    bounds = {}
+    for entry in entries or []:
+        name, sep, value = entry.partition('=')
+        if not sep:
+            raise ValueError(f"Error bound must look like field=1e-4, got {entry!r}")
+        bounds[name.strip()] = float(value)
+    return bounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Delta-compressed snapshot storage')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    pack_parser = subparsers.add_parser('pack', help='Pack VTK snapshots of one run into a store')
+    pack_parser.add_argument('inputs', nargs='+', help='VTK files or glob patterns, in frame order')
+    pack_parser.add_argument('-o', '--output', required=True, help='Store file (e.g. run.gsnap)')
+    pack_parser.add_argument('--keyframe-interval', type=int, default=DEFAULT_KEYFRAME_INTERVAL,
+                             help=f'Frames per keyframe (default: {DEFAULT_KEYFRAME_INTERVAL})')
+    pack_parser.add_argument('--error', action='append', default=[], metavar='FIELD=BOUND',
+                             help='Absolute error bound of a field (lossy); repeatable')
+    pack_parser.add_argument('--relative', action='store_true',
+                             help='Error bounds are fractions of the keyframe field range')
+    pack_parser.add_argument('--append', action='store_true', help='Append to an existing store')
+    pack_parser.add_argument('--level', type=int, default=DEFAULT_COMPRESSLEVEL,
+                             help=f'Deflate level 1-9 (default: {DEFAULT_COMPRESSLEVEL})')
+    info_parser = subparsers.add_parser('info', help='Describe a store')
+    info_parser.add_argument('store')
+    extract_parser = subparsers.add_parser('extract', help='Write one frame as an Athena++ VTK file')
+    extract_parser.add_argument('store')
+    extract_parser.add_argument('frame', type=int)
+    extract_parser.add_argument('-o', '--output', required=True)
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'pack':
+            paths = []
+            for pattern in args.inputs:
+                paths += sorted(glob.glob(pattern)) or [pattern]
+            frames = pack_vtk(paths, args.output, args.keyframe_interval,
+                              parse_error_bounds(args.error), args.relative, args.append, args.level)
+            source = sum(os.path.getsize(p) for p in paths)
+            size = os.path.getsize(args.output)
+            print(f"Packed {frames} frames into {args.output}: {size / 2**20:.2f} MiB "
+                  f"({source / max(size, 1):.1f}x smaller than {source / 2**20:.2f} MiB of VTK)")
+            return 0
+        with SnapshotStore(args.store) as store:
+            if args.command == 'info':
+                run = store.run
+                print(f"{args.store}: {len(store)} frames, cells {tuple(store.shape)}, "
+                      f"fields {', '.join(store.fields)}")
+                print(f"keyframe every {run['keyframe_interval']} frames, {run['chunk_rows']} "
+                      f"rows per chunk, error bounds {run['error_bounds'] or 'none (lossless)'}"
+                      f"{' (relative)' if run['relative'] and run['error_bounds'] else ''}")
+                if store.frames:
+                    print(f"time {store.frames[0]['time']:g} .. {store.frames[-1]['time']:g}, "
+                          f"{os.path.getsize(args.store) / len(store) / 2**10:.1f} KiB per frame")
+                return 0
+            time_value, data = store.read_frame(args.frame)
+            write_athena_vtk(args.output, time_value, store.frames[args.frame]['cycle'],
+                             store.coords, [(name, data[name]) for name in store.fields],
+                             store.run['variables'])
+            print(f"Frame {args.frame} (t={time_value:g}) written to {args.output}")
+            return 0
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+        print(f"Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Cached spherical-to-Cartesian resampling of spherical_polar snapshots
+Maps (r, θ, φ) cell data onto a Cartesian image (the meridional x-z plane
+or the equatorial x-y plane) or a Cartesian volume. For every output pixel
+the source cells and their weights (nearest cell, or linear in r, θ and
+φ between cell centres) are computed once per grid, view and resolution,
+kept in memory and stored on disk, so every later frame of the run is a
+single gather of the field at those cells and a weighted sum. Pixels
+outside the grid (e.g. inside the inner radius) are NaN. Vector fields
+are resampled per component and stay in the (r, θ, φ) basis.
+
+Maps are stored as .npz files in $GENESIS_RESAMPLE_CACHE (default
+resample_cache/), named by the grid and view they belong to.
+
+Usage: python -m utils.spherical_resample vtk_output/*.vtk -i time_density_blast.in --field rho --view meridional --size 512 -o rho.gif
+"""
+
+import argparse
+import glob
+import hashlib
+import os
+import time
+
+import numpy as np
+
+from utils.athena_io import open_vtk_field, read_vtk_header
+from utils.geometry import geometry_from_vtk
+from utils.memory_budget import slabs
+
+VIEWS = ('meridional', 'equatorial', 'volume')
+INTERPOLATIONS = ('nearest', 'linear')
+CACHE_ENV = 'GENESIS_RESAMPLE_CACHE'
+DEFAULT_CACHE_DIR = 'resample_cache'
+MAP_VERSION = 1
+
+_MAP_CACHE = {}
+
+
+def _axis_stencil(faces, centres, q, interpolation, periodic):
+    """
+    Per query coordinate q along one axis: the two neighbouring cells
+    (i0, i1), the weight of i1 and whether q lies inside the faces. A
+    collapsed axis (one cell) maps everything onto that cell.
+    """
+    n = centres.size
+    if n == 1:
+        zeros = np.zeros(q.shape, dtype=np.int64)
+        return zeros, zeros, np.zeros(q.shape), np.ones(q.shape, dtype=bool)
+    inside = (q >= faces[0]) & (q <= faces[-1])
+    if interpolation == 'nearest':
+        i0 = np.clip(np.searchsorted(faces, q, side='right') - 1, 0, n - 1)
+        return i0, i0, np.zeros(q.shape), inside
+    if periodic:
+        span = faces[-1] - faces[0]
+        ext = np.concatenate([[centres[-1] - span], centres, [centres[0] + span]])
+        j = np.clip(np.searchsorted(ext, q, side='right') - 1, 0, n)
+        w = (q - ext[j]) / (ext[j + 1] - ext[j])
+        return (j - 1) % n, j % n, np.clip(w, 0.0, 1.0), inside
+    j = np.searchsorted(centres, q, side='right') - 1
+    below, above = j < 0, j >= n - 1
+    j = np.clip(j, 0, n - 2)
+    w = (q - centres[j]) / (centres[j + 1] - centres[j])
+    # constant beyond the first and last centres
+    i0 = np.where(above, n - 1, j)
+    i1 = np.where(below, 0, j + 1)
+    w = np.where(below | above, 0.0, w)
+    return i0, i1, w, inside
+
+
+def _view_points(view, size, extent, angle, rows):
+    """(r, θ, φ) of the output pixels in `rows` (first output axis), flattened"""
+    axis = -extent + (np.arange(size) + 0.5) * (2.0 * extent / size)
+    if view == 'volume':
+        z, y, x = np.meshgrid(axis[rows], axis, axis, indexing='ij')
+    else:
+        # image rows run from the top (largest vertical coordinate) down
+        vertical, x = np.meshgrid(axis[::-1][rows], axis, indexing='ij')
+        if view == 'meridional':
+            z, y = vertical, np.zeros_like(x)
+        else:
+            y, z = vertical, None
+    if view == 'equatorial':
+        r = np.hypot(x, y)
+        theta = np.full(r.shape, angle)
+        phi = np.arctan2(y, x)
+    else:
+        r = np.sqrt(x**2 + y**2 + z**2)
+        theta = np.arccos(np.clip(np.divide(z, r, out=np.ones_like(r), where=r > 0), -1, 1))
+        phi = (np.where(x >= 0, angle, angle + np.pi) if view == 'meridional'
+               else np.arctan2(y, x))
+    return r.ravel(), theta.ravel(), phi.ravel()
+
+
+class ResampleMap:
+    """
+    Source cells and weights of every output pixel of one view of one grid.
+
+    Attributes:
+    -----------
+    shape : tuple
+        Output shape: (size, size) images (rows top to bottom) or
+        (size, size, size) volumes ordered (z, y, x)
+    pixels : (n,) flat indices of the output pixels inside the grid
+    indices : (n, stencil) int32/int64 flat cell indices into (nz, ny, nx)
+    weights : (n, stencil) float32
+    """
+
+    def __init__(self, shape, grid_shape, pixels, indices, weights):
+        self.shape = tuple(int(n) for n in shape)
+        self.grid_shape = tuple(int(n) for n in grid_shape)
+        self.pixels = pixels
+        self.indices = indices
+        self.weights = weights
+
+    @classmethod
+    def build(cls, geometry, view='meridional', size=512, extent=None, interpolation='linear',
+              angle=None):
+        """
+        Compute the map for a spherical_polar GridGeometry (utils.geometry).
+
+        Parameters:
+        -----------
+        view : str
+            'meridional' (x-z plane through φ = angle and angle + π),
+            'equatorial' (x-y plane at θ = angle) or 'volume'
+        size : int
+            Pixels along each output axis
+        extent : float
+            Half-width of the output in x, y and z (default: outer radius)
+        angle : float
+            φ of the meridional plane (default 0) or θ of the equatorial
+            plane (default π/2)
+        """
+        if geometry.coord != 'spherical_polar':
+            raise ValueError(f"resampling needs a spherical_polar grid, got {geometry.coord}")
+        if view not in VIEWS:
+            raise ValueError(f"view must be one of {', '.join(VIEWS)}, got {view!r}")
+        if interpolation not in INTERPOLATIONS:
+            raise ValueError(f"interpolation must be one of {', '.join(INTERPOLATIONS)}, "
+                             f"got {interpolation!r}")
+        extent = float(geometry.faces[1][-1] if extent is None else extent)
+        angle = float((np.pi / 2 if view == 'equatorial' else 0.0) if angle is None else angle)
+        nz, ny, nx = geometry.shape
+        phi_faces = geometry.faces[3]
+        periodic = nz > 1 and abs(phi_faces[-1] - phi_faces[0] - 2 * np.pi) < 1e-6
+        stencil = 2 ** sum(n > 1 for n in geometry.shape) if interpolation == 'linear' else 1
+        shape = (size,) * (3 if view == 'volume' else 2)
+        pixels_per_row = int(np.prod(shape[1:]))
+        index_dtype = np.int32 if max(nz * ny * nx, size**len(shape)) < 2**31 else np.int64
+        pixels, indices, weights = [], [], []
+        # float64 coordinates, per-axis stencils and products per pixel
+        for k0, k1 in slabs(size, pixels_per_row * (stencil * 24 + 160)):
+            r, theta, phi = _view_points(view, size, extent, angle, slice(k0, k1))
+            phi = phi_faces[0] + np.mod(phi - phi_faces[0], 2 * np.pi)
+            axes = [_axis_stencil(geometry.faces[d], geometry.centres[d], q, interpolation,
+                                  periodic and d == 3)
+                    for d, q in ((3, phi), (2, theta), (1, r))]
+            flat, weight = np.zeros((r.size, 1), dtype=np.int64), np.ones((r.size, 1))
+            for (i0, i1, w, _), n in zip(axes, (nz, ny, nx)):
+                if interpolation == 'linear' and n > 1:
+                    flat = np.concatenate([flat * n + i0[:, None], flat * n + i1[:, None]], axis=1)
+                    weight = np.concatenate([weight * (1 - w)[:, None], weight * w[:, None]],
+                                            axis=1)
+                else:
+                    flat = flat * n + i0[:, None]
+            # only pixels inside the grid are stored
+            ok = np.flatnonzero(axes[0][3] & axes[1][3] & axes[2][3])
+            pixels.append((ok + k0 * pixels_per_row).astype(index_dtype))
+            indices.append(flat[ok].astype(index_dtype))
+            weights.append(weight[ok].astype(np.float32))
+        return cls(shape, geometry.shape, np.concatenate(pixels), np.concatenate(indices),
+                   np.concatenate(weights))
+
+    def apply(self, field, fill=np.nan):
+        """
+        Resample one field: a gather of the stencil cells and a weighted sum.
+
+        field : array-like (nz, ny, nx) or (nz, ny, nx, components), e.g. a
+            memory map from utils.athena_io.open_vtk_field (only the
+            gathered cells are read)
+
+        Returns:
+        --------
+        float32 array of shape `shape` (+ components), `fill` outside the grid
+        """
+        field_shape = tuple(field.shape)
+        if field_shape[:3] != self.grid_shape:
+            raise ValueError(f"field shape {field_shape[:3]} does not match the map's grid "
+                             f"{self.grid_shape}")
+        components = field_shape[3:]
+        flat = field.reshape((-1,) + components)
+        gathered = np.asarray(flat[self.indices], dtype=np.float32)
+        values = np.full((int(np.prod(self.shape)),) + components, fill, dtype=np.float32)
+        values[self.pixels] = np.einsum('ps,ps...->p...', self.weights, gathered)
+        return values.reshape(self.shape + components)
+
+    def save(self, path):
+        np.savez(path, version=MAP_VERSION, shape=self.shape, grid_shape=self.grid_shape,
+                 pixels=self.pixels, indices=self.indices, weights=self.weights)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            if int(data['version']) != MAP_VERSION:
+                raise ValueError(f"{path}: resample map version {int(data['version'])} "
+                                 f"is not {MAP_VERSION}")
+            return cls(data['shape'], data['grid_shape'], data['pixels'], data['indices'],
+                       data['weights'])
+
+
+def resample_map(geometry, view='meridional', size=512, extent=None, interpolation='linear',
+                 angle=None, cache_dir=None):
+    """
+    Cached ResampleMap: from memory, else from the disk cache, else built
+    and stored. cache_dir defaults to $GENESIS_RESAMPLE_CACHE or
+    resample_cache/; pass False to keep maps in memory only.
+    """
+    digest = hashlib.sha1(geometry.cache_key().encode('ascii'))
+    digest.update(repr((MAP_VERSION, view, int(size), extent, interpolation, angle)).encode('ascii'))
+    key = digest.hexdigest()
+    resampler = _MAP_CACHE.get(key)
+    if resampler is not None:
+        return resampler
+    if cache_dir is None:
+        cache_dir = os.environ.get(CACHE_ENV, DEFAULT_CACHE_DIR)
+    path = os.path.join(cache_dir, f"{view}-{size}-{key[:16]}.npz") if cache_dir else None
+    if path and os.path.exists(path):
+        resampler = ResampleMap.load(path)
+    else:
+        resampler = ResampleMap.build(geometry, view, size, extent, interpolation, angle)
+        if path:
+            os.makedirs(cache_dir, exist_ok=True)
+            partial = path + '.partial.npz'
+            resampler.save(partial)
+            os.replace(partial, path)
+    _MAP_CACHE[key] = resampler
+    return resampler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Resample spherical_polar snapshots onto a '
+                                                 'Cartesian image or volume')
+    parser.add_argument('files', nargs='+', help='VTK snapshots of one run')
+    parser.add_argument('-i', '--input', default=None,
+                        help='athinput file of the run (coordinate system and collapsed extents)')
+    parser.add_argument('--coord', choices=('cartesian', 'spherical_polar'), default=None)
+    parser.add_argument('--field', default='rho')
+    parser.add_argument('--component', type=int, default=None,
+                        help='Vector component (default: magnitude)')
+    parser.add_argument('--view', choices=VIEWS, default='meridional')
+    parser.add_argument('--size', type=int, default=None,
+                        help='Pixels per axis (default: 512 for images, 128 for volumes)')
+    parser.add_argument('--extent', type=float, default=None,
+                        help='Half-width of the output (default: outer radius)')
+    parser.add_argument('--angle', type=float, default=None,
+                        help='φ of the meridional plane or θ of the equatorial plane')
+    parser.add_argument('--interpolation', choices=INTERPOLATIONS, default='linear')
+    parser.add_argument('--cache-dir', default=None,
+                        help=f'Map cache directory (default: ${CACHE_ENV} or {DEFAULT_CACHE_DIR})')
+    parser.add_argument('-o', '--output', required=True,
+                        help='.gif (images) or a directory for one .npy per frame')
+    parser.add_argument('--vmin', type=float, default=None)
+    parser.add_argument('--vmax', type=float, default=None)
+    parser.add_argument('--cmap', default='viridis')
+    parser.add_argument('--fps', type=int, default=10)
+    args = parser.parse_args()
+
+    files = sorted(f for pattern in args.files for f in (glob.glob(pattern) or [pattern]))
+    gif = args.output.lower().endswith('.gif')
+    size = args.size or (128 if args.view == 'volume' else 512)
+    try:
+        if gif and args.view == 'volume':
+            raise ValueError("a .gif needs an image view; write volumes to a directory")
+        header = read_vtk_header(files[0])
+        geometry = geometry_from_vtk(files[0], args.coord or (None if args.input else
+                                                              'spherical_polar'),
+                                     args.input, header)
+        start = time.perf_counter()
+        resampler = resample_map(geometry, args.view, size, args.extent, args.interpolation,
+                                 args.angle, args.cache_dir)
+        print(f"Map of the {args.view} view ({'x'.join(map(str, resampler.shape))}, "
+              f"{resampler.indices.shape[1]} cells per pixel) ready in "
+              f"{time.perf_counter() - start:.2f} s")
+
+        def frames():
+            for path in files:
+                frame_header = read_vtk_header(path)
+                values = resampler.apply(open_vtk_field(path, args.field, frame_header))
+                if values.ndim > len(resampler.shape):
+                    values = (np.linalg.norm(values, axis=-1) if args.component is None
+                              else values[..., args.component])
+                yield path, values
+
+        start = time.perf_counter()
+        if gif:
+            from utils.gif_writer import StreamingGifWriter, palette_image
+            from utils.slice_movie import colormap_lut
+            vmin, vmax = args.vmin, args.vmax
+            if vmin is None or vmax is None:
+                ranges = [(np.nanmin(v), np.nanmax(v)) for _, v in frames()]
+                vmin = min(r[0] for r in ranges) if vmin is None else vmin
+                vmax = max(r[1] for r in ranges) if vmax is None else vmax
+            scale = 255.0 / (vmax - vmin) if vmax > vmin else 0.0
+            lut = colormap_lut(args.cmap)
+            with StreamingGifWriter(args.output, fps=args.fps,
+                                    palette=palette_image(lut.tobytes())) as writer:
+                for _, values in frames():
+                    pixels = np.clip((values - vmin) * scale, 0, 255)
+                    writer.write_indexed(np.nan_to_num(pixels, nan=0.0).astype(np.uint8).tobytes(),
+                                         resampler.shape[::-1])
+        else:
+            os.makedirs(args.output, exist_ok=True)
+            for number, (_, values) in enumerate(frames()):
+                np.save(os.path.join(args.output, f"frame_{number:05d}.npy"), values)
+        seconds = time.perf_counter() - start
+        print(f"{len(files)} frames of {args.field} written to {args.output} "
+              f"({1000 * seconds / len(files):.1f} ms per frame)")
+        return 0
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
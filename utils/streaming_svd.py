@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Streaming randomized SVD / POD of snapshot sequences
+Decomposes a sequence of snapshots into spatial modes, singular values and
+temporal coefficients without stacking the frames in memory. Snapshots are
+consumed one chunk of columns at a time from the Athena readers and only a
+low-rank sketch is kept, so memory grows with grid size x rank instead of
+grid size x frames.
+
+Two algorithms share one result type:
+  - randomized_pod: the randomized range finder run as streaming passes
+    over a re-readable sequence (2 + power_iterations passes, accurate to
+    near the optimal rank-r error)
+  - StreamingSVD: a single-pass sketch (range sketch Y = A Omega plus
+    co-range sketch W = Psi A) for generators that can only be read once
+
+Usage:
+  python -m utils.streaming_svd vtk_output/blast.block0.blast_td.*.vtk --fields rho press --rank 8
+"""
+
+import argparse
+import glob
+import json
+import os
+
+import numpy as np
+
+from utils.athena_io import (open_vtk_field, read_vtk_coordinates, read_vtk_header,
+                             write_athena_vtk)
+
+# Column layout of the tables compare_simulations.py loads and exports
+TABLE_COLUMNS = ['x', 'y', 'z', 'time', 'rho', 'vel1', 'vel2', 'vel3', 'press']
+
+
+class SnapshotSequence:
+    """
+    Re-iterable source of snapshot columns read from VTK files or tables.
+
+    Iterating yields float64 arrays of shape (n_rows, c) holding up to
+    chunk_size consecutive snapshots, each the concatenation of the
+    requested fields. Only one chunk is in memory at a time; VTK fields
+    are read through memory maps.
+    """
+
+    def __init__(self, files, fields=('rho',), chunk_size=8):
+        if not files:
+            raise ValueError("No snapshot files given")
+        self.files = list(files)
+        self.fields = list(fields)
+        self.chunk_size = max(1, int(chunk_size))
+        self.format = 'vtk' if self.files[0].endswith('.vtk') else 'table'
+
+        first = self.files[0]
+        if self.format == 'vtk':
+            header = read_vtk_header(first)
+            missing = [name for name in self.fields if name not in header['fields']]
+            if missing:
+                raise ValueError(f"{first}: no field(s) {', '.join(missing)}")
+            self.coords = read_vtk_coordinates(first, header)
+            shapes = [open_vtk_field(first, name, header).shape for name in self.fields]
+        else:
+            missing = [name for name in self.fields if name not in TABLE_COLUMNS]
+            if missing:
+                raise ValueError(f"Unknown table column(s): {', '.join(missing)}")
+            table = np.atleast_2d(np.loadtxt(first))
+            self.coords = {'positions': table[:, :TABLE_COLUMNS.index('time')]}
+            shapes = [(table.shape[0],)] * len(self.fields)
+
+        # (field, shape, start, stop) of each field inside a column
+        self.layout = []
+        start = 0
+        for name, shape in zip(self.fields, shapes):
+            size = int(np.prod(shape))
+            self.layout.append((name, shape, start, start + size))
+            start += size
+        self.n_rows = start
+        self.times = None
+
+    def __len__(self):
+        return len(self.files)
+
+    def read(self, path):
+        """Return (time, column) for one file"""
+        column = np.empty(self.n_rows)
+        if self.format == 'vtk':
+            header = read_vtk_header(path)
+            for name, shape, start, stop in self.layout:
+                data = open_vtk_field(path, name, header)
+                if data.shape != shape:
+                    raise ValueError(f"{path}: field {name} has shape {data.shape}, "
+                                     f"expected {shape}")
+                column[start:stop] = data.ravel()
+            return header['time'], column
+        table = np.atleast_2d(np.loadtxt(path))
+        if table.shape[0] != self.n_rows // len(self.fields):
+            raise ValueError(f"{path}: {table.shape[0]} rows, expected "
+                             f"{self.n_rows // len(self.fields)}")
+        for name, _, start, stop in self.layout:
+            column[start:stop] = table[:, TABLE_COLUMNS.index(name)]
+        return float(table[0, TABLE_COLUMNS.index('time')]), column
+
+    def __iter__(self):
+        times = []
+        for first in range(0, len(self.files), self.chunk_size):
+            paths = self.files[first:first + self.chunk_size]
+            chunk = np.empty((self.n_rows, len(paths)))
+            for j, path in enumerate(paths):
+                time, chunk[:, j] = self.read(path)
+                times.append(time)
+            yield chunk
+        self.times = np.array(times)
+
+
+def _columns(chunk):
+    chunk = np.asarray(chunk, dtype=np.float64)
+    return chunk[:, None] if chunk.ndim == 1 else chunk
+
+
+class PODResult:
+    """
+    Rank-r POD of a snapshot sequence: A ~ mean + modes @ coefficients.T
+
+    Attributes:
+    -----------
+    modes : (n_rows, r) orthonormal spatial modes
+    singular_values : (r,)
+    coefficients : (n_snapshots, r) temporal coefficients (singular value
+        times right singular vector), i.e. the projection of each centred
+        snapshot onto each mode
+    mean : (n_rows,) temporal mean (zeros if the data were not centred)
+    captured_energy : fraction of the (centred) variance in the r modes
+    times, layout, coords : optional snapshot metadata
+    """
+
+    def __init__(self, modes, singular_values, coefficients, mean, total_energy,
+                 times=None, layout=None, coords=None):
+        self.modes = modes
+        self.singular_values = singular_values
+        self.coefficients = coefficients
+        self.mean = mean
+        self.total_energy = float(total_energy)
+        self.times = times
+        self.layout = layout
+        self.coords = coords
+
+    @property
+    def captured_energy(self):
+        if self.total_energy <= 0:
+            return 1.0
+        return float(min(1.0, np.sum(self.singular_values**2) / self.total_energy))
+
+    def unpack(self, column):
+        """Split a column into {field: array} using the snapshot layout"""
+        if not self.layout:
+            return {'data': column}
+        return {name: column[start:stop].reshape(shape)
+                for name, shape, start, stop in self.layout}
+
+    def mode(self, index):
+        """Spatial mode as {field: array}"""
+        return self.unpack(self.modes[:, index])
+
+    def reconstruct(self, index):
+        """Rank-r reconstruction of snapshot index as {field: array}"""
+        return self.unpack(self.mean + self.modes @ self.coefficients[index])
+
+    def save(self, path):
+        meta = {'layout': [[name, list(shape), start, stop]
+                           for name, shape, start, stop in (self.layout or [])],
+                'total_energy': self.total_energy}
+        arrays = {'modes': self.modes.astype(np.float32),
+                  'singular_values': self.singular_values,
+                  'coefficients': self.coefficients, 'mean': self.mean,
+                  'meta': np.array(json.dumps(meta))}
+        if self.times is not None:
+            arrays['times'] = self.times
+        for name, values in (self.coords or {}).items():
+            arrays['coord_' + name] = values
+        with open(path, 'wb') as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            coords = {key[len('coord_'):]: data[key] for key in data.files
+                      if key.startswith('coord_')}
+            return cls(data['modes'].astype(np.float64), data['singular_values'],
+                       data['coefficients'], data['mean'], meta['total_energy'],
+                       times=data['times'] if 'times' in data.files else None,
+                       layout=[(name, tuple(shape), start, stop)
+                               for name, shape, start, stop in meta['layout']] or None,
+                       coords=coords or None)
+
+
+class StreamingSVD:
+    """
+    Single-pass randomized SVD sketch of a matrix streamed by columns.
+
+    Keeps a range sketch Y = A Omega (n_rows x k), a co-range sketch
+    W = Psi A (l x n_cols) and the running mean, with k = rank + oversample
+    and l = 2k + 1 (Tropp et al., 2017). Centring is applied to the
+    sketches at the end, so the mean does not have to be known up front.
+    Memory is about (k + l) * n_rows floats.
+    """
+
+    def __init__(self, n_rows, rank, oversample=10, center=True, seed=0):
+        if rank < 1:
+            raise ValueError("rank must be at least 1")
+        self.rank = int(rank)
+        self.center = center
+        self.k = self.rank + int(oversample)
+        self.l = 2 * self.k + 1
+        self.rng = np.random.default_rng(seed)
+        self.psi = self.rng.standard_normal((self.l, n_rows))
+        self.range_sketch = np.zeros((n_rows, self.k))
+        self.omega_sum = np.zeros(self.k)
+        self.corange = []
+        self.total = np.zeros(n_rows)
+        # Energy is accumulated about the first column to limit cancellation
+        self.shift = None
+        self.shifted_sum = np.zeros(n_rows)
+        self.shifted_sumsq = 0.0
+        self.n_cols = 0
+
+    def update(self, chunk):
+        """Add one snapshot (n_rows,) or a chunk of snapshots (n_rows, c)"""
+        chunk = _columns(chunk)
+        omega = self.rng.standard_normal((chunk.shape[1], self.k))
+        self.range_sketch += chunk @ omega
+        self.omega_sum += omega.sum(axis=0)
+        self.corange.append(self.psi @ chunk)
+        self.total += chunk.sum(axis=1)
+        if self.shift is None:
+            self.shift = chunk[:, 0].copy()
+        shifted = chunk - self.shift[:, None]
+        self.shifted_sum += shifted.sum(axis=1)
+        self.shifted_sumsq += float(np.sum(shifted**2))
+        self.n_cols += chunk.shape[1]
+        return self
+
+    def result(self, times=None, layout=None, coords=None):
+        """Return the rank-r PODResult of everything seen so far"""
+        if self.n_cols == 0:
+            raise ValueError("No snapshots were added")
+        y = self.range_sketch
+        w = np.hstack(self.corange)
+        if self.center:
+            mean = self.total / self.n_cols
+            y = y - np.outer(mean, self.omega_sum)
+            w = w - (self.psi @ mean)[:, None]
+            total_energy = self.shifted_sumsq - np.sum(self.shifted_sum**2) / self.n_cols
+        else:
+            mean = np.zeros_like(self.total)
+            total_energy = np.sum(self.shift**2) * self.n_cols + self.shifted_sumsq \
+                + 2 * self.shift @ self.shifted_sum
+        q, _ = np.linalg.qr(y)
+        x = np.linalg.lstsq(self.psi @ q, w, rcond=None)[0]
+        u, s, vt = np.linalg.svd(x, full_matrices=False)
+        r = min(self.rank, s.size)
+        return PODResult(q @ u[:, :r], s[:r], vt[:r].T * s[:r], mean, total_energy,
+                         times=times, layout=layout, coords=coords)
+
+
+def _source_meta(source):
+    """Snapshot metadata a SnapshotSequence carries (None for plain iterables)"""
+    return {name: getattr(source, name, None) for name in ('times', 'layout', 'coords')}
+
+
+def randomized_pod(source, rank, oversample=10, power_iterations=1, center=True, seed=0):
+    """
+    Randomized POD of a re-readable snapshot source in streaming passes.
+
+    Parameters:
+    -----------
+    source : iterable
+        Re-iterable source of column chunks (n_rows, c), e.g. a
+        SnapshotSequence or a list of arrays. A one-shot iterator
+        (generator) is decomposed with the single-pass StreamingSVD instead.
+    rank : int
+        Number of modes returned
+    oversample : int
+        Extra sketch columns; the sketch has rank + oversample columns
+    power_iterations : int
+        Subspace iterations, one extra pass each; sharpens the modes when
+        the singular values decay slowly
+    center : bool
+        Subtract the temporal mean before decomposing (POD convention)
+    seed : int
+        Seed of the random test matrix
+
+    Returns:
+    --------
+    PODResult
+    """
+    if rank < 1:
+        raise ValueError("rank must be at least 1")
+    if iter(source) is source:
+        sketch = None
+        for chunk in source:
+            chunk = _columns(chunk)
+            sketch = sketch or StreamingSVD(chunk.shape[0], rank, oversample, center, seed)
+            sketch.update(chunk)
+        if sketch is None:
+            raise ValueError("No snapshots were added")
+        return sketch.result(**_source_meta(source))
+
+    k = rank + int(oversample)
+    rng = np.random.default_rng(seed)
+
+    # Pass 1: range sketch and mean
+    y, omega_sum, total, n_cols = None, np.zeros(k), None, 0
+    for chunk in source:
+        chunk = _columns(chunk)
+        if y is None:
+            y, total = np.zeros((chunk.shape[0], k)), np.zeros(chunk.shape[0])
+        omega = rng.standard_normal((chunk.shape[1], k))
+        y += chunk @ omega
+        omega_sum += omega.sum(axis=0)
+        total += chunk.sum(axis=1)
+        n_cols += chunk.shape[1]
+    if y is None:
+        raise ValueError("No snapshots were added")
+    mean = total / n_cols if center else np.zeros_like(total)
+    if center:
+        y -= np.outer(mean, omega_sum)
+
+    # Power passes: Y <- (A - mean)(A - mean)^T Q
+    for _ in range(power_iterations):
+        q, _ = np.linalg.qr(y)
+        y = np.zeros_like(q)
+        for chunk in source:
+            chunk = _columns(chunk) - mean[:, None]
+            y += chunk @ (chunk.T @ q)
+
+    # Final pass: project every snapshot on the range basis
+    q, _ = np.linalg.qr(y)
+    blocks, total_energy = [], 0.0
+    for chunk in source:
+        chunk = _columns(chunk) - mean[:, None]
+        blocks.append(q.T @ chunk)
+        total_energy += float(np.sum(chunk**2))
+    u, s, vt = np.linalg.svd(np.hstack(blocks), full_matrices=False)
+    r = min(rank, s.size)
+    return PODResult(q @ u[:, :r], s[:r], vt[:r].T * s[:r], mean, total_energy,
+                     **_source_meta(source))
+
+
+def write_modes_vtk(result, prefix):
+    """Write the mean and every mode as Athena VTK files prefix.mean.vtk, prefix.mode00.vtk, ..."""
+    if not result.coords or 'x1f' not in result.coords:
+        raise ValueError("Modes can only be written as VTK for VTK input")
+    paths = []
+    columns = [('mean', result.mean)] + [(f"mode{i:02d}", result.modes[:, i])
+                                         for i in range(result.modes.shape[1])]
+    for label, column in columns:
+        path = f"{prefix}.{label}.vtk"
+        write_athena_vtk(path, 0.0, 0, result.coords, list(result.unpack(column).items()))
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Streaming randomized POD of snapshot sequences')
+    parser.add_argument('files', nargs='+', help='Snapshot files (VTK or tables), in time order')
+    parser.add_argument('--fields', nargs='+', default=['rho'], help='Fields to decompose')
+    parser.add_argument('--rank', type=int, default=8, help='Number of modes')
+    parser.add_argument('--oversample', type=int, default=10)
+    parser.add_argument('--power-iterations', type=int, default=1)
+    parser.add_argument('--single-pass', action='store_true',
+                        help='Read every file once (single-pass sketch, less accurate)')
+    parser.add_argument('--chunk', type=int, default=8, help='Snapshots read per chunk')
+    parser.add_argument('--no-center', action='store_true', help='Do not subtract the mean')
+    parser.add_argument('-o', '--output', default=None, help='Save the result as .npz')
+    parser.add_argument('--write-modes', metavar='PREFIX', default=None,
+                        help='Write the mean and modes as VTK files (VTK input only)')
+    args = parser.parse_args()
+
+    files = sorted(f for pattern in args.files for f in (glob.glob(pattern) or [pattern]))
+    try:
+        sequence = SnapshotSequence(files, args.fields, args.chunk)
+        if args.single_pass:
+            source = iter(sequence)
+        else:
+            source = sequence
+        result = randomized_pod(source, args.rank, args.oversample, args.power_iterations,
+                                center=not args.no_center)
+        if result.times is None:
+            result.times = sequence.times
+        result.layout, result.coords = sequence.layout, sequence.coords
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    print(f"{len(files)} snapshots x {sequence.n_rows} values")
+    scale = np.sum(result.mean**2) * len(files)
+    if result.total_energy <= 1e-24 * scale:
+        print("The snapshots do not vary (differences are at round-off level); no modes to report")
+    else:
+        print(f"{100 * result.captured_energy:.4f}% of the variance in "
+              f"{result.modes.shape[1]} modes")
+        energy = result.singular_values**2 / result.total_energy
+        for i, (s, e) in enumerate(zip(result.singular_values, energy)):
+            print(f"  mode {i:2d}: singular value {s:.6e}  energy {100 * e:8.4f}%")
+    if args.output:
+        result.save(args.output)
+        print(f"Saved to {args.output}")
+    if args.write_modes:
+        paths = write_modes_vtk(result, args.write_modes)
+        print(f"Wrote {len(paths)} VTK files to {os.path.dirname(paths[0]) or '.'}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
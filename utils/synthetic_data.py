@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Synthetic Athena++-like datasets for benchmarking
+Builds snapshots of an analytic time-density flow on grids from 64² up to
+512³ and writes them in the formats the analysis tools read: legacy binary
+VTK (RECTILINEAR_GRID), formatted text tables (.out1 as loaded by
+compare_simulations.py), HDF5 .athdf (needs h5py) and .hst history files.
+Fields are computed slab by slab, so even 512³ datasets are written with
+bounded memory.
+
+The flow uses the same formulas as the time_density problem generator:
+ρ = ρ_td(t + r), v = R(t + r) r̂, P = ρ^γ R(t + r), with ρ_td the
+time-density and R the temporal flow ratio, on the domain [-1, 1] per
+active direction. The 'standard' variant sets α = β = 0.
+
+Usage: python -m utils.synthetic_data -o benchmark_data --sizes 64x64 128x128x128 [--formats vtk table hst]
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+from utils.athena_io import (HISTORY_COLUMNS, write_athena_vtk, write_history_header,
+                             write_history_row)
+from utils.hydro_solver import temporal_flow_ratio, time_density
+
+try:
+    import h5py
+    H5PY_AVAILABLE = True
+except ImportError:
+    H5PY_AVAILABLE = False
+
+FORMATS = ('vtk', 'table', 'athdf', 'hst')
+
+DEFAULT_PARAMS = {'alpha': 0.5, 'omega': 3.0, 'beta': 0.2, 'epsilon': 0.1,
+                  'gamma': 5.0 / 3.0, 'time': 0.25}
+
+TABLE_MAX_CELLS = 1 << 20  # text tables beyond this are impractically large
+HISTORY_MAX_ROWS = 100000
+SLAB_CELLS = 1 << 21  # cells computed per slab
+
+
+def parse_size(text):
+    """'64x64' or '512x512x512' -> cell shape (nz, ny, nx)"""
+    try:
+        counts = [int(n) for n in text.lower().split('x')]
+    except ValueError:
+        counts = []
+    if not 1 <= len(counts) <= 3 or min(counts) < 1:
+        raise ValueError(f"Size must look like NX, NXxNY or NXxNYxNZ, got {text!r}")
+    counts += [1] * (3 - len(counts))
+    return tuple(reversed(counts))
+
+
+def size_label(shape):
+    """Cell shape (nz, ny, nx) -> '64x64' style label"""
+    counts = [n for n in reversed(shape)]
+    while len(counts) > 1 and counts[-1] == 1:
+        counts.pop()
+    return 'x'.join(str(n) for n in counts)
+
+
+def grid_faces(shape):
+    """Face coordinates {'x1f', 'x2f', 'x3f'}: [-1, 1] per active direction, unit width otherwise"""
+    coords = {}
+    for name, n in zip(('x1f', 'x2f', 'x3f'), reversed(shape)):
+        coords[name] = np.linspace(-1.0, 1.0, n + 1) if n > 1 else np.array([-0.5, 0.5])
+    return coords
+
+
+def model_params(variant='time_density', **overrides):
+    """Model parameters of a variant ('time_density' or 'standard')"""
+    params = dict(DEFAULT_PARAMS, **overrides)
+    if variant == 'standard':
+        params.update(alpha=0.0, beta=0.0)
+    elif variant != 'time_density':
+        raise ValueError(f"Unknown variant: {variant}")
+    return params
+
+
+def model_slab(coords, k0, k1, params):
+    """
+    Primitive fields of cells k0:k1 along x3.
+
+    Returns:
+    --------
+    dict with 'rho', 'press' (k1 - k0, ny, nx) and 'vel' (k1 - k0, ny, nx, 3),
+    all float32
+    """
+    centres = [0.5 * (coords[name][:-1] + coords[name][1:]) for name in ('x1f', 'x2f', 'x3f')]
+    x = centres[0][None, None, :]
+    y = centres[1][None, :, None]
+    z = centres[2][k0:k1, None, None]
+    active = [len(c) > 1 for c in centres]
+    x, y, z = (c if a else np.zeros_like(c) for c, a in zip((x, y, z), active))
+    r = np.sqrt(x**2 + y**2 + z**2)
+    t = params['time'] + r
+    rho = time_density(t, params['alpha'], params['omega'])
+    flow = temporal_flow_ratio(t, params['beta'], params['epsilon'])
+    scale = flow / np.maximum(r, 1e-12)
+    shape = np.broadcast_shapes(x.shape, y.shape, z.shape)
+    vel = np.empty(shape + (3,), dtype=np.float32)
+    for i, c in enumerate((x, y, z)):
+        vel[..., i] = c * scale
+    return {'rho': np.broadcast_to(rho, shape).astype(np.float32),
+            'press': np.broadcast_to(rho**params['gamma'] * flow, shape).astype(np.float32),
+            'vel': vel}
+
+
+class SyntheticField:
+    """
+    Array-like view of one model field: has `shape` and computes slabs
+    [k0:k1] along x3 on demand (the last slab is cached and shared by the
+    fields of one snapshot).
+    """
+
+    def __init__(self, name, coords, params, shape, cache=None):
+        self.name = name
+        self.coords = coords
+        self.params = params
+        self.shape = shape + ((3,) if name == 'vel' else ())
+        self.cache = cache if cache is not None else {}
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise ValueError("SyntheticField supports slab slicing along x3 only")
+        k0, k1, _ = index.indices(self.shape[0])
+        if self.cache.get('range') != (k0, k1):
+            self.cache['range'] = (k0, k1)
+            self.cache['slab'] = model_slab(self.coords, k0, k1, self.params)
+        return self.cache['slab'][self.name]
+
+
+def _slabs(shape):
+    step = max(1, SLAB_CELLS // (shape[1] * shape[2]))
+    for k in range(0, shape[0], step):
+        yield k, min(k + step, shape[0])
+
+
+def write_vtk(path, shape, params, cycle=0):
+    """Write one snapshot as an Athena++ legacy binary VTK file"""
+    coords = grid_faces(shape)
+    cache = {}
+    fields = [(name, SyntheticField(name, coords, params, shape, cache))
+              for name in ('rho', 'press', 'vel')]
+    write_athena_vtk(path, params['time'], cycle, coords, fields)
+    return path
+
+
+def write_table(path, shape, params):
+    """
+    Write one snapshot as an Athena++ formatted text table with the columns
+    x1v x2v x3v time rho vel1 vel2 vel3 press read by compare_simulations.py
+    """
+    if int(np.prod(shape)) > TABLE_MAX_CELLS:
+        raise ValueError(f"Text tables are limited to {TABLE_MAX_CELLS} cells, "
+                         f"{size_label(shape)} has {int(np.prod(shape))}")
+    coords = grid_faces(shape)
+    centres = [0.5 * (coords[name][:-1] + coords[name][1:]) for name in ('x1f', 'x2f', 'x3f')]
+    with open(path, 'w') as f:
+        f.write(f"# Athena++ data at time={params['time']:e}  cycle=0  variables=prim\n")
+        f.write("# x1v x2v x3v time rho vel1 vel2 vel3 press\n")
+        for k0, k1 in _slabs(shape):
+            slab = model_slab(coords, k0, k1, params)
+            z, y, x = np.meshgrid(centres[2][k0:k1], centres[1], centres[0], indexing='ij')
+            table = np.column_stack([x.ravel(), y.ravel(), z.ravel(),
+                                     np.full(x.size, params['time']),
+                                     slab['rho'].ravel(), slab['vel'].reshape(-1, 3),
+                                     slab['press'].ravel()])
+            np.savetxt(f, table, fmt='%.6e')
+    return path
+
+
+def write_athdf(path, shape, params, cycle=0):
+    """Write one snapshot in the Athena++ HDF5 (.athdf) single-block layout"""
+    if not H5PY_AVAILABLE:
+        raise ValueError("Writing .athdf files requires the h5py package")
+    coords = grid_faces(shape)
+    nz, ny, nx = shape
+    names = ['rho', 'press', 'vel1', 'vel2', 'vel3']
+    with h5py.File(path, 'w') as f:
+        f.attrs['Time'] = params['time']
+        f.attrs['NumCycles'] = cycle
+        f.attrs['Coordinates'] = np.bytes_('cartesian')
+        f.attrs['RootGridSize'] = np.array([nx, ny, nz], dtype=np.int32)
+        f.attrs['MeshBlockSize'] = np.array([nx, ny, nz], dtype=np.int32)
+        f.attrs['NumMeshBlocks'] = 1
+        f.attrs['MaxLevel'] = 0
+        f.attrs['NumVariables'] = np.array([len(names)], dtype=np.int32)
+        f.attrs['DatasetNames'] = np.array([b'prim'])
+        f.attrs['VariableNames'] = np.array([n.encode('ascii') for n in names])
+        for name in ('x1f', 'x2f', 'x3f'):
+            faces = coords[name]
+            f.create_dataset(name, data=faces[None, :].astype(np.float32))
+            f.create_dataset(name[:2] + 'v', data=(0.5 * (faces[:-1] + faces[1:]))[None, :]
+                             .astype(np.float32))
+        f.create_dataset('Levels', data=np.zeros(1, dtype=np.int32))
+        f.create_dataset('LogicalLocations', data=np.zeros((1, 3), dtype=np.int64))
+        prim = f.create_dataset('prim', shape=(len(names), 1) + shape, dtype=np.float32)
+        for k0, k1 in _slabs(shape):
+            slab = model_slab(coords, k0, k1, params)
+            prim[0, 0, k0:k1] = slab['rho']
+            prim[1, 0, k0:k1] = slab['press']
+            for i in range(3):
+                prim[2 + i, 0, k0:k1] = slab['vel'][..., i]
+    return path
+
+
+def write_hst(path, params, rows):
+    """Write a history file of `rows` outputs sampled from the model at r = 0"""
+    times = np.linspace(0.0, params['time'] * 40, rows)
+    rho = time_density(times, params['alpha'], params['omega'])
+    flow = temporal_flow_ratio(times, params['beta'], params['epsilon'])
+    dt = np.gradient(times) if rows > 1 else np.zeros(rows)
+    kinetic = 0.5 * rho * flow**2
+    columns = [times, dt, rho * 8.0, flow, flow, flow, kinetic, kinetic, kinetic,
+               rho**params['gamma'] * flow / (params['gamma'] - 1) + 3 * kinetic]
+    with open(path, 'w') as f:
+        write_history_header(f, HISTORY_COLUMNS)
+        for row in zip(*columns):
+            write_history_row(f, row)
+    return path
+
+
+def dataset_paths(output_dir, shape):
+    """{format: [paths]} of the dataset of one size (tables: standard and time_density)"""
+    directory = os.path.join(output_dir, size_label(shape))
+    return {'vtk': [os.path.join(directory, 'time_density.block0.out3.00000.vtk')],
+            'table': [os.path.join(directory, 'standard.out1.00000'),
+                      os.path.join(directory, 'time_density.out1.00000')],
+            'athdf': [os.path.join(directory, 'time_density.out2.00000.athdf')],
+            'hst': [os.path.join(directory, 'time_density.hst')]}
+
+
+def history_rows(shape):
+    return int(min(np.prod(shape), HISTORY_MAX_ROWS))
+
+
+def supported(shape, fmt):
+    """Whether a format is generated at this size (and can be here)"""
+    if fmt == 'table':
+        return int(np.prod(shape)) <= TABLE_MAX_CELLS
+    if fmt == 'athdf':
+        return H5PY_AVAILABLE
+    return fmt in FORMATS
+
+
+def generate(output_dir, sizes, formats=FORMATS, params=None, force=False, verbose=False):
+    """
+    Write the datasets of every size and format, reusing files already
+    written with the same parameters (recorded in each size's manifest.json).
+    Formats a size does not support (see `supported`) are skipped.
+
+    Returns:
+    --------
+    {size label: {format: [paths]}} of the files present
+    """
+    params = dict(DEFAULT_PARAMS, **(params or {}))
+    for fmt in formats:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format {fmt!r}; choose from {', '.join(FORMATS)}")
+    datasets = {}
+    for size in sizes:
+        shape = parse_size(size) if isinstance(size, str) else tuple(size)
+        label = size_label(shape)
+        paths = dataset_paths(output_dir, shape)
+        directory = os.path.dirname(paths['vtk'][0])
+        os.makedirs(directory, exist_ok=True)
+        manifest_path = os.path.join(directory, 'manifest.json')
+        manifest = {}
+        if os.path.exists(manifest_path) and not force:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            if manifest.get('params') != params:
+                manifest = {}
+        written = set(manifest.get('formats', []))
+
+        datasets[label] = {}
+        for fmt in formats:
+            if not supported(shape, fmt):
+                continue
+            if fmt not in written or not all(os.path.exists(p) for p in paths[fmt]):
+                if verbose:
+                    print(f"Writing {label} {fmt}")
+                if fmt == 'vtk':
+                    write_vtk(paths['vtk'][0], shape, params)
+                elif fmt == 'table':
+                    write_table(paths['table'][0], shape, model_params('standard', **params))
+                    write_table(paths['table'][1], shape, model_params('time_density', **params))
+                elif fmt == 'athdf':
+                    write_athdf(paths['athdf'][0], shape, params)
+                else:
+                    write_hst(paths['hst'][0], params, history_rows(shape))
+                written.add(fmt)
+                with open(manifest_path, 'w') as f:
+                    json.dump({'shape': list(shape), 'params': params,
+                               'formats': sorted(written)}, f, indent=2)
+            datasets[label][fmt] = paths[fmt]
+    return datasets
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write synthetic Athena++-like datasets')
+    parser.add_argument('-o', '--output-dir', default='benchmark_data', help='Dataset directory')
+    parser.add_argument('--sizes', nargs='+', default=['64x64', '256x256', '64x64x64'],
+                        help='Grid sizes such as 64x64 or 512x512x512')
+    parser.add_argument('--formats', nargs='+', default=list(FORMATS), choices=FORMATS)
+    parser.add_argument('--force', action='store_true', help='Rewrite existing files')
+    args = parser.parse_args()
+
+    try:
+        datasets = generate(args.output_dir, args.sizes, args.formats, force=args.force,
+                            verbose=True)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+    for label, files in datasets.items():
+        total = sum(os.path.getsize(p) for paths in files.values() for p in paths)
+        print(f"{label:>12s}: {', '.join(files)} ({total / 2**20:.1f} MiB)")
+    if 'athdf' in args.formats and not H5PY_AVAILABLE:
+        print("Skipped .athdf files: h5py is not installed")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
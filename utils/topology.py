@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Cached polytope topology generator for the Genesis-Sphere visualizations
+Vertices, edges and 2-faces of n-cubes are enumerated by bit flips in
+O(V * n) instead of testing all O(V^2) vertex pairs, and are stored as
+compact integer arrays memoized per dimension.
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+from itertools import combinations
+
+import numpy as np
+
+# vertices: (V, n) int8 coordinates, edges: (E, 2) int32, faces: (F, k) int32
+Polytope = namedtuple('Polytope', ['vertices', 'edges', 'faces'])
+
+
+def _frozen(array, dtype):
+    """Return a read-only copy so cached arrays cannot be modified by callers"""
+    array = np.ascontiguousarray(array, dtype=dtype)
+    array.flags.writeable = False
+    return array
+
+
+def _sorted_rows(pairs):
+    """Sort index rows lexicographically (matches the old pairwise-loop order)"""
+    return pairs[np.lexsort(pairs.T[::-1])]
+
+
+@lru_cache(maxsize=None)
+def hypercube(n):
+    """
+    Topology of the n-cube with 0/1 vertex coordinates.
+
+    Vertex i has the binary digits of i as coordinates (most significant
+    bit first), the same ordering as the old f"{i:0{n}b}" construction.
+    Edges join vertices differing in one bit, 2-faces are the quads
+    (v, v|a, v|a|b, v|b) for every pair of bits a, b clear in v.
+    """
+    if n < 1:
+        raise ValueError(f"Hypercube dimension must be >= 1, got {n}")
+    index = np.arange(1 << n, dtype=np.int64)
+    bits = 1 << np.arange(n - 1, -1, -1, dtype=np.int64)  # MSB first
+    vertices = (index[:, None] & bits) != 0
+
+    # Edges: flip each clear bit of each vertex -> V * n / 2 edges
+    clear = ~vertices
+    src, axis = np.nonzero(clear)
+    edges = np.stack([src, src | bits[axis]], axis=1)
+
+    # 2-faces: flip each pair of clear bits
+    if n >= 2:
+        pair_a, pair_b = np.array(list(combinations(range(n), 2))).T
+        mask = clear[:, pair_a] & clear[:, pair_b]
+        v, p = np.nonzero(mask)
+        a, b = bits[pair_a[p]], bits[pair_b[p]]
+        faces = np.stack([v, v | a, v | a | b, v | b], axis=1)
+    else:
+        faces = np.empty((0, 4), dtype=np.int64)
+
+    return Polytope(_frozen(vertices, np.int8),
+                    _frozen(_sorted_rows(edges), np.int32),
+                    _frozen(faces, np.int32))
+
+
+@lru_cache(maxsize=None)
+def simplex(n):
+    """Topology of the regular n-simplex (n + 1 unit-vector vertices in R^(n+1))"""
+    vertices = np.eye(n + 1)
+    edges = np.array(list(combinations(range(n + 1), 2))).reshape(-1, 2)
+    faces = np.array(list(combinations(range(n + 1), 3))).reshape(-1, 3)
+    return Polytope(_frozen(vertices, np.int8), _frozen(edges, np.int32),
+                    _frozen(faces, np.int32))
+
+
+@lru_cache(maxsize=None)
+def cross_polytope(n):
+    """Topology of the n-dimensional cross-polytope (vertices +e_i, -e_i)"""
+    vertices = np.concatenate([np.eye(n), -np.eye(n)])
+    # Every pair of vertices is an edge except antipodal ones (i, i + n)
+    i, j = np.triu_indices(2 * n, k=1)
+    edges = np.stack([i, j], axis=1)[j != i + n]
+    # Triangles: one vertex from each of three distinct axes, any signs
+    axes = np.array(list(combinations(range(n), 3))).reshape(-1, 3)
+    signs = np.array([[(s >> k) & 1 for k in (2, 1, 0)] for s in range(8)])
+    faces = (axes[:, None, :] + n * signs[None, :, :]).reshape(-1, 3)
+    return Polytope(_frozen(vertices, np.int8), _frozen(edges, np.int32),
+                    _frozen(faces, np.int32))
+
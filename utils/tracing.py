@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Stage-level timing and memory tracing
+Records wall time, CPU time (including finished child processes such as
+the Docker client) and peak resident memory of named, nestable stages, and
+exports them as Chrome trace-event JSON (open in chrome://tracing or
+https://ui.perfetto.dev) and as a summary table per stage.
+
+Tracing is off by default and then costs one global check per stage: the
+span() context manager returns a shared no-op object. It is switched on
+by enable(), or at import time by the GENESIS_TRACE environment variable
+(set to the trace file path, e.g. GENESIS_TRACE=trace.json).
+
+On Linux the peak RSS of each stage is its own: the kernel high-water mark
+is reset when a stage starts (/proc/self/clear_refs). Elsewhere only the
+process-wide peak so far (getrusage) is available and is reported instead.
+"""
+
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:  # Windows
+    RESOURCE_AVAILABLE = False
+
+TRACE_ENV = 'GENESIS_TRACE'
+
+_STATUS_FILE = '/proc/self/status'
+_CLEAR_REFS_FILE = '/proc/self/clear_refs'
+
+_tracer = None
+
+# Nesting depth of the open span in the current thread or asyncio task, so
+# that stages running concurrently are nested under their own parent
+_depth = contextvars.ContextVar('tracing_depth', default=0)
+
+
+def _cpu_seconds():
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def _read_hwm():
+    """Current peak RSS in bytes from /proc (None when unavailable)"""
+    try:
+        with open(_STATUS_FILE) as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_hwm():
+    """Reset the kernel peak-RSS mark; False if this system does not allow it"""
+    try:
+        with open(_CLEAR_REFS_FILE, 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _process_peak_rss():
+    """Process-lifetime peak RSS in bytes, children included where known"""
+    if not RESOURCE_AVAILABLE:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class _Span:
+    __slots__ = ('name', 'category', 'args', 'start', 'cpu', 'peak')
+
+    def __init__(self, name, category, args, start, cpu):
+        self.name, self.category, self.args = name, category, args
+        self.start, self.cpu, self.peak = start, cpu, 0
+
+
+class Tracer:
+    """
+    Collects completed stages as events with keys 'name', 'category',
+    'args', 'start' and 'wall' (seconds since the tracer was created),
+    'cpu' (seconds), 'peak_rss' (bytes or None) and 'depth'.
+
+    Attributes:
+    -----------
+    rss_scope : str
+        'stage' when peaks are per stage, 'process' when they are the
+        process-wide peak at the end of the stage
+    """
+
+    def __init__(self):
+        self.events = []
+        self.origin = time.perf_counter()
+        self._stack = []
+        self._lock = threading.Lock()
+        self.rss_scope = 'stage' if _read_hwm() is not None and _reset_hwm() else 'process'
+
+    def _peak(self):
+        return _read_hwm() if self.rss_scope == 'stage' else _process_peak_rss()
+
+    @contextlib.contextmanager
+    def span(self, name, category='stage', **args):
+        """Trace the enclosed block as stage `name`; args (e.g. file=path) go into the trace"""
+        with self._lock:
+            if self.rss_scope == 'stage':
+                if self._stack:
+                    self._stack[-1].peak = max(self._stack[-1].peak, _read_hwm() or 0)
+                _reset_hwm()
+            current = _Span(name, category, args, time.perf_counter(), _cpu_seconds())
+            self._stack.append(current)
+        depth = _depth.get()
+        token = _depth.set(depth + 1)
+        try:
+            yield current
+        finally:
+            _depth.reset(token)
+            with self._lock:
+                end = time.perf_counter()
+                cpu = _cpu_seconds() - current.cpu
+                peak = max(current.peak, self._peak() or 0) or None
+                self._stack.remove(current)
+                if self._stack and peak:
+                    self._stack[-1].peak = max(self._stack[-1].peak, peak)
+                self.events.append({'name': name, 'category': category, 'args': args,
+                                    'start': current.start - self.origin,
+                                    'wall': end - current.start, 'cpu': cpu,
+                                    'peak_rss': peak, 'depth': depth})
+
+    def chrome_trace(self):
+        """The events in Chrome trace-event format (complete 'X' events plus an RSS counter)"""
+        pid = os.getpid()
+        events = []
+        for event in sorted(self.events, key=lambda e: e['start']):
+            args = dict(event['args'], cpu_ms=round(1000 * event['cpu'], 3))
+            if event['peak_rss'] is not None:
+                args['peak_rss_mb'] = round(event['peak_rss'] / 2**20, 2)
+            events.append({'name': event['name'], 'cat': event['category'], 'ph': 'X',
+                           'ts': 1e6 * event['start'], 'dur': 1e6 * event['wall'],
+                           'pid': pid, 'tid': 0, 'args': args})
+            if event['peak_rss'] is not None:
+                events.append({'name': 'peak RSS (MB)', 'ph': 'C', 'pid': pid, 'tid': 0,
+                               'ts': 1e6 * (event['start'] + event['wall']),
+                               'args': {'rss': args['peak_rss_mb']}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms',
+                'otherData': {'rss_scope': self.rss_scope}}
+
+    def summary(self):
+        """
+        Per-stage totals in order of first appearance.
+
+        Returns:
+        --------
+        list of dicts with 'name', 'calls', 'wall', 'cpu' (seconds, summed)
+        and 'peak_rss' (bytes, maximum over the calls)
+        """
+        rows = {}
+        for event in sorted(self.events, key=lambda e: e['start']):
+            label = event['name']
+            if event['args'].get('file'):
+                label = f"{label} [{os.path.basename(str(event['args']['file']))}]"
+            row = rows.setdefault(label, {'name': label, 'depth': event['depth'], 'calls': 0,
+                                          'wall': 0.0, 'cpu': 0.0, 'peak_rss': None})
+            row['calls'] += 1
+            row['wall'] += event['wall']
+            row['cpu'] += event['cpu']
+            if event['peak_rss'] is not None:
+                row['peak_rss'] = max(row['peak_rss'] or 0, event['peak_rss'])
+        return list(rows.values())
+
+    def format_summary(self):
+        """The summary as a text table"""
+        lines = [f"{'stage':48s} {'calls':>5s} {'wall (s)':>10s} {'cpu (s)':>10s} "
+                 f"{'peak RSS (MB)':>14s}"]
+        for row in self.summary():
+            peak = f"{row['peak_rss'] / 2**20:14.1f}" if row['peak_rss'] else f"{'-':>14s}"
+            name = '  ' * row['depth'] + row['name']
+            lines.append(f"{name[:48]:48s} {row['calls']:5d} {row['wall']:10.3f} "
+                         f"{row['cpu']:10.3f} {peak}")
+        if self.rss_scope == 'process':
+            lines.append("(peak RSS is the process-wide peak at the end of each stage)")
+        return "\n".join(lines)
+
+    def write(self, path):
+        """Write the Chrome trace to `path` and the summary table next to it (.txt)"""
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+        summary_path = os.path.splitext(path)[0] + '_summary.txt'
+        with open(summary_path, 'w') as f:
+            f.write(self.format_summary() + "\n")
+        return path, summary_path
+
+
+class _NullSpan:
+    """Shared no-op stand-in for span() while tracing is off"""
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def enable():
+    """Start tracing (keeps the current tracer if already on) and return the tracer"""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+    return _tracer
+
+
+def disable():
+    """Stop tracing and return the tracer that was active (or None)"""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def active_tracer():
+    return _tracer
+
+
+def span(name, category='stage', **args):
+    """Context manager tracing a stage when tracing is on, a no-op otherwise"""
+    if _tracer is None:
+        return _NULL_SPAN
+    return _tracer.span(name, category, **args)
+
+
+def traced(name=None, category='stage'):
+    """Decorator tracing every call of a function as a stage"""
+    def decorate(function):
+        label = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return function(*args, **kwargs)
+            with _tracer.span(label, category):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def trace_path_from_env():
+    """Trace file named by GENESIS_TRACE, or None"""
+    return os.environ.get(TRACE_ENV) or None
+
+
+if trace_path_from_env():
+    enable()
@@ -215,7 +215,8 @@ def list_vtk_contents(filename):
     except Exception as e:
         print(f"Error examining VTK file {filename}: {e}")
 
-if __name__ == "__main__":
+def main():
+    """Read or list a VTK file given on the command line"""
     if len(sys.argv) < 2:
         print("Usage: python vtk_reader.py <vtk_file> [list]")
         print("  - Provide a VTK file to read its contents")
@@ -236,3 +237,6 @@ if __name__ == "__main__":
                     print(f"  - {key}: shape {value.shape}, range [{value.min():.6g}, {value.max():.6g}]")
                 else:
                     print(f"  - {key}: {value}")
+
+if __name__ == "__main__":
+    main()